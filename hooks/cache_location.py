@@ -113,6 +113,46 @@ class CacheLocation(HookBaseClass):
 
         return target_path
 
+    def get_path_cache_replica_path(self, project_id, plugin_id, pipeline_configuration_id, path_cache_path):
+        """
+        Establish a location for the local copy of the path cache database file.
+
+        When a path cache replica location is returned, the path cache is read from a copy
+        of its database which is refreshed whenever the database changes, writes still going
+        to the database returned by :meth:`get_path_cache_path`. This avoids reading the
+        database over the network when it is located on a shared storage.
+
+        The default implementation returns a file next to the local caches of the pipeline
+        configuration when the ``use_path_cache_replica`` setting of the pipeline configuration
+        is set to true, and None otherwise.
+
+        :param project_id: The shotgun id of the project to store caches for
+        :param plugin_id: Unique string to identify the scope for a particular plugin
+                          or integration. For more information,
+                          see :meth:`~sgtk.bootstrap.ToolkitManager.plugin_id`. For
+                          non-plugin based toolkit projects, this value is None.
+        :param pipeline_configuration_id: The shotgun pipeline config id to store caches for
+        :param path_cache_path: The path to the path cache file.
+        :returns: The path to the replica file, or None to read the path cache file directly.
+                  The folder of the file should exist when this method returns.
+        """
+        tk = self.parent
+
+        if not tk.pipeline_configuration.get_path_cache_replica_enabled():
+            return None
+
+        cache_root = LocalFileStorageManager.get_configuration_root(
+            tk.shotgun_url,
+            project_id,
+            plugin_id,
+            pipeline_configuration_id,
+            LocalFileStorageManager.CACHE
+        )
+
+        target_path = os.path.join(cache_root, "path_cache_replica.db")
+        filesystem.ensure_folder_exists(cache_root)
+        return target_path
+
     def get_bundle_data_cache_path(self, project_id, plugin_id, pipeline_configuration_id, bundle):
         """
         Establish a cache folder for an app, engine or framework.
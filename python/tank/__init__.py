@@ -85,6 +85,7 @@ from .errors import (
 # note: TankEngineInitError used to reside in .errors but was moved into platform.errors
 from .platform.errors import TankEngineInitError
 from .template import Template, TemplatePath, TemplateString
+from .frame_sequence import FrameSequence
 from .hook import Hook, get_hook_baseclass
 
 from .commands import list_commands, get_command, SgtkSystemCommand
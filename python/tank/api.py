@@ -13,14 +13,18 @@ Classes for the main Sgtk API.
 """
 
 import os
-import glob
 
 from . import folder
 from . import context
-from .util import shotgun, yaml_cache
+from .util import shotgun, yaml_cache, EventMetric
 from .errors import TankError, TankMultipleMatchingTemplatesError
-from .path_cache import PathCache
+from .path_cache import PathCache, PathCacheDatabase, PathCacheSynchronizer
 from .template import read_templates
+from .templatekey import SequenceKey
+from .frame_sequence import FrameSequence
+from .template_index import TemplateIndex
+from .template_overlap import TemplateOverlaps
+from .template_walker import TemplatePathWalker, get_placeholder
 from . import constants
 from . import pipelineconfig
 from . import pipelineconfig_factory
@@ -59,6 +63,19 @@ class Sgtk(object):
         except TankError as e:
             raise TankError("Could not read templates configuration: %s" % e)
 
+        # path cache database connections, shared by all the path cache objects
+        self.__path_cache_database = PathCacheDatabase(self)
+        # background path cache sync thread, see start_path_cache_synchronizer
+        self.__path_cache_synchronizer = None
+
+        # indices of templates and schema folders by static path prefix and
+        # analysis of the overlapping templates, built on first use
+        self.__template_index = None
+        self.__template_index_source = None
+        self.__template_overlaps = None
+        self.__folder_index = None
+        self.__folder_index_source = None
+
         # create schema builder
         schema_cfg_folder = self.__pipeline_config.get_schema_config_location()
         self.folder_config = folder.configuration.FolderConfiguration(self, schema_cfg_folder)
@@ -132,6 +149,51 @@ class Sgtk(object):
         """
         pass
 
+    def _get_template_index(self):
+        """
+        Returns the index of the templates by static path prefix, rebuilding it
+        if the templates have been reloaded or changed since it was built.
+
+        :returns: :class:`TemplateIndex` instance.
+        """
+        self.__update_template_analysis()
+        return self.__template_index
+
+    def __update_template_analysis(self):
+        """
+        Builds the template index and overlap analysis if the templates have
+        been loaded, reloaded or changed since they were last built.
+        """
+        if self.__template_index is None or self.__template_index_source != self.templates:
+            self.__template_index_source = dict(self.templates)
+            self.__template_index = TemplateIndex(self.__template_index_source.values())
+            self.__template_overlaps = TemplateOverlaps(self.__template_index_source.values())
+
+    def _get_folder_index(self):
+        """
+        Returns the index of the schema folders by static path prefix, rebuilding
+        it if the folder configuration has changed since it was built.
+
+        :returns: :class:`TemplateIndex` instance.
+        """
+        folders = self.folder_config.get_folders()
+        if self.__folder_index is None or self.__folder_index_source != folders:
+            self.__folder_index_source = list(folders)
+            self.__folder_index = TemplateIndex(
+                self.__folder_index_source,
+                get_template=lambda folder_obj: folder_obj.template_path
+            )
+        return self.__folder_index
+
+    def _get_path_cache_database(self):
+        """
+        Returns the path cache database of this instance, handing out the
+        connections used by :class:`PathCache` objects.
+
+        :returns: :class:`PathCacheDatabase` instance.
+        """
+        return self.__path_cache_database
+
     def get_cache_item(self, cache_key):
         """
         Returns an item from the cache held within this tk instance.
@@ -190,6 +252,20 @@ class Sgtk(object):
         """
         return self.__pipeline_config.get_primary_data_root()
 
+    @property
+    def template_overlaps(self):
+        """
+        Analysis of the template paths which can possibly validate the same
+        path, computed once per set of loaded templates::
+
+            >>> tk.template_overlaps.get_overlapping(tk.templates["maya_shot_work"])
+            [<Sgtk TemplatePath nuke_shot_work: ...>]
+
+        :returns: :class:`TemplateOverlaps` instance.
+        """
+        self.__update_template_analysis()
+        return self.__template_overlaps
+
     @property
     def roots(self):
         """
@@ -289,13 +365,36 @@ class Sgtk(object):
 
                     sgtk.platform.current_engine().sgtk.reload_templates()
 
+        The results memoized by the previous templates are discarded.
+
         :raises: :class:`TankError`
         """
+        previous_templates = self.templates
         try:
             self.templates, self.template_keys = read_templates(self.__pipeline_config)
         except TankError as e:
             raise TankError("Templates could not be reloaded: %s" % e)
 
+        for template in previous_templates.itervalues():
+            template.clear_cache()
+
+        self.__template_index = None
+
+    def close(self):
+        """
+        Closes the connections to the path cache database held by this instance
+        and stops its background path cache synchronizer, if any. The contexts of
+        this instance are also removed from the context cache.
+
+        Connections are kept open across path cache lookups and should be closed
+        once the instance is no longer needed. The connections of threads which
+        exited are closed as other threads open theirs. The instance remains usable
+        after this call, connections being opened again on demand.
+        """
+        self.stop_path_cache_synchronizer()
+        self.__path_cache_database.close()
+        context.g_context_cache.discard(self)
+
     def list_commands(self):
         """
         Lists the system commands registered with the system.
@@ -349,8 +448,13 @@ class Sgtk(object):
         :param path: Path to match against a template
         :returns: :class:`TemplatePath` or None if no match could be found.
         """
+        # only validate the templates which have a static prefix matching the path
+        # and which can overlap with the templates already matching it.
+        template_overlaps = self.template_overlaps
         matched_templates = set()
-        for key, template in self.templates.items():
+        for template in self._get_template_index().get_candidates(path):
+            if any(not template_overlaps.can_overlap(template, m) for m in matched_templates):
+                continue
             if template.validate(path):
                 matched_templates.add(template)
 
@@ -400,8 +504,9 @@ class Sgtk(object):
         :param path: Path to match against a schema configuraiton folder
         :returns: :class:`Folder` or derived class or None if no match could be found.
         """
+        # only validate the folders which have a static prefix matching the path
         matched_folders = set()
-        for folder_obj in self.folder_config.get_folders():
+        for folder_obj in self._get_folder_index().get_candidates(path):
             if folder_obj.template_path.validate(path):
                 matched_folders.add(folder_obj)
 
@@ -487,59 +592,189 @@ class Sgtk(object):
         :returns: Matching file paths
         :rtype: List of strings.
         """
+        return list(self.iter_paths_from_template(template, fields, skip_keys, skip_missing_optional_keys))
+
+    def iter_paths_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False):
+        """
+        Finds paths that match a template using field values passed.
+
+        This works like :meth:`paths_from_template` but returns a generator so that
+        matching paths can be processed while the file system is being searched::
+
+            >>> for path in tk.iter_paths_from_template(maya_work, {"Sequence": "AAA", "Shot": "001"}):
+            ...     print path
+            /studio/my_proj/sequences/AAA/001/work/background.v001.ma
+            /studio/my_proj/sequences/AAA/001/work/background.v002.ma
+
+        The file system is walked one folder level at a time and folders whose names
+        hold invalid values for the searched keys are never listed.
+
+        .. note:: The result is not ordered in any particular way.
+
+        :param template: Template against whom to match.
+        :type  template: :class:`TemplatePath`
+        :param fields: Fields and values to use.
+        :type  fields: Dictionary
+        :param skip_keys: Keys whose values should be ignored from the fields parameter.
+        :type  skip_keys: List of key names
+        :param skip_missing_optional_keys: Specify if optional keys should be skipped if they
+                                        aren't found in the fields collection
+        :returns: Generator of matching file paths
+        """
+        found_files = set()
+        for search_path, keys in self._get_search_paths(template, fields, skip_keys, skip_missing_optional_keys):
+            # Find all files which are valid for this key set
+            for found_file in TemplatePathWalker(search_path, keys).walk():
+                if found_file not in found_files and template.validate(found_file):
+                    found_files.add(found_file)
+                    yield found_file
+
+    def sequences_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False,
+                                sequence_key=None):
+        """
+        Finds the frame sequences that match a template using field values passed.
+
+        This works like :meth:`paths_from_template` but returns each sequence of files
+        only once, rather than one path per frame. Files are grouped by the values of
+        all keys but the sequence key, whose values are always searched for::
+
+            >>> render = tk.templates["render"]
+            >>> for sequence in tk.sequences_from_template(render, {"Sequence": "AAA", "Shot": "001"}):
+            ...     print sequence
+            /studio/my_proj/sequences/AAA/001/images/render_1.%04d.exr [1-100]
+            /studio/my_proj/sequences/AAA/001/images/render_2.%04d.exr [1-48, 50-100]
+
+        Each folder is listed once and the template is only validated once per
+        sequence, regardless of the number of frames it holds.
+
+        .. note:: The result is not ordered in any particular way.
+
+        :param template: Template against whom to match.
+        :type  template: :class:`TemplatePath`
+        :param fields: Fields and values to use.
+        :type  fields: Dictionary
+        :param skip_keys: Keys whose values should be ignored from the fields parameter.
+        :type  skip_keys: List of key names
+        :param skip_missing_optional_keys: Specify if optional keys should be skipped if they
+                                        aren't found in the fields collection
+        :param sequence_key: Name of the key holding frame numbers. Only needed if the
+                             template has several :class:`SequenceKey` keys.
+        :returns: List of :class:`FrameSequence` objects, using the default value of the
+                  sequence key, e.g. ``%04d``, in their path.
+        :raises: :class:`TankError` if the sequence key can't be determined.
+        """
+        if sequence_key is None:
+            sequence_keys = [key.name for key in template.keys.values() if isinstance(key, SequenceKey)]
+            if len(sequence_keys) != 1:
+                raise TankError("Cannot find frame sequences for template %s: it needs to contain "
+                                "exactly one sequence key, or one needs to be specified. "
+                                "Sequence keys found: %s" % (template, sequence_keys))
+            sequence_key = sequence_keys[0]
+
+        elif not isinstance(template.keys.get(sequence_key), SequenceKey):
+            raise TankError("Cannot find frame sequences for template %s: '%s' is not one "
+                            "of its sequence keys." % (template, sequence_key))
+
+        # frames are always searched for
         skip_keys = skip_keys or []
         if isinstance(skip_keys, basestring):
             skip_keys = [skip_keys]
-        
+        skip_keys = list(skip_keys) + [sequence_key]
+
+        # frames keyed by abstract path
+        sequences = {}
+        for search_path, keys in self._get_search_paths(template, fields, skip_keys, skip_missing_optional_keys):
+            if sequence_key not in keys:
+                continue
+
+            walker = TemplatePathWalker(search_path, keys)
+            if walker.supports_sequences(sequence_key):
+                found = walker.walk_sequences(sequence_key)
+            else:
+                # frames can't be told apart from the other values of the file names,
+                # validate all the files.
+                found = ((found_file, None) for found_file in walker.walk())
+
+            for found_file, frames in found:
+                found_fields = template.validate_and_get_fields(found_file)
+                if found_fields is None:
+                    continue
+                frame = found_fields.pop(sequence_key, None)
+                if frames is None:
+                    if not isinstance(frame, int):
+                        # frame spec in the file name, e.g. %04d
+                        continue
+                    frames = [frame]
+
+                # the sequence key default value is used in the abstract path
+                abstract_path = template.apply_fields(found_fields)
+                sequences.setdefault(abstract_path, set()).update(frames)
+
+        return [FrameSequence(path, frames) for path, frames in sequences.iteritems()]
+
+    def _get_search_paths(self, template, fields, skip_keys, skip_missing_optional_keys):
+        """
+        Builds the paths to search for the files matching a template using field values passed.
+
+        :param template: Template against whom to match.
+        :param fields: Fields and values to use.
+        :param skip_keys: Keys whose values should be ignored from the fields parameter.
+        :param skip_missing_optional_keys: Specify if optional keys should be skipped if they
+                                        aren't found in the fields collection
+        :returns: Generator of (search path, keys) tuples, one per template variation, where
+                  the search path holds placeholders for the key values to search for, as
+                  expected by :class:`TemplatePathWalker`.
+        """
+        skip_keys = skip_keys or []
+        if isinstance(skip_keys, basestring):
+            skip_keys = [skip_keys]
+        else:
+            skip_keys = list(skip_keys)
+
         # construct local fields dictionary that doesn't include any skip keys:
         local_fields = dict((field, value) for field, value in fields.iteritems() if field not in skip_keys)
-        
+
         # we always want to automatically skip 'required' keys that weren't
-        # specified so add wildcards for them to the local fields
+        # specified so add placeholders for them to the local fields
         for key in template.missing_keys(local_fields):
             if key not in skip_keys:
                 skip_keys.append(key)
-            local_fields[key] = "*"
-            
+            local_fields[key] = get_placeholder(key)
+
         # iterate for each set of keys in the template:
-        found_files = set()
-        globs_searched = set()
+        paths_searched = set()
         for keys in template._keys:
-            # create fields and skip keys with those that 
+            # create fields and skip keys with those that
             # are relevant for this key set:
             current_local_fields = local_fields.copy()
             current_skip_keys = []
             for key in skip_keys:
                 if key in keys:
                     current_skip_keys.append(key)
-                    current_local_fields[key] = "*"
-            
+                    current_local_fields[key] = get_placeholder(key)
+
             # find remaining missing keys - these will all be optional keys:
             missing_optional_keys = template._missing_keys(current_local_fields, keys, False)
             if missing_optional_keys:
                 if skip_missing_optional_keys:
-                    # Add wildcard for each optional key missing from the input fields
+                    # Add placeholder for each optional key missing from the input fields
                     for missing_key in missing_optional_keys:
-                        current_local_fields[missing_key] = "*"
+                        current_local_fields[missing_key] = get_placeholder(missing_key)
                         current_skip_keys.append(missing_key)
                 else:
                     # if there are missing fields then we won't be able to
                     # form a valid path from them so skip this key set
                     continue
-            
-            # Apply the fields to build the glob string to search with:
-            glob_str = template._apply_fields(current_local_fields, ignore_types=current_skip_keys)
-            if glob_str in globs_searched:
+
+            # Apply the fields to build the path to search with:
+            search_path = template._apply_fields(current_local_fields, ignore_types=current_skip_keys)
+            if search_path in paths_searched:
                 # it's possible that multiple key sets return the same search
                 # string depending on the fields and skip-keys passed in
                 continue
-            globs_searched.add(glob_str)
-            
-            # Find all files which are valid for this key set
-            found_files.update([found_file for found_file in glob.iglob(glob_str) if template.validate(found_file)])
-                    
-        return list(found_files) 
+            paths_searched.add(search_path)
 
+            yield search_path, keys
 
     def abstract_paths_from_template(self, template, fields, skip_keys=None, skip_missing_optional_keys=False):
         """
@@ -706,6 +941,62 @@ class Sgtk(object):
 
         return entity
 
+    def paths_from_entities(self, entities):
+        """
+        Finds paths associated with a list of Shotgun entities. This is equivalent to
+        calling :meth:`paths_from_entity` for each entity, with fewer path cache lookups.
+
+        .. note:: Only paths that have been generated by :meth:`create_filesystem_structure` will
+                 be returned. Such paths are stored in Shotgun as ``FilesystemLocation`` entities.
+
+        :param entities: List of (entity type, entity id) tuples
+        :returns: Dictionary keyed by (entity type, entity id) tuple, with lists of
+                  matching file paths as values.
+        """
+        path_cache = PathCache(self)
+        try:
+            return path_cache.get_paths_for_entities(entities, primary_only=True)
+        finally:
+            path_cache.close()
+
+    def entities_from_paths(self, paths):
+        """
+        Returns the shotgun entities associated with a list of paths. This is equivalent
+        to calling :meth:`entity_from_path` for each path, with fewer path cache lookups.
+
+        .. note:: Only paths that have been generated by :meth:`create_filesystem_structure` will
+                 be returned. Such paths are stored in Shotgun as ``FilesystemLocation`` entities.
+
+        :param paths: List of paths to folders or files
+        :returns: Dictionary keyed by path, with Shotgun dictionaries containing name,
+                  type and id as values, or None if no entity was associated with the path.
+        """
+        path_cache = PathCache(self)
+        try:
+            return path_cache.get_entities_for_paths(paths)
+        finally:
+            path_cache.close()
+
+    def entities_under_path(self, path):
+        """
+        Returns the shotgun entities associated with a folder and with all the folders
+        below it, for example all the Shots, Steps and Tasks with folders under
+        ``/mnt/projects/chasing_the_light/sequences/AAA``.
+
+        .. note:: Only paths that have been generated by :meth:`create_filesystem_structure` will
+                 be returned. Such paths are stored in Shotgun as ``FilesystemLocation`` entities.
+
+        :param path: Path to a folder
+        :returns: Dictionary keyed by path, with Shotgun dictionaries containing name,
+                  type and id as values.
+        """
+        path_cache = PathCache(self)
+        try:
+            entries = path_cache.get_entities_under_path(path, primary_only=True)
+        finally:
+            path_cache.close()
+        return dict((entry["path"], entry["entity"]) for entry in entries)
+
     def context_empty(self):
         """
         Factory method that constructs an empty Context object.
@@ -734,6 +1025,26 @@ class Sgtk(object):
         """
         return context.from_path(self, path, previous_context)
 
+    def contexts_from_paths(self, paths, previous_context=None):
+        """
+        Factory method that constructs context objects for many paths on disk.
+
+        This is equivalent to calling :meth:`context_from_path` for each path, but
+        much faster for large numbers of paths: the folders the paths share are only
+        looked up once, the path cache is queried for all the paths at once and the
+        data missing from the path cache is retrieved from Shotgun with a query per
+        entity type rather than per path. Paths resolving to the same entities
+        share the same context object.
+
+        :param list paths: File system paths.
+        :param previous_context: A context object to use to try to automatically extend the generated
+                                 contexts if they are incomplete when extracted from the paths.
+        :type previous_context: :class:`Context`
+        :returns: List of :class:`Context`, in the same order as the paths.
+        :raises: :class:`TankError` if a path isn't associated with any entity.
+        """
+        return context.from_paths(self, paths, previous_context)
+
     def context_from_entity(self, entity_type, entity_id):
         """
         Factory method that constructs a context object from a Shotgun entity.
@@ -836,6 +1147,113 @@ class Sgtk(object):
         """
         return folder.synchronize_folders(self, full_sync)
 
+    def start_path_cache_synchronizer(self, interval=None):
+        """
+        Starts keeping the path cache in sync with Shotgun from a background thread,
+        so that the syncs carried out by folder creation and
+        :meth:`synchronize_filesystem_structure` usually have nothing left to do.
+
+        The thread applies the folders created and unregistered on other machines
+        incrementally. It runs until :meth:`stop_path_cache_synchronizer` or
+        :meth:`close` is called. Engines start it when the ``path_cache_sync_interval``
+        setting of the pipeline configuration is set.
+
+        :param interval: Number of seconds between syncs. Defaults to the
+                         ``path_cache_sync_interval`` setting, or 60 seconds.
+        :returns: :class:`~tank.path_cache.PathCacheSynchronizer` thread. Its
+                  ``get_metrics()`` method reports the number of syncs and how long
+                  ago the path cache was last in sync.
+        """
+        if self.__path_cache_synchronizer and self.__path_cache_synchronizer.is_alive():
+            log.debug("Path cache synchronizer already running.")
+            return self.__path_cache_synchronizer
+
+        if interval is None:
+            interval = self.__pipeline_config.get_path_cache_sync_interval() or 60
+
+        self.__path_cache_synchronizer = PathCacheSynchronizer(self, interval)
+        self.__path_cache_synchronizer.start()
+        return self.__path_cache_synchronizer
+
+    def stop_path_cache_synchronizer(self):
+        """
+        Stops the background path cache synchronizer started by
+        :meth:`start_path_cache_synchronizer`, waiting for the sync in progress to
+        complete. Does nothing if it isn't running.
+        """
+        if self.__path_cache_synchronizer:
+            log.debug("Stopping path cache synchronizer...")
+            self.__path_cache_synchronizer.halt()
+            self.__path_cache_synchronizer = None
+
+    def get_path_cache_synchronizer(self):
+        """
+        Returns the background path cache synchronizer started by
+        :meth:`start_path_cache_synchronizer`.
+
+        :returns: :class:`~tank.path_cache.PathCacheSynchronizer` or None if it
+                  hasn't been started or has been stopped since.
+        """
+        return self.__path_cache_synchronizer
+
+    def get_path_cache_stats(self, reset=False):
+        """
+        Returns statistics about the path cache of this instance: the number of calls,
+        queries, results and the latency of each path cache lookup, and the number,
+        kind and duration of the syncs with Shotgun.
+
+        :param bool reset: If True, the statistics are cleared once returned.
+        :returns: Dictionary of statistics, see
+                  :meth:`~tank.path_cache.PathCacheStats.get_stats`.
+        """
+        stats = self.__path_cache_database.stats
+        result = stats.get_stats()
+        if reset:
+            stats.reset()
+        return result
+
+    def log_path_cache_metrics(self):
+        """
+        Emits the path cache statistics of this instance as a ``Path Cache Statistics``
+        metric, dispatched to the ``log_metrics`` core hook along with the other
+        metrics. Engines call it when they are destroyed if the ``log_path_cache_metrics``
+        setting of the pipeline configuration is set.
+
+        The statistics are cleared once emitted.
+        """
+        stats = self.get_path_cache_stats(reset=True)
+        # the individual queries scanning whole tables are only of interest to tests
+        stats["full_scans"] = len(stats["full_scans"])
+        EventMetric.log(EventMetric.GROUP_TOOLKIT, "Path Cache Statistics", properties=stats)
+
+    def export_path_cache_snapshot(self, path=None):
+        """
+        Synchronizes the path cache with Shotgun and writes a compressed snapshot of it.
+
+        When the ``path_cache_snapshot_path`` setting of the pipeline configuration
+        points at a snapshot, new path caches, for example the ones of render farm
+        nodes, are seeded from it and then synchronized incrementally rather than
+        downloading all the ``FilesystemLocation`` entities of the project.
+
+        :param path: Path to the snapshot file to write. Defaults to the
+                     ``path_cache_snapshot_path`` setting.
+        :returns: Id of the last event log entry synchronized into the snapshot.
+        :raises: :class:`TankError` if no path is given and the setting isn't set.
+        """
+        if path is None:
+            path = self.pipeline_configuration.get_path_cache_snapshot_path()
+            if path is None:
+                raise TankError(
+                    "No snapshot path given and no path_cache_snapshot_path "
+                    "setting in the pipeline configuration."
+                )
+
+        path_cache = PathCache(self)
+        try:
+            return path_cache.export_snapshot(path)
+        finally:
+            path_cache.close()
+
     def create_filesystem_structure(self, entity_type, entity_id, engine=None):
         """
         Create folders and associated data on disk to reflect branches in the project
@@ -0,0 +1,95 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from .action_base import Action
+from ..errors import TankError
+from .. import template
+from .. import template_snapshot
+from .. import constants
+
+
+class CacheTemplatesAction(Action):
+    """
+    Action that builds the snapshot of the processed keys and templates
+    of a configuration, used to speed up the loading of templates.
+    """
+    def __init__(self):
+        Action.__init__(
+            self,
+            "cache_templates",
+            Action.TK_INSTANCE,
+            "Builds a snapshot of the templates configuration to speed up its loading.",
+            "Admin",
+        )
+
+        # this method can be executed via the API
+        self.supports_api = True
+
+    def run_noninteractive(self, log, parameters):
+        """
+        Tank command API accessor.
+        Called when someone runs a tank command through the core API.
+
+        This command takes no parameters, so an empty dictionary
+        should be passed. The parameters argument is there because
+        we are deriving from the Action base class which requires
+        this parameter to be present.
+
+        :param log: std python logger
+        :param parameters: dictionary with tank command parameters
+        :returns: Path to the snapshot file, None if the configuration can't be snapshotted.
+        """
+        return self._run(log)
+
+    def run_interactive(self, log, args):
+        """
+        Tank command accessor
+
+        :param log: std python logger
+        :param args: command line args
+        """
+        if len(args) != 0:
+            raise TankError("This command takes no arguments!")
+        return self._run(log)
+
+    def _run(self, log):
+        """
+        Actual execution payload
+        """
+        log.info("This command will read the templates configuration and store a "
+                 "snapshot of all its keys and templates.")
+
+        pipeline_configuration = self.tk.pipeline_configuration
+        per_platform_roots = pipeline_configuration.get_all_platform_data_roots()
+
+        config_files = []
+        includes = []
+        templates, keys = template.make_templates(pipeline_configuration, per_platform_roots, config_files, includes)
+        for path in config_files:
+            log.debug("Read %s" % path)
+
+        try:
+            snapshot_path = template_snapshot.write_snapshot(
+                pipeline_configuration, templates, keys, config_files, includes, per_platform_roots
+            )
+        except TankError as e:
+            log.warning("%s" % e)
+            log.warning("No snapshot can be stored for this configuration, each Toolkit "
+                        "instance will read its templates configuration.")
+            return None
+        log.info("Wrote %d keys and %d templates to %s" % (len(keys), len(templates), snapshot_path))
+
+        if not template_snapshot.is_snapshot_enabled():
+            log.warning("The %s environment variable is set, the snapshot will not be used."
+                        % constants.DISABLE_TEMPLATES_SNAPSHOT_ENV_VAR)
+
+        log.info("")
+        log.info("Cache templates completed!")
+        return snapshot_path
@@ -101,6 +101,211 @@ class SynchronizePathCache(Action):
                       "the 'upgrade_folders' tank command.")
 
 
+class ExportPathCacheSnapshotAction(Action):
+    """
+    Tank command to write a snapshot of the path cache, which new path
+    caches are seeded from rather than doing a full sync with Shotgun.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        Action.__init__(self,
+                        "export_path_cache_snapshot",
+                        Action.TK_INSTANCE,
+                        ("Writes a snapshot of the local folder representation, which new machines "
+                         "are seeded from rather than doing a full sync with Shotgun."),
+                        "Admin")
+
+        # this method can be executed via the API
+        self.supports_api = True
+        self.parameters = {}
+        self.parameters["path"] = {
+            "description": "Path to the snapshot file. Defaults to the path_cache_snapshot_path setting.",
+            "default": None,
+            "type": "str"
+        }
+        self.parameters["return_value"] = {
+            "description": "Id of the last event log entry synchronized into the snapshot.",
+            "type": "int"
+        }
+
+    def run_noninteractive(self, log, parameters):
+        """
+        Tank command API accessor.
+        Called when someone runs a tank command through the core API.
+
+        :param log: std python logger
+        :param parameters: dictionary with tank command parameters
+        """
+        # validate params and seed default values
+        computed_params = self._validate_parameters(parameters)
+        return self._run(log, computed_params["path"])
+
+    def run_interactive(self, log, args):
+        """
+        Tank command accessor
+
+        :param log: std python logger
+        :param args: command line args
+        """
+        if len(args) == 1:
+            path = args[0]
+
+        elif len(args) == 0:
+            path = None
+
+        else:
+            raise TankError("Syntax: export_path_cache_snapshot [path]")
+
+        return self._run(log, path)
+
+    def _run(self, log, path):
+        """
+        Actual business logic for command
+
+        :param log: logger
+        :param path: path to the snapshot file, None for the configured location
+        """
+        if not self.tk.pipeline_configuration.get_shotgun_path_cache_enabled():
+            log.error("Looks like this project doesn't synchronize its folders with Shotgun! "
+                      "Only path caches synchronized with Shotgun can be exported.")
+            return None
+
+        if path is None:
+            path = self.tk.pipeline_configuration.get_path_cache_snapshot_path()
+            if path is None:
+                raise TankError("Please specify the path to the snapshot file, no "
+                                "path_cache_snapshot_path setting was found in the "
+                                "pipeline configuration.")
+
+        log.info("Ensuring that the local folder representation is up to date...")
+        last_id = self.tk.export_path_cache_snapshot(path)
+        log.info("Path cache snapshot written to %s." % path)
+        log.info("New path caches seeded from it will be synchronized from event log entry %s." % last_id)
+
+        if path != self.tk.pipeline_configuration.get_path_cache_snapshot_path():
+            log.info("")
+            log.info("Set path_cache_snapshot_path to this location in the pipeline_configuration.yml "
+                     "file of the pipeline configuration for new path caches to be seeded from it.")
+
+        return last_id
+
+
+class PathCacheStatsAction(Action):
+    """
+    Tank command reporting the content of the path cache and how far behind
+    Shotgun it is, timing a sync with Shotgun.
+
+    The statistics are those recorded by the current process. When run from the
+    command line, they cover the sync carried out by the command. When run through
+    the API, they also cover the path cache lookups done by the process so far.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        Action.__init__(self,
+                        "path_cache_stats",
+                        Action.TK_INSTANCE,
+                        ("Reports the size of the local folder representation and how far behind "
+                         "Shotgun it is, and times a synchronization with Shotgun."),
+                        "Admin")
+
+        # this method can be executed via the API
+        self.supports_api = True
+        self.parameters = {}
+        self.parameters["return_value"] = {
+            "description": ("Dictionary with the keys database, the content of the path cache "
+                            "database, and stats, the path cache statistics of the current process."),
+            "type": "dict"
+        }
+
+    def run_noninteractive(self, log, parameters):
+        """
+        Tank command API accessor.
+        Called when someone runs a tank command through the core API.
+
+        :param log: std python logger
+        :param parameters: dictionary with tank command parameters
+        """
+        # validate params and seed default values
+        self._validate_parameters(parameters)
+        return self._run(log)
+
+    def run_interactive(self, log, args):
+        """
+        Tank command accessor
+
+        :param log: std python logger
+        :param args: command line args
+        """
+        if len(args) != 0:
+            raise TankError("Syntax: path_cache_stats")
+
+        return self._run(log)
+
+    def _run(self, log):
+        """
+        Actual business logic for command
+
+        :param log: logger
+        """
+        pc = path_cache.PathCache(self.tk)
+        try:
+            database_info = pc.get_database_info()
+            if database_info is None:
+                log.info("This project does not have any associated folders.")
+                return None
+
+            if self.tk.pipeline_configuration.get_shotgun_path_cache_enabled():
+                # times the sync, but leaves full syncs to the synchronize_folders command
+                log.info("Checking for new folders in Shotgun...")
+                if pc.synchronize(allow_full_sync=False) is None:
+                    log.warning("The path cache needs a full sync, run the synchronize_folders "
+                                "tank command to carry it out.")
+                database_info = pc.get_database_info()
+        finally:
+            pc.close()
+
+        stats = self.tk.get_path_cache_stats()
+
+        log.info("")
+        log.info("Path cache database: %s" % database_info["path"])
+        log.info("Size: %d KB" % (database_info["size"] // 1024))
+        log.info("Entries: %d" % database_info["entries"])
+        log.info("Folders: %d" % database_info["folders"])
+        log.info("Entity types: %d" % database_info["entity_types"])
+        log.info("Last event log entry synced: %s" % database_info["last_event_log_id"])
+
+        log.info("")
+        log.info("Syncs: %d full, %d incremental, %d up to date, %.3f seconds in total" % (
+            stats["full_syncs"], stats["incremental_syncs"], stats["up_to_date_syncs"], stats["sync_time"]
+        ))
+        if stats["event_log_lag"] is not None:
+            log.info("The path cache was %d event log entries behind Shotgun." % stats["event_log_lag"])
+        log.info("Folders synced: %d" % stats["folders_synced"])
+
+        log.info("")
+        log.info("Path cache usage by this process:")
+        log.info("Queries: %d" % stats["queries"])
+        for name, method in sorted(stats["methods"].items()):
+            log.info(
+                "%s: %d calls, %d queries, %d results, %.2f ms on average, %.2f ms at most" % (
+                    name,
+                    method["calls"],
+                    method["queries"],
+                    method["rows"],
+                    method["average_time"] * 1000,
+                    method["max_time"] * 1000,
+                )
+            )
+
+        return {"database": database_info, "stats": stats}
+
+
 class PathCacheMigrationAction(Action):
     """
     Tank command for migrating an existing project to use the new FilesystemLocation
@@ -39,6 +39,8 @@ from . import copy_apps
 from . import unregister_folders
 from . import desktop_migration
 from . import cache_yaml
+from . import cache_templates
+from . import template_overlaps
 from . import get_entity_commands
 from . import constants
 
@@ -55,14 +57,18 @@ log = LogManager.get_logger(__name__)
 
 BUILT_IN_ACTIONS = [
                     app_info.AppInfoAction,
+                    cache_templates.CacheTemplatesAction,
                     dump_config.DumpConfigAction,
                     folders.CreateFoldersAction,
                     folders.PreviewFoldersAction,
                     get_entity_commands.GetEntityCommandsAction,
                     misc.ClearCacheAction,
                     misc.InteractiveShellAction,
+                    path_cache.ExportPathCacheSnapshotAction,
+                    path_cache.PathCacheStatsAction,
                     path_cache.SynchronizePathCache,
                     pc_overview.PCBreakdownAction,
+                    template_overlaps.TemplateOverlapsAction,
                     unregister_folders.UnregisterFoldersAction,
                     validate_config.ValidateConfigAction
                     ]
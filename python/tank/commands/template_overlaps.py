@@ -0,0 +1,82 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from .action_base import Action
+from ..errors import TankError
+
+
+class TemplateOverlapsAction(Action):
+    """
+    Action that reports the templates which can possibly match the same path.
+    """
+    def __init__(self):
+        Action.__init__(
+            self,
+            "template_overlaps",
+            Action.TK_INSTANCE,
+            ("Reports the template paths which can possibly match the same path "
+             "and make template_from_path ambiguous."),
+            "Configuration",
+        )
+
+        # this method can be executed via the API
+        self.supports_api = True
+
+    def run_noninteractive(self, log, parameters):
+        """
+        Tank command API accessor.
+        Called when someone runs a tank command through the core API.
+
+        This command takes no parameters, so an empty dictionary
+        should be passed. The parameters argument is there because
+        we are deriving from the Action base class which requires
+        this parameter to be present.
+
+        :param log: std python logger
+        :param parameters: dictionary with tank command parameters
+        :returns: List of (template name, template name) tuples.
+        """
+        return self._run(log)
+
+    def run_interactive(self, log, args):
+        """
+        Tank command accessor
+
+        :param log: std python logger
+        :param args: command line args
+        """
+        if len(args) != 0:
+            raise TankError("This command takes no arguments!")
+        return self._run(log)
+
+    def _run(self, log):
+        """
+        Actual execution payload
+        """
+        log.info("This command will analyse the template paths of the configuration "
+                 "and report the ones which can possibly match the same path.")
+        log.info("")
+
+        pairs = [
+            (template.name, other_template.name)
+            for template, other_template in self.tk.template_overlaps.get_overlapping_pairs()
+        ]
+        for name, other_name in sorted(pairs):
+            log.info("%s <-> %s" % (name, other_name))
+
+        log.info("")
+        if pairs:
+            log.info("Found %d pairs of overlapping templates. Paths matching both templates "
+                     "of a pair are resolved by template_from_path using the number of static "
+                     "tokens of the templates and an error is raised if there is a tie." % len(pairs))
+        else:
+            log.info("No overlapping templates found.")
+
+        return pairs
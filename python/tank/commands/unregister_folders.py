@@ -279,17 +279,24 @@ class UnregisterFoldersAction(Action):
         # linked up to the folders registered for this entity.
         # store this in a set so that we ensure a unique set of matches
 
-        paths = set()
         pc = path_cache.PathCache(self.tk)
         path_ids = []
         paths = []
+        # ids in path_ids, for fast lookups
+        seen_ids = set()
         try:
             for sg_fs_id in ids:
+                if sg_fs_id in seen_ids:
+                    # already part of the subtree of a previous id
+                    continue
                 # get path subtree for this id via the path cache
                 for path_obj in pc.get_folder_tree_from_sg_id(sg_fs_id):
-                    # store in the set as a tuple which is immutable
-                    paths.append(path_obj["path"])
-                    path_ids.append(path_obj["sg_id"])
+                    # subtrees of the given ids may overlap, keep the
+                    # list unique.
+                    if path_obj["sg_id"] not in seen_ids:
+                        seen_ids.add(path_obj["sg_id"])
+                        paths.append(path_obj["path"])
+                        path_ids.append(path_obj["sg_id"])
         finally:
             pc.close()
 
@@ -39,6 +39,29 @@ PIPELINE_CONFIG_DEV_DESCRIPTOR_TOKEN = "{PIPELINE_CONFIG}"
 # the name of the file that holds the templates.yml config
 CONTENT_TEMPLATES_FILE = "templates.yml"
 
+# the name of the file, in the pipeline configuration cache location, holding
+# a snapshot of the keys and templates read from the templates config
+TEMPLATES_SNAPSHOT_FILE = "templates_snapshot.pickle"
+
+# environment variable that if set, disables the use of the templates snapshot
+DISABLE_TEMPLATES_SNAPSHOT_ENV_VAR = "TK_DISABLE_TEMPLATES_SNAPSHOT"
+
+# environment variable holding the maximum number of results of apply_fields and
+# get_fields memoized by each template, overriding the pipeline configuration setting.
+TEMPLATE_CACHE_SIZE_ENV_VAR = "TK_TEMPLATE_CACHE_SIZE"
+
+# maximum number of contexts kept by the context cache
+CONTEXT_CACHE_SIZE = 1000
+
+# number of seconds contexts are kept by the context cache
+CONTEXT_CACHE_TTL = 300
+
+# maximum number of results of Context.as_template_fields memoized by each context
+CONTEXT_TEMPLATE_FIELDS_CACHE_SIZE = 500
+
+# version of the JSON format of serialized contexts
+CONTEXT_SERIALIZATION_VERSION = 1
+
 # config file with information about which core to use
 CONFIG_CORE_DESCRIPTOR_FILE = "core_api.yml"
 
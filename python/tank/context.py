@@ -15,7 +15,10 @@ Management of the current context, e.g. the current shotgun entity/step/task.
 
 import os
 import re
+import time
+import json
 import pickle
+import threading
 import copy
 import pprint
 
@@ -25,7 +28,8 @@ from . import authentication
 from .util import login
 from .util import shotgun_entity
 from .util import shotgun
-from .util.singleton import Threaded
+from .util import shotgun_batch
+from .util.lru_cache import LRUCache
 from . import constants
 from .errors import TankError, TankContextDeserializationError
 from .path_cache import PathCache
@@ -35,21 +39,39 @@ from . import LogManager
 log = LogManager.get_logger(__name__)
 
 
-class ContextCache(Threaded):
+class ContextCache(object):
     """
-    Cache of plugin settings per context.
+    Cache of the contexts built from entity dictionaries, shared by the Toolkit
+    instances of the process.
+
+    At most ``max_size`` contexts are kept, the least recently used ones being
+    discarded first. Contexts expire after ``ttl`` seconds and as soon as the path
+    cache of their Toolkit instance changes, for example when folders are created
+    or synced. Contexts being immutable, cached contexts are handed out as is.
     """
-    def __init__(self):
+    def __init__(self, max_size=constants.CONTEXT_CACHE_SIZE, ttl=constants.CONTEXT_CACHE_TTL):
         """
         Constructor.
+
+        :param int max_size: Maximum number of contexts kept.
+        :param ttl: Number of seconds contexts are kept.
         """
-        Threaded.__init__(self)
-        self._cache = dict()
+        self.ttl = ttl
+        self._cache = LRUCache(max_size)
 
-    def __build_key(self, entity_dict):
+    @property
+    def info(self):
+        """
+        Dictionary with the number of hits and misses, the current size
+        and the maximum size of the cache.
+        """
+        return self._cache.info
+
+    def __build_key(self, tk, entity_dict):
         """
         Helper method to build the lookup key from an entity dict
 
+        :param tk: :class:`Sgtk` instance the context is built for.
         :param entity_dict: The dictionary to use to generate the key
 
         :returns: A unique identifier that can be used as a key for context lookup
@@ -64,33 +86,67 @@ class ContextCache(Threaded):
         if "step" in entity_dict:
             key_dict["step"] = entity_dict["step"].get("id")
 
-        return tuple(sorted(key_dict.items()))
+        return (id(tk),) + tuple(sorted(key_dict.items()))
 
-    @Threaded.exclusive
-    def get(self, entity_dict):
+    def get(self, tk, entity_dict):
         """
         Retrieve the cached context.
 
+        :param tk: :class:`Sgtk` instance the context is built for.
         :param entity_dict: The entity dict for the context we desire.
 
         :returns: The associated Context object or None
         """
-        key = self.__build_key(entity_dict)
-        return self._cache.get(key)
-
-    @Threaded.exclusive
-    def add(self, entity_dict, context):
+        key = self.__build_key(tk, entity_dict)
+        found, item = self._cache.get(key)
+        if not found:
+            return None
+
+        expiry, change_count, context = item
+        if (
+            expiry < time.time() or
+            change_count != tk._get_path_cache_database().change_count or
+            # the key of an instance which was deleted may be reused
+            context.sgtk is not tk
+        ):
+            self._cache.pop(key)
+            return None
+        return context
+
+    def add(self, tk, entity_dict, context):
         """
         Cache the Context for a given entity lookup dict.
 
+        :param tk: :class:`Sgtk` instance the context is built for.
         :param entity_dict: The entity dict to associate with the context.
         :param context: Context object to be cached.
         """
-        key = self.__build_key(entity_dict)
-        self._cache[key] = context
+        key = self.__build_key(tk, entity_dict)
+        change_count = tk._get_path_cache_database().change_count
+        self._cache.set(key, (time.time() + self.ttl, change_count, context))
+
+    def invalidate(self):
+        """
+        Discards all the cached contexts.
+        """
+        self._cache.clear()
+
+    def discard(self, tk):
+        """
+        Discards the contexts of a Toolkit instance, which they would otherwise
+        keep alive until they expire.
+
+        :param tk: :class:`Sgtk` instance.
+        """
+        for key in self._cache.keys():
+            if key[0] == id(tk):
+                self._cache.pop(key)
 
 g_context_cache = ContextCache()
 
+# guards the creation of the template fields memo of contexts
+_template_fields_memo_lock = threading.Lock()
+
 
 class Context(object):
     """
@@ -121,6 +177,10 @@ class Context(object):
     The data forms a hierarchy, so implicitly, the task belongs to the entity which in turn
     belongs to the project. The exception to this is the user, which simply reflects the
     currently operating user.
+
+    Context objects are immutable. The contexts built by the factory methods are cached and
+    the same object may be handed out to several callers, so its properties return copies of
+    the entity dictionaries it holds.
     """
 
     def __init__(
@@ -140,7 +200,12 @@ class Context(object):
         self.__user = user
         self.__additional_entities = additional_entities or []
         self.__source_entity = source_entity
-        self._entity_fields_cache = {}
+        # values of Shotgun fields, kept as long as the shared Shotgun records
+        self._entity_fields_cache = shotgun_batch.ShotgunFindCache(shotgun_batch.get_find_cache().ttl)
+        # results of as_template_fields, see _get_template_fields_memo
+        self.__template_fields_memo = None
+        # entity locations restored by deserialize, as (path cache change count, expiry, paths)
+        self.__entity_locations = None
 
     def __repr__(self):
         # multi line repr
@@ -160,50 +225,50 @@ class Context(object):
         """
         String representation for context
         """
-        if self.project is None:
+        if self.__project is None:
             # We're in a "site" context, so we'll give the site's url
             # minus the "https://" if that's attached.
             ctx_name = self.shotgun_url.split("//")[-1]
 
-        elif self.entity is None:
+        elif self.__entity is None:
             # project-only, e.g 'Project foobar'
-            ctx_name = "Project %s" % self.project.get("name")
+            ctx_name = "Project %s" % self.__project.get("name")
 
-        elif self.step is None and self.task is None:
+        elif self.__step is None and self.__task is None:
             # entity only
             # e.g. Shot ABC_123
 
             # resolve custom entities to their real display
             entity_display_name = shotgun.get_entity_type_display_name(
                 self.__tk,
-                self.entity.get("type")
+                self.__entity.get("type")
             )
 
             ctx_name = "%s %s" % (
                 entity_display_name,
-                self.entity.get("name")
+                self.__entity.get("name")
             )
 
         else:
             # we have either step or task
             task_step = None
-            if self.step:
-                task_step = self.step.get("name")
-            if self.task:
-                task_step = self.task.get("name")
+            if self.__step:
+                task_step = self.__step.get("name")
+            if self.__task:
+                task_step = self.__task.get("name")
 
             # e.g. Lighting, Shot ABC_123
 
             # resolve custom entities to their real display
             entity_display_name = shotgun.get_entity_type_display_name(
                 self.__tk,
-                self.entity.get("type")
+                self.__entity.get("type")
             )
 
             ctx_name = "%s, %s %s" % (
                 task_step,
                 entity_display_name,
-                self.entity.get("name")
+                self.__entity.get("name")
             )
 
         return ctx_name
@@ -243,16 +308,16 @@ class Context(object):
         if not isinstance(other, Context):
             return NotImplemented
 
-        if not _entity_dicts_eq(self.project, other.project):
+        if not _entity_dicts_eq(self.__project, other.project):
             return False
 
-        if not _entity_dicts_eq(self.entity, other.entity):
+        if not _entity_dicts_eq(self.__entity, other.entity):
             return False
 
-        if not _entity_dicts_eq(self.step, other.step):
+        if not _entity_dicts_eq(self.__step, other.step):
             return False
 
-        if not _entity_dicts_eq(self.task, other.task):
+        if not _entity_dicts_eq(self.__task, other.task):
             return False
 
         # compare additional entities
@@ -326,7 +391,7 @@ class Context(object):
 
         :returns: A std shotgun link dictionary with keys id, type and name, or None if not defined
         """
-        return self.__project
+        return copy.deepcopy(self.__project)
 
 
     @property
@@ -344,7 +409,7 @@ class Context(object):
 
         :returns: A std shotgun link dictionary with keys id, type and name, or None if not defined
         """
-        return self.__entity
+        return copy.deepcopy(self.__entity)
 
     @property
     def source_entity(self):
@@ -366,7 +431,7 @@ class Context(object):
         :returns: A Shotgun entity dictionary.
         :rtype: dict or None
         """
-        return self.__source_entity
+        return copy.deepcopy(self.__source_entity)
 
     @property
     def step(self):
@@ -383,7 +448,7 @@ class Context(object):
 
         :returns: A std shotgun link dictionary with keys id, type and name, or None if not defined
         """
-        return self.__step
+        return copy.deepcopy(self.__step)
 
     @property
     def task(self):
@@ -400,7 +465,7 @@ class Context(object):
 
         :returns: A std shotgun link dictionary with keys id, type and name, or None if not defined
         """
-        return self.__task
+        return copy.deepcopy(self.__task)
 
     @property
     def user(self):
@@ -428,7 +493,7 @@ class Context(object):
                 self.__user = {"type": user.get("type"),
                                "id": user.get("id"),
                                "name": user.get("name")}
-        return self.__user
+        return copy.deepcopy(self.__user)
 
     @property
     def additional_entities(self):
@@ -443,7 +508,7 @@ class Context(object):
         :returns: A list of std shotgun link dictionaries.
                   Will be an empty list in most cases.
         """
-        return self.__additional_entities
+        return copy.deepcopy(self.__additional_entities)
 
     @property
     def entity_locations(self):
@@ -460,10 +525,15 @@ class Context(object):
 
         :returns: A list of paths
         """
-        if self.entity is None:
+        if self.__entity is None:
             return []
 
-        paths = self.__tk.paths_from_entity(self.entity["type"], self.entity["id"])
+        if self.__entity_locations is not None:
+            change_count, expiry, paths = self.__entity_locations
+            if change_count == self._get_path_cache_change_count() and expiry >= time.time():
+                return list(paths)
+
+        paths = self.__tk.paths_from_entity(self.__entity["type"], self.__entity["id"])
 
         return paths
 
@@ -483,14 +553,14 @@ class Context(object):
 
         # walk up task -> entity -> project -> site
 
-        if self.task is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Task", self.task["id"])
+        if self.__task is not None:
+            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Task", self.__task["id"])
 
-        if self.entity is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, self.entity["type"], self.entity["id"])
+        if self.__entity is not None:
+            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, self.__entity["type"], self.__entity["id"])
 
-        if self.project is not None:
-            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Project", self.project["id"])
+        if self.__project is not None:
+            return "%s/detail/%s/%d" % (self.__tk.shotgun_url, "Project", self.__project["id"])
 
         # fall back on just the site main url
         return self.__tk.shotgun_url
@@ -511,17 +581,17 @@ class Context(object):
         """
 
         # first handle special cases: empty context
-        if self.project is None:
+        if self.__project is None:
             return []
 
         # first handle special cases: project context
-        if self.entity is None:
-            return self.__tk.paths_from_entity("Project", self.project["id"])
+        if self.__entity is None:
+            return self.__tk.paths_from_entity("Project", self.__project["id"])
 
         # at this stage we know that the context contains an entity
         # start off with all the paths matching this entity and then cull it down
         # based on constraints.
-        entity_paths = self.__tk.paths_from_entity(self.entity["type"], self.entity["id"])
+        entity_paths = self.__tk.paths_from_entity(self.__entity["type"], self.__entity["id"])
 
         # for each of these paths, get the context and compare it against our context
         # todo: optimize this!
@@ -634,25 +704,65 @@ class Context(object):
         :raises:            :class:`TankError` if the fields can't be resolved for some reason or if 'validate' is True
                             and any of the context fields for the template weren't found.
         """
-        # Get all entities into a dictionary
-        entities = {}
+        # the fields are memoized per template until the path cache changes or they
+        # expire, along with the Shotgun records when they hold Shotgun values
+        source = self.sgtk.template_keys if template is None else template
+        memo_key = (id(source), validate)
+        change_count = self._get_path_cache_change_count()
+        memo = self._get_template_fields_memo()
+
+        found, item = memo.get(memo_key)
+        # the id of a template which was deleted may be reused
+        if found and item[0] is source and item[1] == change_count and item[2] >= time.time():
+            return dict(item[3])
+
+        fields, from_shotgun = self._as_template_fields(template, validate)
+        # folders created by other Toolkit instances or processes don't change the
+        # counter of this instance, so fields are only kept as long as contexts are
+        ttl = constants.CONTEXT_CACHE_TTL
+        if from_shotgun:
+            ttl = min(ttl, shotgun_batch.get_find_cache().ttl)
+        memo.set(memo_key, (source, change_count, time.time() + ttl, fields))
+
+        info = memo.info
+        log.debug(
+            "Resolved the template fields of %s for %s: %d memoized results hit, %d missed." % (
+                self, template, info["hits"], info["misses"]
+            )
+        )
+        return dict(fields)
 
-        if self.entity:
-            entities[self.entity["type"]] = self.entity
-        if self.step:
-            entities["Step"] = self.step
-        if self.task:
-            entities["Task"] = self.task
-        if self.user:
-            entities["HumanUser"] = self.user
-        if self.project:
-            entities["Project"] = self.project
+    def _get_path_cache_change_count(self):
+        """
+        Returns the number of changes made to the path cache, which invalidate the
+        data resolved from it.
 
-        # If there are any additional entities, use them as long as they don't
-        # conflict with types we already have values for (Step, Task, Shot/Asset/etc)
-        for add_entity in self.additional_entities:
-            if add_entity["type"] not in entities:
-                entities[add_entity["type"]] = add_entity
+        :returns: Change counter of the path cache database.
+        """
+        return self.__tk._get_path_cache_database().change_count
+
+    def _get_template_fields_memo(self):
+        """
+        Returns the cache of the results of :meth:`as_template_fields`, keyed by template
+        and validate flag, created the first time it is needed since most contexts are
+        never turned into template fields.
+
+        :returns: :class:`LRUCache` instance.
+        """
+        if self.__template_fields_memo is None:
+            with _template_fields_memo_lock:
+                if self.__template_fields_memo is None:
+                    self.__template_fields_memo = LRUCache(constants.CONTEXT_TEMPLATE_FIELDS_CACHE_SIZE)
+        return self.__template_fields_memo
+
+    def _as_template_fields(self, template, validate):
+        """
+        Returns the context object as a dictionary of template fields, see :meth:`as_template_fields`.
+
+        :returns: Tuple (fields, from_shotgun), from_shotgun being True if some fields
+                  are the values of Shotgun fields which had to be looked up.
+        """
+        entities = self._get_template_entities()
 
         fields = {}
 
@@ -665,7 +775,7 @@ class Context(object):
         fields.update(self._fields_from_entities(keys, entities))
         keys = self._get_missing_keys(keys, fields, entities)
         if not keys:
-            return fields
+            return fields, False
 
         # Try to populate fields using paths caches for entity
         if isinstance(template, TemplatePath):
@@ -698,15 +808,16 @@ class Context(object):
             fields.update(dict([(key, value) for key, value in tmp_fields.iteritems() if value is not None]))
             keys = self._get_missing_keys(keys, fields, entities)
             if not keys:
-                return fields
+                return fields, False
 
             # Determine additional field values by walking down the template tree
             fields.update(self._fields_from_template_tree(template, fields, entities))
             keys = self._get_missing_keys(keys, fields, entities)
             if not keys:
-                return fields
+                return fields, False
 
         # get values for shotgun query keys in template
+        from_shotgun = any(key.shotgun_field_name and key.shotgun_entity_type in entities for key in keys)
         fields.update(self._fields_from_shotgun(keys, entities))
         keys = self._get_missing_keys(keys, fields, entities)
 
@@ -717,8 +828,37 @@ class Context(object):
                             "for '%s' and try again!"
                             % (self, ", ".join([x.name for x in keys]), self.shotgun_url))
 
-        return fields
+        return fields, from_shotgun
+
+
+    def _get_template_entities(self):
+        """
+        Returns the entities of the context template fields are resolved from.
+
+        :returns: Dictionary of entity dictionaries keyed by entity type, which
+                  must not be modified.
+        """
+        # Get all entities into a dictionary
+        entities = {}
+
+        if self.__entity:
+            entities[self.__entity["type"]] = self.__entity
+        if self.__step:
+            entities["Step"] = self.__step
+        if self.__task:
+            entities["Task"] = self.__task
+        if self.user:
+            entities["HumanUser"] = self.user
+        if self.__project:
+            entities["Project"] = self.__project
+
+        # If there are any additional entities, use them as long as they don't
+        # conflict with types we already have values for (Step, Task, Shot/Asset/etc)
+        for add_entity in self.__additional_entities:
+            if add_entity["type"] not in entities:
+                entities[add_entity["type"]] = add_entity
 
+        return entities
 
     def _get_missing_keys(self, keys, fields, entities, validate=False):
         """
@@ -754,14 +894,12 @@ class Context(object):
         :param user:  The Shotgun user entity dictionary that should be set on the copied context
         :returns: :class:`Context`
         """
-        ctx_copy = copy.deepcopy(self)
-        ctx_copy.__user = user
-        return ctx_copy
+        return self._copy(user=user)
 
     ################################################################################################
     # serialization
 
-    def serialize(self, with_user_credentials=True):
+    def serialize(self, with_user_credentials=True, use_json=False):
         """
         Serializes the context into a string.
 
@@ -785,6 +923,13 @@ class Context(object):
             so, invoking :meth:`sgtk.Context.deserialize` on the render farm will only restore the
             context and not the authenticated user.
 
+        :param use_json: If ``True``, the context is serialized in a compact, versioned JSON format.
+            Along with the context, it carries the locations of the context's entity on disk and
+            the template fields of the templates of the context's entity hierarchy, which are
+            resolved beforehand, so that the receiving process can use the context without
+            querying Shotgun or the path cache for them. Cores older than this one can't
+            deserialize it.
+
         :returns: String representation
         """
         # Avoids cyclic imports
@@ -808,6 +953,10 @@ class Context(object):
                 # We should serialize it as well so that the next process knows who to
                 # run as.
                 data["_current_user"] = authentication.serialize_user(user)
+
+        if use_json:
+            return _dump_json_context_data(data, self.entity_locations, self._resolve_hierarchy_template_fields())
+
         return pickle.dumps(data)
 
     @classmethod
@@ -815,7 +964,8 @@ class Context(object):
         """
         The inverse of :meth:`Context.serialize`.
 
-        :param context_str: String representation of context, created with :meth:`Context.serialize`
+        :param context_str: String representation of context, created with :meth:`Context.serialize`,
+            in either format.
 
         .. note:: If the context was serialized with the user credentials, the currently authenticated
             user will be updated with these credentials.
@@ -826,10 +976,19 @@ class Context(object):
         from .api import Tank, set_authenticated_user
 
         try:
-            data = pickle.loads(context_str)
+            if context_str.startswith("{"):
+                data = _load_json_context_data(context_str)
+            else:
+                data = pickle.loads(context_str)
+        except TankContextDeserializationError:
+            raise
         except Exception as e:
             raise TankContextDeserializationError(str(e))
 
+        # data resolved before the context was serialized in the JSON format
+        entity_locations = data.pop("_entity_locations", None)
+        template_fields = data.pop("_template_fields", {})
+
         # first get the pipeline config path out of the dict
         pipeline_config_path = data["_pc_path"]
         del data["_pc_path"]
@@ -855,19 +1014,100 @@ class Context(object):
         data["tk"] = tk
 
         # and lastly make the obejct
-        return cls(**data)
+        context = cls(**data)
+        context._restore_resolved_data(entity_locations, template_fields)
+        return context
+
+    def _resolve_hierarchy_template_fields(self):
+        """
+        Resolves the template fields of the path templates of the context's entity
+        hierarchy, the templates whose context keys are all provided by the entities
+        of the context. Templates whose fields can't be resolved are skipped.
+
+        :returns: Dictionary of (template fields, complete) tuples keyed by template name.
+            Complete is True when all the context keys of the template were resolved,
+            in which case validating the fields would succeed.
+        """
+        entities = self._get_template_entities()
+
+        result = {}
+        for name, template in self.__tk.templates.iteritems():
+            if not isinstance(template, TemplatePath):
+                continue
+            context_keys = [key for key in template.keys.values() if key.shotgun_entity_type]
+            if not context_keys or any(key.shotgun_entity_type not in entities for key in context_keys):
+                continue
+            try:
+                fields = self.as_template_fields(template)
+            except TankError as e:
+                log.debug("Skipping template %s, whose fields can't be resolved for %s: %s" % (name, self, e))
+                continue
+            result[name] = (fields, not self._get_missing_keys(context_keys, fields, entities))
+
+        return result
+
+    def _restore_resolved_data(self, entity_locations, template_fields):
+        """
+        Restores the data resolved before the context was serialized, which is used
+        until the path cache changes or contexts expire. Since the template fields may
+        hold values of Shotgun fields, they are only kept as long as Shotgun records are.
+
+        :param list entity_locations: Paths of the context's entity, or None if unknown.
+        :param dict template_fields: Dictionary of (template fields, complete) tuples keyed by
+            template name, see :meth:`_resolve_hierarchy_template_fields`.
+        """
+        change_count = self._get_path_cache_change_count()
+        if entity_locations is not None:
+            self.__entity_locations = (change_count, time.time() + constants.CONTEXT_CACHE_TTL, entity_locations)
+
+        memo = self._get_template_fields_memo()
+        expiry = time.time() + shotgun_batch.get_find_cache().ttl
+        for name, (fields, complete) in template_fields.iteritems():
+            template = self.__tk.templates.get(name)
+            if template is None:
+                # not part of this configuration
+                continue
+            memo.set((id(template), False), (template, change_count, expiry, fields))
+            if complete:
+                memo.set((id(template), True), (template, change_count, expiry, fields))
 
 
     ##########################################################################################
     # internal API
 
+    def _copy(self, **kwargs):
+        """
+        Returns a copy of the context sharing its entity dictionaries, which
+        contexts never modify nor hand out.
+
+        :param kwargs: Context constructor parameters to change in the copy, e.g. user.
+        :returns: :class:`Context`
+        """
+        params = {
+            "project": self.__project,
+            "entity": self.__entity,
+            "step": self.__step,
+            "task": self.__task,
+            "user": self.__user,
+            "additional_entities": self.__additional_entities,
+            "source_entity": self.__source_entity,
+        }
+        params.update(kwargs)
+        return Context(self.__tk, **params)
+
     def sync_task_and_step(self, other):
         """
-        Syncs the current context's task and step with another context.
+        Returns a copy of the context whose task and step are synced with another context.
+
+        The task and step are only set if the contexts' entities and additional_entities
+        lists match, and only if the current context's task and step, respectively, are
+        not already set.
 
-        This method only sets the task and step if the contexts' entities and
-        additional_entities lists match, and only if the current context's task
-        and step, respectively, are not already set.
+        .. note:: Contexts being immutable and shared, this context is left unchanged.
+            Earlier versions modified the context in place and returned None.
+
+        :param other: :class:`Context` to take the task and step from.
+        :returns: :class:`Context`, the context itself if there is nothing to sync.
         """
         if self.__entity and other.entity and \
            self.__entity == other.entity and \
@@ -876,12 +1116,19 @@ class Context(object):
             # cool, everything is matching down to the step/task level.
             # if context is missing a step and a task, we try to auto populate it.
             # (note: weird edge that a context can have a task but no step)
-            if not self.__step:
-                self.__step = other.step
+            step = self.__step
+            if not step:
+                step = other.step
 
-            if not self.__task and self.__step == other.step:
+            task = self.__task
+            if not task and step == other.step:
                 # now try to assign the previous task but only if the step matches!
-                self.__task = other.task
+                task = other.task
+
+            if step != self.__step or task != self.__task:
+                return self._copy(step=step, task=task)
+
+        return self
 
 
     ################################################################################################
@@ -931,6 +1178,27 @@ class Context(object):
 
         :raises TankError: Raised if a key is missing from the entities list when ``validate`` is ``True``.
         """
+        # gather the fields which need fetching, keyed by entity type, so that
+        # all the values of an entity are retrieved with a single query
+        queries = {}
+        cached_values = {}
+        for key in keys:
+            if key.shotgun_field_name and key.shotgun_entity_type in entities:
+                entity = entities[key.shotgun_entity_type]
+                cache_key = (entity["type"], entity["id"], key.shotgun_field_name)
+                found, value = self._entity_fields_cache.get(cache_key)
+                if found:
+                    cached_values[cache_key] = value
+                else:
+                    queries.setdefault(key.shotgun_entity_type, set()).add(key.shotgun_field_name)
+
+        # get the values from shotgun, records are shared with other contexts for a short time
+        records = {}
+        for entity_type, field_names in queries.iteritems():
+            records[entity_type] = shotgun_batch.find_entity_fields(
+                self.__tk.shotgun, entity_type, [entities[entity_type]["id"]], field_names
+            )
+
         fields = {}
         # for any sg query field
         for key in keys:
@@ -947,15 +1215,13 @@ class Context(object):
 
                 # check the context cache
                 cache_key = (entity["type"], entity["id"], key.shotgun_field_name)
-                if cache_key in self._entity_fields_cache:
+                if cache_key in cached_values:
                     # already have the value cached - no need to fetch from shotgun
-                    fields[key.name] = self._entity_fields_cache[cache_key]
+                    fields[key.name] = cached_values[cache_key]
 
                 else:
-                    # get the value from shotgun
-                    filters = [["id", "is", entity["id"]]]
-                    query_fields = [key.shotgun_field_name]
-                    result = self.__tk.shotgun.find_one(key.shotgun_entity_type, filters, query_fields)
+                    # get the value fetched from shotgun
+                    result = records[key.shotgun_entity_type].get(entity["id"])
                     if not result:
                         # no record with that id in shotgun!
                         raise TankError("Could not retrieve Shotgun data for key '%s'. "
@@ -994,7 +1260,7 @@ class Context(object):
                     # all good!
                     # populate dictionary and cache
                     fields[key.name] = processed_val
-                    self._entity_fields_cache[cache_key] = processed_val
+                    self._entity_fields_cache.set(cache_key, processed_val)
 
 
         return fields
@@ -1218,6 +1484,72 @@ def from_path(tk, path, previous_context=None):
     return _from_entity_dictionary(tk, entity_dict, previous_context)
 
 
+def from_paths(tk, paths, previous_context=None):
+    """
+    Factory method that constructs context objects for many paths on disk, sharing
+    the path cache and Shotgun lookups between them.
+
+    For more information, see :meth:`Sgtk.contexts_from_paths`.
+
+    :param list paths: File system paths.
+    :param previous_context: A context object to use to try to automatically extend the generated
+                             contexts if they are incomplete when extracted from the paths.
+    :type previous_context: :class:`Context`
+    :returns: List of :class:`Context`, one per path.
+    """
+    # We can't parse the PatchCache if we're running a site configuration,
+    # so just return empty contexts
+    if tk.pipeline_configuration.is_site_configuration():
+        log.debug("Cannot parse a context path from the Site PipelineConfiguration.")
+        return [create_empty(tk) for path in paths]
+
+    # the core hook is only executed once for all the contexts
+    additional_entities = tk.execute_core_hook("context_additional_entities")
+    additional_types = additional_entities.get("entity_types_in_path", [])
+
+    path_cache = PathCache(tk)
+    try:
+        # the parent folders the paths share are only looked up once
+        ancestor_entities = path_cache.get_ancestor_entities_for_paths(paths)
+
+        # paths of the same folder resolve to the same entity dictionary,
+        # whose context is only built once
+        entity_dicts = {}
+        entity_dict_keys = {}
+        for path in paths:
+            if path in entity_dict_keys:
+                continue
+            entity_dict = _build_entity_dict_from_ancestor_entities(ancestor_entities[path], None, additional_types)
+            if not entity_dict:
+                raise TankError("Cannot get entity in path_cache for path: %s" % path)
+            entity_dict_keys[path] = _get_entity_dict_key(entity_dict)
+            entity_dicts.setdefault(entity_dict_keys[path], entity_dict)
+
+        # look up the data missing from the entity dictionaries of the contexts which aren't cached
+        cached_contexts = dict(
+            (key, g_context_cache.get(tk, entity_dict)) for key, entity_dict in entity_dicts.iteritems()
+        )
+        prefetched_fields = _prefetch_context_fields(
+            tk,
+            [entity_dicts[key] for key, context in cached_contexts.iteritems() if not context],
+            additional_entities,
+            path_cache
+        )
+    finally:
+        path_cache.close()
+
+    log.debug("Running contexts_from_paths for %d paths, %d distinct entity dictionaries, %d cached." % (
+        len(paths), len(entity_dicts), len([context for context in cached_contexts.itervalues() if context])
+    ))
+    contexts = {}
+    for key, entity_dict in entity_dicts.iteritems():
+        context = cached_contexts[key]
+        if not context:
+            context = _build_context(tk, entity_dict, additional_entities, prefetched_fields)
+        contexts[key] = _sync_with_previous_context(context, previous_context)
+    return [contexts[entity_dict_keys[path]] for path in paths]
+
+
 def from_entity(tk, entity_type, entity_id, previous_context=None):
     """
     Constructs a context from a shotgun entity.
@@ -1289,61 +1621,90 @@ def from_entity_dictionary(tk, entity_dict, previous_context=None):
 
 def _from_entity_dictionary(tk, entity_dict, previous_context=None):
     """
+    Constructs a context from an entity dictionary, see :meth:`from_entity_dictionary`.
     """
     # Basic sanity check
     if not isinstance(entity_dict, dict):
         raise TankError("Cannot create a context from an empty or invalid entity dictionary!")
 
     # Check if we've processed a context for this entity before
-    # and if so return from cache
-    context = g_context_cache.get(entity_dict)
+    # and if so return from cache. Contexts are immutable, so the
+    # cached object can be shared.
+    context = g_context_cache.get(tk, entity_dict)
     if context:
-        # Deepcopy so we return a unique object
-        context = copy.deepcopy(context)
         log_msg = "Loading context from cache"
-
     else:
-        # Get a context-valid entity dictionary
-        entity_dict = _get_valid_context_entity_dict(tk, entity_dict)
-
-        # Embed the entity in the appropriate field
-        entity_type = entity_dict.get("type")
-        if entity_type == "Project":
-            entity_dict["project"] = _build_clean_entity(tk, entity_dict)
-        elif entity_type == "Task":
-            entity_dict["task"] = _build_clean_entity(tk, entity_dict)
-        else:
-            entity_dict["entity"] = _build_clean_entity(tk, entity_dict)
-
-        # Initialize the new context dictionary
-        context_dict = {
-            "tk":                   tk,
-            "project":              _build_clean_entity(tk, entity_dict.get("project")),
-            "entity":               _build_clean_entity(tk, entity_dict.get("entity")),
-            "step":                 _build_clean_entity(tk, entity_dict.get("step")),
-            "user":                 _build_clean_entity(tk, entity_dict.get("user")),
-            "task":                 _build_clean_entity(tk, entity_dict.get("task")),
-            "source_entity":        _build_clean_entity(tk, entity_dict.get("source_entity")),
-            "additional_entities":  [_build_clean_entity(tk, k) for k in entity_dict.get("additional_entities", [])]
-        }
-
-        # Build the context object
-        context = Context(**context_dict)
+        context = _build_context(tk, entity_dict)
         log_msg = "Building context"
 
-        # Add context to cache
-        g_context_cache.add(entity_dict, context)
-
-    # If a previous context has been provided, see if we can populate
-    # any missing fields from it
-    if previous_context:
-        context.sync_task_and_step(previous_context)
+    context = _sync_with_previous_context(context, previous_context)
 
     # Return the Context object
     log.debug("%s:\n%r" % (log_msg, context))
     return context
 
 
+def _build_context(tk, entity_dict, additional_entities=None, prefetched_fields=None):
+    """
+    Builds a context from an entity dictionary and adds it to the context cache.
+
+    :param tk: :class:`Sgtk`
+    :param dict entity_dict: The entity dictionary to create the context from.
+    :param dict additional_entities: Result of the context_additional_entities core
+        hook, the hook is executed when not given.
+    :param dict prefetched_fields: Field values already looked up for a batch of
+        contexts, see :meth:`_prefetch_context_fields`.
+    :returns: :class:`Context`
+    """
+    # contexts are cached for the entity dictionary they are requested with
+    cache_entity_dict = entity_dict
+
+    # Get a context-valid entity dictionary
+    entity_dict = _get_valid_context_entity_dict(tk, entity_dict, additional_entities, prefetched_fields)
+
+    # Embed the entity in the appropriate field
+    entity_type = entity_dict.get("type")
+    if entity_type == "Project":
+        entity_dict["project"] = _build_clean_entity(tk, entity_dict)
+    elif entity_type == "Task":
+        entity_dict["task"] = _build_clean_entity(tk, entity_dict)
+    else:
+        entity_dict["entity"] = _build_clean_entity(tk, entity_dict)
+
+    # Initialize the new context dictionary
+    context_dict = {
+        "tk":                   tk,
+        "project":              _build_clean_entity(tk, entity_dict.get("project")),
+        "entity":               _build_clean_entity(tk, entity_dict.get("entity")),
+        "step":                 _build_clean_entity(tk, entity_dict.get("step")),
+        "user":                 _build_clean_entity(tk, entity_dict.get("user")),
+        "task":                 _build_clean_entity(tk, entity_dict.get("task")),
+        "source_entity":        _build_clean_entity(tk, entity_dict.get("source_entity")),
+        "additional_entities":  [_build_clean_entity(tk, k) for k in entity_dict.get("additional_entities", [])]
+    }
+
+    # Build the context object
+    context = Context(**context_dict)
+
+    # Add context to cache
+    g_context_cache.add(tk, cache_entity_dict, context)
+    return context
+
+
+def _sync_with_previous_context(context, previous_context):
+    """
+    Populates the task and step missing from a context from a previous context,
+    see :meth:`Context.sync_task_and_step`.
+
+    :param context: :class:`Context`, which may be shared and is never modified.
+    :param previous_context: :class:`Context` or None.
+    :returns: :class:`Context`, a copy of the context if it was synced.
+    """
+    if previous_context:
+        context = context.sync_task_and_step(previous_context)
+    return context
+
+
 ################################################################################################
 # serialization
 
@@ -1367,6 +1728,110 @@ def deserialize(context_str):
     return Context.deserialize(context_str)
 
 
+def _dump_json_context_data(data, entity_locations, template_fields):
+    """
+    Encodes the data of a context in the compact JSON serialization format.
+
+    Entity dictionaries and dictionaries of template fields are interned: each
+    distinct dictionary is stored once, and referred to by its index.
+
+    :param dict data: Context constructor parameters, along with the pipeline
+        configuration path and the serialized user, see :meth:`Context.serialize`.
+    :param list entity_locations: Paths of the context's entity.
+    :param dict template_fields: Dictionary of (template fields, complete) tuples keyed
+        by template name, see :meth:`Context._resolve_hierarchy_template_fields`.
+    :returns: JSON string.
+    """
+    entities = []
+    fields_list = []
+    indices = {}
+
+    def intern(table, value):
+        # returns the index of a dictionary in its table, adding it the first time
+        if value is None:
+            return None
+        key = (id(table), _get_entity_dict_key(value))
+        if key not in indices:
+            indices[key] = len(table)
+            table.append(value)
+        return indices[key]
+
+    document = {
+        "version": constants.CONTEXT_SERIALIZATION_VERSION,
+        "pc_path": data["_pc_path"],
+        "entities": entities,
+        "additional_entities": [intern(entities, entity) for entity in data["additional_entities"]],
+        "entity_locations": entity_locations,
+        "fields": fields_list,
+        "templates": dict(
+            (name, [intern(fields_list, fields), int(complete)])
+            for name, (fields, complete) in template_fields.iteritems()
+        ),
+    }
+    for name in ["project", "entity", "user", "step", "task", "source_entity"]:
+        document[name] = intern(entities, data[name])
+    if "_current_user" in data:
+        document["current_user"] = data["_current_user"]
+
+    try:
+        return json.dumps(document, separators=(",", ":"))
+    except (TypeError, ValueError) as e:
+        raise TankError("The context can't be serialized in the JSON format: %s" % e)
+
+
+def _load_json_context_data(context_str):
+    """
+    Decodes the data of a context serialized in the compact JSON format.
+
+    :param str context_str: JSON string, see :meth:`_dump_json_context_data`.
+    :returns: Context constructor parameters, along with the pipeline configuration path,
+        the serialized user and the resolved data, keyed the way :meth:`Context.deserialize`
+        expects them.
+    :raises: :class:`TankContextDeserializationError` if the format version isn't supported.
+    """
+    document = _json_to_str(json.loads(context_str))
+
+    if document.get("version", 0) > constants.CONTEXT_SERIALIZATION_VERSION:
+        raise TankContextDeserializationError(
+            "The context was serialized with a newer format (version %s) than the ones "
+            "supported by this core (up to version %s)." % (
+                document.get("version"), constants.CONTEXT_SERIALIZATION_VERSION
+            )
+        )
+
+    entities = document["entities"]
+    data = {
+        "additional_entities": [entities[index] for index in document["additional_entities"]],
+        "_pc_path": document["pc_path"],
+        "_entity_locations": document["entity_locations"],
+        "_template_fields": dict(
+            (name, (document["fields"][index], bool(complete)))
+            for name, (index, complete) in document["templates"].iteritems()
+        ),
+    }
+    for name in ["project", "entity", "user", "step", "task", "source_entity"]:
+        index = document[name]
+        data[name] = entities[index] if index is not None else None
+    if "current_user" in document:
+        data["_current_user"] = document["current_user"]
+
+    return data
+
+
+def _json_to_str(value):
+    """
+    Converts the unicode strings decoded from JSON to utf-8 encoded strings,
+    which is what the rest of the core handles.
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, list):
+        return [_json_to_str(item) for item in value]
+    if isinstance(value, dict):
+        return dict((_json_to_str(key), _json_to_str(item)) for key, item in value.iteritems())
+    return value
+
+
 ################################################################################################
 # YAML representer/constructor
 
@@ -1436,9 +1901,20 @@ yaml.add_constructor(u'!TankContext', context_yaml_constructor)
 ################################################################################################
 # utility methods
 
-def _get_context_fields_for_entity_type(tk, entity_type):
+def _get_context_fields_for_entity_type(tk, entity_type, additional_entities=None):
     """
+    Returns the fields required and the optional fields to build a context
+    for an entity type.
+
+    :param tk: :class:`Sgtk`
+    :param str entity_type: Entity type of the context.
+    :param dict additional_entities: Result of the context_additional_entities core
+        hook, the hook is executed when not given.
+    :returns: Tuple (list of required field names, list of optional field names).
     """
+    if additional_entities is None:
+        additional_entities = tk.execute_core_hook("context_additional_entities")
+
     # Get the name field
     name_field = shotgun_entity.get_sg_entity_name_field(entity_type)
 
@@ -1450,17 +1926,17 @@ def _get_context_fields_for_entity_type(tk, entity_type):
     elif entity_type == "Project":
         required_fields = [name_field]
         optional_fields = []
-        optional_fields += tk.execute_core_hook("context_additional_entities").get("entity_fields_on_project", [])
+        optional_fields += additional_entities.get("entity_fields_on_project", [])
 
     elif entity_type == "Task":
         required_fields = [name_field, "step", "entity", "project"]
         optional_fields = ["entity.{entity_type}.sg_shot", "entity.{entity_type}.sg_sequence"]
-        optional_fields += tk.execute_core_hook("context_additional_entities").get("entity_fields_on_task", [])
+        optional_fields += additional_entities.get("entity_fields_on_task", [])
 
     else:
         required_fields = [name_field, "project"]
         optional_fields = ["sg_sequence", "sg_shot"]
-        optional_fields += tk.execute_core_hook("context_additional_entities").get("entity_fields_on_entity", [])
+        optional_fields += additional_entities.get("entity_fields_on_entity", [])
 
     return required_fields, optional_fields
 
@@ -1627,52 +2103,62 @@ def _build_entity_dict_from_entities(tk, entities):
 def _build_entity_dict_from_path(tk, path, required_fields=None, additional_types=None):
     """
     """
-    entity_dict = {}
-
     # ask hook for extra entity types we should recognize and insert into the additional_entities list.
     if not additional_types:
         additional_types = tk.execute_core_hook("context_additional_entities").get("entity_types_in_path", [])
 
     # We're going to use the path cache to get all entities for the path
+    # and its parent folders up to the project root
     path_cache = PathCache(tk)
+    try:
+        ancestor_entities = path_cache.get_ancestor_entities(path)
+    finally:
+        path_cache.close()
 
-    # Grab all project roots
-    project_roots = tk.pipeline_configuration.get_data_roots().values()
+    return _build_entity_dict_from_ancestor_entities(ancestor_entities, required_fields, additional_types)
 
-    # note - paths returned by get_paths are always prefixed with a
-    # project root so there is no risk we end up with an infinite loop here..
-    try:
-        curr_path = path
-        while True:
-            curr_entity = path_cache.get_entity(curr_path)
-            if curr_entity:
-                # The first valid element processed (the last one in the path) is the primary entity
-                # HumanUser and Step entities cannot be primary entities
-                if not entity_dict.get("type") and curr_entity["type"] not in ("HumanUser", "Step"):
-                    entity_dict.update(curr_entity)
-
-                # Else, organize it in the entity dictionary
-                else:
-                    _process_entity(curr_entity, entity_dict, required_fields, additional_types)
 
-            # Now process any secondary entities
-            for sec_entity in path_cache.get_secondary_entities(curr_path):
-                _process_entity(sec_entity, entity_dict, required_fields, additional_types)
+def _build_entity_dict_from_ancestor_entities(ancestor_entities, required_fields, additional_types):
+    """
+    Builds an entity dictionary from the entities of a path and of its parent folders.
+
+    :param list ancestor_entities: (path, entity, secondary entities) tuples, as returned
+        by :meth:`PathCache.get_ancestor_entities`.
+    :param list required_fields: Entity dictionary fields to populate, all by default.
+    :param list additional_types: Entity types to add to the additional entities.
+    :returns: Entity dictionary, empty if the paths have no entities.
+    """
+    entity_dict = {}
 
-            if curr_path in project_roots:
-                break
+    for curr_path, curr_entity, secondary_entities in ancestor_entities:
+        if curr_entity:
+            # The first valid element processed (the last one in the path) is the primary entity
+            # HumanUser and Step entities cannot be primary entities
+            if not entity_dict.get("type") and curr_entity["type"] not in ("HumanUser", "Step"):
+                entity_dict.update(curr_entity)
 
-            # Move up to the next level directory and repeat
-            curr_path = os.path.dirname(curr_path)
+            # Else, organize it in the entity dictionary
+            else:
+                _process_entity(curr_entity, entity_dict, required_fields, additional_types)
 
-    finally:
-        path_cache.close()
+        # Now process any secondary entities
+        for sec_entity in secondary_entities:
+            _process_entity(sec_entity, entity_dict, required_fields, additional_types)
 
     return entity_dict
 
 
-def _get_valid_context_entity_dict(tk, entity_dict):
+def _get_valid_context_entity_dict(tk, entity_dict, additional_entities=None, prefetched_fields=None):
     """
+    Completes an entity dictionary with the entities a context is built from.
+
+    :param tk: :class:`Sgtk`
+    :param dict entity_dict: Entity dictionary containing at least a type and an id.
+    :param dict additional_entities: Result of the context_additional_entities core
+        hook, the hook is executed when not given.
+    :param dict prefetched_fields: Field values already looked up for a batch of
+        contexts, see :meth:`_prefetch_context_fields`.
+    :returns: Entity dictionary.
     """
     # Since we are modifying in place, make a copy
     entity_dict = copy.deepcopy(entity_dict)
@@ -1687,14 +2173,14 @@ def _get_valid_context_entity_dict(tk, entity_dict):
         raise TankError("Cannot create a context without an entity id!")
 
     # Get the required and optional context fields for this entity type
-    required_fields, optional_fields = _get_context_fields_for_entity_type(tk, entity_type)
+    required_fields, optional_fields = _get_context_fields_for_entity_type(tk, entity_type, additional_entities)
 
     # Special case handling for published file entities
     if entity_type in ["PublishedFile", "TankPublishedFile"]:
 
         # If we are missing all required fields, go get them
         if all([not entity_dict.get(x) for x in required_fields]):
-            entity_dict = _build_entity_dict(tk, entity_dict, required_fields)
+            entity_dict = _build_entity_dict(tk, entity_dict, required_fields, prefetched_fields)
 
         # Iterate (in order) over entity fields to get the new entity to process
         for field in required_fields:
@@ -1705,14 +2191,14 @@ def _get_valid_context_entity_dict(tk, entity_dict):
                 new_entity["source_entity"] = entity_dict
 
                 # Rerun context creation with new primary entity
-                return _get_valid_context_entity_dict(tk, new_entity)
+                return _get_valid_context_entity_dict(tk, new_entity, additional_entities, prefetched_fields)
 
         # If we got here, we don't have a valid entity dictionary
         raise TankError("'%s' entity missing required fields: %s" %
                 (entity_type, pprint.pformat(required_fields)))
 
     # If we are missing any required or optional fields, attempt to go get them
-    entity_dict = _build_entity_dict(tk, entity_dict, required_fields + optional_fields)
+    entity_dict = _build_entity_dict(tk, entity_dict, required_fields + optional_fields, prefetched_fields)
 
     # If we're missing any required fields, we're not a valid entity dictionary
     missing_fields = list(set(required_fields) - set([k for k, v in entity_dict.items() if v]))
@@ -1744,12 +2230,24 @@ def _get_valid_context_entity_dict(tk, entity_dict):
     return entity_dict
 
 
-def _build_entity_dict(tk, entity_dict, required_fields=None):
+def _build_entity_dict(tk, entity_dict, required_fields=None, prefetched_fields=None):
     """
     """
     entity_dict = copy.deepcopy(entity_dict)
     required_fields = required_fields or []
 
+    # Use the values looked up for a batch of contexts, even the empty ones,
+    # rather than looking them up again
+    resolved_fields = (prefetched_fields or {}).get((entity_dict["type"], entity_dict["id"]))
+    if resolved_fields:
+        for field_name, value in resolved_fields.iteritems():
+            if not entity_dict.get(field_name):
+                entity_dict[field_name] = value
+        required_fields = [
+            field_name for field_name in required_fields
+            if _format_link_field_name(field_name, entity_dict) not in resolved_fields
+        ]
+
     # Get the list of missing fields
     missing_fields = list(set(required_fields) - set([k for k, v in entity_dict.items() if v]))
     if not missing_fields:
@@ -1799,7 +2297,7 @@ def _build_entity_dict(tk, entity_dict, required_fields=None):
                 parent_fields.append(match.group(1))
 
         # Recurse to get the valid entity dict (hopefully from path_cache)
-        parent_entity = _build_entity_dict(tk, parent_entity, parent_fields)
+        parent_entity = _build_entity_dict(tk, parent_entity, parent_fields, prefetched_fields)
 
         # Populate the correct field on the task
         for key in parent_entity.keys():
@@ -1923,6 +2421,156 @@ def _get_entity_dict_from_shotgun(tk, entity_dict, required_fields):
     return entity_dict
 
 
+def _prefetch_context_fields(tk, entity_dicts, additional_entities, path_cache):
+    """
+    Looks up the context fields missing from many entity dictionaries, the way
+    :meth:`_build_entity_dict` does it for a single one, but with set queries on
+    the path cache and a Shotgun query per entity type.
+
+    Fields of the entities Tasks are linked to, e.g. entity.{entity_type}.sg_sequence,
+    are looked up in a second Shotgun query once the linked entities are known.
+
+    :param tk: :class:`Sgtk`
+    :param list entity_dicts: Entity dictionaries, containing at least a type and an id.
+    :param dict additional_entities: Result of the context_additional_entities core hook.
+    :param path_cache: :class:`PathCache` instance.
+    :returns: Dictionary of {field name: value} dictionaries keyed by (entity type, entity id).
+        Link fields are formatted for the type of the entity linked to.
+    """
+    # entity dictionaries and the names of their missing fields, keyed by entity
+    missing_fields = {}
+    for entity_dict in entity_dicts:
+        entity_type = entity_dict["type"]
+        if entity_type in ["PublishedFile", "TankPublishedFile"]:
+            # contexts are built from the entities these are linked to
+            continue
+
+        required_fields, optional_fields = _get_context_fields_for_entity_type(
+            tk, entity_type, additional_entities
+        )
+        field_names = [
+            field_name for field_name in required_fields + optional_fields if not entity_dict.get(field_name)
+        ]
+        if field_names:
+            entity_key = (entity_type, entity_dict["id"])
+            entity_dict, entity_field_names = missing_fields.setdefault(
+                entity_key, (copy.deepcopy(entity_dict), [])
+            )
+            entity_field_names.extend(
+                field_name for field_name in field_names if field_name not in entity_field_names
+            )
+
+    if not missing_fields:
+        return {}
+
+    # Attempt to get the missing fields from the folders of the entities,
+    # see _get_entity_dict_from_path_cache
+    entity_paths = path_cache.get_paths_for_entities(list(missing_fields), primary_only=True)
+    ancestor_entities = path_cache.get_ancestor_entities_for_paths(
+        [path for paths in entity_paths.itervalues() for path in paths]
+    )
+    additional_types = additional_entities.get("entity_types_in_path", [])
+    for (entity_type, entity_id), paths in entity_paths.iteritems():
+        entity_dict, field_names = missing_fields[(entity_type, entity_id)]
+        for path in paths:
+            # The entity of the path itself should always match
+            path_entity = ancestor_entities[path][0][1]
+            if not path_entity or path_entity.get("id") != entity_id:
+                raise TankError("The path '%s' associated with %s id %s does not "
+                                "resolve correctly. This may be an indication of an issue "
+                                "with the local storage setup. Please contact %s."
+                                % (path, entity_type, entity_id, constants.SUPPORT_EMAIL))
+
+            new_entity_dict = _build_entity_dict_from_ancestor_entities(
+                ancestor_entities[path], field_names, additional_types
+            )
+            for key in new_entity_dict.keys():
+                if key in entity_dict and entity_dict[key] != new_entity_dict[key]:
+                    raise TankError("Context entity has two conflicting values for field '%s'."
+                        "\n\t%s\n\t%s" % (key, entity_dict, new_entity_dict))
+
+                entity_dict[key] = new_entity_dict[key]
+
+            if all([entity_dict.get(x) for x in field_names]):
+                break
+
+    prefetched_fields = {}
+    for entity_key, (entity_dict, field_names) in missing_fields.iteritems():
+        prefetched_fields[entity_key] = dict(
+            (field_name, entity_dict[field_name]) for field_name in field_names if entity_dict.get(field_name)
+        )
+
+    # Attempt to get the remaining fields from shotgun, link fields once
+    # the entities they are linked to are known
+    requested_fields = set()
+    for _ in range(2):
+        sg_field_names = {}
+        for entity_key, (entity_dict, field_names) in missing_fields.iteritems():
+            for field_name in field_names:
+                field_name = _format_link_field_name(field_name, entity_dict)
+                if "{" in field_name or field_name in prefetched_fields[entity_key]:
+                    continue
+                if (entity_key, field_name) not in requested_fields:
+                    requested_fields.add((entity_key, field_name))
+                    sg_field_names.setdefault(entity_key, set()).add(field_name)
+
+        if not sg_field_names:
+            break
+
+        field_names_by_type = {}
+        for (entity_type, entity_id), field_names in sg_field_names.iteritems():
+            field_names_by_type.setdefault(entity_type, set()).update(field_names)
+
+        for entity_type, field_names in field_names_by_type.iteritems():
+            entity_ids = [entity_id for (sg_type, entity_id) in sg_field_names if sg_type == entity_type]
+            records = shotgun_batch.find_entity_fields(tk.shotgun, entity_type, entity_ids, field_names)
+            for entity_id in entity_ids:
+                if entity_id not in records:
+                    # left to _build_entity_dict, which reports it
+                    continue
+                entity_key = (entity_type, entity_id)
+                entity_dict = missing_fields[entity_key][0]
+                for field_name in sg_field_names[entity_key]:
+                    value = records[entity_id][field_name]
+                    # empty link fields are left to _build_entity_dict, which
+                    # looks them up on the entity linked to
+                    if value or "." not in field_name:
+                        prefetched_fields[entity_key][field_name] = value
+                        if not entity_dict.get(field_name):
+                            entity_dict[field_name] = value
+
+    return prefetched_fields
+
+
+def _format_link_field_name(field_name, entity_dict):
+    """
+    Formats the name of a field of a linked entity, e.g. entity.{entity_type}.sg_sequence,
+    for the type of the entity linked to.
+
+    :param str field_name: Field name.
+    :param dict entity_dict: Entity dictionary.
+    :returns: The formatted field name, or the field name unchanged if it isn't a field of
+        a linked entity or if the entity dictionary isn't linked to an entity yet.
+    """
+    if "." in field_name:
+        sub_entity = entity_dict.get(field_name.split(".")[0])
+        if sub_entity:
+            return field_name.format(entity_type=sub_entity["type"])
+    return field_name
+
+
+def _get_entity_dict_key(value):
+    """
+    Returns a hashable value identifying an entity dictionary, including the
+    entities it is linked to.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _get_entity_dict_key(item)) for key, item in value.iteritems()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_get_entity_dict_key(item) for item in value)
+    return value
+
+
 def _values_from_path_cache(entity, cur_template, path_cache, required_fields):
     """
     Determine values for template fields based on an entities cached paths.
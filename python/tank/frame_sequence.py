@@ -0,0 +1,141 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Frame sequences found on disk.
+"""
+
+
+class FrameSequence(object):
+    """
+    A sequence of files on disk, stored as an abstract path and the ranges
+    of frames found for it.
+
+        >>> sequence = FrameSequence("/mnt/proj/shot_2/render.%04d.exr", [1, 2, 3, 5])
+        >>> sequence.ranges
+        [(1, 3), (5, 5)]
+        >>> sequence.missing_frames
+        [4]
+        >>> str(sequence)
+        '/mnt/proj/shot_2/render.%04d.exr [1-3, 5]'
+    """
+
+    def __init__(self, path, frames):
+        """
+        Construction
+
+        :param str path: Abstract path of the sequence, e.g. ``/mnt/proj/render.%04d.exr``.
+        :param frames: Iterable of frame numbers.
+        """
+        self._path = path
+        self._ranges = []
+        self._num_frames = 0
+
+        for frame in sorted(set(frames)):
+            if self._ranges and self._ranges[-1][1] == frame - 1:
+                self._ranges[-1][1] = frame
+            else:
+                self._ranges.append([frame, frame])
+            self._num_frames += 1
+
+        self._ranges = [tuple(frame_range) for frame_range in self._ranges]
+
+    def __repr__(self):
+        return "<Sgtk FrameSequence %s %s>" % (self._path, self.range_string)
+
+    def __str__(self):
+        return "%s [%s]" % (self._path, self.range_string)
+
+    def __len__(self):
+        """
+        The number of frames in the sequence.
+        """
+        return self._num_frames
+
+    def __contains__(self, frame):
+        """
+        True if a frame exists in the sequence.
+        """
+        for first, last in self._ranges:
+            if first <= frame <= last:
+                return True
+        return False
+
+    def __eq__(self, other):
+        if not isinstance(other, FrameSequence):
+            return NotImplemented
+        return self._path == other._path and self._ranges == other._ranges
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self._path, tuple(self._ranges)))
+
+    @property
+    def path(self):
+        """
+        The abstract path of the sequence, e.g. ``/mnt/proj/render.%04d.exr``.
+        """
+        return self._path
+
+    @property
+    def ranges(self):
+        """
+        The frames of the sequence, as a sorted list of (first, last) tuples of
+        consecutive frames.
+        """
+        return list(self._ranges)
+
+    @property
+    def first_frame(self):
+        """
+        The first frame of the sequence, None if it is empty.
+        """
+        return self._ranges[0][0] if self._ranges else None
+
+    @property
+    def last_frame(self):
+        """
+        The last frame of the sequence, None if it is empty.
+        """
+        return self._ranges[-1][1] if self._ranges else None
+
+    @property
+    def frames(self):
+        """
+        Sorted list of all the frames of the sequence.
+        """
+        frames = []
+        for first, last in self._ranges:
+            frames.extend(xrange(first, last + 1))
+        return frames
+
+    @property
+    def missing_frames(self):
+        """
+        Sorted list of the frames missing between the first and last frames.
+        """
+        missing_frames = []
+        for (_, previous_last), (first, _) in zip(self._ranges, self._ranges[1:]):
+            missing_frames.extend(xrange(previous_last + 1, first))
+        return missing_frames
+
+    @property
+    def range_string(self):
+        """
+        The frames of the sequence as a string, e.g. ``1-48, 50-100``.
+        """
+        return ", ".join(
+            str(first) if first == last else "%d-%d" % (first, last) for first, last in self._ranges
+        )
@@ -15,11 +15,20 @@ all Tank items in the file system are kept.
 """
 
 import collections
+import functools
 import threading
+import Queue
 import sqlite3
 import sys
 import os
+import time
 import itertools
+import re
+import gzip
+import shutil
+import tempfile
+import zlib
+import struct
 
 # use api json to cover py 2.5
 # todo - replace with proper external library  
@@ -31,6 +40,7 @@ from . import constants
 from .errors import TankError, TankMultipleMatchingTemplatesError
 from . import LogManager
 from .util.login import get_current_user
+from .util import filesystem
 
 # Shotgun field definitions to store the path cache data
 SHOTGUN_ENTITY = "FilesystemLocation"
@@ -43,10 +53,856 @@ SG_ENTITY_TYPE_FIELD = "linked_entity_type"
 SG_ENTITY_NAME_FIELD = "code"
 SG_PIPELINE_CONFIG_FIELD = "pipeline_configuration"
 
+# FilesystemLocation fields needed to import an entry into the path cache
+SG_FILESYSTEM_LOCATION_FIELDS = [
+    "id",
+    SG_METADATA_FIELD,
+    SG_IS_PRIMARY_FIELD,
+    SG_ENTITY_ID_FIELD,
+    SG_PATH_FIELD,
+    SG_ENTITY_TYPE_FIELD,
+    SG_ENTITY_NAME_FIELD
+]
+
 log = LogManager.get_logger(__name__)
 
 g_processed_paths = set()
 
+
+class PathCacheDatabase(object):
+    """
+    Path cache database of a Toolkit instance, shared by all the :class:`PathCache`
+    objects created for it.
+
+    The location of the database is resolved through the cache location core hook
+    and its schema is checked the first time it is opened. Each thread is then handed
+    its own sqlite connection, which stays open until :meth:`close` is called.
+
+    The database is reopened and its schema checked again if the path cache file
+    is removed or replaced, or if the project switches path cache mode.
+
+    If the cache location core hook returns a location for a replica of the database,
+    reads can be done from that local copy. The statements of each write transaction
+    are replayed on the replica once committed, and the database is copied to the
+    replica whenever it is found to have been modified by another process.
+    """
+
+    def __init__(self, tk):
+        """
+        Constructor.
+
+        :param tk: Toolkit API instance
+        """
+        self._tk = tk
+        # reentrant, the schema is checked with the lock held and
+        # connections are opened while doing so.
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        # (thread, connection) tuples of the connections opened
+        self._connections = []
+        # incremented every time the connections are closed, to discard
+        # the thread local connections opened before.
+        self._generation = 0
+        self._path = None
+        self._replica_path = None
+        self._shotgun_path_cache_enabled = None
+        # identifier of the file whose schema was checked
+        self._file_id = None
+        # state of the file when the replica was last refreshed
+        self._replica_stamp = None
+        self._checking_schema = False
+        self._stats = PathCacheStats()
+        # incremented every time changes to the database are committed
+        self._change_count = 0
+
+    @property
+    def stats(self):
+        """
+        :class:`PathCacheStats` of the path cache lookups and syncs.
+        """
+        return self._stats
+
+    @property
+    def change_count(self):
+        """
+        Number of times changes to the path cache were committed through this
+        instance, for example when folders are created or synced. Data derived
+        from the path cache is stale once it has changed.
+        """
+        return self._change_count
+
+    def mark_changed(self):
+        """
+        Records that changes to the path cache were committed.
+        """
+        with self._lock:
+            self._change_count += 1
+
+    def get_path(self):
+        """
+        Returns the location of the path cache file, creating it if needed.
+
+        :returns: The path to the path cache file
+        """
+        with self._lock:
+            enabled = self._tk.pipeline_configuration.get_shotgun_path_cache_enabled()
+            if self._path is None or enabled != self._shotgun_path_cache_enabled:
+                self._close()
+                self._path = _get_path_cache_location(self._tk)
+                self._replica_path = _get_path_cache_replica_location(self._tk, self._path)
+                self._shotgun_path_cache_enabled = enabled
+            return self._path
+
+    def get_replica_path(self):
+        """
+        Returns the location of the replica of the path cache file.
+
+        :returns: The path to the replica file or None if there is no replica.
+        """
+        with self._lock:
+            self.get_path()
+            return self._replica_path
+
+    def ensure_schema(self, check_schema):
+        """
+        Checks the schema of the database if it hasn't been checked yet, or if the
+        database file was removed or replaced since it was checked. All connections
+        are closed in the latter case.
+
+        The replica of the database is refreshed if the database was modified since
+        the replica was last refreshed.
+
+        :param check_schema: Callable creating or upgrading the database tables,
+                             called with no arguments.
+        """
+        with self._lock:
+            if self._checking_schema:
+                # connections opened while checking the schema
+                return
+
+            path = self.get_path()
+            stamp = _get_file_stamp(path, read_header=bool(self._replica_path))
+            if self._file_id is not None and (stamp is None or stamp[:2] != self._file_id):
+                # the database file was removed or replaced
+                log.debug("Path cache file %s has changed, reopening it." % path)
+                self._close()
+                path = self.get_path()
+
+            if self._file_id is None:
+                self._checking_schema = True
+                try:
+                    check_schema()
+                finally:
+                    self._checking_schema = False
+                # the changes made to the schema are copied to the replica, they
+                # must not be replayed on it.
+                for _, connection in self._connections:
+                    connection.reset_changes()
+                stamp = _get_file_stamp(path, read_header=bool(self._replica_path))
+                self._file_id = stamp[:2] if stamp else None
+
+            if self._replica_path and stamp != self._replica_stamp:
+                self._refresh_replica(stamp)
+
+    def commit(self, connection):
+        """
+        Commits the current transaction of a connection returned by :meth:`get_connection`,
+        propagates the changes to the replica of the database if there is one and records
+        that the path cache changed.
+
+        :param connection: sqlite3 connection to the database.
+        """
+        with self._lock:
+            changes = connection.changes
+            modified = connection.total_changes != connection.transaction_start_changes
+            connection.commit()
+            if self.get_replica_path():
+                self._update_replica(changes, modified)
+            self._change_count += 1
+
+    def _update_replica(self, changes, modified):
+        """
+        Propagates a transaction just committed to the replica of the database. The
+        statements of the transaction are replayed on the replica if no other transaction
+        was committed since the replica was last updated, the database is copied to the
+        replica otherwise. The lock must be held.
+
+        :param changes: List of the (sql, parameters, many) tuples of the statements which
+                        modified the database in the transaction, None if they weren't recorded.
+        :param bool modified: True if the transaction modified any row.
+        """
+        stamp = _get_file_stamp(self._path, read_header=True)
+        if stamp is None or self._replica_stamp is None or stamp[:2] != self._replica_stamp[:2]:
+            self._refresh_replica(stamp)
+            return
+
+        change_counter = _get_change_counter(stamp)
+        replica_change_counter = _get_change_counter(self._replica_stamp)
+        if not modified and change_counter == replica_change_counter:
+            # nothing changed
+            return
+
+        # the change counter of the database file is incremented by every transaction
+        # which modifies it, so the replica is only missing this transaction if the
+        # counter was incremented once.
+        if (
+            not modified or changes is None or change_counter is None or
+            replica_change_counter is None or change_counter != replica_change_counter + 1
+        ):
+            self._refresh_replica(stamp)
+            return
+
+        connection = sqlite3.connect(self._replica_path)
+        try:
+            for sql, parameters, many in changes:
+                if many:
+                    connection.executemany(sql, parameters)
+                else:
+                    connection.execute(sql, parameters)
+            connection.commit()
+        except sqlite3.Error as e:
+            log.debug("Could not update path cache replica %s: %s" % (self._replica_path, e))
+            connection.close()
+            self._refresh_replica(stamp)
+            return
+        connection.close()
+        self._replica_stamp = stamp
+
+    def _refresh_replica(self, stamp):
+        """
+        Copies the database to its replica. The lock must be held.
+
+        :param stamp: State of the database file being copied.
+        """
+        log.debug("Refreshing path cache replica %s..." % self._replica_path)
+        _copy_database(self._path, self._replica_path)
+        if stamp != _get_file_stamp(self._path, read_header=True):
+            # modified while being copied, the replica may hold these changes or not,
+            # so it will be copied again on the next commit.
+            stamp = None
+        self._replica_stamp = stamp
+
+    def get_connection(self):
+        """
+        Returns the connection to the database of the current thread, opening it if needed.
+
+        :returns: sqlite3 connection.
+        """
+        return self._get_thread_connection("connection", self.get_path)
+
+    def get_read_connection(self):
+        """
+        Returns the connection to the replica of the database of the current thread,
+        opening it if needed. The connection to the database is returned if there is
+        no replica.
+
+        Nothing should be written through this connection, changes would be lost the
+        next time the replica is refreshed.
+
+        :returns: sqlite3 connection.
+        """
+        if self._replica_path is None:
+            return self.get_connection()
+        return self._get_thread_connection("replica_connection", self.get_replica_path)
+
+    def _get_thread_connection(self, name, get_path):
+        """
+        Returns a connection of the current thread, opening it if needed.
+
+        :param str name: Name of the connection.
+        :param get_path: Callable returning the path of the database to open.
+        :returns: sqlite3 connection.
+        """
+        connection, generation = getattr(self._local, name, (None, None))
+        if connection is not None and generation == self._generation:
+            return connection
+
+        with self._lock:
+            # threads don't close their connections when they exit, which
+            # would otherwise keep them open until close() is called.
+            self._close_dead_thread_connections()
+
+            path = get_path()
+
+            # connections are closed by the thread calling close(), which
+            # isn't necessarily the thread which opened them.
+            connection = sqlite3.connect(path, check_same_thread=False, factory=_PathCacheConnection)
+            connection.stats = self._stats
+            if name == "connection" and self._replica_path:
+                # replayed on the replica once committed
+                connection.changes = []
+
+            # this is to handle unicode properly - make sure that sqlite returns
+            # str objects for TEXT fields rather than unicode. Note that any unicode
+            # objects that are passed into the database will be automatically
+            # converted to UTF-8 strs, so this text_factory guarantees that any character
+            # representation will work for any language, as long as data is either input
+            # as UTF-8 (byte string) or unicode. And in the latter case, the returned data
+            # will always be unicode.
+            connection.text_factory = str
+
+            self._connections.append((threading.current_thread(), connection))
+            setattr(self._local, name, (connection, self._generation))
+        return connection
+
+    def close(self):
+        """
+        Closes the connections of all threads. They are opened again on demand,
+        the schema of the database being checked again.
+        """
+        with self._lock:
+            self._close()
+
+    def _close_dead_thread_connections(self):
+        """
+        Closes the connections of the threads which exited. The lock must be held.
+        """
+        connections = []
+        for thread, connection in self._connections:
+            if thread.is_alive():
+                connections.append((thread, connection))
+            else:
+                self._close_connection(connection)
+        self._connections = connections
+
+    def _close_connection(self, connection):
+        """
+        Closes a connection, logging failures.
+
+        :param connection: sqlite3 connection.
+        """
+        try:
+            connection.close()
+        except sqlite3.Error as e:
+            log.debug("Could not close path cache connection: %s" % e)
+
+    def _close(self):
+        """
+        Closes the connections of all threads. The lock must be held.
+        """
+        for _, connection in self._connections:
+            self._close_connection(connection)
+        self._connections = []
+        self._generation += 1
+        self._path = None
+        self._replica_path = None
+        self._file_id = None
+        self._replica_stamp = None
+
+
+class PathCacheStats(object):
+    """
+    Statistics about the use of the path cache database of a Toolkit instance.
+
+    The calls to the public :class:`PathCache` methods are recorded with their
+    duration, the number of queries they executed and the number of results they
+    returned. Syncs are recorded with their kind, duration and number of folders
+    synced.
+
+    If :attr:`check_query_plans` is set, the plan of every query is checked and the
+    queries scanning a whole table rather than using an index are recorded.
+    """
+
+    # plan details of a query scanning a whole table, e.g. "SCAN TABLE path_cache"
+    # or "SCAN path_cache_entry". Scans of an index start the same way.
+    _FULL_SCAN_REGEX = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._lock = threading.Lock()
+        # stack of the calls being recorded by each thread
+        self._local = threading.local()
+        self.check_query_plans = False
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the statistics.
+        """
+        with self._lock:
+            # [calls, queries, rows, total time, max time] lists keyed by method name
+            self._methods = {}
+            self._num_queries = 0
+            # number of syncs keyed by kind, "full", "incremental" or "up_to_date"
+            self._syncs = dict.fromkeys(["full", "incremental", "up_to_date"], 0)
+            self._sync_time = 0.0
+            self._num_folders_synced = 0
+            self._last_sync_time = None
+            self._last_sync_duration = None
+            self._last_event_log_id = None
+            self._last_event_log_lag = None
+            # (sql, table name) tuples
+            self._full_scans = []
+
+    def get_stats(self):
+        """
+        Returns the statistics recorded since the path cache database was opened or
+        since the last :meth:`reset`.
+
+        :returns: Dictionary with keys:
+            - methods: Dictionary keyed by :class:`PathCache` method name, with
+              dictionaries with keys ``calls``, ``queries``, ``rows`` (number of
+              results returned), ``total_time``, ``average_time`` and ``max_time``,
+              times being in seconds.
+            - queries: Total number of queries executed.
+            - full_syncs: Number of full syncs.
+            - incremental_syncs: Number of syncs which applied new event log entries.
+            - up_to_date_syncs: Number of syncs which found nothing to do.
+            - sync_time: Number of seconds spent syncing.
+            - folders_synced: Number of folders added to the path cache by the syncs.
+            - last_sync_time: Time, in seconds since the epoch, at which the last
+              sync completed, None if there was none.
+            - last_sync_duration: Duration in seconds of the last sync, None if
+              there was none.
+            - last_event_log_id: Id of the last event log entry synced, None if
+              there was no sync.
+            - event_log_lag: Number of event log entries the path cache was behind
+              Shotgun at the last sync, None if there was no sync or it was a full sync.
+            - lag: Number of seconds since the path cache was last known to be in
+              sync with Shotgun, None if there was no sync.
+            - full_scans: List of (query, table name) tuples, the queries found
+              scanning a whole table when :attr:`check_query_plans` is set.
+        """
+        with self._lock:
+            methods = {}
+            for name, (calls, queries, rows, total_time, max_time) in self._methods.iteritems():
+                methods[name] = {
+                    "calls": calls,
+                    "queries": queries,
+                    "rows": rows,
+                    "total_time": total_time,
+                    "average_time": total_time / calls,
+                    "max_time": max_time,
+                }
+
+            if self._last_sync_time is None:
+                lag = None
+            else:
+                lag = time.time() - self._last_sync_time
+
+            return {
+                "methods": methods,
+                "queries": self._num_queries,
+                "full_syncs": self._syncs["full"],
+                "incremental_syncs": self._syncs["incremental"],
+                "up_to_date_syncs": self._syncs["up_to_date"],
+                "sync_time": self._sync_time,
+                "folders_synced": self._num_folders_synced,
+                "last_sync_time": self._last_sync_time,
+                "last_sync_duration": self._last_sync_duration,
+                "last_event_log_id": self._last_event_log_id,
+                "event_log_lag": self._last_event_log_lag,
+                "lag": lag,
+                "full_scans": list(self._full_scans),
+            }
+
+    def start_call(self, name):
+        """
+        Records the start of a method call by the current thread.
+
+        :param str name: Name of the method.
+        :returns: Start time, to pass to :meth:`end_call`.
+        """
+        calls = getattr(self._local, "calls", None)
+        if calls is None:
+            calls = self._local.calls = []
+        calls.append([name, 0])
+        return time.time()
+
+    def end_call(self, name, start_time, result):
+        """
+        Records the end of a method call by the current thread.
+
+        :param str name: Name of the method.
+        :param start_time: Value returned by :meth:`start_call`.
+        :param result: Value returned by the method, None if it raised.
+        """
+        duration = time.time() - start_time
+        _, num_queries = self._local.calls.pop()
+
+        if result is None:
+            num_rows = 0
+        elif isinstance(result, dict) and "type" in result and "id" in result:
+            # a single entity
+            num_rows = 1
+        elif isinstance(result, (list, tuple, set, dict)):
+            num_rows = len(result)
+        else:
+            num_rows = 1
+
+        with self._lock:
+            method = self._methods.get(name)
+            if method is None:
+                method = self._methods[name] = [0, 0, 0, 0.0, 0.0]
+            method[0] += 1
+            method[1] += num_queries
+            method[2] += num_rows
+            method[3] += duration
+            method[4] = max(method[4], duration)
+
+    def record_query(self, connection, sql, parameters):
+        """
+        Records a query executed by the current thread, checking its plan if
+        :attr:`check_query_plans` is set.
+
+        :param connection: Connection executing the query.
+        :param str sql: Query.
+        :param parameters: Parameters of the query, None for queries executed
+                           with several sets of parameters.
+        """
+        calls = getattr(self._local, "calls", None)
+        if calls:
+            calls[-1][1] += 1
+
+        full_scans = []
+        if self.check_query_plans and parameters is not None:
+            for table_name in self._get_scanned_tables(connection, sql, parameters):
+                log.debug("Query scanning the whole %s table: %s" % (table_name, sql))
+                full_scans.append((sql, table_name))
+
+        with self._lock:
+            self._num_queries += 1
+            self._full_scans.extend(full_scans)
+
+    def record_sync(self, kind, duration, num_folders, event_log_id, num_events):
+        """
+        Records a sync of the path cache.
+
+        :param str kind: "full", "incremental" or "up_to_date".
+        :param duration: Duration of the sync in seconds.
+        :param int num_folders: Number of folders added to the path cache.
+        :param int event_log_id: Id of the last event log entry synced.
+        :param num_events: Number of event log entries the path cache was behind
+                           Shotgun, None for a full sync.
+        """
+        with self._lock:
+            self._syncs[kind] += 1
+            self._sync_time += duration
+            self._num_folders_synced += num_folders
+            self._last_sync_time = time.time()
+            self._last_sync_duration = duration
+            self._last_event_log_id = event_log_id
+            self._last_event_log_lag = num_events
+
+    def _get_scanned_tables(self, connection, sql, parameters):
+        """
+        Returns the tables a query scans without using an index.
+
+        :param connection: Connection executing the query.
+        :param str sql: Query.
+        :param parameters: Parameters of the query.
+        :returns: List of table names.
+        """
+        if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            return []
+
+        # a plain cursor, whose queries aren't recorded
+        cursor = sqlite3.Connection.cursor(connection)
+        try:
+            plan = cursor.execute("EXPLAIN QUERY PLAN %s" % sql, parameters).fetchall()
+        finally:
+            cursor.close()
+
+        table_names = []
+        for row in plan:
+            # the detail is the last column, whatever the sqlite version
+            detail = row[-1]
+            match = self._FULL_SCAN_REGEX.match(detail)
+            if match and "USING" not in detail:
+                table_names.append(str(match.group(1)))
+        return table_names
+
+
+class _PathCacheCursor(sqlite3.Cursor):
+    """
+    Cursor recording the queries it executes in the :class:`PathCacheStats`
+    of its connection.
+    """
+
+    def execute(self, sql, parameters=()):
+        self.connection.stats.record_query(self.connection, sql, parameters)
+        self.connection.record_change(sql, parameters, False)
+        return super(_PathCacheCursor, self).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.stats.record_query(self.connection, sql, None)
+        if self.connection.changes is not None:
+            # the parameters may be a generator, consumed by the statement
+            seq_of_parameters = list(seq_of_parameters)
+            self.connection.record_change(sql, seq_of_parameters, True)
+        return super(_PathCacheCursor, self).executemany(sql, seq_of_parameters)
+
+
+class _PathCacheConnection(sqlite3.Connection):
+    """
+    Connection to the path cache database, whose cursors record the queries
+    they execute in :attr:`stats`.
+
+    If :attr:`changes` is set, the statements modifying the database executed
+    in the current transaction are recorded in it.
+    """
+
+    # PathCacheStats, set once connected
+    stats = None
+    # list of (sql, parameters, many) tuples, None if changes aren't recorded
+    changes = None
+    # value of total_changes when the current transaction started
+    transaction_start_changes = 0
+
+    def cursor(self, factory=_PathCacheCursor):
+        return super(_PathCacheConnection, self).cursor(factory)
+
+    def record_change(self, sql, parameters, many):
+        """
+        Records a statement executed in the current transaction if it may modify the database.
+
+        :param str sql: Statement.
+        :param parameters: Parameters of the statement, or list of parameters if many is True.
+        :param bool many: True if the statement is executed for each set of parameters.
+        """
+        if self.changes is not None and not sql.lstrip().upper().startswith("SELECT"):
+            self.changes.append((sql, parameters, many))
+
+    def reset_changes(self):
+        """
+        Forgets the statements recorded so far, a new transaction being started.
+        """
+        if self.changes is not None:
+            self.changes = []
+        self.transaction_start_changes = self.total_changes
+
+    def commit(self):
+        super(_PathCacheConnection, self).commit()
+        self.reset_changes()
+
+    def rollback(self):
+        super(_PathCacheConnection, self).rollback()
+        self.reset_changes()
+
+
+def _get_file_stamp(path, read_header=False):
+    """
+    Returns the state of a database file, or None if the file doesn't exist.
+
+    :param path: Path to the database file.
+    :param read_header: If True, the change counter stored in the header of the file
+                        is read, for modifications not changing its size to be detected
+                        on file systems with a coarse modification time.
+    :returns: Tuple whose first two items identify the file, changing when the
+              file is removed and created again. The whole tuple changes when
+              the file is modified.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    change_counter = None
+    if read_header:
+        try:
+            with open(path, "rb") as fh:
+                # 4 bytes at offset 24 of the database header
+                fh.seek(24)
+                change_counter = fh.read(4)
+        except (IOError, OSError):
+            pass
+
+    return (stat.st_dev, stat.st_ino, stat.st_mtime, stat.st_size, change_counter)
+
+
+def _get_change_counter(stamp):
+    """
+    Returns the change counter of a database file.
+
+    :param stamp: State of the file, as returned by :func:`_get_file_stamp`.
+    :returns: Integer or None if the change counter wasn't read.
+    """
+    change_counter = stamp[4]
+    if change_counter is None or len(change_counter) != 4:
+        return None
+    return struct.unpack(">I", change_counter)[0]
+
+
+def _copy_database(path, target_path):
+    """
+    Copies an sqlite database into another one, in a single transaction.
+
+    :param path: Path to the database to copy.
+    :param target_path: Path to the database to replace.
+    """
+    if hasattr(sqlite3.Connection, "backup"):
+        # use the backup api when available
+        connection = sqlite3.connect(path)
+        target_connection = sqlite3.connect(target_path)
+        try:
+            connection.backup(target_connection)
+        finally:
+            target_connection.close()
+            connection.close()
+        return
+
+    # transactions are handled explicitly, the sqlite3 module would otherwise
+    # commit before each schema statement.
+    connection = sqlite3.connect(target_path, isolation_level=None)
+    try:
+        connection.execute("ATTACH DATABASE ? AS source", (path,))
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            table_names = connection.execute(
+                "SELECT name FROM main.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+            for (table_name,) in table_names:
+                connection.execute("DROP TABLE main.\"%s\"" % table_name)
+
+            # tables are created before their indices
+            schema = connection.execute(
+                "SELECT type, name, sql FROM source.sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type = 'index'"
+            ).fetchall()
+            for object_type, name, sql in schema:
+                connection.execute(sql)
+                if object_type == "table":
+                    connection.execute("INSERT INTO main.\"%s\" SELECT * FROM source.\"%s\"" % (name, name))
+
+            connection.execute("COMMIT")
+        except:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("DETACH DATABASE source")
+    finally:
+        connection.close()
+
+
+def _compress_file(path, target_path):
+    """
+    Compresses a file with gzip. The compressed file is written next to its
+    target and then moved into place, so that it is never read partially written.
+
+    :param path: Path to the file to compress.
+    :param target_path: Path to the compressed file to write.
+    """
+    temp_path = "%s.%d.tmp" % (target_path, os.getpid())
+    try:
+        with open(path, "rb") as fh:
+            gzip_fh = gzip.open(temp_path, "wb")
+            try:
+                shutil.copyfileobj(fh, gzip_fh)
+            finally:
+                gzip_fh.close()
+
+        # files can't be renamed over on windows
+        if sys.platform == "win32" and os.path.exists(target_path):
+            os.remove(target_path)
+        os.rename(temp_path, target_path)
+    finally:
+        filesystem.safe_delete_file(temp_path)
+
+
+def _decompress_file(path, target_path):
+    """
+    Decompresses a gzip file.
+
+    :param path: Path to the compressed file.
+    :param target_path: Path to the file to write.
+    """
+    gzip_fh = gzip.open(path, "rb")
+    try:
+        with open(target_path, "wb") as fh:
+            shutil.copyfileobj(gzip_fh, fh)
+    finally:
+        gzip_fh.close()
+
+
+def _get_path_cache_location(tk):
+    """
+    Creates the path cache file and returns its location on disk.
+
+    :param tk: Toolkit API instance
+    :returns: The path to the path cache file
+    """
+    if tk.pipeline_configuration.get_shotgun_path_cache_enabled():
+
+        # 0.15+ path cache setup - call out to a core hook to determine
+        # where the path cache should be located.
+        path = tk.execute_core_hook_method(
+            constants.CACHE_LOCATION_HOOK_NAME,
+            "get_path_cache_path",
+            project_id=tk.pipeline_configuration.get_project_id(),
+            plugin_id=tk.pipeline_configuration.get_plugin_id(),
+            pipeline_configuration_id=tk.pipeline_configuration.get_shotgun_id()
+        )
+
+    else:
+        # old (v0.14) style path cache
+        # fall back on the 0.14 setting, where the path cache
+        # is located in a tank folder in the project root
+        path = os.path.join(tk.pipeline_configuration.get_primary_data_root(),
+                            "tank",
+                            "cache",
+                            "path_cache.db")
+
+        # first check that the cache folder exists
+        # note that the cache folder is inside of the tank folder
+        # so no need to attempt a recursive creation here.
+        cache_folder = os.path.dirname(path)
+        if not os.path.exists(cache_folder):
+            old_umask = os.umask(0)
+            try:
+                os.mkdir(cache_folder, 0o777)
+            finally:
+                os.umask(old_umask)
+
+        # now try to write a placeholder file with open permissions
+        if not os.path.exists(path):
+            old_umask = os.umask(0)
+            try:
+                fh = open(path, "wb")
+                fh.close()
+                os.chmod(path, 0o666)
+            finally:
+                os.umask(old_umask)
+
+    return path
+
+
+def _get_path_cache_replica_location(tk, path):
+    """
+    Returns the location of the local replica of the path cache file.
+
+    :param tk: Toolkit API instance
+    :param path: The path to the path cache file
+    :returns: The path to the replica file or None if the path cache is read directly.
+    """
+    return tk.execute_core_hook_method(
+        constants.CACHE_LOCATION_HOOK_NAME,
+        "get_path_cache_replica_path",
+        project_id=tk.pipeline_configuration.get_project_id(),
+        plugin_id=tk.pipeline_configuration.get_plugin_id(),
+        pipeline_configuration_id=tk.pipeline_configuration.get_shotgun_id(),
+        path_cache_path=path
+    )
+
+
+def _instrumented(method):
+    """
+    Decorator recording the calls to a :class:`PathCache` method in the
+    :class:`PathCacheStats` of its database.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self._database.stats
+        start_time = stats.start_call(method.__name__)
+        result = None
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        finally:
+            stats.end_call(method.__name__, start_time, result)
+    return wrapper
+
+
 class PathCache(object):
     """
     A global cache which holds the mapping between a shotgun entity and a location on disk.
@@ -58,6 +914,16 @@ class PathCache(object):
     # sqlite has a limit for how many items fit into a single in statement
     SQLITE_MAX_ITEMS_FOR_IN_STATEMENT = 200
 
+    # sqlite has a limit of 64 tables in a join. Folders are looked up by joining
+    # a copy of the folder table per path segment, up to this number of segments.
+    SQLITE_MAX_FOLDER_LEVELS_FOR_JOIN = 60
+
+    # Number of levels of parent folders fetched at a time when resolving folder paths.
+    FOLDER_LEVELS_PER_QUERY = 8
+
+    # Query resolving folder paths, see _get_folder_paths_sql.
+    _folder_paths_sql = None
+
     # To avoid paging, we batch queries of FilesystemLocation entities
     # in chunks of 500 and combine the results. The performance issues
     # around this have been largely alleviated in Shotgun 7.4.x and the
@@ -68,6 +934,14 @@ class PathCache(object):
     # to do so.
     SHOTGUN_ENTITY_QUERY_BATCH_SIZE = 500
 
+    # During a full sync, FilesystemLocation entities are downloaded in pages of
+    # SHOTGUN_ENTITY_QUERY_BATCH_SIZE entities. This is the maximum number of pages
+    # downloaded ahead of the one being written to the path cache.
+    FULL_SYNC_PREFETCH_PAGES = 2
+
+    # Number of v1 path_cache rows migrated to the v2 tables at a time.
+    PATH_CACHE_MIGRATION_BATCH_SIZE = 5000
+
     def __init__(self, tk):
         """
         Constructor.
@@ -75,8 +949,8 @@ class PathCache(object):
         :param tk: Toolkit API instance
         """
         self._lock = threading.Lock()
-        self._connection = None
         self._tk = tk
+        self._database = tk._get_path_cache_database()
         self._sync_with_sg = tk.pipeline_configuration.get_shotgun_path_cache_enabled()
 
         if tk.pipeline_configuration.has_associated_data_roots():
@@ -87,33 +961,69 @@ class PathCache(object):
             # no primary location found. Path cache therefore does not exist!
             # go into a no-path-cache-mode
             self._path_cache_disabled = True
-    
+
+    @property
+    def _connection(self):
+        """
+        Connection to the path cache database for the current thread, shared by
+        all the path cache objects of the Toolkit instance.
+        """
+        if self._path_cache_disabled:
+            return None
+        return self._database.get_connection()
+
+    @property
+    def _read_connection(self):
+        """
+        Connection to read the path cache database from for the current thread, to
+        the local replica of the database if there is one. Nothing should be written
+        through it.
+        """
+        if self._path_cache_disabled:
+            return None
+        return self._database.get_read_connection()
+
+    def _commit(self):
+        """
+        Commits the current transaction, propagates the changes to the
+        replica of the database and records that the path cache changed.
+        """
+        self._database.commit(self._connection)
+
     def _init_db(self):
         """
-        Sets up the database
+        Sets up the database, the first time it is used by the Toolkit instance
+        or if the database file has been removed or replaced since. New databases
+        are seeded from the path cache snapshot of the pipeline configuration if
+        there is one, see :meth:`export_snapshot`.
+        """
+        self._database.ensure_schema(self._check_schema)
+
+    def _check_schema(self):
+        """
+        Creates the tables and indices of a new database, or upgrades the ones of
+        an existing database.
+
+        Entries are stored in the v2 tables, see :meth:`_create_v2_tables`. The
+        original path_cache, shotgun_status and event_log_sync tables are kept
+        empty, so that older cores sharing the database do a full sync rather
+        than use stale data. Their entries are migrated to the v2 tables whenever
+        some are found, see :meth:`_migrate_v1_entries`.
         """
-        # first, make way for the path cache file. This call
-        # will ensure that there is a valid folder and file on
-        # disk, created with all the right permissions etc.
-        path_cache_file = self._get_path_cache_location()
-        
-        self._connection = sqlite3.connect(path_cache_file)
-        
-        # this is to handle unicode properly - make sure that sqlite returns 
-        # str objects for TEXT fields rather than unicode. Note that any unicode
-        # objects that are passed into the database will be automatically
-        # converted to UTF-8 strs, so this text_factory guarantees that any character
-        # representation will work for any language, as long as data is either input
-        # as UTF-8 (byte string) or unicode. And in the latter case, the returned data
-        # will always be unicode.
-        self._connection.text_factory = str
-        
         c = self._connection.cursor()
         try:
         
             # get a list of tables in the current database
             ret = c.execute("SELECT name FROM main.sqlite_master WHERE type='table';")
             table_names = [x[0] for x in ret.fetchall()]
+
+            # a new database is seeded from the path cache snapshot if there is one,
+            # it is then upgraded like any existing database and brought up to date
+            # incrementally from the snapshot's event log marker.
+            seeded = len(table_names) == 0 and self._seed_from_snapshot()
+            if seeded:
+                ret = c.execute("SELECT name FROM main.sqlite_master WHERE type='table';")
+                table_names = [x[0] for x in ret.fetchall()]
             
             if len(table_names) == 0:
                 # we have a brand new database. Create all tables and indices
@@ -141,6 +1051,8 @@ class PathCache(object):
 
                     CREATE INDEX shotgun_status_shotgun_id ON shotgun_status(shotgun_id);
                     """)
+                self._create_v2_tables(c)
+                self._insert_v1_sentinel(c)
                 self._connection.commit()
 
                 # Synchronize the table with the shotgun server
@@ -179,59 +1091,314 @@ class PathCache(object):
                         """)
         
                     self._connection.commit()
+
+                # this is a setup from before the v2 tables. Entries written since
+                # the migration by older cores are migrated again.
+                if "path_cache_entry" not in table_names:
+                    self._create_v2_tables(c)
+                    self._migrate_v1_entries(c, first_migration=True)
+                elif list(c.execute("SELECT 1 FROM path_cache LIMIT 1")):
+                    self._migrate_v1_entries(c, first_migration=False)
+
+                if seeded:
+                    self.synchronize()
         
         finally:
             c.close()
 
-    def _get_path_cache_location(self):
+    def _create_v2_tables(self, cursor):
+        """
+        Creates the v2 tables of the path cache.
+
+        Rather than full paths, folders are stored one segment at a time in
+        path_cache_folder, each row pointing at the folder containing it. The
+        top folder of each storage root has parent_id 0 and the name of the root.
+        Entity types are stored once in path_cache_entity_type. The entries of
+        path_cache_entry point at both, and hold the id of the FilesystemLocation
+        they were registered as in Shotgun, if any.
+
+        :param cursor: Database cursor.
+        """
+        cursor.executescript("""
+            CREATE TABLE IF NOT EXISTS path_cache_folder (id INTEGER PRIMARY KEY, parent_id integer NOT NULL, name text NOT NULL);
+
+            CREATE UNIQUE INDEX IF NOT EXISTS path_cache_folder_name ON path_cache_folder(parent_id, name);
+
+            CREATE TABLE IF NOT EXISTS path_cache_entity_type (id INTEGER PRIMARY KEY, name text NOT NULL);
+
+            CREATE UNIQUE INDEX IF NOT EXISTS path_cache_entity_type_name ON path_cache_entity_type(name);
+
+            CREATE TABLE IF NOT EXISTS path_cache_entry (id INTEGER PRIMARY KEY, folder_id integer NOT NULL, entity_type_id integer NOT NULL, entity_id integer, entity_name text, primary_entity integer, shotgun_id integer);
+
+            CREATE UNIQUE INDEX IF NOT EXISTS path_cache_entry_folder ON path_cache_entry(folder_id, primary_entity, entity_type_id, entity_id);
+
+            CREATE INDEX IF NOT EXISTS path_cache_entry_entity ON path_cache_entry(entity_type_id, entity_id);
+
+            CREATE INDEX IF NOT EXISTS path_cache_entry_shotgun_id ON path_cache_entry(shotgun_id);
+
+            CREATE TABLE IF NOT EXISTS path_cache_sync (last_id integer);
+            """)
+
+    def _insert_v1_sentinel(self, cursor):
+        """
+        Inserts the sentinel row of the v1 shotgun_status table. Full syncs done by
+        older cores clear the table, while they only ever add rows to it otherwise,
+        so the v1 tables hold a complete copy of the path cache if both the sentinel
+        is missing and there is an event log sync marker. The sentinel never matches
+        the id of a path_cache row nor the id of a FilesystemLocation.
+
+        :param cursor: Database cursor.
+        """
+        cursor.execute("INSERT OR IGNORE INTO shotgun_status(path_cache_id, shotgun_id) VALUES(0, 0)")
+
+    def _migrate_v1_entries(self, cursor, first_migration):
+        """
+        Moves the entries of the v1 path_cache and shotgun_status tables to the v2 tables.
+
+        The entries replace the content of the v2 tables, keeping their ids, the first
+        time the database is migrated or if an older core did a full sync since the last
+        migration. The event log sync marker is moved along in that case. Otherwise, the
+        entries are added to the v2 tables, those already registered or conflicting with
+        a primary entity of the v2 tables being skipped, and the v2 marker is kept.
+
+        The database is compacted after the first migration.
+
+        :param cursor: Database cursor.
+        :param bool first_migration: True if the v2 tables were just created.
+        """
+        res = list(cursor.execute("SELECT max(last_id) FROM event_log_sync"))
+        last_event_log_id = res[0][0]
+        full_sync = last_event_log_id is not None and not list(
+            cursor.execute("SELECT 1 FROM shotgun_status WHERE path_cache_id = 0")
+        )
+        replace = first_migration or full_sync
+
+        if replace:
+            log.debug("Migrating the path cache entries to the v2 tables...")
+            cursor.execute("DELETE FROM path_cache_entry")
+            cursor.execute("DELETE FROM path_cache_folder")
+            cursor.execute("DELETE FROM path_cache_entity_type")
+            cursor.execute("DELETE FROM path_cache_sync")
+        else:
+            log.debug("Merging the path cache entries written by older cores into the v2 tables...")
+
+        num_records = 0
+        last_rowid = -1
+        while True:
+            rows = cursor.execute(
+                """SELECT pc.rowid, pc.entity_type, pc.entity_id, pc.entity_name, pc.root, pc.path,
+                          pc.primary_entity, ss.shotgun_id
+                   FROM path_cache pc
+                   LEFT JOIN shotgun_status ss ON pc.rowid = ss.path_cache_id
+                   WHERE pc.rowid > ?
+                   ORDER BY pc.rowid
+                   LIMIT ?""",
+                (last_rowid, self.PATH_CACHE_MIGRATION_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+
+            folder_keys = dict(
+                (row[0], self._get_folder_key(row[4] or "", row[5] or "")) for row in rows
+            )
+            folder_ids = self._get_folder_ids(cursor, folder_keys.values(), create=True)
+            entity_type_ids = self._get_entity_type_ids(cursor, [row[1] for row in rows], create=True)
+
+            if replace:
+                cursor.executemany(
+                    """INSERT OR IGNORE INTO path_cache_entry(id, folder_id, entity_type_id, entity_id,
+                                                             entity_name, primary_entity, shotgun_id)
+                       VALUES(?, ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (rowid, folder_ids[folder_keys[rowid]], entity_type_ids[entity_type],
+                         entity_id, entity_name, primary_entity, shotgun_id)
+                        for rowid, entity_type, entity_id, entity_name, _, _, primary_entity, shotgun_id in rows
+                    ]
+                )
+                num_records += len(rows)
+                continue
+
+            # folders with a primary entity, which must stay unique
+            primary_folder_ids = set()
+            for chunk in self._get_chunks(list(set(folder_ids.values()))):
+                res = cursor.execute(
+                    "SELECT folder_id FROM path_cache_entry WHERE primary_entity = 1 AND folder_id IN (%s)" % (
+                        self._gen_param_string(chunk)
+                    ),
+                    chunk
+                )
+                primary_folder_ids.update(folder_id for (folder_id,) in res)
+
+            entry_rows = []
+            for rowid, entity_type, entity_id, entity_name, _, _, primary_entity, shotgun_id in rows:
+                folder_id = folder_ids[folder_keys[rowid]]
+                if primary_entity:
+                    if folder_id in primary_folder_ids:
+                        continue
+                    primary_folder_ids.add(folder_id)
+                entry_rows.append(
+                    (folder_id, entity_type_ids[entity_type], entity_id, entity_name, primary_entity, shotgun_id)
+                )
+            # note: see _add_db_mapping for why INSERT OR IGNORE is used.
+            cursor.executemany(
+                """INSERT OR IGNORE INTO path_cache_entry(folder_id, entity_type_id, entity_id,
+                                                         entity_name, primary_entity, shotgun_id)
+                   VALUES(?, ?, ?, ?, ?, ?)""",
+                entry_rows
+            )
+            num_records += len(entry_rows)
+
+        if replace and last_event_log_id is not None:
+            cursor.execute("INSERT INTO path_cache_sync(last_id) VALUES(?)", (last_event_log_id,))
+
+        cursor.execute("DELETE FROM shotgun_status")
+        cursor.execute("DELETE FROM path_cache")
+        cursor.execute("DELETE FROM event_log_sync")
+        self._insert_v1_sentinel(cursor)
+        self._connection.commit()
+        log.debug("Migrated %s path cache entries." % num_records)
+
+        if first_migration:
+            # give the space used by the v1 tables back
+            try:
+                cursor.execute("VACUUM")
+            except sqlite3.Error as e:
+                log.debug("Could not compact the path cache database: %s" % e)
+
+    def get_database_info(self):
+        """
+        Returns information about the content of the path cache database.
+
+        :returns: Dictionary with keys path (path to the database file), size (size
+                  of the file in bytes), entries, folders and entity_types (number of
+                  rows of the tables) and last_event_log_id (id of the last event log
+                  entry synced, None if the path cache isn't synced), or None if the
+                  project has no path cache.
+        """
+        if self._path_cache_disabled:
+            return None
+
+        c = self._read_connection.cursor()
+        try:
+            info = {}
+            for key, table_name in [
+                ("entries", "path_cache_entry"),
+                ("folders", "path_cache_folder"),
+                ("entity_types", "path_cache_entity_type"),
+            ]:
+                info[key] = c.execute("SELECT count(*) FROM %s" % table_name).fetchone()[0]
+            info["last_event_log_id"] = c.execute("SELECT max(last_id) FROM path_cache_sync").fetchone()[0]
+        finally:
+            c.close()
+
+        info["path"] = self._database.get_path()
+        info["size"] = os.path.getsize(info["path"])
+        return info
+
+    @_instrumented
+    def export_snapshot(self, snapshot_path):
         """
-        Creates the path cache file and returns its location on disk.
+        Synchronizes the path cache with Shotgun and writes a snapshot of it, from
+        which new path caches of the project are seeded rather than fully synced.
 
-        :returns: The path to the path cache file
+        The snapshot is a gzip compressed copy of the database, which records the
+        project and the last event log entry synced. Path caches seeded from it are
+        brought up to date with an incremental sync from that event log entry.
+
+        :param snapshot_path: Path to the snapshot file to write.
+        :returns: Id of the last event log entry synced into the snapshot.
+        :raises: :class:`TankError` if the path cache isn't synchronized with Shotgun.
+        """
+        if self._path_cache_disabled or not self._sync_with_sg:
+            raise TankError("Only path caches synchronized with Shotgun can be exported.")
+
+        self.synchronize()
+
+        filesystem.ensure_folder_exists(os.path.dirname(os.path.abspath(snapshot_path)))
+        (fd, db_path) = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            # the marker is read from the copy, whose entries it matches
+            # even if another process syncs the path cache meanwhile.
+            _copy_database(self._database.get_path(), db_path)
+            connection = sqlite3.connect(db_path)
+            try:
+                last_id = connection.execute("SELECT max(last_id) FROM path_cache_sync").fetchone()[0]
+                if last_id is None:
+                    raise TankError("The path cache has not been synchronized with Shotgun.")
+                connection.execute(
+                    "CREATE TABLE path_cache_snapshot (project_id integer, last_id integer, created_at real)"
+                )
+                connection.execute(
+                    "INSERT INTO path_cache_snapshot VALUES(?, ?, ?)",
+                    (self._tk.pipeline_configuration.get_project_id(), last_id, time.time())
+                )
+                connection.commit()
+            finally:
+                connection.close()
+
+            _compress_file(db_path, snapshot_path)
+        finally:
+            filesystem.safe_delete_file(db_path)
+
+        log.debug("Wrote path cache snapshot %s, synced up to event log entry %s." % (snapshot_path, last_id))
+        return last_id
+
+    def _seed_from_snapshot(self):
+        """
+        Copies the path cache snapshot of the pipeline configuration into the
+        database, if there is one and it was taken for the current project.
+
+        :returns: True if the database was seeded, False otherwise.
         """
-        if self._tk.pipeline_configuration.get_shotgun_path_cache_enabled():
+        snapshot_path = self._tk.pipeline_configuration.get_path_cache_snapshot_path()
+        if not self._sync_with_sg or not snapshot_path or not os.path.exists(snapshot_path):
+            return False
+
+        log.debug("Seeding the path cache from snapshot %s..." % snapshot_path)
+        (fd, db_path) = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            _decompress_file(snapshot_path, db_path)
+            connection = sqlite3.connect(db_path)
+            try:
+                data = connection.execute("SELECT project_id, last_id FROM path_cache_snapshot").fetchone()
+                connection.execute("DROP TABLE path_cache_snapshot")
+                connection.commit()
+            finally:
+                connection.close()
 
-            # 0.15+ path cache setup - call out to a core hook to determine
-            # where the path cache should be located.
-            path = self._tk.execute_core_hook_method(
-                constants.CACHE_LOCATION_HOOK_NAME,
-                "get_path_cache_path",
-                project_id=self._tk.pipeline_configuration.get_project_id(),
-                plugin_id=self._tk.pipeline_configuration.get_plugin_id(),
-                pipeline_configuration_id=self._tk.pipeline_configuration.get_shotgun_id()
+            project_id = self._tk.pipeline_configuration.get_project_id()
+            if data is None or data[0] != project_id or data[1] is None:
+                log.warning(
+                    "Path cache snapshot %s was not taken for project %s, a full sync "
+                    "will be carried out instead." % (snapshot_path, project_id)
+                )
+                return False
+
+            _copy_database(db_path, self._database.get_path())
+
+        except (IOError, OSError, EOFError, zlib.error, sqlite3.Error) as e:
+            log.warning(
+                "Could not seed the path cache from snapshot %s, a full sync will be "
+                "carried out instead: %s" % (snapshot_path, e)
             )
+            return False
 
-        else:
-            # old (v0.14) style path cache
-            # fall back on the 0.14 setting, where the path cache
-            # is located in a tank folder in the project root
-            path = os.path.join(self._tk.pipeline_configuration.get_primary_data_root(),
-                                "tank",
-                                "cache",
-                                "path_cache.db")
-
-            # first check that the cache folder exists
-            # note that the cache folder is inside of the tank folder
-            # so no need to attempt a recursive creation here.
-            cache_folder = os.path.dirname(path)
-            if not os.path.exists(cache_folder):
-                old_umask = os.umask(0)
-                try:
-                    os.mkdir(cache_folder, 0o777)
-                finally:
-                    os.umask(old_umask)
+        finally:
+            filesystem.safe_delete_file(db_path)
 
-            # now try to write a placeholder file with open permissions
-            if not os.path.exists(path):
-                old_umask = os.umask(0)
-                try:
-                    fh = open(path, "wb")
-                    fh.close()
-                    os.chmod(path, 0o666)
-                finally:
-                    os.umask(old_umask)
+        log.debug("Seeded the path cache, synced up to event log entry %s." % data[1])
+        return True
+
+    def _get_path_cache_location(self):
+        """
+        Creates the path cache file and returns its location on disk.
 
-        return path
+        :returns: The path to the path cache file
+        """
+        return self._database.get_path()
 
     def _path_to_dbpath(self, relative_path):
         """
@@ -295,18 +1462,344 @@ class PathCache(object):
         full_path = os.path.join(root_path, path_sep)
         return os.path.normpath(full_path)
 
+    ############################################################################################
+    # path cache storage
+
+    def _get_chunks(self, items, chunk_size=None):
+        """
+        Splits a list into chunks small enough to be passed to an sql IN statement.
+
+        :param list items: Items to split.
+        :param int chunk_size: Maximum number of items per chunk, defaults to
+                               SQLITE_MAX_ITEMS_FOR_IN_STATEMENT.
+        :returns: Generator of lists of items.
+        """
+        chunk_size = chunk_size or self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT
+        for index in xrange(0, len(items), chunk_size):
+            yield items[index:index + chunk_size]
+
+    def _get_folder_key(self, root_name, db_path):
+        """
+        Returns the key identifying a folder in the path_cache_folder table.
+
+        /foo/bar in the primary root --> ("primary", "foo", "bar")
+
+        :param root_name: Name of the storage root.
+        :param db_path: Path relative to the root, in db path form.
+        :returns: Tuple made of the root name followed by the path segments, as utf-8 strs.
+        """
+        if isinstance(root_name, unicode):
+            root_name = root_name.encode("utf-8")
+        if isinstance(db_path, unicode):
+            db_path = db_path.encode("utf-8")
+
+        segments = db_path.split("/")
+        if segments[0] == "":
+            # db paths start with a /, the root itself being an empty path.
+            segments = segments[1:]
+        return (root_name, ) + tuple(segments)
+
+    def _get_path_folder_key(self, path):
+        """
+        Returns the key identifying the folder of a path in the path_cache_folder table.
+        A TankError is raised if the path doesn't belong to any of the project roots.
+
+        :param path: a path on disk
+        :returns: Folder key, see :meth:`_get_folder_key`.
+        """
+        root_name, relative_path = self._separate_root(path)
+        return self._get_folder_key(root_name, self._path_to_dbpath(relative_path))
+
+    def _get_folder_ids(self, cursor, folder_keys, create=False):
+        """
+        Looks up folders in the path_cache_folder table, a level of the folder
+        hierarchy at a time.
+
+        :param cursor: Database cursor.
+        :param folder_keys: Iterable of folder keys, see :meth:`_get_folder_key`.
+        :param create: If True, the missing folders are created.
+        :returns: Dictionary of folder ids keyed by folder key. Missing folders are omitted.
+        """
+        folder_keys = set(folder_keys)
+        # folder ids keyed by folder key, the root folders being children of folder 0.
+        folder_ids = {(): 0}
+        depth = 1
+        while True:
+            keys = set(
+                key[:depth] for key in folder_keys if len(key) >= depth and key[:depth - 1] in folder_ids
+            )
+            if not keys:
+                break
+
+            self._find_folder_ids(cursor, keys, folder_ids)
+            if create:
+                missing_keys = [key for key in keys if key not in folder_ids]
+                if missing_keys:
+                    # note: see _add_db_mapping for why INSERT OR IGNORE is used.
+                    cursor.executemany(
+                        "INSERT OR IGNORE INTO path_cache_folder(parent_id, name) VALUES(?, ?)",
+                        [(folder_ids[key[:-1]], key[-1]) for key in missing_keys]
+                    )
+                    self._find_folder_ids(cursor, missing_keys, folder_ids)
+            depth += 1
+
+        return dict((key, folder_ids[key]) for key in folder_keys if key in folder_ids)
+
+    def _get_folder_id(self, cursor, folder_key):
+        """
+        Looks up a folder in the path_cache_folder table, with a single query.
+
+        :param cursor: Database cursor.
+        :param folder_key: Folder key, see :meth:`_get_folder_key`.
+        :returns: The folder id or None if the folder is missing.
+        """
+        if len(folder_key) > self.SQLITE_MAX_FOLDER_LEVELS_FOR_JOIN:
+            return self._get_folder_ids(cursor, [folder_key]).get(folder_key)
+
+        # the tables are joined in order, each level being looked up in the
+        # path_cache_folder_name index from the id of its parent.
+        tables = " CROSS JOIN ".join("path_cache_folder f%d" % level for level in xrange(len(folder_key)))
+        conditions = ["f0.parent_id = 0 AND f0.name = ?"] + [
+            "f%d.parent_id = f%d.id AND f%d.name = ?" % (level, level - 1, level)
+            for level in xrange(1, len(folder_key))
+        ]
+        res = cursor.execute(
+            "SELECT f%d.id FROM %s WHERE %s" % (len(folder_key) - 1, tables, " AND ".join(conditions)),
+            folder_key
+        )
+        data = list(res)
+        return data[0][0] if data else None
+
+    def _get_ancestor_folder_ids(self, cursor, folder_keys):
+        """
+        Looks up folders and all their parent folders in the path_cache_folder table,
+        with a single query per folder. Folders which are parents of other folders
+        being looked up don't need a query of their own.
+
+        :param cursor: Database cursor.
+        :param folder_keys: Iterable of folder keys, see :meth:`_get_folder_key`.
+        :returns: Dictionary of folder ids keyed by folder key, for the folders and
+                  all their parent folders. Missing folders are omitted.
+        """
+        folder_ids = {}
+        # keys of the folders and of their parents which have been looked up.
+        looked_up_keys = set()
+        # looking up the deepest folders first takes care of their parents.
+        for folder_key in sorted(set(folder_keys), key=len, reverse=True):
+            if folder_key in looked_up_keys:
+                continue
+            parent_keys = [folder_key[:depth] for depth in xrange(1, len(folder_key) + 1)]
+            looked_up_keys.update(parent_keys)
+
+            if len(folder_key) > self.SQLITE_MAX_FOLDER_LEVELS_FOR_JOIN:
+                folder_ids.update(self._get_folder_ids(cursor, parent_keys))
+                continue
+
+            # same join as in _get_folder_id, but each level is left joined so that
+            # the parent folders are found even if some of their children are missing.
+            joins = " ".join(
+                "LEFT JOIN path_cache_folder f%d ON f%d.parent_id = f%d.id AND f%d.name = ?" % (
+                    level, level, level - 1, level
+                )
+                for level in xrange(1, len(folder_key))
+            )
+            res = cursor.execute(
+                "SELECT %s FROM path_cache_folder f0 %s WHERE f0.parent_id = 0 AND f0.name = ?" % (
+                    ", ".join("f%d.id" % level for level in xrange(len(folder_key))), joins
+                ),
+                # the parameters of the joins come first in the statement.
+                folder_key[1:] + folder_key[:1]
+            )
+            for row in res:
+                for parent_key, folder_id in zip(parent_keys, row):
+                    if folder_id is None:
+                        break
+                    folder_ids[parent_key] = folder_id
+
+        return folder_ids
+
+    def _find_folder_ids(self, cursor, folder_keys, folder_ids):
+        """
+        Looks up folders whose parent folder ids are known.
+
+        :param cursor: Database cursor.
+        :param folder_keys: Iterable of folder keys, see :meth:`_get_folder_key`.
+        :param dict folder_ids: Folder ids keyed by folder key, holding the ids of
+                                the parent folders. The ids found are added to it.
+        """
+        keys_by_parent_and_name = dict(
+            ((folder_ids[key[:-1]], key[-1]), key) for key in folder_keys
+        )
+        # parent ids and names both go in IN statements, so chunks are halved. Rows
+        # matching a parent id and a name from different keys are filtered out.
+        for chunk in self._get_chunks(list(keys_by_parent_and_name), self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT // 2):
+            parent_ids = list(set(parent_id for parent_id, _ in chunk))
+            names = list(set(name for _, name in chunk))
+            res = cursor.execute(
+                "SELECT id, parent_id, name FROM path_cache_folder "
+                "WHERE parent_id IN (%s) AND name IN (%s)" % (
+                    self._gen_param_string(parent_ids), self._gen_param_string(names)
+                ),
+                parent_ids + names
+            )
+            for folder_id, parent_id, name in res:
+                key = keys_by_parent_and_name.get((parent_id, name))
+                if key is not None:
+                    folder_ids[key] = folder_id
+
+    @classmethod
+    def _get_folder_paths_sql(cls):
+        """
+        Builds the query selecting the (id, parent id, name) triples of a folder
+        and of its FOLDER_LEVELS_PER_QUERY - 1 closest ancestors. The query is
+        built once and reused by all path caches.
+
+        :returns: SQL string, with a placeholder for the parameters of the
+                  folder id IN statement.
+        """
+        if cls._folder_paths_sql is None:
+            levels = xrange(cls.FOLDER_LEVELS_PER_QUERY)
+            cls._folder_paths_sql = "SELECT %s FROM path_cache_folder f0 %s WHERE f0.id IN (%%s)" % (
+                ", ".join("f%d.id, f%d.parent_id, f%d.name" % (level, level, level) for level in levels),
+                " ".join(
+                    "LEFT JOIN path_cache_folder f%d ON f%d.id = f%d.parent_id" % (level, level, level - 1)
+                    for level in levels if level
+                )
+            )
+        return cls._folder_paths_sql
+
+    def _get_folder_paths(self, cursor, folder_ids):
+        """
+        Resolves folder ids into paths, walking up the folder hierarchy
+        FOLDER_LEVELS_PER_QUERY levels at a time.
+
+        :param cursor: Database cursor.
+        :param folder_ids: Iterable of folder ids.
+        :returns: Dictionary of (root name, db path) tuples keyed by folder id.
+                  Missing folders are omitted.
+        """
+        sql = self._get_folder_paths_sql()
+
+        # (parent id, name) tuples keyed by folder id
+        folders = {}
+        pending_ids = set(folder_ids)
+        while pending_ids:
+            parent_ids = set()
+            for chunk in self._get_chunks(list(pending_ids)):
+                for row in cursor.execute(sql % self._gen_param_string(chunk), chunk):
+                    for index in xrange(0, len(row), 3):
+                        folder_id, parent_id, name = row[index:index + 3]
+                        if folder_id is None:
+                            break
+                        folders[folder_id] = (parent_id, name)
+                        if parent_id:
+                            parent_ids.add(parent_id)
+            pending_ids = parent_ids.difference(folders)
+
+        paths = {}
+        for folder_id in folder_ids:
+            names = []
+            current_id = folder_id
+            while current_id in folders and folders[current_id][0]:
+                names.append(folders[current_id][1])
+                current_id = folders[current_id][0]
+            if current_id not in folders:
+                continue
+            root_name = folders[current_id][1]
+            paths[folder_id] = (root_name, "".join("/" + name for name in reversed(names)))
+        return paths
+
+    def _get_subtree_folders(self, cursor, folder_id, db_path):
+        """
+        Looks up a folder and all the folders below it, a level at a time.
+
+        :param cursor: Database cursor.
+        :param folder_id: Id of the top folder.
+        :param db_path: db path of the top folder, e.g. /sequences/aaa
+        :returns: Dictionary of db paths keyed by folder id.
+        """
+        folders = {folder_id: db_path}
+        parents = folders
+        while parents:
+            children = {}
+            for chunk in self._get_chunks(list(parents)):
+                res = cursor.execute(
+                    "SELECT id, parent_id, name FROM path_cache_folder "
+                    "WHERE parent_id IN (%s)" % self._gen_param_string(chunk),
+                    chunk
+                )
+                for child_id, parent_id, name in res:
+                    children[child_id] = "%s/%s" % (parents[parent_id], name)
+            folders.update(children)
+            parents = children
+        return folders
+
+    def _get_entity_type_ids(self, cursor, entity_types, create=False):
+        """
+        Looks up entity types in the path_cache_entity_type table.
+
+        :param cursor: Database cursor.
+        :param entity_types: Iterable of Shotgun entity types.
+        :param create: If True, the missing entity types are created.
+        :returns: Dictionary of ids keyed by entity type. Missing entity types are omitted.
+        """
+        entity_types = list(set(entity_types))
+        entity_type_ids = {}
+        for chunk in self._get_chunks(entity_types):
+            res = cursor.execute(
+                "SELECT id, name FROM path_cache_entity_type "
+                "WHERE name IN (%s)" % self._gen_param_string(chunk),
+                chunk
+            )
+            entity_type_ids.update((name, entity_type_id) for entity_type_id, name in res)
+
+        if create:
+            missing_types = [entity_type for entity_type in entity_types if entity_type not in entity_type_ids]
+            if missing_types:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO path_cache_entity_type(name) VALUES(?)",
+                    [(entity_type, ) for entity_type in missing_types]
+                )
+                entity_type_ids.update(self._get_entity_type_ids(cursor, missing_types))
+
+        return entity_type_ids
+
+    def _get_entries(self, cursor):
+        """
+        Returns all the entries of the path cache.
+
+        :param cursor: Database cursor.
+        :returns: List of (entry id, entity type, entity id, entity name, root name,
+                  db path, primary) tuples, ordered by entry id.
+        """
+        rows = list(cursor.execute(
+            """SELECT e.id, t.name, e.entity_id, e.entity_name, e.folder_id, e.primary_entity
+               FROM path_cache_entry e
+               INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+               ORDER BY e.id"""
+        ))
+        folder_paths = self._get_folder_paths(cursor, set(row[4] for row in rows))
+
+        entries = []
+        for entry_id, entity_type, entity_id, entity_name, folder_id, primary_entity in rows:
+            root_name, db_path = folder_paths.get(folder_id, (None, None))
+            entries.append((entry_id, entity_type, entity_id, entity_name, root_name, db_path, primary_entity))
+        return entries
+
     def close(self):
         """
-        Close the database connection.
+        Releases the path cache object.
+
+        The database connections are shared by all the path cache objects of the
+        Toolkit instance and stay open, :meth:`Sgtk.close` closes them.
         """
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
+        pass
                 
     ############################################################################################
     # shotgun synchronization (SG data pushed into path cache database)
 
-    def synchronize(self, full_sync=False):
+    @_instrumented
+    def synchronize(self, full_sync=False, allow_full_sync=True):
         """
         Ensure the local path cache is in sync with Shotgun. 
         
@@ -314,6 +1807,8 @@ class PathCache(object):
         launch the busy overlay window.
 
         :param full_sync: Boolean to indicate that a full sync should be carried out. 
+        :param allow_full_sync: If False, nothing is done when the path cache can only
+                                be brought up to date by a full sync.
         
         :returns: A list of remote items which were detected, created remotely
                   and not existing in this path cache. These are returned as a list of 
@@ -321,6 +1816,20 @@ class PathCache(object):
                     - entity
                     - metadata 
                     - path
+
+                  None is returned if a full sync was needed but not allowed.
+        """
+        return self._synchronize(full_sync, allow_full_sync)
+
+    def _synchronize(self, full_sync, allow_full_sync):
+        """
+        Ensure the local path cache is in sync with Shotgun, see :meth:`synchronize`.
+
+        :param full_sync: Boolean to indicate that a full sync should be carried out.
+        :param allow_full_sync: If False, nothing is done when the path cache can only
+                                be brought up to date by a full sync.
+        :returns: A list of remote items, see :meth:`synchronize`, or None if a full
+                  sync was needed but not allowed.
         """
 
         if self._path_cache_disabled:
@@ -330,7 +1839,8 @@ class PathCache(object):
         if not self._sync_with_sg:
             log.debug("Folder synchronization is turned off for this project.")
             return []
-                
+
+        start_time = time.time()
         c = self._connection.cursor()
         
         try:
@@ -340,7 +1850,7 @@ class PathCache(object):
                 return self._do_full_sync(c)
             
             # first get the last synchronized event log event.        
-            res = c.execute("SELECT max(last_id) FROM event_log_sync")
+            res = c.execute("SELECT max(last_id) FROM path_cache_sync")
             # get first item in the data set
             data = list(res)[0]
             
@@ -349,7 +1859,7 @@ class PathCache(object):
             # expect back something like [(249660,)] for a running cache and [(None,)] for a clear
             if len(data) != 1 or data[0] is None:
                 # we should do a full sync
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, allow_full_sync)
     
             # we have an event log id - so check if there are any more recent events
             event_log_id = data[0]
@@ -397,7 +1907,7 @@ class PathCache(object):
             if len(response) == 0:
                 # nothing in event log. Probably a truncated setup.
                 log.debug("No sync information in the event log. Falling back on a full sync.")
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, allow_full_sync)
                 
             elif response[0]["id"] != event_log_id:
                 # there is either no event log data at all or a gap
@@ -409,17 +1919,22 @@ class PathCache(object):
                     "like the event log has been truncated, so falling back "
                     "on a full sync." % (event_log_id, response[0]["id"])
                 )
-                return self._do_full_sync(c)
+                return self._fall_back_on_full_sync(c, allow_full_sync)
             
             elif len(response) == 1 and response[0]["id"] == event_log_id:
                 # nothing has changed since the last sync
                 log.debug("Path cache syncing not necessary - local folders already up to date!")
+                self._database.stats.record_sync("up_to_date", time.time() - start_time, 0, event_log_id, 0)
                 return []
             elif num_creations > 0 or num_deletions > 0:
                 # we have a complete trail of increments.
                 # note that we skip the current entity.
                 log.debug("Full event log history traced. Running incremental sync.")
-                return self._do_incremental_sync(c, response[1:])
+                new_items = self._do_incremental_sync(c, response[1:])
+                self._database.stats.record_sync(
+                    "incremental", time.time() - start_time, len(new_items), response[-1]["id"], len(response) - 1
+                )
+                return new_items
 
             else:
                 # should never be here
@@ -428,6 +1943,20 @@ class PathCache(object):
         finally:       
             c.close()
 
+    def _fall_back_on_full_sync(self, cursor, allow_full_sync):
+        """
+        Carries out a full sync when an incremental sync isn't possible.
+
+        :param cursor: Sqlite database cursor
+        :param allow_full_sync: If False, the full sync is skipped.
+        :returns: A list of remote items, see :meth:`synchronize`, or None if the
+                  full sync was skipped.
+        """
+        if not allow_full_sync:
+            log.debug("The path cache needs a full sync. Skipping it.")
+            return None
+        return self._do_full_sync(cursor)
+
     def _upload_cache_data_to_shotgun(self, data, event_log_desc):
         """
         Takes a standard chunk of Shotgun data and uploads it to Shotgun
@@ -494,19 +2023,17 @@ class PathCache(object):
                             "data. Please contact support. Error details: %s" % e)
         
         # now create a dictionary where input path cache rowid (path_cache_row_id)
-        # is mapped to the shotgun ids that were just created
-        def _rowid_from_path(path):
-            for d in data:
-                if d["path"] == path:
-                    return d["path_cache_row_id"] 
-            raise TankError("Could not resolve row id for path! Please contact support! "
-                            "trying to resolve path '%s'. Source data set: %s" % (path, data))
-        
+        # is mapped to the shotgun ids that were just created. The batch results are
+        # in the order of the requests, which matters since the primary and secondary
+        # entries of a folder share the same path.
+        if len(response) != len(data):
+            raise TankError("Could not resolve row ids of the folders uploaded to Shotgun! "
+                            "Please contact support! Expected %d results, got %s. Source data "
+                            "set: %s" % (len(data), response, data))
+
         rowid_sgid_lookup = {}
-        for sg_obj in response:
-            sg_id = sg_obj["id"]
-            pc_row_id = _rowid_from_path( sg_obj[SG_PATH_FIELD]["local_path"] )
-            rowid_sgid_lookup[pc_row_id] = sg_id
+        for d, sg_obj in zip(data, response):
+            rowid_sgid_lookup[d["path_cache_row_id"]] = sg_obj["id"]
         
         # now register the created ids in the event log
         # this will later on be read by the synchronization            
@@ -565,6 +2092,7 @@ class PathCache(object):
         :param cursor: Sqlite database cursor
         """
         
+        start_time = time.time()
         show_global_busy("Hang on, Toolkit is preparing folders...", 
                          ("Toolkit is retrieving folder listings from Shotgun and ensuring that your "
                           "setup is up to date. Hang tight while data is being downloaded..."))
@@ -591,7 +2119,8 @@ class PathCache(object):
 
         finally:
             clear_global_busy()
-        
+
+        self._database.stats.record_sync("full", time.time() - start_time, len(data), max_event_log_id, None)
         return data
 
     @classmethod
@@ -731,9 +2260,9 @@ class PathCache(object):
 
         self._update_last_event_log_synced(cursor, max_event_log_id)
 
-        self._connection.commit()
+        self._commit()
 
-        # run the actual sync - and at the end, inser the event_log_sync data marker
+        # run the actual sync - and at the end, inser the path_cache_sync data marker
         # into the database to show where to start syncing from next time.
         return new_items
 
@@ -801,15 +2330,7 @@ class PathCache(object):
                 self._tk.shotgun.find(
                     SHOTGUN_ENTITY,
                     batched_filter,
-                    [
-                        "id",
-                        SG_METADATA_FIELD,
-                        SG_IS_PRIMARY_FIELD,
-                        SG_ENTITY_ID_FIELD,
-                        SG_PATH_FIELD,
-                        SG_ENTITY_TYPE_FIELD,
-                        SG_ENTITY_NAME_FIELD
-                    ],
+                    list(SG_FILESYSTEM_LOCATION_FIELDS),
                     [{"field_name": "id", "direction": "asc"}]
                 )
             )
@@ -823,8 +2344,17 @@ class PathCache(object):
         Downloads all the filesystem location entities from Shotgun and repopulates the
         path cache with them.
 
-        Lastly, this method updates the event_log_sync marker in the sqlite database
-        that tracks what the most recent event log id was being synced.
+        Entities are downloaded one page at a time, the next pages being fetched while
+        the current one is written to the path cache, so that at most a couple of pages
+        of Shotgun records are held at once. Memory use still grows with the number of
+        folders though, since a dictionary is returned for every imported entry and
+        :meth:`synchronize` hands all of them to the folder creation hook.
+
+        The tables are cleared and all the pages written in a single transaction, along
+        with the path_cache_sync marker tracking the most recent event log id synced.
+        Other connections keep reading the previous content of the path cache until
+        the transaction is committed. Should the sync fail, the transaction is rolled
+        back and the path cache is left untouched.
 
         :param cursor: Sqlite database cursor
         :param max_event_log_id: max event log marker to write to the path
@@ -839,58 +2369,282 @@ class PathCache(object):
         """
         log.debug("Fetching already registered folders from Shotgun...")
 
-        sg_data = self._get_filesystem_location_entities(folder_ids=None)
-
-        # complete sync - clear our tables first
-        log.debug("Full sync - clearing local sqlite path cache tables...")
-        cursor.execute("DELETE FROM event_log_sync")
-        cursor.execute("DELETE FROM shotgun_status")
-        cursor.execute("DELETE FROM path_cache")
-
         return_data = []
+        num_records = 0
 
-        for x in sg_data:
-            imported_data = self._import_filesystem_location_entry(cursor, x)
-            if imported_data:
-                return_data.append(imported_data)
+        pages = self._get_filesystem_location_pages()
+        try:
+            # complete sync - clear our tables first
+            log.debug("Full sync - clearing local sqlite path cache tables...")
+            cursor.execute("DELETE FROM path_cache_sync")
+            cursor.execute("DELETE FROM path_cache_entry")
+            cursor.execute("DELETE FROM path_cache_folder")
+            cursor.execute("DELETE FROM path_cache_entity_type")
+
+            for sg_data in pages:
+                return_data.extend(self._import_filesystem_location_page(cursor, sg_data))
+
+                num_records += len(sg_data)
+                log.debug("...Imported %s records." % num_records)
+                show_global_busy(
+                    "Hang on, Toolkit is preparing folders...",
+                    "Toolkit is retrieving folder listings from Shotgun and ensuring that your "
+                    "setup is up to date. %s folders retrieved so far..." % num_records
+                )
 
-        # lastly, save the id of this event log entry for purpose of future syncing
-        # note - we don't maintain a list of event log entries but just a single
-        # value in the db, so start by clearing the table.
+            # lastly, save the id of this event log entry for purpose of future syncing
+            # note - we don't maintain a list of event log entries but just a single
+            # value in the db, so start by clearing the table.
+            self._update_last_event_log_synced(cursor, max_event_log_id)
 
-        self._update_last_event_log_synced(cursor, max_event_log_id)
+        except:
+            # leave the path cache as it was before the sync
+            self._connection.rollback()
+            raise
 
-        self._connection.commit()
+        finally:
+            pages.close()
+
+        self._commit()
 
         return return_data
 
-    def _update_last_event_log_synced(self, cursor, event_log_id):
-        """
-        Saves into the db the last event processed from Shotgun.
+    def _find_filesystem_location_page(self, sg, last_id):
+        """
+        Retrieves a page of the project's filesystem location entities from Shotgun.
+
+        :param sg: Shotgun API instance to use.
+        :param last_id: Id of the last entity of the previous page, None for the first page.
+        :returns: List of at most SHOTGUN_ENTITY_QUERY_BATCH_SIZE FilesystemLocation
+                  entity dictionaries ordered by id, see :meth:`_get_filesystem_location_entities`.
+        """
+        entity_filter = [["project", "is", self._get_project_link()]]
+        if last_id is not None:
+            # page through the entities by id rather than by page number, so
+            # that entities created during the sync don't shift the pages.
+            entity_filter.append(["id", "greater_than", last_id])
+
+        return sg.find(
+            SHOTGUN_ENTITY,
+            entity_filter,
+            list(SG_FILESYSTEM_LOCATION_FIELDS),
+            [{"field_name": "id", "direction": "asc"}],
+            limit=self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE
+        )
+
+    def _get_filesystem_location_pages(self):
+        """
+        Downloads all the project's filesystem location entities from Shotgun, one
+        page at a time.
+
+        If there is more than one page, the following pages are downloaded by a
+        background thread, with its own Shotgun connection, while the caller
+        processes the previous ones. At most FULL_SYNC_PREFETCH_PAGES pages are
+        held in memory ahead of the caller.
+
+        :returns: Generator of lists of FilesystemLocation entity dictionaries,
+                  see :meth:`_get_filesystem_location_entities`.
+        """
+        log.debug("Getting all the project's FilesystemLocation entries in pages "
+                  "of %s. Project id: %s" % (self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE, self._get_project_link()["id"]))
+
+        sg_data = self._find_filesystem_location_page(self._tk.shotgun, None)
+        if len(sg_data) < self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE:
+            # everything fits in a single page.
+            yield sg_data
+            return
+
+        pages = Queue.Queue(self.FULL_SYNC_PREFETCH_PAGES)
+        stop = threading.Event()
+
+        def _put(item):
+            # put an item in the queue unless the consumer is gone
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except Queue.Full:
+                    pass
+            return False
+
+        def _fetch_pages(last_id):
+            try:
+                # tk.shotgun hands a separate connection to each thread.
+                sg = self._tk.shotgun
+                while True:
+                    page = self._find_filesystem_location_page(sg, last_id)
+                    if not _put((page, None)) or len(page) < self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE:
+                        return
+                    last_id = page[-1]["id"]
+            except Exception as e:
+                log.debug("Could not retrieve FilesystemLocation entries.", exc_info=True)
+                _put((None, e))
+
+        fetcher = threading.Thread(target=_fetch_pages, args=(sg_data[-1]["id"],))
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            while sg_data:
+                yield sg_data
+                if len(sg_data) < self.SHOTGUN_ENTITY_QUERY_BATCH_SIZE:
+                    break
+                sg_data, error = pages.get()
+                if error:
+                    raise error
+        finally:
+            stop.set()
+            fetcher.join()
+
+    def _update_last_event_log_synced(self, cursor, event_log_id):
+        """
+        Saves into the db the last event processed from Shotgun.
+
+        :param cursor: Database cursor.
+        :type cursor: :class:`sqlite3.Cursor`
+        :param int event_log_id: New last event log
+        """
+        log.debug("Inserting path cache marker %s in the sqlite db" % event_log_id)
+        cursor.execute("DELETE FROM path_cache_sync")
+        cursor.execute("INSERT INTO path_cache_sync(last_id) VALUES(?)", (event_log_id, ))
+
+    def _import_filesystem_location_entry(self, cursor, fsl_entity):
+        """
+        Imports a single filesystem location into the path cache.
+
+        :param cursor: Database cursor.
+        :type :class:`sqlite3.Cursor`
+        :param dict fsl_entry: Filesystem location entity dictionary with keys:
+            - id
+            - type
+            - configuration_metadata
+            - is_primary
+            - linked_entity_id
+            - path
+            - linked_entity_type
+            - code
+        :returns: Dictionary with keys entity, path and metadata if the entry was
+                  imported, None otherwise.
+        """
+        mapping = self._get_filesystem_location_mapping(fsl_entity)
+        if mapping is None:
+            return None
+        entity, local_os_path, is_primary, _, _ = mapping
+
+        # all validation checks seem ok - go ahead and make the changes.
+        # because this record came from shotgun, it is stored along with
+        # its shotgun id to indicate that this record exists in sg
+        new_rowid = self._add_db_mapping(cursor, local_os_path, entity, is_primary, fsl_entity["id"])
+        if new_rowid:
+            # something was inserted into the db!
+            # add this entry to our list of new things that we will return later on.
+            return {
+                "entity": entity,
+                "path": local_os_path,
+                "metadata": SG_METADATA_FIELD
+            }
+
+        else:
+            # Note: edge case - for some reason there was already an entry in the path cache
+            # representing this. This could be because of duplicate entries and is
+            # not necessarily an anomaly. It could also happen because a previos sync failed
+            # at some point half way through.
+            log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
+            return None
+
+    def _import_filesystem_location_page(self, cursor, fsl_entities):
+        """
+        Imports a page of filesystem locations into the path cache, with one
+        statement per level of folders and per table. The changes are not committed.
+
+        Entries are checked against the path cache and against each other the same
+        way :meth:`_import_filesystem_location_entry` does it.
+
+        :param cursor: Database cursor.
+        :type :class:`sqlite3.Cursor`
+        :param list fsl_entities: Filesystem location entity dictionaries, see
+                                  :meth:`_import_filesystem_location_entry`.
+        :returns: List of dictionaries with keys entity, path and metadata, one for
+                  each imported entry.
+        """
+        mappings = []
+        for fsl_entity in fsl_entities:
+            mapping = self._get_filesystem_location_mapping(fsl_entity)
+            if mapping is None:
+                continue
+            _, _, _, root_name, db_path = mapping
+            mappings.append((fsl_entity["id"], mapping, self._get_folder_key(root_name, db_path)))
+
+        folder_ids = self._get_folder_ids(cursor, set(key for _, _, key in mappings), create=True)
+        entity_type_ids = self._get_entity_type_ids(
+            cursor, [mapping[0]["type"] for _, mapping, _ in mappings], create=True
+        )
+
+        # (entity type, entity id, primary) tuples already registered, keyed by folder id
+        registered = collections.defaultdict(list)
+        for chunk in self._get_chunks(list(set(folder_ids.values()))):
+            res = cursor.execute(
+                """SELECT e.folder_id, t.name, e.entity_id, e.primary_entity
+                   FROM path_cache_entry e
+                   INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+                   WHERE e.folder_id IN (%s)""" % self._gen_param_string(chunk),
+                chunk
+            )
+            for folder_id, entity_type, entity_id, primary_entity in res:
+                registered[folder_id].append((entity_type, entity_id, primary_entity))
+
+        entry_rows = []
+        return_data = []
+        for shotgun_id, (entity, local_os_path, is_primary, _, _), folder_key in mappings:
+            folder_id = folder_ids[folder_key]
+            records = registered[folder_id]
+            if is_primary:
+                # the primary entity must be unique: path/id/type
+                curr_entities = [(t, i) for (t, i, primary) in records if primary]
+                if curr_entities and curr_entities[0] != (entity["type"], entity["id"]):
+                    raise TankError("Database concurrency problems: The path '%s' is "
+                                    "already associated with Shotgun entity %s. Please re-run "
+                                    "folder creation to try again." % (local_os_path, curr_entities[0]))
+                exists = bool(curr_entities)
+            else:
+                exists = any(t == entity["type"] and i == entity["id"] for (t, i, _) in records)
+
+            if exists:
+                log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
+                continue
+
+            records.append((entity["type"], entity["id"], is_primary))
+            # because these records came from shotgun, they are stored along with
+            # their shotgun id to indicate that they exist in sg.
+            entry_rows.append(
+                (folder_id, entity_type_ids[entity["type"]], entity["id"], entity["name"], is_primary, shotgun_id)
+            )
+            return_data.append({
+                "entity": entity,
+                "path": local_os_path,
+                "metadata": SG_METADATA_FIELD
+            })
+
+        # note: see _add_db_mapping for why INSERT OR IGNORE is used.
+        cursor.executemany("""INSERT OR IGNORE INTO path_cache_entry(folder_id,
+                                                         entity_type_id,
+                                                         entity_id,
+                                                         entity_name,
+                                                         primary_entity,
+                                                         shotgun_id)
+                              VALUES(?, ?, ?, ?, ?, ?)""",
+                           entry_rows)
 
-        :param cursor: Database cursor.
-        :type cursor: :class:`sqlite3.Cursor`
-        :param int event_log_id: New last event log
-        """
-        log.debug("Inserting path cache marker %s in the sqlite db" % event_log_id)
-        cursor.execute("DELETE FROM event_log_sync")
-        cursor.execute("INSERT INTO event_log_sync(last_id) VALUES(?)", (event_log_id, ))
+        return return_data
 
-    def _import_filesystem_location_entry(self, cursor, fsl_entity):
+    def _get_filesystem_location_mapping(self, fsl_entity):
         """
-        Imports a single filesystem location into the path cache.
+        Validates a filesystem location entity and resolves the path cache entry
+        it maps to.
 
-        :param cursor: Database cursor.
-        :type :class:`sqlite3.Cursor`
-        :param dict fsl_entry: Filesystem location entity dictionary with keys:
-            - id
-            - type
-            - configuration_metadata
-            - is_primary
-            - linked_entity_id
-            - path
-            - linked_entity_type
-            - code
+        :param dict fsl_entity: Filesystem location entity dictionary, see
+                                :meth:`_import_filesystem_location_entry`.
+        :returns: Tuple (entity, local path, is primary, root name, db path) or None
+                  if the entry can't be imported on this machine.
         """
         # get entity data from our entry
         entity = {"id": fsl_entity[SG_ENTITY_ID_FIELD],
@@ -964,29 +2718,12 @@ class PathCache(object):
             log.debug("Could not resolve storages - skipping: %s" % e)
             return None
 
-        # all validation checks seem ok - go ahead and make the changes.
-        new_rowid = self._add_db_mapping(cursor, local_os_path, entity, is_primary)
-        if new_rowid:
-            # something was inserted into the db!
-            # because this record came from shotgun, insert a record in the
-            # shotgun_status table to indicate that this record exists in sg
-            cursor.execute("INSERT INTO shotgun_status(path_cache_id, shotgun_id) "
-                           "VALUES(?, ?)", (new_rowid, fsl_entity["id"]))
-
-            # and add this entry to our list of new things that we will return later on.
-            return {
-                "entity": entity,
-                "path": local_os_path,
-                "metadata": SG_METADATA_FIELD
-            }
+        db_path = self._path_to_dbpath(relative_path)
+        if isinstance(db_path, unicode):
+            # paths are returned as utf-8 strs
+            db_path = db_path.encode("utf-8")
 
-        else:
-            # Note: edge case - for some reason there was already an entry in the path cache
-            # representing this. This could be because of duplicate entries and is
-            # not necessarily an anomaly. It could also happen because a previos sync failed
-            # at some point half way through.
-            log.debug("Found existing record for '%s', %s. Skipping." % (local_os_path, entity))
-            return None
+        return entity, local_os_path, is_primary, root_name, db_path
 
     def _gen_param_string(self, items):
         """
@@ -1011,30 +2748,6 @@ class PathCache(object):
 
         log.debug("Processing %s Toolkit_Folders_Delete events", len(folder_ids))
 
-        def _chunks(large_list, chunk_size):
-            """
-            Helper operator to split a large list into smaller chunks
-            """
-            for i in range(0, len(large_list), chunk_size):
-                yield large_list[i:i + chunk_size]
-
-        # For every folder id, find the associated path cache id.
-        all_path_cache_ids = []
-
-        # split sql into batches - sqlite has a max number of terms for its in statement
-        for subset_folder_ids in _chunks(folder_ids, self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
-            path_cache_ids = cursor.execute(
-                "SELECT path_cache_id FROM shotgun_status "
-                "WHERE shotgun_id IN (%s)" % self._gen_param_string(subset_folder_ids),
-                subset_folder_ids
-            )
-
-            # Flatten the list of one element tuples into a list of ids.
-            path_cache_ids = [path_cache_id[0] for path_cache_id in path_cache_ids]
-
-            # add to our full list
-            all_path_cache_ids.extend(path_cache_ids)
-
         # Consider the following sequence
         # - Add 1
         # - Remove 1
@@ -1045,29 +2758,23 @@ class PathCache(object):
         # While incrementally updating the path cache, entry 1 will never be added to the path cache
         # because it doesn't exist in Shotgun anymore. Because of this, _import_filesystem_location_entry
         # will skip importing entry 1 because it isn't in the result final set of entities. When this 
-        # happens, it means that it also can't be removed from the path cache. As such, shotgun_status
-        # will not report any mapping between the path cache and the Shotgun filesystem location
-        # entity.
-        if not all_path_cache_ids:
-            return
-
-        # Delete all the path cache entries associated with the file system locations.
-        for subset_path_cache_ids in _chunks(all_path_cache_ids, self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
-            cursor.execute(
-                "DELETE FROM path_cache where rowid IN (%s)" % self._gen_param_string(subset_path_cache_ids),
-                subset_path_cache_ids
-            )
+        # happens, it means that it also can't be removed from the path cache. As such, no path cache
+        # entry will be associated with the Shotgun filesystem location entity.
+        #
+        # Folders are left in place, they are shared with other entries and are
+        # cleared on the next full sync.
 
-        # Now delete all the mappings between filesystem location entities and path cache entries.
-        for subset_folder_ids in _chunks(folder_ids, self.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT):
+        # split sql into batches - sqlite has a max number of terms for its in statement
+        for subset_folder_ids in self._get_chunks(folder_ids):
             cursor.execute(
-                "DELETE FROM shotgun_status WHERE shotgun_id IN (%s)" % self._gen_param_string(subset_folder_ids),
+                "DELETE FROM path_cache_entry WHERE shotgun_id IN (%s)" % self._gen_param_string(subset_folder_ids),
                 subset_folder_ids
             )
 
     ############################################################################################
     # pre-insertion validation
 
+    @_instrumented
     def validate_mappings(self, data):
         """
         Checks a series of path mappings to ensure that they don't conflict with
@@ -1170,6 +2877,7 @@ class PathCache(object):
     ############################################################################################
     # database insertion methods
 
+    @_instrumented
     def add_mappings(self, data, entity_type, entity_ids):
         """
         Adds a collection of mappings to the path cache in case they are not 
@@ -1220,9 +2928,8 @@ class PathCache(object):
                 (event_log_id, sg_id_lookup) = self._upload_cache_data_to_shotgun(data_for_sg, desc)
                 self._update_last_event_log_synced(c, event_log_id)
                 # and indicate in the path cache that all these records have been pushed
-                for (pc_row_id, sg_id) in sg_id_lookup.items():
-                    c.execute("INSERT INTO shotgun_status(path_cache_id, shotgun_id) "
-                              "VALUES(?, ?)", (pc_row_id, sg_id) )
+                c.executemany("UPDATE path_cache_entry SET shotgun_id = ? WHERE id = ?",
+                              [(sg_id, pc_row_id) for (pc_row_id, sg_id) in sg_id_lookup.items()])
                     
 
         except:
@@ -1233,7 +2940,7 @@ class PathCache(object):
         
         else:
             # Shotgun insert complete! Now we can commit path cache transaction
-            self._connection.commit()
+            self._commit()
         
         finally:
             c.close()
@@ -1241,7 +2948,7 @@ class PathCache(object):
 
 
 
-    def _add_db_mapping(self, cursor, path, entity, primary):
+    def _add_db_mapping(self, cursor, path, entity, primary, shotgun_id=None):
         """
         Adds an association to the database. If the association already exists, it will
         do nothing, just return.
@@ -1253,6 +2960,8 @@ class PathCache(object):
         :param path: a path on disk representing the entity.
         :param entity: a shotgun entity dict with keys type, id and name
         :param primary: is this the primary entry for this particular path     
+        :param shotgun_id: id of the FilesystemLocation entity the association is
+                           registered as in Shotgun, if any.
         
         :returns: None if nothing was added to the db, otherwise the ROWID for the new row   
         """
@@ -1294,34 +3003,36 @@ class PathCache(object):
                 return None
 
         # there was no entity in the db. So let's create it!
-        root_name, relative_path = self._separate_root(path)
-        db_path = self._path_to_dbpath(relative_path)
+        folder_key = self._get_path_folder_key(path)
+        folder_id = self._get_folder_id(cursor, folder_key)
+        if folder_id is None:
+            folder_id = self._get_folder_ids(cursor, [folder_key], create=True)[folder_key]
+        entity_type_id = self._get_entity_type_ids(cursor, [entity["type"]], create=True)[entity["type"]]
         # note: the INSERT OR IGNORE INTO checks if we already have a
         # record in the db for this combination - if we do, the insert
         # is ignored. This is to avoid reported realtime issues when two
         # processes are doing an incremental sync at the same time,
         # download new data from shotgun and then attempts to insert it.
-        cursor.execute("""INSERT OR IGNORE INTO path_cache(entity_type,
-                                                 entity_id,
-                                                 entity_name,
-                                                 root,
-                                                 path,
-                                                 primary_entity)
+        cursor.execute("""INSERT OR IGNORE INTO path_cache_entry(folder_id,
+                                                       entity_type_id,
+                                                       entity_id,
+                                                       entity_name,
+                                                       primary_entity,
+                                                       shotgun_id)
                            VALUES(?, ?, ?, ?, ?, ?)""", 
-                        (entity["type"], 
+                        (folder_id,
+                         entity_type_id,
                          entity["id"], 
                          entity["name"], 
-                         root_name,
-                         db_path,
-                         primary))
+                         primary,
+                         shotgun_id))
 
-        db_entity_id = cursor.lastrowid
-        if db_entity_id == 0:
+        if cursor.rowcount == 0:
             # this has already been inserted into the db once
             # return None
-            db_entity_id = None
+            return None
 
-        return db_entity_id
+        return cursor.lastrowid
 
     def _is_path_in_db(self, path, entity_type, entity_id, cursor):
         """
@@ -1334,26 +3045,28 @@ class PathCache(object):
         :returns: True if path exists, false if not
         """
         try:
-            root_name, relative_path = self._separate_root(path)
+            folder_key = self._get_path_folder_key(path)
         except TankError:
             # fail gracefully if path is not a valid path
             # eg. doesn't belong to the project
             return False
 
-        db_path = self._path_to_dbpath(relative_path)
+        folder_id = self._get_folder_id(cursor, folder_key)
+        if folder_id is None:
+            return False
 
         # now see if we have any records in the db which matches the path
         res = cursor.execute(
             """
-            SELECT count(entity_id)
-            FROM   path_cache
-            WHERE  entity_type = ?
-            AND    entity_id = ?
-            AND    root = ?
-            AND    path = ?
-            GROUP BY entity_id
+            SELECT count(e.entity_id)
+            FROM   path_cache_entry e
+            INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+            WHERE  e.folder_id = ?
+            AND    t.name = ?
+            AND    e.entity_id = ?
+            GROUP BY e.entity_id
             """,
-            (entity_type, entity_id, root_name, db_path)
+            (folder_id, entity_type, entity_id)
         )
 
         res = list(res)
@@ -1368,6 +3081,7 @@ class PathCache(object):
     ############################################################################################
     # database accessor methods
 
+    @_instrumented
     def get_shotgun_id_from_path(self, path):
         """
         Returns a FilesystemLocation id given a path.
@@ -1377,7 +3091,7 @@ class PathCache(object):
         """
                 
         try:
-            root_path, relative_path = self._separate_root(path)
+            folder_key = self._get_path_folder_key(path)
         except TankError:
             # fail gracefully if path is not a valid path
             # eg. doesn't belong to the project
@@ -1385,17 +3099,18 @@ class PathCache(object):
 
         # use built in cursor unless specifically provided - means this
         # is part of a larger transaction
-        c = self._connection.cursor()        
+        c = self._read_connection.cursor()        
 
         try:
-            db_path = self._path_to_dbpath(relative_path)
-            res = c.execute("""
-                            select ss.shotgun_id 
-                            from shotgun_status ss 
-                            inner join path_cache pc on pc.rowid = ss.path_cache_id
-                            where pc.path = ? and pc.root = ? and pc.primary_entity = 1
-                            """, (db_path, root_path))
-            data = list(res)
+            data = []
+            folder_id = self._get_folder_id(c, folder_key)
+            if folder_id is not None:
+                res = c.execute("""
+                                select shotgun_id
+                                from path_cache_entry
+                                where folder_id = ? and primary_entity = 1 and shotgun_id is not null
+                                """, (folder_id, ))
+                data = list(res)
         finally:
             c.close()
         
@@ -1409,6 +3124,7 @@ class PathCache(object):
         else:
             return None
 
+    @_instrumented
     def get_folder_tree_from_sg_id(self, shotgun_id):
         """
         Returns a list of items making up the subtree below a certain shotgun id
@@ -1418,46 +3134,112 @@ class PathCache(object):
         :returns: A list of items making up the subtree below the given id
         """
         
-        c = self._connection.cursor()
-        # first get the path
-        res = c.execute("""SELECT pc.root, pc.path 
-                          FROM path_cache pc
-                          INNER JOIN shotgun_status ss on pc.rowid = ss.path_cache_id
-                          WHERE ss.shotgun_id = ? """, (shotgun_id, ))
-         
-        res = list(res)
-        
-        if len(res) == 0:
-            return []
-        
-        matches = []
-        
-        # returns something like [('primary', '/assets/Character/foo')]
-        root_name = res[0][0]
-        path = res[0][1]
-        # first append this match
-        root_path = self._roots.get(root_name)
-        matches.append( {"path": self._dbpath_to_path(root_path, path), "sg_id": shotgun_id } )
-                         
-        
-        # now get all paths that are child paths
-        like_path = "%s/%%" % path
-        res = c.execute("""SELECT pc.root, pc.path, ss.shotgun_id
-                          FROM path_cache pc
-                          INNER JOIN shotgun_status ss on pc.rowid = ss.path_cache_id
-                          WHERE root = ? and path like ?""", (root_name, like_path))
-        
-        for x in list(res):
-            root_name = x[0]
-            path = x[1]
-            sg_id = x[2]
+        c = self._read_connection.cursor()
+        try:
+            # first get the path
+            res = c.execute("SELECT folder_id FROM path_cache_entry WHERE shotgun_id = ?", (shotgun_id, ))
+
+            res = list(res)
+
+            if len(res) == 0:
+                return []
+
+            folder_id = res[0][0]
+            folder_paths = self._get_folder_paths(c, [folder_id])
+            if folder_id not in folder_paths:
+                return []
+
+            matches = []
+
+            # returns something like ('primary', '/assets/Character/foo')
+            root_name, path = folder_paths[folder_id]
             # first append this match
             root_path = self._roots.get(root_name)
-            matches.append( {"path": self._dbpath_to_path(root_path, path), "sg_id": sg_id } )
-            
+            matches.append( {"path": self._dbpath_to_path(root_path, path), "sg_id": shotgun_id } )
+
+            # now get all paths that are child paths
+            subtree_folders = self._get_subtree_folders(c, folder_id, path)
+            del subtree_folders[folder_id]
+            for chunk in self._get_chunks(list(subtree_folders)):
+                res = c.execute(
+                    "SELECT folder_id, shotgun_id FROM path_cache_entry "
+                    "WHERE shotgun_id IS NOT NULL AND folder_id IN (%s)" % self._gen_param_string(chunk),
+                    chunk
+                )
+                for curr_folder_id, sg_id in res:
+                    # first append this match
+                    matches.append({
+                        "path": self._dbpath_to_path(root_path, subtree_folders[curr_folder_id]),
+                        "sg_id": sg_id
+                    })
+        finally:
+            c.close()
+
         return matches
 
+    @_instrumented
+    def get_entities_under_path(self, path, primary_only=False):
+        """
+        Returns the entities registered for a folder and for all the folders below it.
+
+        The folders below are looked up a level at a time, from the parent folder
+        ids, so the cost of the queries depends on the size of the subtree rather
+        than on the size of the path cache.
+
+        :param path: a path on disk
+        :param primary_only: Only return items marked as primary
+        :returns: list of dictionaries ordered by path, each with keys:
+            - path: path on disk
+            - entity: shotgun entity dict, e.g. {"type": "Shot", "name": "xxx", "id": 123}
+            - primary: True if the entity is the primary entity of the path
+            - sg_id: FilesystemLocation id, None if the entry isn't registered in Shotgun
+        """
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return []
+
+        try:
+            folder_key = self._get_path_folder_key(path)
+        except TankError:
+            # fail gracefully if path is not a valid path
+            # eg. doesn't belong to the project
+            return []
+
+        root_path = self._roots.get(folder_key[0])
+        rows = []
+        c = self._read_connection.cursor()
+        try:
+            folder_id = self._get_folder_id(c, folder_key)
+            if folder_id is None:
+                return []
+
+            db_path = "".join("/" + name for name in folder_key[1:])
+            folders = self._get_subtree_folders(c, folder_id, db_path)
+            for chunk in self._get_chunks(list(folders)):
+                sql = """SELECT e.folder_id, t.name, e.entity_id, e.entity_name, e.primary_entity, e.shotgun_id
+                         FROM path_cache_entry e
+                         INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+                         WHERE e.folder_id IN (%s)""" % self._gen_param_string(chunk)
+                if primary_only:
+                    sql += " AND e.primary_entity = 1"
+                rows.extend(c.execute(sql, chunk))
+        finally:
+            c.close()
+
+        rows.sort(key=lambda row: folders[row[0]])
+        matches = []
+        for curr_folder_id, entity_type, entity_id, entity_name, primary_entity, sg_id in rows:
+            matches.append({
+                "path": self._dbpath_to_path(root_path, folders[curr_folder_id]),
+                # convert to string, not unicode!
+                "entity": {"type": str(entity_type), "id": entity_id, "name": str(entity_name)},
+                "primary": bool(primary_entity),
+                "sg_id": sg_id
+            })
+
+        return matches
 
+    @_instrumented
     def get_paths(self, entity_type, entity_id, primary_only, cursor=None):
         """
         Returns a path given a shotgun entity (type/id pair)
@@ -1477,17 +3259,22 @@ class PathCache(object):
         
         # use built in cursor unless specifically provided - means this
         # is part of a larger transaction
-        c = cursor or self._connection.cursor()
+        c = cursor or self._read_connection.cursor()
         
         try:
+            sql = """SELECT folder_id FROM path_cache_entry
+                     WHERE entity_type_id = (SELECT id FROM path_cache_entity_type WHERE name = ?)
+                     AND entity_id = ?"""
             if primary_only:
-                res = c.execute("SELECT root, path FROM path_cache WHERE entity_type = ? AND entity_id = ? and primary_entity = 1", (entity_type, entity_id))
-            else:
-                res = c.execute("SELECT root, path FROM path_cache WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id))
+                sql += " and primary_entity = 1"
+            res = c.execute(sql, (entity_type, entity_id))
+            folder_ids = [row[0] for row in res]
+            folder_paths = self._get_folder_paths(c, folder_ids)
     
-            for row in res:
-                root_name = row[0]
-                relative_path = row[1]
+            for folder_id in folder_ids:
+                if folder_id not in folder_paths:
+                    continue
+                root_name, relative_path = folder_paths[folder_id]
                 
                 root_path = self._roots.get(root_name)
                 if not root_path:
@@ -1504,6 +3291,7 @@ class PathCache(object):
         return paths
 
 
+    @_instrumented
     def get_entity(self, path):
         """
         Returns an entity given a path.
@@ -1514,56 +3302,67 @@ class PathCache(object):
         """
         entity = self._get_entity(path)
         if not entity:
+            entity = self._get_entity_from_schema(path)
+        return entity
 
-            # Don't do the heavy lifting if we've attempted to process this path before
-            self._lock.acquire()
-            try:
-                if path in g_processed_paths:
-                    return None
+    def _get_entity_from_schema(self, path):
+        """
+        Derives the entity of a path missing from the path cache from the schema
+        folder matching the path, adding it to the path cache.
 
-                log.debug("Entry missing from path_cache: '%s'" % path)
-                g_processed_paths.add(path)
+        :param path: a path on disk
+        :returns: Shotgun entity dict, e.g. {"type": "Shot", "name": "xxx", "id": 123}
+                  or None if not found
+        """
+        # Don't do the heavy lifting if we've attempted to process this path before
+        self._lock.acquire()
+        try:
+            if path in g_processed_paths:
+                return None
 
-            finally:
-                self._lock.release()
+            log.debug("Entry missing from path_cache: '%s'" % path)
+            g_processed_paths.add(path)
 
-            # If entity for the path isn't in the cache, see if we can derive it
-            # from a schema folder matching the path
-            try:
-                folder_obj = self._tk.schema_folder_from_path(path)
-            except TankMultipleMatchingTemplatesError as e:
-                log.warning(str(e))
+        finally:
+            self._lock.release()
 
-            if not folder_obj:
-                log.debug("Cannot find a schema folder matching path '%s'" % path)
-                return None
+        # If entity for the path isn't in the cache, see if we can derive it
+        # from a schema folder matching the path
+        try:
+            folder_obj = self._tk.schema_folder_from_path(path)
+        except TankMultipleMatchingTemplatesError as e:
+            log.warning(str(e))
 
-            # Get the primary and secondary entities defined in the path
-            try:
-                primary_entry, secondary_entries = folder_obj.get_entries_from_path(path)
-            except TankError as e:
-                log.debug("Cannot get entities from path '%s' using schema folder '%s': %s"
-                        % (path, folder_obj, str(e)))
-                return None
-            except AttributeError:
-                log.debug("Schema folder '%s' is not associated with an entity" % folder_obj)
-                return None
+        if not folder_obj:
+            log.debug("Cannot find a schema folder matching path '%s'" % path)
+            return None
 
-            # Get the entity from the primary entry
-            entity = primary_entry["entity"]
+        # Get the primary and secondary entities defined in the path
+        try:
+            primary_entry, secondary_entries = folder_obj.get_entries_from_path(path)
+        except TankError as e:
+            log.debug("Cannot get entities from path '%s' using schema folder '%s': %s"
+                    % (path, folder_obj, str(e)))
+            return None
+        except AttributeError:
+            log.debug("Schema folder '%s' is not associated with an entity" % folder_obj)
+            return None
 
-            # Add the missing primary and secondary entities to the path_cache
-            db_entries = [primary_entry] + secondary_entries
+        # Get the entity from the primary entry
+        entity = primary_entry["entity"]
 
-            # validate the data before we push it into the database. 
-            # to properly cover some edge cases
-            try:
-                self.validate_mappings(db_entries)
-            except TankError as e:
-                raise TankError("path_cache population aborted: %s" % e)
+        # Add the missing primary and secondary entities to the path_cache
+        db_entries = [primary_entry] + secondary_entries
+
+        # validate the data before we push it into the database. 
+        # to properly cover some edge cases
+        try:
+            self.validate_mappings(db_entries)
+        except TankError as e:
+            raise TankError("path_cache population aborted: %s" % e)
 
-            log.info("Adding path_cache mapping %s(%s): %s" % (entity["type"], entity["id"], path))
-            self.add_mappings(db_entries, entity["type"], [entity["id"]])
+        log.info("Adding path_cache mapping %s(%s): %s" % (entity["type"], entity["id"], path))
+        self.add_mappings(db_entries, entity["type"], [entity["id"]])
 
         return entity
 
@@ -1592,7 +3391,7 @@ class PathCache(object):
             return None
         
         try:
-            root_path, relative_path = self._separate_root(path)
+            folder_key = self._get_path_folder_key(path)
         except TankError:
             # fail gracefully if path is not a valid path
             # eg. doesn't belong to the project
@@ -1600,12 +3399,10 @@ class PathCache(object):
 
         # use built in cursor unless specifically provided - means this
         # is part of a larger transaction
-        c = cursor or self._connection.cursor()        
+        c = cursor or self._read_connection.cursor()        
 
         try:
-            db_path = self._path_to_dbpath(relative_path)
-            res = c.execute("SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 1", (db_path, root_path))
-            data = list(res)
+            data = self._get_folder_entities(c, folder_key, 1)
         finally:
             if cursor is None:
                 c.close()
@@ -1622,6 +3419,7 @@ class PathCache(object):
             return None
 
 
+    @_instrumented
     def get_secondary_entities(self, path):
         """
         Returns all the secondary entities for a path.
@@ -1636,17 +3434,15 @@ class PathCache(object):
             return []
         
         try:
-            root_path, relative_path = self._separate_root(path)
+            folder_key = self._get_path_folder_key(path)
         except TankError:
             # fail gracefully if path is not a valid path
             # eg. doesn't belong to the project
             return []
 
-        c = self._connection.cursor()
+        c = self._read_connection.cursor()
         try:
-            db_path = self._path_to_dbpath(relative_path)
-            res = c.execute("SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 0", (db_path, root_path))
-            data = list(res)
+            data = self._get_folder_entities(c, folder_key, 0)
         finally:
             c.close()
 
@@ -1659,6 +3455,273 @@ class PathCache(object):
 
         return matches
     
+    def _get_folder_entities(self, cursor, folder_key, primary_entity):
+        """
+        Returns the primary or secondary entities of a folder.
+
+        :param cursor: Database cursor.
+        :param folder_key: Folder key, see :meth:`_get_folder_key`.
+        :param primary_entity: 1 for the primary entities, 0 for the secondary ones.
+        :returns: List of (entity type, entity id, entity name) tuples.
+        """
+        folder_id = self._get_folder_id(cursor, folder_key)
+        if folder_id is None:
+            return []
+
+        res = cursor.execute(
+            """SELECT t.name, e.entity_id, e.entity_name
+               FROM path_cache_entry e
+               INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+               WHERE e.folder_id = ? AND e.primary_entity = ?""",
+            (folder_id, primary_entity)
+        )
+        return list(res)
+
+    @_instrumented
+    def get_ancestor_entities(self, path):
+        """
+        Returns the primary and secondary entities of a path and of all its parent
+        folders up to the project root. The folders are looked up with a single query
+        and their entities with another one.
+
+        Entities missing from the path cache are derived from the schema folders
+        and added to the path cache, the same way :meth:`get_entity` does it.
+
+        :param path: a path on disk
+        :returns: list of (path, entity, secondary entities) tuples, starting with the
+                  given path and ending with the project root. The entity is a shotgun
+                  entity dict, e.g. {"type": "Shot", "name": "xxx", "id": 123} or None,
+                  the secondary entities a list of shotgun entity dicts.
+        """
+        return self._get_ancestor_entities_for_paths([path])[path]
+
+    @_instrumented
+    def get_ancestor_entities_for_paths(self, paths):
+        """
+        Returns the primary and secondary entities of a list of paths and of all
+        their parent folders up to the project root. Folders shared by several paths
+        are only looked up once, with a single query per path, and their entities in
+        chunks of SQLITE_MAX_ITEMS_FOR_IN_STATEMENT folders.
+
+        Entities missing from the path cache are derived from the schema folders
+        and added to the path cache, the same way :meth:`get_entity` does it.
+
+        :param paths: list of paths on disk
+        :returns: dictionary keyed by path, with lists of (path, entity, secondary entities)
+                  tuples as values, see :meth:`get_ancestor_entities`.
+        """
+        return self._get_ancestor_entities_for_paths(paths)
+
+    def _get_ancestor_entities_for_paths(self, paths):
+        """
+        Looks up the entities of paths and of their parent folders,
+        see :meth:`get_ancestor_entities_for_paths`.
+        """
+        project_roots = self._roots.values() if not self._path_cache_disabled else []
+
+        # parent folders of each path, starting with the path itself
+        ancestor_paths = {}
+        for path in paths:
+            if path in ancestor_paths:
+                continue
+            curr_paths = [path]
+            while curr_paths[-1] not in project_roots:
+                parent_path = os.path.dirname(curr_paths[-1])
+                if parent_path == curr_paths[-1]:
+                    # not a project path
+                    break
+                curr_paths.append(parent_path)
+            ancestor_paths[path] = curr_paths
+
+        all_paths = set()
+        for curr_paths in ancestor_paths.itervalues():
+            all_paths.update(curr_paths)
+        entities, secondary_entities = self._get_entities_for_paths(list(all_paths), ancestors=True)
+
+        folders = {}
+        result = {}
+        for path, curr_paths in ancestor_paths.iteritems():
+            result[path] = []
+            for curr_path in curr_paths:
+                if curr_path not in folders:
+                    entity = entities.get(curr_path)
+                    secondary = secondary_entities.get(curr_path, [])
+                    if not entity:
+                        entity = self._get_entity_from_schema(curr_path)
+                        if entity:
+                            # secondary entities may have been added along with the entity
+                            secondary = self.get_secondary_entities(curr_path)
+                    folders[curr_path] = (curr_path, entity, secondary)
+                result[path].append(folders[curr_path])
+
+        return result
+
+    @_instrumented
+    def get_entities_for_paths(self, paths):
+        """
+        Returns the entities associated with a list of paths, looked up with
+        as few queries as possible.
+
+        Entities missing from the path cache are derived from the schema folders
+        and added to the path cache, the same way :meth:`get_entity` does it.
+
+        :param paths: list of paths on disk
+        :returns: dictionary keyed by path, with shotgun entity dicts as values,
+                  e.g. {"type": "Shot", "name": "xxx", "id": 123}, or None if no
+                  entity is associated with the path.
+        """
+        entities, _ = self._get_entities_for_paths(paths)
+
+        result = {}
+        for path in paths:
+            if path in result:
+                continue
+            entity = entities.get(path)
+            if not entity:
+                entity = self._get_entity_from_schema(path)
+            result[path] = entity
+        return result
+
+    @_instrumented
+    def get_secondary_entities_for_paths(self, paths):
+        """
+        Returns the secondary entities associated with a list of paths, looked up
+        with as few queries as possible.
+
+        :param paths: list of paths on disk
+        :returns: dictionary keyed by path, with lists of shotgun entity dicts as
+                  values, e.g. [{"type": "Shot", "name": "xxx", "id": 123}], or []
+                  if no entities are associated with the path.
+        """
+        _, secondary_entities = self._get_entities_for_paths(paths)
+        return dict((path, secondary_entities.get(path, [])) for path in paths)
+
+    def _get_entities_for_paths(self, paths, ancestors=False):
+        """
+        Looks up the primary and secondary entities of paths in the path cache. The
+        folders of the paths are looked up together, a level at a time, and their
+        entities in chunks of SQLITE_MAX_ITEMS_FOR_IN_STATEMENT folders, a single
+        query per chunk.
+
+        :param paths: list of paths on disk
+        :param ancestors: If True, the paths are made of a few paths and of their parent
+                          folders, which are looked up along with the deepest folders,
+                          see :meth:`_get_ancestor_folder_ids`.
+        :returns: tuple (primary entities, secondary entities). Primary entities are
+                  shotgun entity dicts keyed by path, secondary entities lists of
+                  shotgun entity dicts keyed by path. Paths without entities are omitted.
+        """
+        entities = {}
+        secondary_entities = {}
+
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return entities, secondary_entities
+
+        # input paths keyed by folder key
+        paths_by_folder_key = {}
+        for path in paths:
+            if path is None:
+                continue
+            try:
+                folder_key = self._get_path_folder_key(path)
+            except TankError:
+                # fail gracefully if path is not a valid path
+                # eg. doesn't belong to the project
+                continue
+            paths_by_folder_key.setdefault(folder_key, []).append(path)
+
+        c = self._read_connection.cursor()
+        try:
+            if ancestors:
+                folder_ids = self._get_ancestor_folder_ids(c, paths_by_folder_key)
+            else:
+                folder_ids = self._get_folder_ids(c, paths_by_folder_key)
+            # parent folders which weren't asked for are skipped.
+            paths_by_folder_id = dict(
+                (folder_id, paths_by_folder_key[folder_key]) for folder_key, folder_id in folder_ids.iteritems()
+                if folder_key in paths_by_folder_key
+            )
+            for chunk in self._get_chunks(list(paths_by_folder_id)):
+                res = c.execute(
+                    """SELECT e.folder_id, t.name, e.entity_id, e.entity_name, e.primary_entity
+                       FROM path_cache_entry e
+                       INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id
+                       WHERE e.folder_id IN (%s)""" % self._gen_param_string(chunk),
+                    chunk
+                )
+                for folder_id, entity_type, entity_id, entity_name, primary_entity in res:
+                    for path in paths_by_folder_id[folder_id]:
+                        # convert to string, not unicode!
+                        entity = {"type": str(entity_type), "id": entity_id, "name": str(entity_name)}
+                        if not primary_entity:
+                            secondary_entities.setdefault(path, []).append(entity)
+                        elif path in entities:
+                            # never supposed to happen!
+                            raise TankError("More than one entry in path database for %s!" % path)
+                        else:
+                            entities[path] = entity
+        finally:
+            c.close()
+
+        return entities, secondary_entities
+
+    @_instrumented
+    def get_paths_for_entities(self, entities, primary_only):
+        """
+        Returns the paths associated with a list of shotgun entities, looked up
+        with as few queries as possible. Entities are grouped by type and looked
+        up in chunks of SQLITE_MAX_ITEMS_FOR_IN_STATEMENT entities, a single query
+        per chunk.
+
+        :param entities: list of (entity type, entity id) tuples
+        :param primary_only: Only return items marked as primary
+        :returns: dictionary keyed by (entity type, entity id) tuple, with lists
+                  of paths on disk as values.
+        """
+        result = dict((entity, []) for entity in entities)
+
+        if self._path_cache_disabled:
+            # no entries because we don't have a path cache
+            return result
+
+        ids_by_type = collections.defaultdict(set)
+        for entity_type, entity_id in result:
+            ids_by_type[entity_type].add(entity_id)
+
+        c = self._read_connection.cursor()
+        try:
+            entity_type_ids = self._get_entity_type_ids(c, ids_by_type)
+
+            # (entity type, entity id, folder id) tuples
+            rows = []
+            for entity_type, entity_type_id in entity_type_ids.iteritems():
+                for entity_ids_chunk in self._get_chunks(list(ids_by_type[entity_type])):
+                    sql = (
+                        "SELECT entity_id, folder_id FROM path_cache_entry "
+                        "WHERE entity_type_id = ? AND entity_id IN (%s)" % self._gen_param_string(entity_ids_chunk)
+                    )
+                    if primary_only:
+                        sql += " AND primary_entity = 1"
+
+                    for entity_id, folder_id in c.execute(sql, [entity_type_id] + entity_ids_chunk):
+                        rows.append((entity_type, entity_id, folder_id))
+
+            folder_paths = self._get_folder_paths(c, set(folder_id for _, _, folder_id in rows))
+        finally:
+            c.close()
+
+        for entity_type, entity_id, folder_id in rows:
+            if folder_id not in folder_paths:
+                continue
+            root_name, relative_path = folder_paths[folder_id]
+            root_path = self._roots.get(root_name)
+            if not root_path:
+                # The root name doesn't match a recognized name, so skip this entry
+                continue
+            result[(entity_type, entity_id)].append(self._dbpath_to_path(root_path, relative_path))
+
+        return result
 
     def ensure_all_entries_are_in_shotgun(self):
         """
@@ -1698,14 +3761,7 @@ class PathCache(object):
 
         try:
             # get all records and check each one against shotgun.
-            pc_data = list(cursor.execute("""select pc.rowid,
-                                                    pc.entity_type, 
-                                                    pc.entity_id, 
-                                                    pc.entity_name, 
-                                                    pc.root, 
-                                                    pc.path, 
-                                                    pc.primary_entity 
-                                             from path_cache pc"""))
+            pc_data = self._get_entries(cursor)
         finally:
             cursor.close()
         
@@ -1805,3 +3861,131 @@ class PathCache(object):
         log.info("")
         log.info("Migration complete. %s records created in Shotgun" % len(sg_valid_records))
      
+
+
+class PathCacheSynchronizer(threading.Thread):
+    """
+    Background thread keeping the path cache of a Toolkit instance in sync with Shotgun.
+
+    At a regular interval, the thread looks for new ``Toolkit_Folders_Create`` and
+    ``Toolkit_Folders_Delete`` event log entries and applies them to the path cache,
+    so that the syncs carried out by folder creation and
+    :meth:`Sgtk.synchronize_filesystem_structure` usually have nothing left to do.
+
+    Full syncs are not carried out in the background, unless the path cache database
+    is first created by the thread. If the path cache needs one, it is left to the
+    next foreground sync.
+    """
+
+    def __init__(self, tk, interval):
+        """
+        Constructor.
+
+        :param tk: Toolkit API instance
+        :param interval: Number of seconds to wait between syncs.
+        """
+        super(PathCacheSynchronizer, self).__init__(name="PathCacheSynchronizer")
+
+        self._tk = tk
+        self._interval = interval
+        # Make this thread a daemon, so that the process doesn't hang if
+        # the synchronizer isn't halted before exiting.
+        self.daemon = True
+
+        # makes possible to halt the thread
+        self._halt_event = threading.Event()
+
+        self._metrics_lock = threading.Lock()
+        self._num_syncs = 0
+        self._num_failures = 0
+        self._num_folders_synced = 0
+        self._last_sync_time = None
+        self._last_sync_duration = None
+        self._full_sync_required = False
+
+    @property
+    def interval(self):
+        """
+        Number of seconds between syncs.
+        """
+        return self._interval
+
+    def run(self):
+        """
+        Synchronizes the path cache until halted.
+        """
+        log.debug("Path cache synchronizer started, syncing every %s seconds." % self._interval)
+        while not self._halt_event.isSet():
+            self._synchronize()
+            self._halt_event.wait(self._interval)
+        log.debug("Path cache synchronizer stopped.")
+
+    def halt(self, timeout=None):
+        """
+        Stops the thread, waiting for the sync in progress to complete.
+
+        :param timeout: Maximum number of seconds to wait for the thread to stop,
+                        None to wait until it has stopped.
+        """
+        self._halt_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def get_metrics(self):
+        """
+        Returns statistics about the syncs carried out by the thread.
+
+        :returns: Dictionary with keys:
+            - syncs: Number of successful syncs.
+            - failures: Number of syncs which raised an error.
+            - folders_synced: Number of folders added to the path cache.
+            - last_sync_time: Time, in seconds since the epoch, at which the last
+              successful sync started, None if there was none.
+            - last_sync_duration: Duration in seconds of the last successful sync,
+              None if there was none.
+            - lag: Number of seconds since the path cache was last known to be in
+              sync with Shotgun, None if it never was.
+            - full_sync_required: True if the last sync found that the path cache
+              needs a full sync.
+        """
+        with self._metrics_lock:
+            if self._last_sync_time is None:
+                lag = None
+            else:
+                lag = time.time() - self._last_sync_time
+            return {
+                "syncs": self._num_syncs,
+                "failures": self._num_failures,
+                "folders_synced": self._num_folders_synced,
+                "last_sync_time": self._last_sync_time,
+                "last_sync_duration": self._last_sync_duration,
+                "lag": lag,
+                "full_sync_required": self._full_sync_required,
+            }
+
+    def _synchronize(self):
+        """
+        Applies the new folder events to the path cache.
+        """
+        start_time = time.time()
+        try:
+            path_cache = PathCache(self._tk)
+            try:
+                new_items = path_cache.synchronize(allow_full_sync=False)
+            finally:
+                path_cache.close()
+        except Exception as e:
+            # keep going, the next sync may succeed.
+            log.debug("Background path cache sync failed: %s" % e, exc_info=True)
+            with self._metrics_lock:
+                self._num_failures += 1
+            return
+
+        with self._metrics_lock:
+            self._full_sync_required = new_items is None
+            if new_items is None:
+                return
+            self._num_syncs += 1
+            self._num_folders_synced += len(new_items)
+            self._last_sync_time = start_time
+            self._last_sync_duration = time.time() - start_time
@@ -119,6 +119,27 @@ class PipelineConfiguration(object):
             False
         )
 
+        # read the path cache from a local copy of the database
+        self._use_path_cache_replica = pipeline_config_metadata.get(
+            "use_path_cache_replica",
+            False
+        )
+
+        # number of seconds between background syncs of the path cache
+        self._path_cache_sync_interval = pipeline_config_metadata.get(
+            "path_cache_sync_interval"
+        )
+
+        # snapshot of the path cache new path caches are seeded from
+        self._path_cache_snapshot_path = pipeline_config_metadata.get(
+            "path_cache_snapshot_path"
+        )
+
+        # whether path cache statistics are emitted as metrics
+        self._log_path_cache_metrics = pipeline_config_metadata.get(
+            "log_path_cache_metrics", False
+        )
+
         # figure out whether to use the bundle cache or the
         # local pipeline configuration 'install' cache
         if pipeline_config_metadata.get("use_bundle_cache"):
@@ -133,6 +154,9 @@ class PipelineConfiguration(object):
         else:
             self._bundle_cache_fallback_paths = []
 
+        # number of results memoized by each template, disabled by default
+        self._template_cache_size = pipeline_config_metadata.get("template_cache_size") or 0
+
         # There are four ways this initializer can be invoked.
         #
         # 1) Classic: We're instantiated from sgtk_from_path with a single path.
@@ -503,6 +527,74 @@ class PipelineConfiguration(object):
         self._update_metadata({"use_shotgun_path_cache": True})
         self._use_shotgun_path_cache = True
 
+    def get_path_cache_replica_enabled(self):
+        """
+        Returns true if the path cache should be read from a local copy of its
+        database, as set by the ``use_path_cache_replica`` setting. The location
+        of the copy is determined by the ``cache_location`` core hook.
+        """
+        return self._use_path_cache_replica
+
+    def get_path_cache_sync_interval(self):
+        """
+        Returns the number of seconds between background syncs of the path cache,
+        as set by the ``path_cache_sync_interval`` setting. When set, engines keep
+        the path cache in sync with Shotgun from a background thread.
+
+        :returns: Number of seconds or None if background syncs are turned off.
+        """
+        return self._path_cache_sync_interval or None
+
+    def get_path_cache_snapshot_path(self):
+        """
+        Returns the location of the path cache snapshot, as set by the
+        ``path_cache_snapshot_path`` setting. Environment variables in the
+        setting are expanded.
+
+        New path caches are seeded from the snapshot rather than fully synced
+        with Shotgun, see :meth:`~sgtk.Sgtk.export_path_cache_snapshot`.
+
+        :returns: Path to the snapshot file or None if there is no snapshot.
+        """
+        if not self._path_cache_snapshot_path:
+            return None
+        return os.path.expanduser(os.path.expandvars(self._path_cache_snapshot_path))
+
+    def get_path_cache_metrics_enabled(self):
+        """
+        Returns whether engines emit the path cache statistics as a metric when they
+        are destroyed, as set by the ``log_path_cache_metrics`` setting, see
+        :meth:`~sgtk.Sgtk.log_path_cache_metrics`.
+
+        :returns: True if the statistics are emitted, False otherwise.
+        """
+        return bool(self._log_path_cache_metrics)
+
+
+    ########################################################################################
+    # templates
+
+    def get_template_cache_size(self):
+        """
+        Returns the maximum number of results of :meth:`Template.apply_fields` and
+        :meth:`Template.get_fields` memoized by each template, 0 if memoization is disabled.
+
+        The value is read from the ``template_cache_size`` setting of the pipeline
+        configuration and can be overridden with the ``TK_TEMPLATE_CACHE_SIZE``
+        environment variable.
+
+        :returns: Cache size as an int.
+        """
+        env_value = os.environ.get(constants.TEMPLATE_CACHE_SIZE_ENV_VAR)
+        if env_value:
+            try:
+                return max(int(env_value), 0)
+            except ValueError:
+                log.warning(
+                    "Ignoring invalid value '%s' of the %s environment variable." %
+                    (env_value, constants.TEMPLATE_CACHE_SIZE_ENV_VAR)
+                )
+        return self._template_cache_size
 
     ########################################################################################
     # storage roots related
@@ -985,14 +1077,22 @@ class PipelineConfiguration(object):
             constants.CONTENT_TEMPLATES_FILE,
         )
 
-    def get_templates_config(self):
+    def get_templates_config(self, config_files=None, includes=None):
         """
         Returns the templates configuration as an object
+
+        :param list config_files: Optional list to which the paths of the templates
+                                  file and of all the files it includes are appended.
+        :param list includes: Optional list to which a (file name, include, resolved path)
+                              tuple is appended for every include of the templates file
+                              and of the files it includes.
         """
         templates_file = self._get_templates_config_location()
+        if config_files is not None:
+            config_files.append(templates_file)
 
         data = yaml_cache.g_yaml_cache.get(templates_file)
-        data = template_includes.process_includes(templates_file, data)
+        data = template_includes.process_includes(templates_file, data, config_files, includes)
 
         return data
 
@@ -97,6 +97,9 @@ class Engine(TankBundle):
 
         self._metrics_dispatcher = None
 
+        # true if the engine started the background path cache sync
+        self._path_cache_synchronizer_started = False
+
         # Initialize these early on so that methods implemented in the derived class and trying
         # to access the invoker don't trip on undefined variables.
         self._invoker = None
@@ -258,6 +261,13 @@ class Engine(TankBundle):
             self._metrics_dispatcher.start()
             self.log_debug("Metrics dispatcher started.")
 
+        # keep the path cache in sync in the background if the config asks for it
+        sync_interval = tk.pipeline_configuration.get_path_cache_sync_interval()
+        if sync_interval and not tk.get_path_cache_synchronizer():
+            self.log_debug("Starting path cache synchronizer...")
+            tk.start_path_cache_synchronizer(sync_interval)
+            self._path_cache_synchronizer_started = True
+
         self.log_debug("Init complete: %s" % self)
 
     def __repr__(self):
@@ -718,12 +728,25 @@ class Engine(TankBundle):
             self._invoker = None
             self._async_invoker = None
 
+            # report how the path cache was used before the metrics stop being dispatched
+            if self.sgtk.pipeline_configuration.get_path_cache_metrics_enabled():
+                self.sgtk.log_path_cache_metrics()
+
             # halt metrics dispatching
             if self._metrics_dispatcher and self._metrics_dispatcher.dispatching:
                 self.log_debug("Stopping metrics dispatcher.")
                 self._metrics_dispatcher.stop()
                 self.log_debug("Metrics dispatcher stopped.")
 
+            # halt the background path cache sync
+            if self._path_cache_synchronizer_started:
+                self.sgtk.stop_path_cache_synchronizer()
+                self._path_cache_synchronizer_started = False
+
+            # release the path cache connections and cached contexts of the toolkit
+            # instance, connections are opened again on demand if it outlives the engine.
+            self.sgtk.close()
+
         # kill log handler
         LogManager().root_logger.removeHandler(self.__log_handler)
         self.__log_handler = None
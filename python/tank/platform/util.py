@@ -12,6 +12,7 @@ import logging
 
 from .import_stack import ImportStack
 from ..errors import TankError
+from ..context import g_context_cache
 from .errors import TankContextChangeNotSupportedError, TankCurrentModuleNotFoundError
 from .engine import current_engine, _restart_engine
 from ..log import LogManager
@@ -108,6 +109,10 @@ def change_context(new_context):
     if engine is None:
         raise TankError("No engine is currently running! Run start_engine instead.")
 
+    # the contexts cached so far may be out of date, for example if tasks were
+    # reassigned, so the apps build theirs from scratch in the new context.
+    g_context_cache.invalidate()
+
     try:
         engine.log_debug("Changing context to %r." % new_context)
 
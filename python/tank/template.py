@@ -19,10 +19,13 @@ import sys
 import copy
 
 from . import templatekey
+from . import template_snapshot
 from . import constants
 from .errors import TankError
 from .template_path_parser import TemplatePathParser
-from .util import shotgun, shotgun_entity
+from .template_path_matcher import TemplatePathMatcher
+from .util import shotgun, shotgun_entity, shotgun_batch
+from .util.lru_cache import LRUCache
 from . import LogManager
 
 log = LogManager.get_logger(__name__)
@@ -113,6 +116,12 @@ class Template(object):
         self._prefix = ''
         self._static_tokens = []
 
+        # compiled path matchers, one per variation, built on first use
+        self._matchers = None
+
+        # memoized results of apply_fields and get_fields, see set_cache_size
+        self._memo = None
+
     def __repr__(self):
         class_name = self.__class__.__name__
         if self.name:
@@ -123,6 +132,46 @@ class Template(object):
     def __str__(self):
         return self._definitions[0]
 
+    def set_cache_size(self, size):
+        """
+        Enables memoization of the results of :meth:`apply_fields` and :meth:`get_fields`.
+
+        Results are kept in a least recently used cache, keyed by the normalized
+        input path and skip keys for :meth:`get_fields`, and by the values of the
+        template keys and the platform for :meth:`apply_fields`. Paths relying on
+        the default value of a :class:`TimestampKey` are never cached.
+
+        Memoization is usually enabled for all the templates of a configuration,
+        see :meth:`PipelineConfiguration.get_template_cache_size`.
+
+        :param int size: Maximum number of results kept, 0 disables memoization.
+        """
+        if not size:
+            self._memo = None
+        elif self._memo is None or self._memo.max_size != size:
+            self._memo = LRUCache(size)
+
+    def get_cache_info(self):
+        """
+        Returns statistics about the memoized results::
+
+            >>> template_path.get_cache_info()
+            {'hits': 12, 'misses': 3, 'size': 3, 'max_size': 128}
+
+        :returns: Dictionary with the number of cache hits and misses, the current and
+                  maximum number of results kept, or None if memoization is disabled.
+        """
+        if self._memo is None:
+            return None
+        return self._memo.info
+
+    def clear_cache(self):
+        """
+        Discards the memoized results and resets the cache statistics.
+        """
+        if self._memo is not None:
+            self._memo.clear()
+
     @property
     def name(self):
         """
@@ -275,9 +324,92 @@ class Template(object):
 
         :returns: Full path, matching the template with the given fields inserted.
         """
-        return self._apply_fields(fields, platform=platform)
+        memo_key = self._get_apply_fields_memo_key(fields, platform)
+        if memo_key is None:
+            return self._apply_fields(fields, platform=platform)
+
+        found, path = self._memo.get(memo_key)
+        if not found:
+            path = self._apply_fields(fields, platform=platform)
+            self._memo.set(memo_key, path)
+        return path
 
-    def _apply_fields(self, fields, ignore_types=None, platform=None):
+    def _get_apply_fields_memo_key(self, fields, platform):
+        """
+        Returns the key under which the result of :meth:`apply_fields` is memoized.
+
+        :param fields: Mapping of keys to fields.
+        :param platform: Optional operating system platform.
+        :returns: Hashable key or None if the result shouldn't be memoized.
+        """
+        if self._memo is None:
+            return None
+
+        values = []
+        # the first variation holds all the keys
+        for key_name, key in sorted(self._keys[0].iteritems()):
+            value = fields.get(key_name)
+            if value is None and callable(key._default):
+                # the default value is computed each time it is used, e.g. the
+                # current time of timestamp keys.
+                return None
+            values.append((key_name, type(value), value))
+
+        memo_key = ("apply_fields", tuple(values), platform)
+        try:
+            hash(memo_key)
+        except TypeError:
+            return None
+        return memo_key
+
+    def apply_fields_many(self, fields_list, platform=None, errors=None):
+        """
+        Creates paths from many sets of fields. This is equivalent to calling
+        :meth:`apply_fields` for each set of fields, with the template keys
+        required by each variation of the template only being looked up once::
+
+            >>> fields_list = [{"Shot": "shot_1", "Step": "comp", "name": "henry", "version": 3},
+                               {"Shot": "shot_2", "Step": "comp", "name": "henry", "version": 1}]
+            >>> list(template_path.apply_fields_many(fields_list))
+            ['/studio_root/sgtk/demo_project_1/shots/shot_1/comp/publish/henry.v003.ma',
+             '/studio_root/sgtk/demo_project_1/shots/shot_2/comp/publish/henry.v001.ma']
+
+        :param fields_list: Iterable of mappings of keys to fields.
+        :param platform: Optional operating system platform, see :meth:`apply_fields`.
+        :param errors: Optional list. If set, a ``(index, TankError)`` tuple is appended
+                       to it for each set of fields which can't be applied and None is
+                       returned for it, instead of raising the error.
+
+        :returns: Generator returning a path for each set of fields.
+        :raises: :class:`TankError` if a set of fields can't be applied and no errors
+                 list was given.
+        """
+        required_keys = self._get_required_keys()
+        for index, fields in enumerate(fields_list):
+            if errors is None:
+                yield self._apply_fields(fields, platform=platform, required_keys=required_keys)
+                continue
+
+            try:
+                path = self._apply_fields(fields, platform=platform, required_keys=required_keys)
+            except TankError as e:
+                errors.append((index, e))
+                path = None
+            yield path
+
+    def _get_required_keys(self):
+        """
+        Returns the names of the keys without default values for each variation
+        of the template.
+
+        :returns: List of lists of key names, in the same order as the variations.
+        """
+        return [
+            [key.name for key in keys.values() if key.default is None]
+            for keys in self._keys
+        ]
+
+    def _apply_fields(self, fields, ignore_types=None, platform=None, required_keys=None):
         """
         Creates path using fields.
 
@@ -290,17 +422,20 @@ class Template(object):
                          current operating system. If you pass in a sys.platform-style string
                          (e.g. 'win32', 'linux2' or 'darwin'), paths will be generated to
                          match that platform.
+        :param required_keys: Optional names of the keys without default values for each
+                              variation, as returned by :meth:`_get_required_keys`.
 
         :returns: Full path, matching the template with the given fields inserted.
         """
         ignore_types = ignore_types or []
+        required_keys = required_keys or self._get_required_keys()
 
         # find largest key mapping without missing values
         keys = None
         # index of matching keys will be used to find cleaned_definition
         index = -1
         for index, cur_keys in enumerate(self._keys):
-            missing_keys = self._missing_keys(fields, cur_keys, skip_defaults=True)
+            missing_keys = [x for x in required_keys[index] if (x not in fields) or (fields[x] is None)]
             if not missing_keys:
                 keys = cur_keys
                 break
@@ -431,10 +566,8 @@ class Template(object):
         skip_keys = skip_keys or []
 
         # Path should split into keys as per template
-        path_fields = {}
-        try:
-            path_fields = self.get_fields(path, skip_keys=skip_keys)
-        except TankError:
+        path_fields = self._get_fields(path, skip_keys=skip_keys, raise_error=False)
+        if path_fields is None:
             return None
 
         # Check that all required fields were found in the path:
@@ -468,6 +601,63 @@ class Template(object):
         """
         return self.validate_and_get_fields(path, fields, skip_keys) != None
 
+    def validate_many(self, paths, fields=None, skip_keys=None):
+        """
+        Validates that many paths can be mapped to the pattern given by the template.
+        This is equivalent to calling :meth:`validate` for each path::
+
+            >>> list(template_path.validate_many([good_path, bad_path]))
+            [True, False]
+
+        :param paths:       Iterable of paths to validate.
+        :param fields:      An optional dictionary of key names to key values. If supplied these values must
+                            be present in each input path and found by the template.
+        :param skip_keys:   Field names whose values should be ignored
+        :returns:           Generator returning True for each valid path, False otherwise.
+        """
+        fields = fields or {}
+        skip_keys = skip_keys or []
+        for path in paths:
+            yield self.validate_and_get_fields(path, fields, skip_keys) != None
+
+    def get_fields_many(self, input_paths, skip_keys=None, errors=None):
+        """
+        Extracts key name, value pairs from many strings. This is equivalent to
+        calling :meth:`get_fields` for each of them::
+
+            >>> list(template_path.get_fields_many([good_path, bad_path], errors=errors))
+            [{'Sequence': 'seq_1',
+              'Shot': 'shot_2',
+              'Step': 'comp',
+              'name': 'henry',
+              'version': 3},
+             None]
+            >>> errors
+            [(1, TankError(...))]
+
+        :param input_paths: Iterable of source paths for values
+        :param skip_keys: Optional keys to skip
+        :param errors: Optional list. If set, a ``(index, TankError)`` tuple is appended
+                       to it for each path which doesn't fit the template and None is
+                       returned for it, instead of raising the error.
+
+        :returns: Generator returning the values found in each path.
+        :raises: :class:`TankError` if a path doesn't fit the template and no errors
+                 list was given.
+        """
+        skip_keys = skip_keys or []
+        for index, input_path in enumerate(input_paths):
+            if errors is None:
+                yield self._get_fields(input_path, skip_keys=skip_keys)
+                continue
+
+            try:
+                fields = self._get_fields(input_path, skip_keys=skip_keys)
+            except TankError as e:
+                errors.append((index, e))
+                fields = None
+            yield fields
+
     def get_fields(self, input_path, skip_keys=None):
         """
         Extracts key name, value pairs from a string. Example::
@@ -489,16 +679,74 @@ class Template(object):
         :returns: Values found in the path based on keys in template
         :rtype: Dictionary
         """
+        return self._get_fields(input_path, skip_keys=skip_keys)
+
+    def _get_fields(self, input_path, skip_keys=None, raise_error=True):
+        """
+        Extracts key name, value pairs from a string.
+
+        Each template variation is first matched with its compiled
+        :class:`TemplatePathMatcher`, the :class:`TemplatePathParser` is only
+        used for the variations and paths the matcher can't decide on.
+
+        :param input_path: Source path for values
+        :param skip_keys: Optional keys to skip
+        :param raise_error: If True, a :class:`TankError` is raised when the path
+                            doesn't fit the template, otherwise None is returned.
+
+        :returns: Values found in the path based on keys in template or None.
+        :raises: :class:`TankError` if the path doesn't fit and raise_error is True.
+        """
+        if self._memo is None:
+            return self._parse_fields(input_path, skip_keys, raise_error)
+
+        # the path is normalized by the matchers and parsers
+        memo_key = ("get_fields", os.path.normpath(input_path), tuple(sorted(skip_keys or [])))
+        found, fields = self._memo.get(memo_key)
+        if not found:
+            fields = self._parse_fields(input_path, skip_keys, raise_error)
+            if fields is None:
+                return None
+            self._memo.set(memo_key, fields)
+        # callers are free to modify the fields they get
+        return dict(fields)
+
+    def _parse_fields(self, input_path, skip_keys, raise_error):
+        """
+        Extracts key name, value pairs from a string, without memoization.
+
+        :param input_path: Source path for values
+        :param skip_keys: Optional keys to skip
+        :param raise_error: If True, a :class:`TankError` is raised when the path
+                            doesn't fit the template, otherwise None is returned.
+
+        :returns: Values found in the path based on keys in template or None.
+        :raises: :class:`TankError` if the path doesn't fit and raise_error is True.
+        """
+        if self._matchers is None:
+            self._matchers = [
+                TemplatePathMatcher(ordered_keys, static_tokens)
+                for ordered_keys, static_tokens in zip(self._ordered_keys, self._static_tokens)
+            ]
+
         path_parser = None
         fields = None
 
-        for ordered_keys, static_tokens in zip(self._ordered_keys, self._static_tokens):
-            path_parser = TemplatePathParser(ordered_keys, static_tokens)
-            fields = path_parser.parse_path(input_path, skip_keys)
+        for ordered_keys, static_tokens, matcher in zip(self._ordered_keys, self._static_tokens, self._matchers):
+            path_parser = None
+            fields = matcher.match_path(input_path, skip_keys)
+            if fields is TemplatePathMatcher.UNDECIDED:
+                path_parser = TemplatePathParser(ordered_keys, static_tokens)
+                fields = path_parser.parse_path(input_path, skip_keys)
             if fields != None:
                 break
 
-        if fields is None:
+        if fields is None and raise_error:
+            if path_parser is None:
+                # the last variation was rejected by its matcher, run the parser
+                # to report the same error as it would have.
+                path_parser = TemplatePathParser(self._ordered_keys[-1], self._static_tokens[-1])
+                path_parser.parse_path(input_path, skip_keys)
             raise TankError("Template %s: %s" % (str(self), path_parser.last_error))
 
         return fields
@@ -518,26 +766,190 @@ class Template(object):
 
         :param input_path: Source path for values
         :type input_path: String
-        :param additional_types: Optional additional types to search for
-        :type additional_types: List
         :param skip_keys: Optional keys to skip
         :type skip_keys: List
 
         :returns: A list of entity dictionaries
         :rtype: List
         """
-        entities = []
-        sg_filters = []
-        entity_searches_by_type = {}
+        return self.get_entities_many([input_path], skip_keys)[0]
+
+    def get_entities_many(self, input_paths, skip_keys=None, errors=None):
+        """
+        Extracts lists of entities from many strings. This is equivalent to calling
+        :meth:`get_entities` for each of them, but the Shotgun searches of all the strings
+        are batched, resulting in a few queries per entity type rather than one query per
+        entity and string::
+
+            >>> template_path.get_entities_many([input_path_1, input_path_2])
+            [[{'type': 'Project', 'id': 10, 'name': 'demo_project_1'}, ...],
+             [{'type': 'Project', 'id': 10, 'name': 'demo_project_1'}, ...]]
+
+        Entities found in Shotgun are cached for a short amount of time and shared
+        across calls.
+
+        :param input_paths: Iterable of source paths for values
+        :param skip_keys: Optional keys to skip
+        :param errors: Optional list. If set, a ``(index, TankError)`` tuple is appended
+                       to it for each path whose entities can't be resolved and None is
+                       returned for it, instead of raising the error.
+
+        :returns: A list with a list of entity dictionaries for each path.
+        :raises: :class:`TankError` if the entities of a path can't be resolved and no
+                 errors list was given.
+        """
+        resolutions = []
+        for input_path in input_paths:
+            resolution = _EntityResolution()
+            try:
+                resolution.searches = self._get_entity_searches(self.get_fields(input_path, skip_keys))
+            except TankError as e:
+                if errors is None:
+                    raise
+                resolution.error = e
+            resolutions.append(resolution)
 
         # Get the shotgun connection object
         sg = shotgun.get_sg_connection()
 
-        # Get fields parsed from the path
-        path_fields = self.get_fields(input_path, skip_keys)
+        # Treat HumanUser entity special since it can be parsed without a Project entity
+        searches = [(resolution, resolution.searches.pop("HumanUser"))
+                    for resolution in resolutions
+                    if resolution.is_active and "HumanUser" in resolution.searches]
+        for (resolution, _), user_entity in zip(searches, _find_entities(sg, searches)):
+            if user_entity is not None:
+                resolution.entities.append(user_entity)
+
+        # First see if we can get the Project entity from the PipelineConfiguration
+        proj_id = self.pipeline_configuration.get_project_id()
+        if proj_id is not None:
+            name_field = shotgun_entity.get_sg_entity_name_field("Project")
+            for resolution in resolutions:
+                resolution.project = {
+                    "type": "Project",
+                    "id": proj_id,
+                    name_field: self.pipeline_configuration.get_project_disk_name()
+                }
+
+        # Else see if we can process the provided Project entity searches
+        else:
+            searches = [(resolution, resolution.searches.pop("Project"))
+                        for resolution in resolutions
+                        if resolution.is_active and "Project" in resolution.searches]
+            for (resolution, _), proj_entity in zip(searches, _find_entities(sg, searches)):
+                resolution.project = proj_entity
+
+        for resolution in resolutions:
+            if not resolution.is_active:
+                continue
+
+            # we can't resolve anything else if we're outside a project
+            if not resolution.project:
+                resolution.is_complete = True
+                continue
+
+            # Append it to the entities list
+            resolution.entities.append(resolution.project)
+
+            # Filter all further entity searches by it
+            resolution.sg_filters.append(["project", "is", resolution.project])
+
+            # And make sure we exclude Project from any future searches
+            resolution.searches.pop("Project", None)
+
+        # Next process any primary entity types (in hierarchy order)
+        for entity_type in ("Sequence", "Shot", "Asset"):
+            searches = []
+            for resolution in resolutions:
+                # Skip if its not in the list of entities to process
+                if not resolution.is_active or entity_type not in resolution.searches:
+                    continue
+
+                entity_search = resolution.searches.pop(entity_type)
+
+                # Append the project entity filter
+                entity_search[1].extend(resolution.sg_filters)
+
+                # Append any previous primary entity filter
+                if resolution.entity_filter:
+                    entity_search[1].append(resolution.entity_filter)
+
+                searches.append((resolution, entity_search))
+
+            for (resolution, _), entity in zip(searches, _find_entities(sg, searches)):
+                if entity is None:
+                    continue
+
+                # Append the entity
+                resolution.entities.append(entity)
+
+                # Update the entity_filter for the next level
+                resolution.entity_filter = ["sg_%s" % entity_type.lower(), "is", entity]
+
+        # If we have an entity_filter, then we've processed a primary entity
+        searches = []
+        for resolution in resolutions:
+            if not resolution.is_active or not resolution.entity_filter:
+                continue
+
+            # Filter all further entity searches by it
+            resolution.sg_filters.append(resolution.entity_filter)
+
+            # Treat Step entity special since it requires a primary entity
+            if "Step" in resolution.searches:
+                searches.append((resolution, resolution.searches.pop("Step")))
+
+        for (resolution, _), step_entity in zip(searches, _find_entities(sg, searches)):
+            if step_entity is not None:
+                resolution.entities.append(step_entity)
+
+        # Now process the remaining fields
+        searches = []
+        for resolution in resolutions:
+            if not resolution.is_active:
+                continue
+
+            for entity_type, entity_search in resolution.searches.iteritems():
+
+                # Allow the user to override the entity search to run
+                entity_search = self.pipeline_configuration.execute_core_hook_internal(
+                                                "template_additional_entities",
+                                                self,
+                                                entity_type=entity_type,
+                                                entity_search=entity_search,
+                                                sg_filters=resolution.sg_filters)
+
+                # Skip if no entity_search is provided
+                if entity_search:
+                    searches.append((resolution, entity_search))
+
+        for (resolution, _), entity in zip(searches, _find_entities(sg, searches)):
+            if entity is not None:
+                resolution.entities.append(entity)
+
+        results = []
+        for index, resolution in enumerate(resolutions):
+            if resolution.error is None:
+                results.append(resolution.entities)
+            elif errors is None:
+                raise resolution.error
+            else:
+                errors.append((index, resolution.error))
+                results.append(None)
+        return results
+
+    def _get_entity_searches(self, path_fields):
+        """
+        Builds the Shotgun searches needed to find the entities matching fields.
+
+        :param path_fields: Dictionary of fields parsed from a path.
+        :returns: Dictionary of (entity type, filters, fields) tuples, keyed by entity type.
+        """
+        entity_searches_by_type = {}
 
         def _add_entity_search(entity_type, field_name, value):
             """
+            Adds a filter to the search for an entity type.
             """
             sg_filter = [field_name, "is", value]
             name_field = shotgun_entity.get_sg_entity_name_field(entity_type)
@@ -575,126 +987,7 @@ class Template(object):
                 # Add a search for the linked entity as well
                 _add_entity_search(sub_entity_type, sub_field_name, value)
 
-
-        # Treat HumanUser entity special since it can be parsed without a Project entity
-        if "HumanUser" in entity_searches_by_type:
-            entity_search = entity_searches_by_type.pop("HumanUser")
-
-            user_entity = sg.find_one(*entity_search)
-            if user_entity is None:
-                raise TankError("Cannot find '%s' Entity matching search: %s %s" % entity_search)
-
-            # Add to list of entities
-            entities.append(user_entity)
-
-
-        # First see if we can get the Project entity from the PipelineConfiguration
-        proj_id = self.pipeline_configuration.get_project_id()
-        if proj_id is not None:
-            name_field = shotgun_entity.get_sg_entity_name_field("Project")
-            proj_entity = {
-                "type": "Project",
-                "id": proj_id,
-                name_field: self.pipeline_configuration.get_project_disk_name()
-            }
-
-        # Else see if we can process a provided Project entity search
-        elif "Project" in entity_searches_by_type:
-            entity_search = entity_searches_by_type.pop("Project")
-
-            proj_entity = sg.find_one(*entity_search)
-            if proj_entity is None:
-                raise TankError("Cannot find '%s' Entity matching search: %s %s" % entity_search)
-
-        # If we have a Project, entity...
-        if proj_entity:
-            # Append it to the entities list
-            entities.append(proj_entity)
-
-            # Filter all further entity searches by it
-            sg_filters.append(["project", "is", proj_entity])
-
-            # And make sure we exclude Project from any future searches
-            if "Project" in entity_searches_by_type:
-                entity_searches_by_type.pop("Project")
-
-        # Else we can't resolve anything else if we're outside a project
-        else:
-            # ...so just return
-            return entities
-
-
-        # Next process any primary entity types (in hierarchy order)
-        entity_filter = None
-        for entity_type in ("Sequence", "Shot", "Asset"):
-
-            # Skip if its not in the list of entities to process
-            if entity_type not in entity_searches_by_type:
-                continue
-
-            entity_search = entity_searches_by_type.pop(entity_type)
-
-            # Append the project entity filter
-            entity_search[1].extend(sg_filters)
-
-            # Append any previous primary entity filter
-            if entity_filter:
-                entity_search[1].append(entity_filter)
-
-            entity = sg.find_one(*entity_search)
-            if entity is None:
-                raise TankError("Cannot find '%s' Entity matching search: %s %s" % entity_search)
-
-            # Append the entity
-            entities.append(entity)
-
-            # Update the entity_filter for the next level
-            entity_filter = ["sg_%s" % entity_type.lower(), "is", entity]
-
-
-        # If we have an entity_filter, then we've processed a primary entity
-        if entity_filter:
-            # Filter all further entity searches by it
-            sg_filters.append(entity_filter)
-
-            # Treat Step entity special since it requires a primary entity
-            if "Step" in entity_searches_by_type:
-                entity_search = entity_searches_by_type.pop("Step")
-
-                # Filter step entity by the parent entity type
-                step_filters = [["entity_type", "is", entities[-1]["type"]]]
-
-                step_entity = sg.find_one(*entity_search)
-                if step_entity is None:
-                    raise TankError("Cannot find '%s' Entity matching search: %s %s" % entity_search)
-
-                # Add to list of entities
-                entities.append(step_entity)
-
-
-        # Now process the remaining fields
-        for entity_type, entity_search in entity_searches_by_type.iteritems():
-
-            # Allow the user to override the entity search to run
-            entity_search = self.pipeline_configuration.execute_core_hook_internal(
-                                            "template_additional_entities",
-                                            self,
-                                            entity_type=entity_type,
-                                            entity_search=entity_search,
-                                            sg_filters=sg_filters)
-
-            # Skip if no entity_search is provided
-            if not entity_search:
-                continue
-
-            entity = sg.find_one(*entity_search)
-            if entity is None:
-                raise TankError("Cannot find '%s' Entity matching search: %s %s" % entity_search)
-
-            # Add to list of entities
-            entities.append(entity)
-
-        return entities
+        return entity_searches_by_type
 
     def get_entity_fields(self, entities, validate=False):
         """
@@ -711,6 +1004,75 @@ class Template(object):
         :returns: A dictionary of template fields found matching the input entities.
         :rtype: Dictionary
         """
+        return self.get_entity_fields_many([entities], validate)[0]
+
+    def get_entity_fields_many(self, entities_list, validate=False, errors=None):
+        """
+        Returns the template fields matching many lists of entities. This is equivalent
+        to calling :meth:`get_entity_fields` for each of them, but the values missing
+        from the entity dictionaries are retrieved with a single Shotgun query per
+        entity type. Values retrieved from Shotgun are cached for a short amount of
+        time and shared across calls.
+
+        :param entities_list: Iterable of lists of entity dictionaries.
+        :param validate:    If True then the fields found will be checked to ensure that all
+                            expected fields for the entity was found.
+        :param errors: Optional list. If set, a ``(index, TankError)`` tuple is appended
+                       to it for each list of entities whose fields can't be resolved and
+                       None is returned for it, instead of raising the error.
+
+        :returns: A list with a dictionary of template fields for each list of entities.
+        :raises: :class:`TankError` if the fields of a list of entities can't be resolved
+                 and no errors list was given.
+        """
+        entities_list = list(entities_list)
+        sg_keys = [key for key in self.keys.values() if key.shotgun_field_name]
+
+        # gather the values which need fetching, as (entity ids, field names) keyed by entity type
+        queries = {}
+        for entities in entities_list:
+            entity_dict = dict([(x["type"], x) for x in entities])
+            for key in sg_keys:
+                entity = entity_dict.get(key.shotgun_entity_type)
+                if entity is None or key.shotgun_field_name in entity:
+                    continue
+                if (entity["type"], entity["id"], key.shotgun_field_name) in self._entity_fields_cache:
+                    continue
+                entity_ids, field_names = queries.setdefault(key.shotgun_entity_type, (set(), set()))
+                entity_ids.add(entity["id"])
+                field_names.add(key.shotgun_field_name)
+
+        # get the values from shotgun
+        records = {}
+        if queries:
+            sg = shotgun.get_sg_connection()
+            for entity_type, (entity_ids, field_names) in queries.iteritems():
+                records[entity_type] = shotgun_batch.find_entity_fields(sg, entity_type, entity_ids, field_names)
+
+        results = []
+        for index, entities in enumerate(entities_list):
+            try:
+                fields = self._get_entity_fields(entities, records, validate)
+            except TankError as e:
+                if errors is None:
+                    raise
+                errors.append((index, e))
+                fields = None
+            results.append(fields)
+        return results
+
+    def _get_entity_fields(self, entities, records, validate):
+        """
+        Returns the template fields matching a list of entities.
+
+        :param entities:    A list of entity dictionaries
+        :param records:     Dictionary of the records retrieved from Shotgun, keyed
+                            by entity type and id.
+        :param validate:    If True then the fields found will be checked to ensure that all
+                            expected fields for the entity was found.
+
+        :returns: A dictionary of template fields found matching the input entities.
+        """
         fields = {}
         entity_dict = dict([(x["type"], x) for x in entities])
 
@@ -725,7 +1087,6 @@ class Template(object):
                     continue
 
                 entity = entity_dict[key.shotgun_entity_type]
-                entity_type = entity["type"]
 
                 # See if we already have the value
                 if key.shotgun_field_name in entity:
@@ -740,14 +1101,8 @@ class Template(object):
                         fields[key.name] = self._entity_fields_cache[cache_key]
 
                     else:
-                        # get the value from shotgun
-                        filters = [["id", "is", entity["id"]]]
-                        query_fields = [key.shotgun_field_name]
-
-                        # Get the shotgun connection object
-                        sg = shotgun.get_sg_connection()
-
-                        result = sg.find_one(key.shotgun_entity_type, filters, query_fields)
+                        # get the value fetched from shotgun
+                        result = records.get(key.shotgun_entity_type, {}).get(entity["id"])
                         if not result:
                             # no record with that id in shotgun!
                             raise TankError("Could not retrieve Shotgun data for key '%s'. "
@@ -854,7 +1209,7 @@ class TemplatePath(Template):
                                 self._per_platform_roots)
         return None
 
-    def _apply_fields(self, fields, ignore_types=None, platform=None):
+    def _apply_fields(self, fields, ignore_types=None, platform=None, required_keys=None):
         """
         Creates path using fields.
 
@@ -867,10 +1222,12 @@ class TemplatePath(Template):
                          current operating system. If you pass in a sys.platform-style string
                          (e.g. 'win32', 'linux2' or 'darwin'), paths will be generated to
                          match that platform.
+        :param required_keys: Optional names of the keys without default values for each
+                              variation, as returned by :meth:`_get_required_keys`.
 
         :returns: Full path, matching the template with the given fields inserted.
         """
-        relative_path = super(TemplatePath, self)._apply_fields(fields, ignore_types, platform)
+        relative_path = super(TemplatePath, self)._apply_fields(fields, ignore_types, platform, required_keys)
 
         if platform is None:
             # return the current OS platform's path
@@ -967,9 +1324,22 @@ class TemplateString(Template):
         :returns: Values found in the path based on keys in template
         :rtype: Dictionary
         """
+        return self._get_fields(input_path, skip_keys=skip_keys)
+
+    def _get_fields(self, input_path, skip_keys=None, raise_error=True):
+        """
+        Extracts key name, value pairs from a string.
+
+        :param input_path: Source string for values
+        :param skip_keys: Optional keys to skip
+        :param raise_error: If True, a :class:`TankError` is raised when the string
+                            doesn't fit the template, otherwise None is returned.
+
+        :returns: Values found in the string based on keys in template or None.
+        """
         # add path prefix as original design was to require project root
         adj_path = os.path.join(self._prefix, input_path)
-        return super(TemplateString, self).get_fields(adj_path, skip_keys=skip_keys)
+        return super(TemplateString, self)._get_fields(adj_path, skip_keys=skip_keys, raise_error=raise_error)
 
 def split_path(input_path):
     """
@@ -985,16 +1355,69 @@ def split_path(input_path):
     cur_path = cur_path.replace("\\", "/")
     return cur_path.split("/")
 
-def read_templates(pipeline_configuration):
+def read_templates(pipeline_configuration, use_snapshot=True):
     """
     Creates templates and keys based on contents of templates file.
 
+    Unless disabled, the templates are loaded from the snapshot stored in the
+    pipeline configuration cache location if it is up to date with the templates
+    file and its includes. Otherwise they are read from the templates file and a
+    new snapshot is written.
+
+    The results of :meth:`Template.apply_fields` and :meth:`Template.get_fields` are
+    memoized if a template cache size is configured, see
+    :meth:`PipelineConfiguration.get_template_cache_size`.
+
     :param pipeline_configuration: pipeline config object
+    :param use_snapshot: If False, the templates are always read from the templates file.
 
     :returns: Dictionary of form {template name: template object}
     """
     per_platform_roots = pipeline_configuration.get_all_platform_data_roots()
-    data = pipeline_configuration.get_templates_config()
+    snapshot_enabled = template_snapshot.is_snapshot_enabled()
+
+    snapshot = None
+    if use_snapshot and snapshot_enabled:
+        snapshot = template_snapshot.load_snapshot(pipeline_configuration, per_platform_roots)
+
+    if snapshot is not None:
+        templates, keys = snapshot
+    else:
+        config_files = []
+        includes = []
+        templates, keys = make_templates(pipeline_configuration, per_platform_roots, config_files, includes)
+
+        if snapshot_enabled:
+            try:
+                template_snapshot.write_snapshot(
+                    pipeline_configuration, templates, keys, config_files, includes, per_platform_roots
+                )
+            except Exception as e:
+                log.debug("Templates snapshot not written: %s" % e)
+
+    cache_size = pipeline_configuration.get_template_cache_size()
+    if cache_size:
+        for template in templates.itervalues():
+            template.set_cache_size(cache_size)
+
+    return templates, keys
+
+
+def make_templates(pipeline_configuration, per_platform_roots, config_files=None, includes=None):
+    """
+    Creates templates and keys by reading the templates file.
+
+    :param pipeline_configuration: pipeline config object
+    :param per_platform_roots: Root paths for all supported operating systems.
+    :param list config_files: Optional list to which the paths of the templates file
+                              and of all the files it includes are appended.
+    :param list includes: Optional list to which a (file name, include, resolved path)
+                          tuple is appended for every include processed.
+
+    :returns: Tuple of two dictionaries, {template name: template object} and
+              {key name: key object}
+    """
+    data = pipeline_configuration.get_templates_config(config_files, includes)
 
     # get dictionaries from the templates config file:
     def get_data_section(section_name):
@@ -1203,3 +1626,56 @@ def _process_templates_data(data, template_type):
                         "templates were detected:\n %s" % dups_msg)
 
     return templates_data
+
+
+class _EntityResolution(object):
+    """
+    State of the resolution of the entities of a single path
+    by :meth:`Template.get_entities_many`.
+    """
+
+    def __init__(self):
+        # entity searches still to run, keyed by entity type
+        self.searches = {}
+        self.entities = []
+        self.sg_filters = []
+        self.project = None
+        # filter on the last primary entity found
+        self.entity_filter = None
+        self.error = None
+        # set once no other entity can be resolved
+        self.is_complete = False
+
+    @property
+    def is_active(self):
+        """
+        True if more entities need to be resolved.
+        """
+        return self.error is None and not self.is_complete
+
+
+def _find_entities(sg, searches):
+    """
+    Runs entity searches for many paths as a batch.
+
+    :param sg: Shotgun API instance.
+    :param searches: List of (:class:`_EntityResolution`, entity search) tuples, where
+                     entity search is an (entity type, filters, fields) tuple.
+    :returns: List with the entity found for each search, None for the ones
+              which didn't find anything. The error of their resolution is set.
+    """
+    if not searches:
+        return []
+
+    batch = shotgun_batch.BatchedFind(sg)
+    search_ids = [batch.add(*entity_search) for _, entity_search in searches]
+    batch.execute()
+
+    entities = []
+    for (resolution, entity_search), search_id in zip(searches, search_ids):
+        entity = batch.get(search_id)
+        if entity is None and resolution.error is None:
+            resolution.error = TankError("Cannot find '%s' Entity matching search: %s %s"
+                                         % tuple(entity_search))
+        entities.append(entity)
+    return entities
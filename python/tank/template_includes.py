@@ -68,12 +68,20 @@ def _resolve_include(file_name, include):
 
     return resolved_include
 
-def _process_template_includes_r(file_name, data):
+def _process_template_includes_r(file_name, data, included_files=None, includes=None):
     """
     Recursively add template include files.
     
     For each of the sections keys, strings, path, populate entries based on
     include files.
+
+    :param str file_name: Name of the file the data was read from.
+    :param data: Data read from the file.
+    :param list included_files: Optional list to which the path of every
+                                include file read is appended.
+    :param list includes: Optional list to which a (file name, include, resolved path)
+                          tuple is appended for every include, the resolved path
+                          being None if the include was skipped on this platform.
     """
     # return data    
     output_data = {}
@@ -101,14 +109,21 @@ def _process_template_includes_r(file_name, data):
 
             for include_file in include_files:
                 resolved_file = _resolve_include(file_name, include_file)
+                if includes is not None:
+                    includes.append((file_name, include_file, resolved_file))
                 if not resolved_file:
                     continue
 
+                if included_files is not None:
+                    included_files.append(resolved_file)
+
                 # Read the include file
                 include_data = yaml_cache.g_yaml_cache.get(resolved_file, deepcopy_data=False)
 
                 # ...process the contents
-                included_data = _process_template_includes_r(resolved_file, include_data)
+                included_data = _process_template_includes_r(
+                    resolved_file, include_data, included_files, includes
+                )
 
                 # ...and merge the results
                 dict_merge(output_data, included_data)
@@ -126,7 +141,7 @@ def _process_template_includes_r(file_name, data):
 
     return output_data
         
-def process_includes(file_name, data):
+def process_includes(file_name, data, included_files=None, includes=None):
     """
     Processes includes for the main templates file. Will look for 
     any include data structures and transform them into real data.
@@ -137,10 +152,16 @@ def process_includes(file_name, data):
        if there are multiple files, they are loaded in order.
     2. now, on top of this, load in this file's keys, strings and path defs
     3. lastly, process all @refs in the paths section
-        
+
+    :param str file_name: Path to the main templates file.
+    :param data: Data read from the main templates file.
+    :param list included_files: Optional list to which the path of every
+                                include file read is appended.
+    :param list includes: Optional list to which a (file name, include, resolved path)
+                          tuple is appended for every include processed.
     """
     # first recursively load all template data from includes
-    resolved_includes_data = _process_template_includes_r(file_name, data)
+    resolved_includes_data = _process_template_includes_r(file_name, data, included_files, includes)
     
     # Now recursively process any @resolves.
     # these are of the following form:
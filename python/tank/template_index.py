@@ -0,0 +1,120 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Prefix tree index of template paths, used to quickly find the templates
+which may match a given path.
+"""
+
+import os
+
+from .template import TemplatePath
+
+
+class TemplateIndex(object):
+    """
+    Index of objects associated with a :class:`TemplatePath`, keyed by the
+    leading static token of each template variation, i.e. the template root
+    followed by the static path segments preceding the first key.
+
+    The index is a tree of path segments and is only used to discard objects
+    whose template can't possibly validate a path, the candidates returned by
+    :meth:`get_candidates` still need to be validated.
+    """
+
+    class _Node(object):
+        """
+        Node of the tree, holding child nodes keyed by path segment and the
+        entries whose leading static token ends in this node.
+        """
+        __slots__ = ["children", "entries"]
+
+        def __init__(self):
+            self.children = {}
+            # list of (partial segment, insertion index) tuples
+            self.entries = []
+
+    def __init__(self, items, get_template=None):
+        """
+        Construction
+
+        :param items:           List of objects to index.
+        :param get_template:    Optional function returning the :class:`Template` associated
+                                with an item. If not set, items are expected to be templates.
+        """
+        self._items = list(items)
+        self._root = self._Node()
+        # items which can't be indexed and are always candidates
+        self._unindexed = set()
+
+        for index, item in enumerate(self._items):
+            template = get_template(item) if get_template else item
+            if not isinstance(template, TemplatePath):
+                # template strings are matched against a prefixed version of the path.
+                self._unindexed.add(index)
+                continue
+
+            for static_tokens in template._static_tokens:
+                if not static_tokens:
+                    self._unindexed.add(index)
+                    continue
+                self._insert(static_tokens[0], index)
+
+    def _insert(self, token, index):
+        """
+        Adds a leading static token to the tree.
+
+        :param token:   Lower case static token.
+        :param index:   Index of the item the token belongs to.
+        """
+        segments = token.split(os.path.sep)
+        node = self._root
+        for segment in segments[:-1]:
+            node = node.children.setdefault(segment, self._Node())
+        node.entries.append((segments[-1], index))
+
+    def _find(self, path, found):
+        """
+        Collects the indices of the items whose leading static token is a prefix
+        of a path.
+
+        :param path:    Normalized, lower case path.
+        :param found:   Set to which matching indices are added.
+        """
+        segments = path.split(os.path.sep)
+        node = self._root
+        for segment in segments:
+            for partial, index in node.entries:
+                if segment.startswith(partial):
+                    found.add(index)
+            node = node.children.get(segment)
+            if node is None:
+                break
+
+    def get_candidates(self, path):
+        """
+        Returns the items whose template may validate the given path.
+
+        :param path:    Path to look up.
+        :returns:       List of items, in the order they were indexed.
+        """
+        lower_path = os.path.normpath(path).lower()
+        found = set(self._unindexed)
+        self._find(lower_path, found)
+
+        # the template path parser also tries to resolve paths starting with a
+        # value for the first key followed by the leading static token, which is
+        # only possible if there are no separators before the static token.
+        first_sep = lower_path.find(os.path.sep)
+        last_offset = first_sep if first_sep != -1 else len(lower_path) - 1
+        for offset in xrange(1, last_offset + 1):
+            self._find(lower_path[offset:], found)
+
+        return [self._items[index] for index in sorted(found)]
@@ -0,0 +1,255 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Static analysis of the template paths of a configuration, finding out which
+templates can possibly validate the same path.
+"""
+
+import os
+import re
+
+from . import constants
+from . import templatekey
+from .template import TemplatePath
+from .template_path_matcher import _get_excluded_chars
+
+# maximum number of strings enumerated for a path segment whose keys all have choices
+_MAX_SEGMENT_VALUES = 256
+
+
+class TemplateOverlaps(object):
+    """
+    Finds the :class:`TemplatePath` objects which can possibly validate the same path::
+
+        >>> overlaps = TemplateOverlaps(tk.templates.values())
+        >>> overlaps.can_overlap(tk.templates["shot_work"], tk.templates["asset_work"])
+        False
+        >>> overlaps.get_overlapping(tk.templates["shot_work"])
+        [<Sgtk TemplatePath shot_work_alt: ...>]
+
+    Each variation of the templates is split into path segments which are compared
+    using their static tokens, the choices of their keys and the characters allowed
+    by the key filters. The analysis is conservative: templates are only reported as
+    disjoint if no path can be valid for both of them, :class:`TemplateString` objects
+    and templates which can't be analysed are reported as overlapping with any template.
+    """
+
+    def __init__(self, templates):
+        """
+        Construction
+
+        :param templates: Iterable of :class:`Template` objects.
+        """
+        self._templates = []
+        # overlapping templates, keyed by analysed template
+        self._overlaps = {}
+
+        variations_by_length = {}
+        for template in templates:
+            if template in self._templates:
+                # aliased templates
+                continue
+            self._templates.append(template)
+            variations = _get_variations(template)
+            if variations is None:
+                continue
+
+            self._overlaps[template] = set()
+            for segments in variations:
+                variations_by_length.setdefault(len(segments), []).append((template, segments))
+
+        # key values can't contain path separators, only variations with the same
+        # number of segments can match the same path.
+        for variations in variations_by_length.itervalues():
+            for index, (template, segments) in enumerate(variations):
+                overlaps = self._overlaps[template]
+                for other_template, other_segments in variations[index + 1:]:
+                    if other_template is template or other_template in overlaps:
+                        continue
+                    if all(s.can_overlap(o) for s, o in zip(segments, other_segments)):
+                        overlaps.add(other_template)
+                        self._overlaps[other_template].add(template)
+
+    def can_overlap(self, template, other_template):
+        """
+        Returns True if a path can possibly be validated by two templates.
+
+        :param template: :class:`Template` instance.
+        :param other_template: :class:`Template` instance.
+        """
+        if template is other_template:
+            return True
+        overlaps = self._overlaps.get(template)
+        if overlaps is None or other_template not in self._overlaps:
+            return True
+        return other_template in overlaps
+
+    def get_overlapping(self, template):
+        """
+        Returns the templates which can possibly validate the same paths as a template.
+
+        :param template: :class:`Template` instance.
+        :returns: List of :class:`Template` objects, in the order they were given.
+        """
+        return [
+            other_template for other_template in self._templates
+            if other_template is not template and self.can_overlap(template, other_template)
+        ]
+
+    def get_overlapping_pairs(self):
+        """
+        Returns all the pairs of analysed templates which can possibly validate the same
+        path. Those are configuration ambiguities :meth:`Sgtk.template_from_path` has to
+        resolve, or report as a :class:`TankMultipleMatchingTemplatesError`.
+
+        :returns: List of (template, other template) tuples.
+        """
+        pairs = []
+        for index, template in enumerate(self._templates):
+            overlaps = self._overlaps.get(template)
+            if not overlaps:
+                continue
+            for other_template in self._templates[index + 1:]:
+                if other_template in overlaps:
+                    pairs.append((template, other_template))
+        return pairs
+
+
+class _Segment(object):
+    """
+    Path segment of a template variation, made of static strings and keys.
+    """
+
+    def __init__(self, pieces, optional_key=None):
+        """
+        Construction
+
+        :param pieces: List of lower case static strings and :class:`TemplateKey` objects.
+        :param optional_key: Key which may be left without a value, if any.
+        """
+        expression = ""
+        for piece in pieces:
+            if isinstance(piece, basestring):
+                expression += re.escape(piece)
+            else:
+                expression += _get_key_expression(piece, piece is optional_key)
+        self._regex = re.compile(expression + r"\Z", re.IGNORECASE | re.DOTALL)
+
+        # strings the beginning and the end of the segment can match
+        self._heads, complete = _expand_pieces(pieces, optional_key)
+        # all the strings the segment can match, if there aren't too many
+        self._values = self._heads if complete else None
+        self._tails, _ = _expand_pieces(pieces, optional_key, from_end=True)
+
+    def can_overlap(self, other):
+        """
+        Returns True if a path segment can possibly match both segments.
+
+        :param other: :class:`_Segment` instance.
+        """
+        if self._values is not None:
+            return any(other._regex.match(value) for value in self._values)
+        if other._values is not None:
+            return any(self._regex.match(value) for value in other._values)
+
+        if not any(h.startswith(o) or o.startswith(h) for h in self._heads for o in other._heads):
+            return False
+        if not any(t.endswith(o) or o.endswith(t) for t in self._tails for o in other._tails):
+            return False
+        return True
+
+
+def _get_variations(template):
+    """
+    Splits the variations of a template into path segments.
+
+    :param template: :class:`Template` instance.
+    :returns: List of lists of :class:`_Segment` objects, None if the template can't be analysed.
+    """
+    if not isinstance(template, TemplatePath) or not os.path.isabs(template.root_path):
+        return None
+
+    regex = r"{(%s)}" % constants.TEMPLATE_KEY_NAME_REGEX
+    variations = []
+    for definition, keys in zip(template._definitions, template._keys):
+        expanded_definition = os.path.join(template.root_path, definition) if definition else template.root_path
+        pieces = re.split(regex, os.path.normpath(expanded_definition))
+
+        segments = []
+        segment_pieces = []
+        for index, piece in enumerate(pieces):
+            if index % 2:
+                segment_pieces.append(keys[piece])
+                continue
+            for static_index, static_piece in enumerate(piece.lower().split(os.path.sep)):
+                if static_index:
+                    segments.append(segment_pieces)
+                    segment_pieces = []
+                if static_piece:
+                    segment_pieces.append(static_piece)
+        segments.append(segment_pieces)
+
+        # the path parser resolves paths stopping right after the static token
+        # preceding the last key, leaving the key without a value.
+        optional_key = None
+        if len(pieces) > 3 and not pieces[-1]:
+            optional_key = keys[pieces[-2]]
+
+        variations.append([
+            _Segment(segment_pieces, optional_key if index == len(segments) - 1 else None)
+            for index, segment_pieces in enumerate(segments)
+        ])
+
+    return variations
+
+
+def _get_key_expression(key, optional):
+    """
+    Returns a regular expression matching all the valid string values of a key.
+
+    :param key: :class:`TemplateKey` instance.
+    :param optional: True if the value can be empty.
+    """
+    excluded_chars = _get_excluded_chars(key) + os.path.sep
+    return "[^%s]%s" % ("".join(re.escape(c) for c in excluded_chars), "*" if optional else "+")
+
+
+def _expand_pieces(pieces, optional_key, from_end=False):
+    """
+    Enumerates the strings the pieces of a path segment can match, stopping at the
+    first key whose values can't be enumerated or once there are too many strings.
+
+    :param pieces: List of lower case static strings and :class:`TemplateKey` objects.
+    :param optional_key: Key which may be left without a value, if any.
+    :param from_end: If True, the pieces are expanded from the end of the segment.
+    :returns: Tuple (strings, complete) where complete is True if all the pieces were expanded.
+    """
+    values = [""]
+    for piece in (reversed(pieces) if from_end else pieces):
+        if isinstance(piece, basestring):
+            choices = [piece]
+        elif (piece.validate_hook or piece.value_from_str_hook or not piece.choices or
+                not isinstance(piece, templatekey.StringKey)):
+            # only string key choices match their string values
+            return values, False
+        else:
+            choices = set(str(choice).lower() for choice in piece.choices)
+            if piece is optional_key:
+                choices.add("")
+
+        if len(values) * len(choices) > _MAX_SEGMENT_VALUES:
+            return values, False
+        if from_end:
+            values = [choice + value for choice in choices for value in values]
+        else:
+            values = [value + choice for value in values for choice in choices]
+
+    return values, True
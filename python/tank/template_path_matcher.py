@@ -0,0 +1,196 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Compiled, regular expression based matching of paths against a template variation.
+"""
+
+import os
+import re
+import string
+
+from .errors import TankError
+from . import templatekey
+
+# ascii characters that can never be part of an alphanumeric or alpha string key
+# value. Non-ascii characters are always let through since the key validation
+# is done in unicode space and we only need a superset of the valid characters.
+_ASCII_CHARS = "".join(chr(x) for x in range(128))
+_NON_ALNUM_CHARS = "".join(c for c in _ASCII_CHARS if c not in string.ascii_letters + string.digits)
+_NON_ALPHA_CHARS = "".join(c for c in _ASCII_CHARS if c not in string.ascii_letters)
+_NON_INTEGER_CHARS = "".join(c for c in _ASCII_CHARS if c not in string.digits + " ")
+
+
+class TemplatePathMatcher(object):
+    """
+    Matches a path against the keys and static tokens of a single template
+    variation using a regular expression which is compiled once.
+
+    The matcher is only a fast path for :class:`TemplatePathParser` - it only
+    takes a decision when the structure of the template guarantees that there is
+    a single way to split a path into key values, in which case the result is
+    identical to the one of the parser. In all other cases :meth:`match_path`
+    returns :attr:`UNDECIDED` and the caller should fall back to the parser.
+    """
+
+    # returned by match_path when the matcher can't take a decision
+    UNDECIDED = object()
+
+    def __init__(self, ordered_keys, static_tokens):
+        """
+        Construction
+
+        :param ordered_keys:    Template key objects in order that they appear in the
+                                template definition.
+        :param static_tokens:   Pieces of the definition that don't represent Template Keys,
+                                lower cased.
+        """
+        self.ordered_keys = ordered_keys
+        self.static_tokens = static_tokens
+        self._regex = self.__compile()
+
+    @property
+    def is_compiled(self):
+        """
+        True if the template variation could be compiled into a regular expression,
+        False if all paths will be left to the parser.
+        """
+        return self._regex is not None
+
+    def match_path(self, input_path, skip_keys=None):
+        """
+        Matches a path against the template variation.
+
+        :param input_path:  The path to parse.
+        :param skip_keys:   List of keys for whom we do not need to find values.
+
+        :returns:           A dictionary of fields mapping key names to their values,
+                            None if the path doesn't fit the template or
+                            :attr:`UNDECIDED` if the path should be handed over to
+                            the :class:`TemplatePathParser`.
+        """
+        if self._regex is None or skip_keys:
+            # values for skipped keys are not validated by the parser so there
+            # is no guarantee that a single way of splitting the path exists.
+            return self.UNDECIDED
+
+        input_path = os.path.normpath(input_path)
+        # all token comparisons are done case insensitively.
+        lower_path = input_path.lower()
+
+        # the parser also tries to resolve paths starting with a value for
+        # the first key, followed by the first static token. This can only
+        # happen if the first static token can be found after a separator
+        # free section at the beginning of the path.
+        first_token = self.static_tokens[0]
+        token_pos = lower_path.find(first_token, 1)
+        if token_pos != -1 and os.path.sep not in lower_path[:token_pos]:
+            return self.UNDECIDED
+
+        if not self.ordered_keys:
+            return {} if lower_path == first_token else None
+
+        match = self._regex.match(lower_path)
+        if match is None:
+            return None
+
+        fields = {}
+        str_values = {}
+        for index, key in enumerate(self.ordered_keys):
+            start, end = match.span(index + 1)
+            if start == -1:
+                # the path finishes with the last static token, the
+                # remaining key is left unresolved like the parser does.
+                break
+
+            str_value = input_path[start:end]
+            if key.length is not None and len(str_value) < key.length:
+                return None
+
+            previous_value = str_values.get(key.name)
+            if previous_value and previous_value != str_value:
+                # can't have two different values for the same key.
+                return None
+
+            try:
+                fields[key.name] = key.value_from_str(str_value)
+            except TankError:
+                return None
+            str_values[key.name] = str_value
+
+        return fields
+
+    def __compile(self):
+        """
+        Builds an anchored regular expression for the template variation if
+        the key values it contains can only be found in a single way.
+
+        :returns: Compiled regular expression or None.
+        """
+        num_keys = len(self.ordered_keys)
+        num_tokens = len(self.static_tokens)
+
+        if not num_tokens:
+            return None
+
+        if num_keys not in (num_tokens - 1, num_tokens):
+            # keys that aren't separated by static tokens
+            return None
+
+        for token, next_token in zip(self.static_tokens[1:-1], self.static_tokens[2:]):
+            # the parser accepts paths stopping on a static token following a key
+            # when that token is followed by another one inside its own characters.
+            if next_token in token[1:]:
+                return None
+
+        expression = "^%s" % re.escape(self.static_tokens[0])
+        for index, key in enumerate(self.ordered_keys):
+            excluded_chars = _get_excluded_chars(key) + os.path.sep
+            key_expression = "([^%s]+)" % "".join(re.escape(c) for c in excluded_chars)
+
+            if index + 1 < num_tokens:
+                next_token = self.static_tokens[index + 1]
+                if next_token[0] not in excluded_chars:
+                    # the key value could contain the beginning of the next
+                    # token, the path might be split in different ways.
+                    return None
+                expression += "%s%s" % (key_expression, re.escape(next_token))
+            elif index:
+                # last key without a trailing static token. The parser resolves
+                # paths stopping right after the last token once a value was
+                # found for the previous key, so the key is optional.
+                expression += "(?:%s)?" % key_expression
+            else:
+                expression += key_expression
+
+        return re.compile(expression + r"\Z")
+
+
+def _get_excluded_chars(key):
+    """
+    Returns the characters that can never be part of a value for a key.
+
+    :param key: :class:`TemplateKey` instance.
+    :returns: String of characters, possibly empty.
+    """
+    if key.validate_hook or key.value_from_str_hook:
+        # can't make assumptions about values validated by hooks.
+        return ""
+
+    if isinstance(key, templatekey.StringKey):
+        if key.filter_by == "alphanumeric":
+            return _NON_ALNUM_CHARS
+        if key.filter_by == "alpha":
+            return _NON_ALPHA_CHARS
+
+    elif isinstance(key, templatekey.IntegerKey) and not isinstance(key, templatekey.SequenceKey):
+        return _NON_INTEGER_CHARS
+
+    return ""
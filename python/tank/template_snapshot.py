@@ -0,0 +1,242 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+On disk snapshot of the keys and templates of a pipeline configuration.
+
+The snapshot holds the fully processed keys and templates, pickled, together with
+the modification time and size of every file which contributed to them and the
+include strings they were read through. Files provided by the preferences system
+are tracked by a digest of their data instead. The snapshot is only used as long as
+none of these files changed, every include still resolves to the same file and the
+storage roots are the same.
+"""
+
+import os
+import json
+import hashlib
+import cPickle as pickle
+
+from .errors import TankError
+from .util import filesystem
+from .util import yaml_cache
+from . import template_includes
+from . import constants
+from . import LogManager
+
+log = LogManager.get_logger(__name__)
+
+# bump this whenever the content of the snapshot changes
+SNAPSHOT_FORMAT_VERSION = 2
+
+# persistent id used in place of the pipeline configuration
+_PIPELINE_CONFIGURATION_ID = "pipeline_configuration"
+
+
+def is_snapshot_enabled():
+    """
+    Returns True if snapshots should be read and written when loading templates.
+    """
+    return not os.environ.get(constants.DISABLE_TEMPLATES_SNAPSHOT_ENV_VAR)
+
+
+def get_snapshot_path(pipeline_configuration):
+    """
+    Returns the path to the templates snapshot of a pipeline configuration.
+
+    :param pipeline_configuration: :class:`PipelineConfiguration` instance.
+    :returns: Path string.
+    """
+    return os.path.join(pipeline_configuration.get_cache_location(), constants.TEMPLATES_SNAPSHOT_FILE)
+
+
+def load_snapshot(pipeline_configuration, per_platform_roots):
+    """
+    Loads the templates snapshot of a pipeline configuration if it is up to date.
+
+    :param pipeline_configuration: :class:`PipelineConfiguration` instance.
+    :param per_platform_roots: Root paths for all platforms, as returned by
+                               :meth:`PipelineConfiguration.get_all_platform_data_roots`.
+    :returns: Tuple (templates, keys) or None if there is no valid snapshot.
+    """
+    try:
+        snapshot_path = get_snapshot_path(pipeline_configuration)
+    except Exception as e:
+        log.debug("Templates snapshot not available: %s" % e)
+        return None
+
+    if not os.path.exists(snapshot_path):
+        return None
+
+    try:
+        with open(snapshot_path, "rb") as fh:
+            # the header is stored separately so that the templates only get
+            # unpickled if the snapshot is up to date.
+            header = pickle.load(fh)
+            if header.get("version") != SNAPSHOT_FORMAT_VERSION:
+                log.debug("Ignoring templates snapshot %s with a different format." % snapshot_path)
+                return None
+
+            if header.get("roots") != per_platform_roots:
+                log.debug("Ignoring templates snapshot %s: the storage roots changed." % snapshot_path)
+                return None
+
+            files = header.get("files") or []
+            if _get_fingerprint([path for (path, _, _) in files]) != files:
+                log.debug("Ignoring templates snapshot %s: the templates config changed." % snapshot_path)
+                return None
+
+            # includes can use environment variables and ~, which can resolve
+            # differently for this process than for the one which wrote the snapshot.
+            if not _includes_resolve_to(header.get("includes") or []):
+                log.debug("Ignoring templates snapshot %s: the templates includes resolve "
+                          "to different files." % snapshot_path)
+                return None
+
+            unpickler = pickle.Unpickler(fh)
+            unpickler.persistent_load = lambda pid: _persistent_load(pid, pipeline_configuration)
+            templates, keys = unpickler.load()
+
+    except Exception as e:
+        log.warning("Could not read templates snapshot %s: %s" % (snapshot_path, e))
+        return None
+
+    log.debug("Read %d templates from snapshot %s" % (len(templates), snapshot_path))
+    return templates, keys
+
+
+def write_snapshot(pipeline_configuration, templates, keys, config_files, includes, per_platform_roots):
+    """
+    Writes the templates snapshot of a pipeline configuration.
+
+    :param pipeline_configuration: :class:`PipelineConfiguration` instance.
+    :param templates: Dictionary of templates, keyed by name.
+    :param keys: Dictionary of template keys, keyed by name.
+    :param config_files: Paths to all the yml files the templates were read from.
+    :param includes: List of (file name, include, resolved path) tuples for all the
+                     includes processed while reading the templates.
+    :param per_platform_roots: Root paths for all platforms the templates were created with.
+    :returns: Path to the snapshot.
+    :raises: :class:`TankError` if the snapshot can't be written.
+    """
+    paths = list(config_files) + _get_core_files()
+    files = _get_fingerprint(paths)
+    if files is None:
+        raise TankError("The templates config can't be snapshotted since some of its "
+                        "files can't be accessed: %s" % ", ".join(
+                            path for path in paths if _get_fingerprint([path]) is None
+                        ))
+
+    header = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "roots": per_platform_roots,
+        "files": files,
+        "includes": list(includes),
+    }
+
+    snapshot_path = get_snapshot_path(pipeline_configuration)
+    # write to a temporary file first so that concurrent readers
+    # never see a partially written snapshot.
+    tmp_path = "%s.%d.tmp" % (snapshot_path, os.getpid())
+    try:
+        filesystem.ensure_folder_exists(os.path.dirname(snapshot_path))
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(header, fh, pickle.HIGHEST_PROTOCOL)
+            pickler = pickle.Pickler(fh, pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = lambda obj: _persistent_id(obj, pipeline_configuration)
+            pickler.dump((templates, keys))
+
+        if os.path.exists(snapshot_path):
+            # renaming over an existing file isn't supported on windows
+            filesystem.safe_delete_file(snapshot_path)
+        os.rename(tmp_path, snapshot_path)
+    except Exception as e:
+        filesystem.safe_delete_file(tmp_path)
+        raise TankError("Could not write templates snapshot %s: %s" % (snapshot_path, e))
+
+    log.debug("Wrote %d templates to snapshot %s" % (len(templates), snapshot_path))
+    return snapshot_path
+
+
+def _persistent_id(obj, pipeline_configuration):
+    """
+    Pickler hook, replacing the pipeline configuration with a persistent id.
+    """
+    if obj is pipeline_configuration:
+        return _PIPELINE_CONFIGURATION_ID
+    return None
+
+
+def _persistent_load(pid, pipeline_configuration):
+    """
+    Unpickler hook, resolving the pipeline configuration persistent id.
+    """
+    if pid == _PIPELINE_CONFIGURATION_ID:
+        return pipeline_configuration
+    raise pickle.UnpicklingError("Invalid persistent id: %s" % pid)
+
+
+def _get_core_files():
+    """
+    Returns the files of the modules defining the snapshotted classes, so that
+    snapshots are invalidated when the core is updated. Depending on how the core
+    is deployed and was imported, these are the source or the compiled files.
+    """
+    from . import template, templatekey
+
+    return [module.__file__ for module in (template, templatekey)]
+
+
+def _includes_resolve_to(includes):
+    """
+    Checks that includes still resolve to the files they were resolved to.
+
+    :param includes: List of (file name, include, resolved path) tuples.
+    :returns: True if every include resolves to the same path, False otherwise.
+    """
+    for (file_name, include, resolved_path) in includes:
+        try:
+            path = template_includes._resolve_include(file_name, include)
+        except TankError:
+            # the include file doesn't exist anymore.
+            return False
+        if path != resolved_path:
+            return False
+    return True
+
+
+def _get_fingerprint(paths):
+    """
+    Returns the modification time and size of files.
+
+    Files provided by the preferences system, whose paths start with ``{preferences}``,
+    aren't files on disk. They are identified by the digest of the data the yaml cache
+    reads for them instead of their modification time, their size being None.
+
+    :param paths: List of file paths.
+    :returns: List of (path, mtime or digest, size) tuples or None if a file can't be found.
+    """
+    fingerprint = []
+    for path in paths:
+        if path.startswith("{preferences}"):
+            try:
+                data = yaml_cache.g_yaml_cache.get(path, deepcopy_data=False)
+                digest = hashlib.md5(json.dumps(data, sort_keys=True, default=str)).hexdigest()
+            except Exception as e:
+                log.debug("Could not read %s: %s" % (path, e))
+                return None
+            fingerprint.append((path, digest, None))
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        fingerprint.append((path, stat.st_mtime, stat.st_size))
+    return fingerprint
@@ -0,0 +1,361 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Directory walker used to find the paths matching a partially resolved template.
+"""
+
+import os
+import re
+
+from .errors import TankError
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        # fall back on os.listdir
+        scandir = None
+
+# placeholders are inserted in search paths in place of the values of the keys
+# that need to be searched for.
+_PLACEHOLDER = "\0%s\0"
+_PLACEHOLDER_REGEX = re.compile("\0([^\0]*)\0")
+
+
+def get_placeholder(key_name):
+    """
+    Returns the string to use as a value for a key which should be searched for.
+
+    :param key_name: Name of the key.
+    :returns: Placeholder string.
+    """
+    return _PLACEHOLDER % key_name
+
+
+class TemplatePathWalker(object):
+    """
+    Finds the files and folders matching a search path, i.e. a path built from a
+    template variation where the values of the keys to search for are placeholders
+    returned by :meth:`get_placeholder`.
+
+    The file system is walked one path segment at a time and directory entries
+    are only descended into when the values they hold for the keys are valid, so
+    invalid branches of the tree are never listed. Paths returned by :meth:`walk`
+    should still be validated against the template.
+    """
+
+    def __init__(self, search_path, keys):
+        """
+        Construction
+
+        :param search_path: Path with placeholders in place of the searched key values.
+        :param keys:        Dictionary of the :class:`TemplateKey` objects of the template
+                            variation the search path was built from, keyed by name.
+        """
+        self._search_path = search_path
+        self._segments = []
+
+        placeholder_match = _PLACEHOLDER_REGEX.search(search_path)
+        if placeholder_match is None:
+            # nothing to search for
+            self._base_path = search_path
+            return
+
+        # everything up to the segment holding the first placeholder can be used as is.
+        base_end = search_path.rfind(os.path.sep, 0, placeholder_match.start()) + 1
+        self._base_path = search_path[:base_end]
+        for segment in search_path[base_end:].split(os.path.sep):
+            if _PLACEHOLDER_REGEX.search(segment):
+                self._segments.append(_Segment(segment, keys))
+            else:
+                self._segments.append(segment)
+
+    @property
+    def pattern(self):
+        """
+        The search path in glob syntax, with wildcards in place of the placeholders.
+        """
+        return _PLACEHOLDER_REGEX.sub("*", self._search_path)
+
+    def walk(self):
+        """
+        Walks the file system, yielding paths matching the search path.
+
+        :returns: Generator of paths, in no particular order.
+        """
+        if not self._segments:
+            if os.path.lexists(self._base_path):
+                yield self._base_path
+            return
+
+        leaf_segment = self._segments[-1]
+        for path, str_values in self._walk_leaf_folders():
+            if not isinstance(leaf_segment, _Segment):
+                leaf_path = os.path.join(path, leaf_segment)
+                if os.path.lexists(leaf_path):
+                    yield leaf_path
+                continue
+
+            for name, _ in _scan_dir(path):
+                if leaf_segment.match(name, str_values) is not None:
+                    yield os.path.join(path, name)
+
+    def supports_sequences(self, key_name):
+        """
+        Returns True if :meth:`walk_sequences` can be used for a sequence key, i.e.
+        if the key only appears once in the search path, in its last segment, and
+        its values can be told apart from the values of the other keys.
+
+        :param key_name: Name of the sequence key.
+        """
+        if not self._segments or not isinstance(self._segments[-1], _Segment):
+            return False
+
+        for segment in self._segments[:-1]:
+            if isinstance(segment, _Segment) and key_name in segment.key_names:
+                return False
+
+        return self._segments[-1].supports_sequence(key_name)
+
+    def walk_sequences(self, key_name):
+        """
+        Walks the file system, grouping the files which only differ by
+        the value of a sequence key. Only valid if :meth:`supports_sequences`
+        returns True for the key.
+
+        :param key_name: Name of the sequence key.
+        :returns: Generator of (path, frames) tuples, where path is the path to
+                  one of the files of the sequence and frames the list of
+                  values found for the sequence key.
+        """
+        leaf_segment = self._segments[-1]
+        for path, str_values in self._walk_leaf_folders():
+            # frames keyed by the parts of the file names around them
+            sequences = {}
+            for name, _ in _scan_dir(path):
+                result = leaf_segment.match_sequence(name, str_values, key_name)
+                if result is None:
+                    continue
+                prefix, suffix, frame = result
+                if (prefix, suffix) in sequences:
+                    sequences[(prefix, suffix)][1].append(frame)
+                else:
+                    sequences[(prefix, suffix)] = (name, [frame])
+
+            for name, frames in sequences.itervalues():
+                yield os.path.join(path, name), frames
+
+    def _walk_leaf_folders(self):
+        """
+        Walks the file system, yielding the folders matching all the segments
+        of the search path but the last one.
+
+        :returns: Generator of (path, str_values) tuples, where str_values is a
+                  dictionary of the string values found for the keys along the way.
+        """
+        last_index = len(self._segments) - 1
+        # depth first traversal, keeping track of the key values found along the
+        # way so that keys appearing several times in the path are only listed once.
+        stack = [(self._base_path, 0, {})]
+        while stack:
+            path, index, str_values = stack.pop()
+            if index == last_index:
+                yield path, str_values
+                continue
+
+            segment = self._segments[index]
+            if not isinstance(segment, _Segment):
+                stack.append((os.path.join(path, segment), index + 1, str_values))
+                continue
+
+            for name, is_dir in _scan_dir(path):
+                if is_dir is False:
+                    continue
+                child_values = segment.match(name, str_values)
+                if child_values is not None:
+                    stack.append((os.path.join(path, name), index + 1, child_values))
+
+
+class _Segment(object):
+    """
+    Path segment containing placeholders.
+    """
+
+    def __init__(self, pattern, keys):
+        """
+        Construction
+
+        :param pattern: Segment of the search path.
+        :param keys:    Dictionary of :class:`TemplateKey` objects, keyed by name.
+        """
+        # alternating static strings and key names
+        self._pieces = _PLACEHOLDER_REGEX.split(pattern)
+        self.key_names = self._pieces[1::2]
+        self._keys = keys
+        # like glob, only match hidden entries if explicitly asked for.
+        self._match_hidden = self._pieces[0].startswith(".")
+        # regular expressions keyed by the known values of the segment keys
+        self._regexes = {}
+
+    def _get_regex(self, known_values, digits_key_name=None):
+        """
+        Returns the regular expression matching the segment and the
+        names of the keys it captures a value for.
+
+        :param known_values: Tuple with the value of each placeholder of the
+                             segment, None for the ones that are unknown.
+        :param digits_key_name: Optional name of a key only made of digits.
+        """
+        regex_key = (known_values, digits_key_name)
+        if regex_key not in self._regexes:
+            expression = ""
+            group_names = []
+            for index, piece in enumerate(self._pieces):
+                if not index % 2:
+                    expression += re.escape(os.path.normcase(piece))
+                    continue
+
+                known_value = known_values[index // 2]
+                if known_value is not None:
+                    expression += re.escape(os.path.normcase(known_value))
+                elif piece in group_names:
+                    # the same key can't have different values
+                    expression += "(?P=k%d)" % group_names.index(piece)
+                else:
+                    value_expression = r"\d+" if piece == digits_key_name else ".*"
+                    expression += "(?P<k%d>%s)" % (len(group_names), value_expression)
+                    group_names.append(piece)
+
+            self._regexes[regex_key] = (re.compile(expression + r"\Z", re.DOTALL), group_names)
+
+        return self._regexes[regex_key]
+
+    def match(self, name, str_values):
+        """
+        Matches a directory entry against the segment.
+
+        :param name:        Name of the directory entry.
+        :param str_values:  Dictionary of the string values found for keys in
+                            the parent segments.
+        :returns:           Dictionary of string values, updated with the values of
+                            the keys of this segment, or None if the entry doesn't match.
+        """
+        if not self._match_hidden and name.startswith("."):
+            return None
+
+        known_values = tuple(str_values.get(key_name) for key_name in self.key_names)
+        regex, group_names = self._get_regex(known_values)
+        match = regex.match(os.path.normcase(name))
+        if match is None:
+            return None
+
+        if len(group_names) != 1 or self.key_names.count(group_names[0]) != 1:
+            # several values in the same segment, there is no single way to
+            # split the entry name into values, let the template decide.
+            return str_values
+
+        key_name = group_names[0]
+        start, end = match.span(1)
+        str_value = name[start:end]
+        if self._get_value(key_name, str_value) is None:
+            return None
+
+        str_values = dict(str_values)
+        str_values[key_name] = str_value
+        return str_values
+
+    def supports_sequence(self, key_name):
+        """
+        Returns True if :meth:`match_sequence` can be used for a sequence key.
+
+        :param key_name: Name of the sequence key.
+        """
+        if self.key_names.count(key_name) != 1:
+            return False
+
+        # the values of keys directly before or after the sequence key can't be
+        # told apart from the frame numbers.
+        index = 2 * self.key_names.index(key_name) + 1
+        if index > 1 and not self._pieces[index - 1]:
+            return False
+        if index < len(self._pieces) - 2 and not self._pieces[index + 1]:
+            return False
+        return True
+
+    def match_sequence(self, name, str_values, key_name):
+        """
+        Matches a directory entry against the segment, isolating the value of a
+        sequence key. Only valid if :meth:`supports_sequence` returns True for the key.
+
+        :param name:        Name of the directory entry.
+        :param str_values:  Dictionary of the string values found for keys in
+                            the parent segments.
+        :param key_name:    Name of the sequence key.
+        :returns:           Tuple (prefix, suffix, frame) where prefix and suffix are
+                            the parts of the name around the frame number, or None if
+                            the entry doesn't match.
+        """
+        if not self._match_hidden and name.startswith("."):
+            return None
+
+        known_values = tuple(
+            None if segment_key_name == key_name else str_values.get(segment_key_name)
+            for segment_key_name in self.key_names
+        )
+        regex, group_names = self._get_regex(known_values, key_name)
+        match = regex.match(os.path.normcase(name))
+        if match is None:
+            return None
+
+        start, end = match.span(group_names.index(key_name) + 1)
+        frame = self._get_value(key_name, name[start:end])
+        if frame is None:
+            return None
+
+        return name[:start], name[end:], frame
+
+    def _get_value(self, key_name, str_value):
+        """
+        Returns the value of a key from a string, or None if the string is invalid.
+        """
+        key = self._keys[key_name]
+        if key.length is not None and len(str_value) < key.length:
+            return None
+        try:
+            return key.value_from_str(str_value)
+        except TankError:
+            return None
+
+
+def _scan_dir(path):
+    """
+    Lists a directory.
+
+    :param path: Path to the directory.
+    :returns: List of (name, is_dir) tuples, where is_dir is None if unknown.
+              The list is empty if the directory can't be listed.
+    """
+    try:
+        if scandir is None:
+            return [(name, None) for name in os.listdir(path)]
+
+        entries = []
+        for entry in scandir(path):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = None
+            entries.append((entry.name, is_dir))
+        return entries
+    except OSError:
+        return []
@@ -715,6 +715,29 @@ class TimestampKey(TemplateKey):
         """
         return self._format_spec
 
+    def __getstate__(self):
+        """
+        Returns the state of the key for pickling. The bound methods used as
+        default values for ``now`` and ``utc_now`` can't be pickled so they
+        are replaced by their setting value.
+        """
+        state = self.__dict__.copy()
+        if self._default == self.__get_current_time:
+            state["_default"] = "now"
+        elif self._default == self.__get_current_utc_time:
+            state["_default"] = "utc_now"
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the state of an unpickled key.
+        """
+        self.__dict__.update(state)
+        if self._default == "now":
+            self._default = self.__get_current_time
+        elif self._default == "utc_now":
+            self._default = self.__get_current_utc_time
+
     def __get_current_time(self):
         """
         Returns the current time as a datetime.datetime instance.
@@ -49,3 +49,9 @@ SHOTGUN_SCHEMA_CACHE_KEY = "shotgun_schema"
 # tk instance cache of sg local storages
 SHOTGUN_LOCAL_STORAGES_CACHE_KEY = "shotgun_local_storages"
 
+
+# number of seconds the Shotgun records found by batched queries are kept in cache
+SHOTGUN_FIND_CACHE_TTL = 60
+
+# maximum number of values sent in a single "in" filter by batched queries
+SHOTGUN_FIND_BATCH_SIZE = 100
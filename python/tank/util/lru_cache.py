@@ -0,0 +1,136 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Bounded, least recently used cache.
+"""
+
+from __future__ import with_statement
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread safe cache holding a maximum number of items, discarding the
+    least recently used ones first. Hits and misses are counted::
+
+        >>> cache = LRUCache(2)
+        >>> cache.set("a", 1)
+        >>> cache.get("a")
+        (True, 1)
+        >>> cache.get("b")
+        (False, None)
+        >>> cache.info
+        {'hits': 1, 'misses': 1, 'size': 1, 'max_size': 2}
+    """
+
+    def __init__(self, max_size):
+        """
+        Construction
+
+        :param int max_size: Maximum number of items held by the cache.
+        """
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __getstate__(self):
+        """
+        Cached items and locks aren't pickled.
+        """
+        return {"max_size": self._max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_size"])
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def max_size(self):
+        """
+        Maximum number of items held by the cache.
+        """
+        return self._max_size
+
+    @property
+    def info(self):
+        """
+        Dictionary with the number of hits and misses, the current size
+        and the maximum size of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._items),
+                "max_size": self._max_size,
+            }
+
+    def get(self, key):
+        """
+        Returns a cached item, marking it as the most recently used.
+
+        :param key: Hashable key of the item.
+        :returns: Tuple (found, value).
+        """
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self._misses += 1
+                return False, None
+            self._items[key] = value
+            self._hits += 1
+            return True, value
+
+    def set(self, key, value):
+        """
+        Caches an item, discarding the least recently used item if the cache is full.
+
+        :param key: Hashable key of the item.
+        :param value: Value to cache.
+        """
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+    def keys(self):
+        """
+        Returns the keys of the cached items, from the least to the most recently used.
+
+        :returns: List of keys.
+        """
+        with self._lock:
+            return list(self._items.keys())
+
+    def pop(self, key):
+        """
+        Removes an item from the cache.
+
+        :param key: Hashable key of the item.
+        """
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all items from the cache and resets the counters.
+        """
+        with self._lock:
+            self._items.clear()
+            self._hits = 0
+            self._misses = 0
@@ -0,0 +1,302 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Batching of Shotgun queries and time limited caching of their results.
+"""
+
+from __future__ import with_statement
+
+import copy
+import time
+import threading
+
+from . import constants
+
+
+class ShotgunFindCache(object):
+    """
+    Thread safe cache of Shotgun query results, where each item
+    expires after a given number of seconds.
+    """
+
+    def __init__(self, ttl):
+        """
+        Construction
+
+        :param ttl: Number of seconds items are kept in cache.
+        """
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a cached item.
+
+        :param key: Hashable key of the item.
+        :returns: Tuple (found, value).
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False, None
+            expiry, value = item
+            if expiry < time.time():
+                del self._items[key]
+                return False, None
+            return True, value
+
+    def set(self, key, value):
+        """
+        Caches an item.
+
+        :param key: Hashable key of the item.
+        :param value: Value to cache.
+        """
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl, value)
+
+    def clear(self):
+        """
+        Removes all items from the cache.
+        """
+        with self._lock:
+            self._items.clear()
+
+
+# cache shared by all batched queries
+_g_find_cache = ShotgunFindCache(constants.SHOTGUN_FIND_CACHE_TTL)
+
+
+def get_find_cache():
+    """
+    Returns the cache shared by all batched queries.
+
+    :returns: :class:`ShotgunFindCache` instance.
+    """
+    return _g_find_cache
+
+
+class BatchedFind(object):
+    """
+    Runs many single record searches, similar to ``find_one`` calls, as few
+    ``find`` calls as possible.
+
+    Searches on the same entity type with the same fields, whose filters only differ
+    by the values of ``is`` filters, are merged into a single query using ``in``
+    filters. The records returned are then dispatched back to each search. Records
+    found are kept in the shared :class:`ShotgunFindCache` for subsequent searches::
+
+        >>> batch = BatchedFind(sg)
+        >>> shot_1 = batch.add("Shot", [["code", "is", "shot_1"]], ["code"])
+        >>> shot_2 = batch.add("Shot", [["code", "is", "shot_2"]], ["code"])
+        >>> batch.execute()
+        >>> batch.get(shot_1)
+        {'type': 'Shot', 'id': 1, 'code': 'shot_1'}
+    """
+
+    def __init__(self, sg, cache=None):
+        """
+        Construction
+
+        :param sg: Shotgun API instance.
+        :param cache: Optional :class:`ShotgunFindCache`, the shared one is used by default.
+        """
+        self._sg = sg
+        self._cache = cache or get_find_cache()
+        self._site = getattr(sg, "base_url", None)
+        # searches keyed by id
+        self._searches = {}
+        self._results = {}
+
+    def add(self, entity_type, filters, fields):
+        """
+        Adds a search to the batch.
+
+        :param str entity_type: Entity type to search for.
+        :param list filters: Shotgun filters.
+        :param list fields: Fields to return.
+        :returns: Search id, to pass to :meth:`get` once the batch is executed.
+        """
+        search_id = (self._site, entity_type, _freeze(filters), tuple(sorted(fields)))
+        if search_id not in self._searches:
+            self._searches[search_id] = (entity_type, filters, fields)
+        return search_id
+
+    def execute(self):
+        """
+        Runs the searches which can't be resolved from the cache.
+        """
+        groups = {}
+        for search_id, search in self._searches.iteritems():
+            if search_id in self._results:
+                continue
+            found, entity = self._cache.get(search_id)
+            if found:
+                self._results[search_id] = entity
+                continue
+
+            entity_type, filters, fields = search
+            group_key = (entity_type, search_id[-1], tuple(_get_filter_shape(f) for f in filters))
+            groups.setdefault(group_key, []).append(search_id)
+
+        for search_ids in groups.itervalues():
+            for offset in xrange(0, len(search_ids), constants.SHOTGUN_FIND_BATCH_SIZE):
+                self._execute_group(search_ids[offset:offset + constants.SHOTGUN_FIND_BATCH_SIZE])
+
+    def get(self, search_id):
+        """
+        Returns the record found by a search.
+
+        :param search_id: Id returned by :meth:`add`.
+        :returns: Entity dictionary or None if no record was found.
+        """
+        entity = self._results.get(search_id)
+        # records are shared with the cache
+        return copy.deepcopy(entity)
+
+    def _execute_group(self, search_ids):
+        """
+        Runs searches on the same entity type, with the same fields and filter shapes.
+
+        :param search_ids: List of search ids.
+        """
+        entity_type, filters, fields = self._searches[search_ids[0]]
+
+        # find the filters whose values differ between searches
+        varying = []
+        if len(search_ids) > 1:
+            for index, sg_filter in enumerate(filters):
+                values = set(search_id[2][index] for search_id in search_ids)
+                if len(values) > 1:
+                    if _get_filter_shape(sg_filter)[1:] != ("is",):
+                        varying = None
+                        break
+                    varying.append(index)
+
+        if not varying:
+            for search_id in search_ids:
+                self._set_result(search_id, self._sg.find_one(*self._searches[search_id]))
+            return
+
+        batch_filters = []
+        for index, sg_filter in enumerate(filters):
+            if index not in varying:
+                batch_filters.append(sg_filter)
+                continue
+            values = {}
+            for search_id in search_ids:
+                value = self._searches[search_id][1][index][2]
+                values.setdefault(search_id[2][index][2], value)
+            batch_filters.append([sg_filter[0], "in", values.values()])
+
+        batch_fields = list(fields)
+        for index in varying:
+            if filters[index][0] not in batch_fields:
+                batch_fields.append(filters[index][0])
+
+        records = self._sg.find(entity_type, batch_filters, batch_fields)
+        for record in records:
+            for index in varying:
+                if filters[index][0] not in record:
+                    # can't tell which search the record belongs to
+                    for search_id in search_ids:
+                        self._set_result(search_id, self._sg.find_one(*self._searches[search_id]))
+                    return
+
+        for search_id in search_ids:
+            search_filters = self._searches[search_id][1]
+            for record in records:
+                if all(_values_match(record[search_filters[i][0]], search_filters[i][2]) for i in varying):
+                    entity = dict(
+                        (name, value) for name, value in record.iteritems()
+                        if name in ("type", "id") or name in fields
+                    )
+                    self._set_result(search_id, entity)
+                    break
+            else:
+                self._set_result(search_id, None)
+
+    def _set_result(self, search_id, entity):
+        """
+        Stores the result of a search, caching records which were found.
+        """
+        self._results[search_id] = entity
+        if entity is not None:
+            self._cache.set(search_id, entity)
+
+
+def find_entity_fields(sg, entity_type, entity_ids, field_names, cache=None):
+    """
+    Retrieves field values for many records of the same type, with a single ``find``
+    call per batch of ids. Values found are kept in the shared :class:`ShotgunFindCache`.
+
+    :param sg: Shotgun API instance.
+    :param str entity_type: Entity type of the records.
+    :param entity_ids: Iterable of record ids.
+    :param field_names: Iterable of field names.
+    :param cache: Optional :class:`ShotgunFindCache`, the shared one is used by default.
+    :returns: Dictionary of {field name: value} dictionaries, keyed by record id.
+              Ids of records which can't be found are not part of it.
+    """
+    cache = cache or get_find_cache()
+    site = getattr(sg, "base_url", None)
+    field_names = sorted(set(field_names))
+
+    records = {}
+    missing_ids = []
+    for entity_id in sorted(set(entity_ids)):
+        found, record = cache.get((site, entity_type, entity_id, tuple(field_names)))
+        if found:
+            records[entity_id] = dict(record)
+        else:
+            missing_ids.append(entity_id)
+
+    for offset in xrange(0, len(missing_ids), constants.SHOTGUN_FIND_BATCH_SIZE):
+        batch_ids = missing_ids[offset:offset + constants.SHOTGUN_FIND_BATCH_SIZE]
+        for result in sg.find(entity_type, [["id", "in", batch_ids]], field_names):
+            record = dict((name, result.get(name)) for name in field_names)
+            cache.set((site, entity_type, result["id"], tuple(field_names)), record)
+            records[result["id"]] = dict(record)
+
+    return records
+
+
+def _get_filter_shape(sg_filter):
+    """
+    Returns the parts of a filter which need to be identical for searches to be batched.
+    """
+    if isinstance(sg_filter, (list, tuple)) and len(sg_filter) == 3:
+        return (sg_filter[0], sg_filter[1])
+    return (_freeze(sg_filter),)
+
+
+def _freeze(value):
+    """
+    Turns filters into a hashable value. Entity dictionaries are reduced to their type and id.
+    """
+    if isinstance(value, dict):
+        if "type" in value and "id" in value:
+            return ("entity", value["type"], value["id"])
+        return tuple(sorted((k, _freeze(v)) for k, v in value.iteritems()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, basestring):
+        # Shotgun text filters are case insensitive
+        return value.lower()
+    return value
+
+
+def _values_match(record_value, filter_value):
+    """
+    Returns True if a value returned by Shotgun matches the value of an ``is`` filter.
+    """
+    return _freeze(record_value) == _freeze(filter_value)
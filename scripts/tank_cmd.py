@@ -1283,12 +1283,17 @@ def run_engine_cmd(pipeline_config_root, context_items, command, using_cwd, args
     if ctx is not None:
         logger.info("- Setting the Context to %s." % ctx)
 
-    if command is None:
-        return _list_commands(tk, ctx)
-    else:
-        # pass over to the tank commands api - this will take over command execution,
-        # setup the objects accordingly etc.
-        return run_action(logger, tk, ctx, command, args)
+    try:
+        if command is None:
+            return _list_commands(tk, ctx)
+        else:
+            # pass over to the tank commands api - this will take over command execution,
+            # setup the objects accordingly etc.
+            return run_action(logger, tk, ctx, command, args)
+    finally:
+        # release the path cache connections held by the toolkit instance
+        if tk is not None:
+            tk.close()
 
 
 def _extract_args(cmd_line, args):
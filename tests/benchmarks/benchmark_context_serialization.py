@@ -0,0 +1,193 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Compares the pickle and the JSON serialization formats of contexts.
+
+A test project is set up the same way the unit tests do it, with a few shot step
+contexts registered in the path cache. Each context is serialized, deserialized and
+then used the way a freshly launched engine does it, by resolving its entity
+locations and the fields of its work area templates. No network access is required.
+
+Usage:
+
+    python benchmark_context_serialization.py [options]
+
+    --iterations N      Number of operations timed per benchmark (default 2000).
+    --shots N           Number of shot step contexts (default 20).
+    --filter NAME       Only run the benchmarks whose name contains NAME.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import optparse
+
+from mock import patch
+
+from benchmark_templates import Benchmark
+
+from tank import Context
+from tank.template import TemplatePath
+from tank.templatekey import StringKey
+from tank_test import tank_test_base
+from tank_test.tank_test_base import TankTestBase
+
+_STEPS = ["anim", "light", "comp"]
+
+
+class ContextSerializationBenchmarks(TankTestBase):
+    """
+    Project with shot step folders in its path cache, providing the benchmarks.
+    """
+
+    def __init__(self, num_shots):
+        """
+        :param int num_shots: Number of shot step contexts.
+        """
+        super(ContextSerializationBenchmarks, self).__init__("get_benchmarks")
+        self._num_shots = num_shots
+
+    def setUp(self):
+        super(ContextSerializationBenchmarks, self).setUp()
+
+        self._step_paths = []
+        seq = {"type": "Sequence", "code": "seq_001", "id": 1, "project": self.project}
+        seq_path = os.path.join(self.project_root, "sequences", seq["code"])
+        self.add_production_path(seq_path, seq)
+        for shot_id in range(self._num_shots):
+            shot = {
+                "type": "Shot", "code": "shot_%04d" % shot_id, "id": shot_id + 1,
+                "sg_sequence": seq, "project": self.project,
+            }
+            shot_path = os.path.join(seq_path, shot["code"])
+            self.add_production_path(shot_path, shot)
+            step_index = shot_id % len(_STEPS)
+            step = {"type": "Step", "code": _STEPS[step_index], "id": step_index + 1}
+            step_path = os.path.join(shot_path, step["code"])
+            self.add_production_path(step_path, step)
+            self._step_paths.append(step_path)
+
+        patcher = patch("tank.api.read_templates", side_effect=self._read_templates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tk.reload_templates()
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _read_templates(self, pipeline_configuration):
+        """
+        Returns the work area templates of shots and assets.
+        """
+        keys = {
+            "Sequence": StringKey("Sequence", pipeline_configuration, shotgun_entity_type="Sequence"),
+            "Shot": StringKey("Shot", pipeline_configuration, shotgun_entity_type="Shot"),
+            "Step": StringKey("Step", pipeline_configuration, shotgun_entity_type="Step"),
+            "Asset": StringKey("Asset", pipeline_configuration, shotgun_entity_type="Asset"),
+        }
+        definitions = {
+            "shot_root": "sequences/{Sequence}/{Shot}",
+            "shot_work_area": "sequences/{Sequence}/{Shot}/{Step}/work",
+            "shot_publish_area": "sequences/{Sequence}/{Shot}/{Step}/publish",
+            "asset_work_area": "assets/{Asset}/{Step}/work",
+        }
+        templates = dict(
+            (name, TemplatePath(definition, keys, pipeline_configuration, self.project_root))
+            for name, definition in definitions.items()
+        )
+        return templates, keys
+
+    def get_benchmarks(self):
+        """
+        Builds the contexts and the benchmarks.
+
+        :returns: List of (pickle :class:`Benchmark`, json :class:`Benchmark`) tuples.
+        """
+        contexts = [self.tk.context_from_path(path) for path in self._step_paths]
+        pickled = [context.serialize(with_user_credentials=False) for context in contexts]
+        dumped = [context.serialize(with_user_credentials=False, use_json=True) for context in contexts]
+        print("pickle: %d bytes per context, json: %d bytes per context" % (
+            sum(len(data) for data in pickled) // len(pickled),
+            sum(len(data) for data in dumped) // len(dumped),
+        ))
+
+        template_names = sorted(name for name in self.tk.templates if name.startswith("shot_"))
+
+        def use_context(context_str):
+            context = Context.deserialize(context_str)
+            context.entity_locations
+            for name in template_names:
+                context.as_template_fields(context.sgtk.templates[name])
+
+        return [
+            (
+                Benchmark("pickle serialize", lambda context: context.serialize(with_user_credentials=False),
+                          contexts),
+                Benchmark("json serialize",
+                          lambda context: context.serialize(with_user_credentials=False, use_json=True), contexts),
+            ),
+            (
+                Benchmark("pickle deserialize", Context.deserialize, pickled),
+                Benchmark("json deserialize", Context.deserialize, dumped),
+            ),
+            (
+                Benchmark("pickle deserialize and use", use_context, pickled),
+                Benchmark("json deserialize and use", use_context, dumped),
+            ),
+        ]
+
+
+def _parse_command_line():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--iterations", type="int", default=2000,
+                      help="Number of operations timed per benchmark.")
+    parser.add_option("--shots", type="int", default=20,
+                      help="Number of shot step contexts.")
+    parser.add_option("--filter", default=None,
+                      help="Only run the benchmarks whose name contains this string.")
+    options, _ = parser.parse_args()
+    return options
+
+
+def main():
+    options = _parse_command_line()
+
+    tank_test_base.setUpModule()
+    project = ContextSerializationBenchmarks(options.shots)
+    project.setUp()
+    try:
+        benchmarks = project.get_benchmarks()
+        if options.filter:
+            benchmarks = [
+                (pickle_benchmark, json_benchmark) for (pickle_benchmark, json_benchmark) in benchmarks
+                if options.filter in pickle_benchmark.name or options.filter in json_benchmark.name
+            ]
+
+        print("%-35s %14s %12s %9s" % ("benchmark", "pickle ops/sec", "json ops/sec", "change"))
+        for pickle_benchmark, json_benchmark in benchmarks:
+            pickle_ops, _ = pickle_benchmark.run(options.iterations)
+            json_ops, _ = json_benchmark.run(options.iterations)
+            print("%-35s %14.0f %12.0f %9s" % (
+                json_benchmark.name[5:],
+                pickle_ops,
+                json_ops,
+                "%+.1f%%" % ((json_ops / pickle_ops - 1) * 100),
+            ))
+    finally:
+        project.tearDown()
+        project.doCleanups()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Compares the size and the lookup latency of the v2 path cache tables against the
+v1 path_cache table.
+
+A test project is set up with the fixture configuration, the same way the unit tests
+do it. A v1 path cache database is generated with a synthetic folder structure and
+queried the way older cores do it. It is then migrated to the v2 tables by the path
+cache, which is queried through its API. No network access is required.
+
+Usage:
+
+    python benchmark_path_cache.py [options]
+
+    --iterations N      Number of operations timed per benchmark (default 2000).
+    --shots N           Number of synthetic shots (default 10000).
+    --filter NAME       Only run the benchmarks whose name contains NAME.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import optparse
+
+from benchmark_templates import Benchmark
+
+from tank import path_cache
+from tank_test import tank_test_base
+from tank_test.tank_test_base import TankTestBase
+
+# Each shot has a folder per step, with the step as the primary entity and
+# the shot as a secondary entity.
+_STEPS = ["anim", "light", "comp"]
+_SHOTS_PER_SEQUENCE = 50
+
+
+class PathCacheBenchmarks(TankTestBase):
+    """
+    Project set up with the fixture configuration, providing the benchmarks.
+    """
+
+    def __init__(self, num_shots):
+        """
+        :param int num_shots: Number of synthetic shots.
+        """
+        super(PathCacheBenchmarks, self).__init__("get_benchmarks")
+        self._num_shots = num_shots
+
+    def setUp(self):
+        super(PathCacheBenchmarks, self).setUp()
+        self.setup_fixtures()
+
+    def get_benchmarks(self):
+        """
+        Builds the v1 and v2 path caches and the benchmarks.
+
+        :returns: List of (v1 :class:`Benchmark`, v2 :class:`Benchmark`) tuples.
+        """
+        rows = _make_v1_rows(self._num_shots)
+        v1_path = os.path.join(self.tank_temp, "path_cache_v1.db")
+        _make_v1_database(v1_path, rows)
+
+        # the path cache migrates the v1 database when it is opened
+        self.tk.close()
+        v2_path = self.tk._get_path_cache_database().get_path()
+        shutil.copy(v1_path, v2_path)
+        self.tk.close()
+        start = time.time()
+        pc = path_cache.PathCache(self.tk)
+        print("Migrated %d entries in %.2f seconds" % (len(rows), time.time() - start))
+        print("v1 database: %d KB, v2 database: %d KB" % (
+            os.path.getsize(v1_path) // 1024, os.path.getsize(v2_path) // 1024
+        ))
+
+        v1_connection = sqlite3.connect(v1_path)
+        v1_connection.text_factory = str
+        self.addCleanup(v1_connection.close)
+
+        root_path = pc._roots["primary"]
+        step_paths = [
+            pc._dbpath_to_path(root_path, db_path) for (_, _, _, _, db_path, primary) in rows
+            if primary and db_path.count("/") == 4
+        ]
+        sequence_paths = [
+            pc._dbpath_to_path(root_path, db_path) for (entity_type, _, _, _, db_path, _) in rows
+            if entity_type == "Sequence"
+        ]
+        shots = [(entity_type, entity_id) for (entity_type, entity_id, _, _, _, primary) in rows
+                 if entity_type == "Shot" and primary]
+        path_batches = [step_paths[index:index + 100] for index in xrange(0, len(step_paths), 100)]
+
+        return [
+            (
+                Benchmark("v1 path -> entity", lambda path: _v1_get_entity(v1_connection, pc, path), step_paths),
+                Benchmark("v2 path -> entity", pc._get_entity, step_paths),
+            ),
+            (
+                Benchmark("v1 path -> secondary", lambda path: _v1_get_secondary_entities(v1_connection, pc, path),
+                          step_paths),
+                Benchmark("v2 path -> secondary", pc.get_secondary_entities, step_paths),
+            ),
+            (
+                Benchmark("v1 entity -> paths", lambda entity: _v1_get_paths(v1_connection, pc, *entity), shots),
+                Benchmark("v2 entity -> paths", lambda entity: pc.get_paths(entity[0], entity[1], False), shots),
+            ),
+            (
+                Benchmark("v1 100 paths -> entities", lambda paths: _v1_get_entities(v1_connection, pc, paths),
+                          path_batches),
+                Benchmark("v2 100 paths -> entities", pc._get_entities_for_paths, path_batches),
+            ),
+            (
+                Benchmark("v1 sequence subtree", lambda path: _v1_get_subtree(v1_connection, pc, path),
+                          sequence_paths),
+                Benchmark("v2 sequence subtree", pc.get_entities_under_path, sequence_paths),
+            ),
+        ]
+
+
+def _make_v1_rows(num_shots):
+    """
+    Generates the rows of a v1 path_cache table.
+
+    :param int num_shots: Number of shots.
+    :returns: List of (entity type, entity id, entity name, root, path, primary) tuples.
+    """
+    rows = []
+    sequence = None
+    for shot_id in xrange(num_shots):
+        if shot_id % _SHOTS_PER_SEQUENCE == 0:
+            sequence = ("Sequence", shot_id // _SHOTS_PER_SEQUENCE, "seq_%04d" % (shot_id // _SHOTS_PER_SEQUENCE))
+            rows.append(sequence + ("primary", "/sequences/%s" % sequence[2], 1))
+
+        shot_name = "%s_%04d" % (sequence[2], shot_id)
+        shot_path = "/sequences/%s/%s" % (sequence[2], shot_name)
+        rows.append(("Shot", shot_id, shot_name, "primary", shot_path, 1))
+        for step_id, step in enumerate(_STEPS):
+            step_path = "%s/%s" % (shot_path, step)
+            rows.append(("Step", step_id, step, "primary", step_path, 1))
+            rows.append(("Shot", shot_id, shot_name, "primary", step_path, 0))
+    return rows
+
+
+def _make_v1_database(path, rows):
+    """
+    Creates a v1 path cache database, the way older cores do it.
+
+    :param str path: Path to the database file.
+    :param list rows: Rows of the path_cache table, see :meth:`_make_v1_rows`.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript("""
+            PRAGMA page_size=8192;
+
+            CREATE TABLE path_cache (entity_type text, entity_id integer, entity_name text, root text, path text, primary_entity integer);
+
+            CREATE INDEX path_cache_entity ON path_cache(entity_type, entity_id);
+
+            CREATE INDEX path_cache_path ON path_cache(root, path, primary_entity);
+
+            CREATE UNIQUE INDEX path_cache_all ON path_cache(entity_type, entity_id, root, path, primary_entity);
+
+            CREATE TABLE event_log_sync (last_id integer);
+
+            CREATE TABLE shotgun_status (path_cache_id integer, shotgun_id integer);
+
+            CREATE UNIQUE INDEX shotgun_status_id ON shotgun_status(path_cache_id);
+
+            CREATE INDEX shotgun_status_shotgun_id ON shotgun_status(shotgun_id);
+            """)
+        connection.executemany("INSERT INTO path_cache VALUES(?, ?, ?, ?, ?, ?)", rows)
+        connection.execute("INSERT INTO shotgun_status SELECT rowid, rowid + 1000 FROM path_cache")
+        connection.execute("INSERT INTO event_log_sync VALUES(1)")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _v1_split(pc, path):
+    """
+    Splits a path into a root name and a db path.
+    """
+    root_name, relative_path = pc._separate_root(path)
+    return root_name, pc._path_to_dbpath(relative_path)
+
+
+def _v1_get_entity(connection, pc, path):
+    root_name, db_path = _v1_split(pc, path)
+    return connection.execute(
+        "SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 1",
+        (db_path, root_name)
+    ).fetchall()
+
+
+def _v1_get_secondary_entities(connection, pc, path):
+    root_name, db_path = _v1_split(pc, path)
+    return connection.execute(
+        "SELECT entity_type, entity_id, entity_name FROM path_cache WHERE path = ? AND root = ? and primary_entity = 0",
+        (db_path, root_name)
+    ).fetchall()
+
+
+def _v1_get_paths(connection, pc, entity_type, entity_id):
+    root_path = pc._roots["primary"]
+    return [
+        pc._dbpath_to_path(root_path, db_path) for (_, db_path) in connection.execute(
+            "SELECT root, path FROM path_cache WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id)
+        )
+    ]
+
+
+def _v1_get_entities(connection, pc, paths):
+    db_paths = [_v1_split(pc, path)[1] for path in paths]
+    return connection.execute(
+        "SELECT path, entity_type, entity_id, entity_name, primary_entity FROM path_cache "
+        "WHERE root = ? AND path IN (%s)" % pc._gen_param_string(db_paths),
+        ["primary"] + db_paths
+    ).fetchall()
+
+
+def _v1_get_subtree(connection, pc, path):
+    root_name, db_path = _v1_split(pc, path)
+    prefix = db_path.rstrip("/") + "/"
+    return connection.execute(
+        """SELECT pc.path, pc.entity_type, pc.entity_id, pc.entity_name, pc.primary_entity, ss.shotgun_id
+           FROM path_cache pc
+           LEFT JOIN shotgun_status ss on pc.rowid = ss.path_cache_id
+           WHERE pc.root = ? AND (pc.path = ? OR pc.path >= ? AND pc.path < ?)
+           ORDER BY pc.path""",
+        (root_name, db_path, prefix, prefix[:-1] + "0")
+    ).fetchall()
+
+
+def _parse_command_line():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--iterations", type="int", default=2000,
+                      help="Number of operations timed per benchmark.")
+    parser.add_option("--shots", type="int", default=10000,
+                      help="Number of synthetic shots.")
+    parser.add_option("--filter", default=None,
+                      help="Only run the benchmarks whose name contains this string.")
+    options, _ = parser.parse_args()
+    return options
+
+
+def main():
+    options = _parse_command_line()
+
+    tank_test_base.setUpModule()
+    project = PathCacheBenchmarks(options.shots)
+    project.setUp()
+    try:
+        benchmarks = project.get_benchmarks()
+        if options.filter:
+            benchmarks = [
+                (v1_benchmark, v2_benchmark) for (v1_benchmark, v2_benchmark) in benchmarks
+                if options.filter in v1_benchmark.name or options.filter in v2_benchmark.name
+            ]
+
+        print("%-35s %12s %12s %9s" % ("benchmark", "v1 ops/sec", "v2 ops/sec", "change"))
+        for v1_benchmark, v2_benchmark in benchmarks:
+            v1_ops, _ = v1_benchmark.run(options.iterations)
+            v2_ops, _ = v2_benchmark.run(options.iterations)
+            print("%-35s %12.0f %12.0f %9s" % (
+                v2_benchmark.name[3:],
+                v1_ops,
+                v2_ops,
+                "%+.1f%%" % ((v2_ops / v1_ops - 1) * 100),
+            ))
+    finally:
+        project.tearDown()
+        project.doCleanups()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
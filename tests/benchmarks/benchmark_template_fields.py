@@ -0,0 +1,91 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmarks Template.get_fields against the recursive TemplatePathParser.
+
+Usage:
+
+    python benchmark_template_fields.py [iterations]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "python")))
+
+from tank.template import TemplatePath
+from tank.template_path_parser import TemplatePathParser
+from tank.templatekey import StringKey, IntegerKey, SequenceKey
+
+
+def _get_templates():
+    """
+    Returns a list of (template, matching path, non matching path) tuples.
+    """
+    root = os.path.join(os.path.sep, "studio", "project")
+    keys = {"Sequence": StringKey("Sequence", None),
+            "Shot": StringKey("Shot", None),
+            "Step": StringKey("Step", None),
+            "name": StringKey("name", None, filter_by="alphanumeric"),
+            "version": IntegerKey("version", None, format_spec="03"),
+            "SEQ": SequenceKey("SEQ", None, format_spec="04")}
+
+    data = [
+        ("sequences/{Sequence}/{Shot}/{Step}/work/maya/{name}.v{version}.ma",
+         "sequences/aa/aa_010/anim/work/maya/scene.v003.ma",
+         "sequences/aa/aa_010/anim/publish/maya/scene.v003.ma"),
+        ("sequences/{Sequence}/{Shot}/{Step}/work/images/{name}/v{version}/{Shot}_{name}_v{version}.{SEQ}.exr",
+         "sequences/aa/aa_010/comp/work/images/main/v003/aa_010_main_v003.0101.exr",
+         "sequences/aa/aa_010/comp/work/images/main/v003/aa_010_main_v003.0101.dpx"),
+        ("sequences/{Sequence}/{Shot}/{Step}/work/{name}[.v{version}].nk",
+         "sequences/aa/aa_010/comp/work/scene.v003.nk",
+         "sequences/aa/aa_010/comp/work/scene.v003.ma"),
+    ]
+
+    templates = []
+    for definition, good_path, bad_path in data:
+        template = TemplatePath(definition, keys, None, root_path=root)
+        templates.append((template, os.path.join(root, good_path), os.path.join(root, bad_path)))
+    return templates
+
+
+def _parse_path(template, input_path):
+    """
+    Resolves a path the way get_fields did before compiled matchers were introduced.
+    """
+    for ordered_keys, static_tokens in zip(template._ordered_keys, template._static_tokens):
+        fields = TemplatePathParser(ordered_keys, static_tokens).parse_path(input_path, None)
+        if fields is not None:
+            return fields
+    return None
+
+
+def main(iterations):
+    print("%-100s %12s %12s %8s" % ("template / path", "parser (us)", "matcher (us)", "speedup"))
+    for template, good_path, bad_path in _get_templates():
+        for input_path in (good_path, bad_path):
+            parser_time = timeit.timeit(lambda: _parse_path(template, input_path), number=iterations)
+            matcher_time = timeit.timeit(
+                lambda: template.validate_and_get_fields(input_path), number=iterations
+            )
+            print("%-100s %12.2f %12.2f %7.1fx" % (
+                input_path[-100:],
+                parser_time * 1e6 / iterations,
+                matcher_time * 1e6 / iterations,
+                parser_time / matcher_time
+            ))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
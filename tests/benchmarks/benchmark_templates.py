@@ -0,0 +1,400 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Micro-benchmarks of the template engine, compared against a stored baseline.
+
+A test project is set up with the fixture configuration, the same way the unit tests
+do it, and a synthetic set of templates is generated from the fixture template paths
+to simulate large configurations. No network access is required.
+
+Usage:
+
+    python benchmark_templates.py [options]
+
+    --iterations N      Number of operations timed per benchmark (default 2000).
+    --scale N           Number of synthetic copies of the fixture template paths (default 20).
+    --filter NAME       Only run the benchmarks whose name contains NAME.
+    --baseline PATH     Baseline file (default benchmark_templates_baseline.json next to this script).
+    --save-baseline     Store the results as the new baseline.
+    --threshold RATIO   Maximum slowdown allowed against the baseline (default 0.25, i.e. 25%).
+
+The script exits with a non zero status if a benchmark is slower than its baseline by
+more than the threshold. Baselines depend on the machine they were recorded on and
+should be saved on the machine running the comparisons.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import gc
+import json
+import timeit
+import datetime
+import optparse
+
+_TESTS_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path = [
+    os.path.join(_TESTS_ROOT, "python", "third_party"),
+    os.path.join(_TESTS_ROOT, "python"),
+    os.path.abspath(os.path.join(_TESTS_ROOT, "..", "python")),
+] + sys.path
+os.environ.setdefault("TK_TEST_FIXTURES", os.path.join(_TESTS_ROOT, "fixtures"))
+
+from tank_vendor import yaml
+from tank.errors import TankError
+from tank.template import TemplatePath, make_template_paths
+from tank.template_path_parser import TemplatePathParser
+from tank.templatekey import StringKey, IntegerKey, SequenceKey, TimestampKey
+from tank_test import tank_test_base
+from tank_test.tank_test_base import TankTestBase
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+_DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_templates_baseline.json")
+
+
+class Benchmark(object):
+    """
+    Operation to time, called with a different input on each iteration.
+    """
+
+    def __init__(self, name, func, inputs):
+        """
+        :param str name: Name of the benchmark.
+        :param func: Function called with one of the inputs.
+        :param list inputs: Inputs, cycled through.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+
+    def run(self, iterations, repeat=3):
+        """
+        Times the operation.
+
+        :param int iterations: Number of calls to time.
+        :param int repeat: Number of timings, the fastest one is kept.
+        :returns: Tuple (operations per second, memory retained in KB or None).
+        """
+        func = self.func
+        inputs = (self.inputs * (iterations // len(self.inputs) + 1))[:iterations]
+
+        def run_iterations():
+            for value in inputs:
+                func(value)
+
+        gc.collect()
+        memory_before = _get_memory_usage()
+        timings = timeit.repeat(run_iterations, number=1, repeat=repeat)
+        gc.collect()
+        memory_after = _get_memory_usage()
+
+        memory = None
+        if memory_before is not None and memory_after is not None:
+            memory = memory_after - memory_before
+        return iterations / min(timings), memory
+
+
+class TemplateBenchmarks(TankTestBase):
+    """
+    Project set up with the fixture configuration, providing the benchmarks.
+    """
+
+    def __init__(self, scale):
+        """
+        :param int scale: Number of synthetic copies of the fixture template paths.
+        """
+        super(TemplateBenchmarks, self).__init__("get_benchmarks")
+        self._scale = scale
+
+    def setUp(self):
+        super(TemplateBenchmarks, self).setUp()
+        self.setup_fixtures()
+
+    def get_benchmarks(self):
+        """
+        Builds the benchmarks.
+
+        :returns: List of :class:`Benchmark` objects.
+        """
+        fixture_templates = [
+            template for template in self.tk.templates.values() if isinstance(template, TemplatePath)
+        ]
+        fields_and_paths = _get_fields_and_paths(fixture_templates)
+
+        benchmarks = [
+            Benchmark(
+                "Template.apply_fields",
+                lambda item: item[0].apply_fields(item[1]),
+                [(template, fields) for template, fields, _ in fields_and_paths],
+            ),
+            Benchmark(
+                "Template.get_fields",
+                lambda item: item[0].get_fields(item[1]),
+                [(template, path) for template, _, path in fields_and_paths],
+            ),
+            Benchmark(
+                "TemplatePathParser.parse_path",
+                lambda item: TemplatePathParser(item[0]._ordered_keys[0], item[0]._static_tokens[0]).parse_path(
+                    item[1], None
+                ),
+                [(template, path) for template, _, path in fields_and_paths],
+            ),
+        ]
+        benchmarks.extend(_get_key_benchmarks())
+
+        # synthetic copies of the fixture template paths, in distinct folders
+        memory_before = _get_memory_usage()
+        synthetic_templates = self._make_synthetic_templates()
+        memory_after = _get_memory_usage()
+        if memory_before is not None and memory_after is not None:
+            print("%d synthetic templates use %d KB" % (len(synthetic_templates), memory_after - memory_before))
+
+        self.tk.templates.update(synthetic_templates)
+        synthetic_paths = [
+            path for _, _, path in _get_fields_and_paths(synthetic_templates.values())
+        ]
+        paths = [path for _, _, path in fields_and_paths] + synthetic_paths
+        benchmarks.append(
+            Benchmark("Sgtk.template_from_path", self.tk.template_from_path, _get_resolvable_paths(self.tk, paths))
+        )
+        return benchmarks
+
+    def _make_synthetic_templates(self):
+        """
+        Generates templates from the fixture template paths.
+
+        :returns: Dictionary of :class:`TemplatePath` objects keyed by name.
+        """
+        with open(os.path.join(self.fixtures_root, "config", "core", "templates.yml")) as fh:
+            data = yaml.load(fh)
+
+        synthetic_data = {}
+        for index in range(self._scale):
+            for name, template_data in data["paths"].iteritems():
+                if isinstance(template_data, basestring):
+                    template_data = {"definition": template_data}
+                template_data = dict(template_data)
+                template_data["definition"] = "synthetic_%04d/%s" % (index, template_data["definition"])
+                synthetic_data["synthetic_%04d_%s" % (index, name)] = template_data
+
+        return make_template_paths(
+            self.tk.pipeline_configuration,
+            synthetic_data,
+            self.tk.template_keys,
+            self.tk.pipeline_configuration.get_all_platform_data_roots(),
+        )
+
+
+def _get_key_benchmarks():
+    """
+    Returns the benchmarks of the validation and conversion of key values.
+    """
+    alphanumeric_key = StringKey("name", None, filter_by="alphanumeric")
+    subset_key = StringKey(
+        "initials", None, subset="([A-Z])[a-z]* ([A-Z])[a-z]*", subset_format="{0}{1}"
+    )
+    sequence_key = SequenceKey("frame", None, format_spec="04")
+
+    return [
+        Benchmark(
+            "StringKey.validate filter_by",
+            alphanumeric_key.validate,
+            ["name%d" % index for index in range(100)] + ["bad_name_%d" % index for index in range(100)],
+        ),
+        Benchmark(
+            "StringKey.validate subset",
+            subset_key.validate,
+            ["John Smith", "Jane Doe", "john smith", "Ada Lovelace"],
+        ),
+        Benchmark(
+            "StringKey.str_from_value subset",
+            subset_key.str_from_value,
+            ["John Smith", "Jane Doe", "Ada Lovelace"],
+        ),
+        Benchmark(
+            "SequenceKey.str_from_value",
+            sequence_key.str_from_value,
+            [1001, "FORMAT: %d", "FORMAT: #", "FORMAT: @", "FORMAT: $F", "FORMAT: <UDIM>"],
+        ),
+        Benchmark(
+            "SequenceKey.value_from_str",
+            sequence_key.value_from_str,
+            ["1001", "%04d", "####", "@@@@", "$F4", "[1001-1100]"],
+        ),
+    ]
+
+
+def _get_fields_and_paths(templates):
+    """
+    Generates fields for templates and resolves them into paths.
+
+    :param templates: Iterable of :class:`TemplatePath` objects.
+    :returns: List of (template, fields, path) tuples. Templates whose keys can't
+              be given generated values are left out.
+    """
+    result = []
+    for template in templates:
+        for index in range(3):
+            fields = _make_fields(template, index)
+            if fields is None:
+                break
+            try:
+                path = template.apply_fields(fields)
+            except TankError:
+                break
+            if not template.validate(path):
+                break
+            result.append((template, fields, path))
+    return result
+
+
+def _make_fields(template, index):
+    """
+    Generates valid values for the keys of a template.
+
+    :returns: Dictionary of fields or None if a key value can't be generated.
+    """
+    fields = {}
+    for key_name, key in template.keys.iteritems():
+        if key.choices:
+            choices = sorted(key.choices)
+            value = choices[index % len(choices)]
+        elif isinstance(key, SequenceKey):
+            value = 1001 + index
+        elif isinstance(key, IntegerKey):
+            value = index + 1
+        elif isinstance(key, TimestampKey):
+            value = datetime.datetime(2017, 1, 1) + datetime.timedelta(hours=index)
+        elif isinstance(key, StringKey) and key.filter_by in (None, "alphanumeric", "alpha"):
+            value = "value" + "abc"[index]
+        else:
+            return None
+
+        if not key.validate(value):
+            return None
+        fields[key_name] = value
+    return fields
+
+
+def _get_resolvable_paths(tk, paths):
+    """
+    Returns the paths template_from_path resolves without ambiguity.
+    """
+    resolvable_paths = []
+    for path in paths:
+        try:
+            tk.template_from_path(path)
+        except TankError:
+            continue
+        resolvable_paths.append(path)
+    return resolvable_paths
+
+
+def _get_memory_usage():
+    """
+    Returns the memory used by the process in KB, or None if it can't be determined.
+    The peak memory usage is returned on platforms without /proc.
+    """
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macosx
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+def _parse_command_line():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--iterations", type="int", default=2000,
+                      help="Number of operations timed per benchmark.")
+    parser.add_option("--scale", type="int", default=20,
+                      help="Number of synthetic copies of the fixture template paths.")
+    parser.add_option("--filter", default=None,
+                      help="Only run the benchmarks whose name contains this string.")
+    parser.add_option("--baseline", default=_DEFAULT_BASELINE,
+                      help="Path to the baseline file.")
+    parser.add_option("--save-baseline", action="store_true", default=False,
+                      help="Store the results as the new baseline.")
+    parser.add_option("--threshold", type="float", default=0.25,
+                      help="Maximum slowdown allowed against the baseline, as a ratio.")
+    options, _ = parser.parse_args()
+    return options
+
+
+def main():
+    options = _parse_command_line()
+
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as fh:
+            baseline = json.load(fh)
+
+    tank_test_base.setUpModule()
+    project = TemplateBenchmarks(options.scale)
+    project.setUp()
+    try:
+        benchmarks = project.get_benchmarks()
+        if options.filter:
+            benchmarks = [benchmark for benchmark in benchmarks if options.filter in benchmark.name]
+
+        print("%-35s %12s %12s %14s %9s" % ("benchmark", "ops/sec", "memory (KB)", "baseline ops", "change"))
+        results = {}
+        regressions = []
+        for benchmark in benchmarks:
+            ops, memory = benchmark.run(options.iterations)
+            results[benchmark.name] = {"ops_per_sec": ops, "memory_kb": memory}
+
+            baseline_ops = baseline.get(benchmark.name, {}).get("ops_per_sec")
+            change = ""
+            if baseline_ops:
+                ratio = ops / baseline_ops - 1
+                change = "%+.1f%%" % (ratio * 100)
+                if ratio < -options.threshold:
+                    regressions.append(benchmark.name)
+                    change += " !"
+            print("%-35s %12.0f %12s %14s %9s" % (
+                benchmark.name,
+                ops,
+                "-" if memory is None else memory,
+                "%.0f" % baseline_ops if baseline_ops else "-",
+                change,
+            ))
+    finally:
+        project.tearDown()
+        project.doCleanups()
+
+    if options.save_baseline:
+        with open(options.baseline, "w") as fh:
+            json.dump(results, fh, indent=4, sort_keys=True)
+        print("Baseline saved to %s" % options.baseline)
+        return 0
+
+    if regressions:
+        print("%d benchmarks are more than %d%% slower than the baseline: %s" % (
+            len(regressions), options.threshold * 100, ", ".join(regressions)
+        ))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
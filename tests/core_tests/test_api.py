@@ -15,6 +15,7 @@ from mock import Mock, patch
 
 import tank
 from tank.api import Tank
+from tank.errors import TankError, TankMultipleMatchingTemplatesError
 from tank.template import TemplatePath, TemplateString
 from tank.templatekey import StringKey, IntegerKey, SequenceKey
 
@@ -61,6 +62,58 @@ class TestTemplateFromPath(TankTestBase):
         self.assertIsInstance(template, TemplateString)
 
 
+    def test_added_template(self):
+        """Resolve a path matching a template added after the first lookup"""
+        file_path = os.path.join(self.project_root, "custom", "shot_010", "file.ma")
+        self.assertIsNone(self.tk.template_from_path(file_path))
+
+        template = TemplatePath("custom/{Shot}/file.ma",
+                                self.tk.template_keys,
+                                self.tk.pipeline_configuration,
+                                self.project_root)
+        self.tk.templates["custom_template"] = template
+        self.assertEquals(template, self.tk.template_from_path(file_path))
+
+    def test_reloaded_templates(self):
+        """Resolve a path after the templates have been reloaded"""
+        file_path = os.path.join(self.project_root,
+                'sequences/Sequence_1/shot_010/Anm/publish/shot_010.jfk.v001.ma')
+        template = self.tk.template_from_path(file_path)
+        self.tk.reload_templates()
+        reloaded_template = self.tk.template_from_path(file_path)
+        self.assertEquals(template.name, reloaded_template.name)
+        self.assertIs(self.tk.templates[template.name], reloaded_template)
+
+    def test_multiple_matches(self):
+        """Resolve a path matching more than one template with the same static tokens"""
+        for name in ["custom_template", "custom_template_dup"]:
+            self.tk.templates[name] = TemplatePath("custom/{Shot}/file.ma",
+                                                   self.tk.template_keys,
+                                                   self.tk.pipeline_configuration,
+                                                   self.project_root)
+        file_path = os.path.join(self.project_root, "custom", "shot_010", "file.ma")
+        self.assertRaises(TankMultipleMatchingTemplatesError, self.tk.template_from_path, file_path)
+
+
+class TestSchemaFolderFromPath(TankTestBase):
+    """Cases testing Tank.schema_folder_from_path method"""
+    def setUp(self):
+        super(TestSchemaFolderFromPath, self).setUp()
+        self.setup_fixtures()
+
+    def test_defined_path(self):
+        """Resolve a path which maps to a schema folder"""
+        folder_path = os.path.join(self.project_root, "assets", "Character", "Hero", "Anm", "work")
+        folder_obj = self.tk.schema_folder_from_path(folder_path)
+        self.assertIsNotNone(folder_obj)
+        self.assertTrue(folder_obj.template_path.validate(folder_path))
+
+    def test_undefined_path(self):
+        """Resolve a path which does not map to a schema folder"""
+        folder_path = os.path.join(self.project_root, "undefined", "Hero")
+        self.assertIsNone(self.tk.schema_folder_from_path(folder_path))
+
+
 class TestTemplatesLoaded(TankTestBase):
     """Test case for the loading of templates from project level config."""
     def setUp(self):
@@ -182,6 +235,33 @@ class TestPathsFromTemplate(TankTestBase):
         self.assertIn(good_file_path, result)
         self.assertNotIn(bad_file_path, result)
 
+    def test_iter(self):
+        """Test that paths are streamed by iter_paths_from_template."""
+        fields = {"Sequence": "Seq_1", "Shot": "shot_1", "Step": "step_name", "name": "filename"}
+        result = self.tk.iter_paths_from_template(self.template, fields, skip_keys=["version"])
+        self.assertFalse(isinstance(result, list))
+        self.assertEquals(set([self.file_1, self.file_2]), set(result))
+
+    def test_prune_invalid_folders(self):
+        """Test that folders holding invalid key values are not listed."""
+        keys = {"Shot": StringKey("Shot", None),
+                "name": StringKey("name", None),
+                "version": IntegerKey("version", None, format_spec="03")}
+
+        template = TemplatePath("shots/{Shot}/v{version}/{name}.nk", keys, None, root_path=self.project_root)
+        good_file_path = os.path.join(self.project_root, "shots", "Shot1", "v001", "name.nk")
+        bad_file_path = os.path.join(self.project_root, "shots", "Shot1", "vabc", "name.nk")
+        self.create_file(good_file_path)
+        self.create_file(bad_file_path)
+
+        with patch("tank.template_walker._scan_dir", wraps=tank.template_walker._scan_dir) as mock_scan:
+            result = self.tk.paths_from_template(template, {"Shot": "Shot1"})
+
+        self.assertEquals([good_file_path], result)
+        listed = [x[0][0] for x in mock_scan.call_args_list]
+        self.assertIn(os.path.dirname(good_file_path), listed)
+        self.assertNotIn(os.path.dirname(bad_file_path), listed)
+
 
 class TestAbstractPathsFromTemplate(TankTestBase):
     """Tests Tank.abstract_paths_from_template method."""
@@ -303,8 +383,62 @@ class TestAbstractPathsFromTemplate(TankTestBase):
         self.assertEquals(set(expected), set(result))
 
 
+class TestSequencesFromTemplate(TankTestBase):
+    """Tests Tank.sequences_from_template method."""
+    def setUp(self):
+        super(TestSequencesFromTemplate, self).setUp()
+        keys = {"Shot": StringKey("Shot", None),
+                "name": StringKey("name", None, filter_by="alphanumeric"),
+                "SEQ": SequenceKey("SEQ", None, format_spec="04")}
+
+        self.template = TemplatePath("shots/{Shot}/{Shot}_{name}.{SEQ}.exr", keys, None,
+                                     root_path=self.project_root)
+
+        for name in ["main", "bg"]:
+            for frame in range(1, 11):
+                if name == "bg" and frame == 5:
+                    continue
+                self.create_file(self.template.apply_fields({"Shot": "shot_1", "name": name, "SEQ": frame}))
+        # not a valid frame
+        self.create_file(os.path.join(self.project_root, "shots", "shot_1", "shot_1_main.abcd.exr"))
+
+    def test_sequences(self):
+        """Test that each sequence is returned once with all its frames."""
+        sequences = self.tk.sequences_from_template(self.template, {"Shot": "shot_1"})
+        sequences = dict((sequence.path, sequence) for sequence in sequences)
+
+        main_path = os.path.join(self.project_root, "shots", "shot_1", "shot_1_main.%04d.exr")
+        bg_path = os.path.join(self.project_root, "shots", "shot_1", "shot_1_bg.%04d.exr")
+        self.assertEquals(set([main_path, bg_path]), set(sequences))
+        self.assertEquals([(1, 10)], sequences[main_path].ranges)
+        self.assertEquals([(1, 4), (6, 10)], sequences[bg_path].ranges)
+        self.assertEquals([5], sequences[bg_path].missing_frames)
+
+    def test_validated_once(self):
+        """Test that the template is validated once per sequence."""
+        with patch.object(self.template, "validate_and_get_fields",
+                          wraps=self.template.validate_and_get_fields) as mock_validate:
+            sequences = self.tk.sequences_from_template(self.template, {"Shot": "shot_1", "name": "main"})
+
+        self.assertEquals(1, len(sequences))
+        self.assertEquals(10, len(sequences[0]))
+        self.assertEquals(1, mock_validate.call_count)
+
+    def test_same_as_paths(self):
+        """Test that the frames found are the ones of paths_from_template."""
+        paths = self.tk.paths_from_template(self.template, {"Shot": "shot_1"})
+        sequences = self.tk.sequences_from_template(self.template, {"Shot": "shot_1"})
+        self.assertEquals(len(paths), sum(len(sequence) for sequence in sequences))
+
+    def test_no_sequence_key(self):
+        """Test that templates without sequence keys are rejected."""
+        keys = {"Shot": StringKey("Shot", None)}
+        template = TemplatePath("shots/{Shot}", keys, None, root_path=self.project_root)
+        self.assertRaises(TankError, self.tk.sequences_from_template, template, {})
+
+
 class TestPathsFromTemplateGlob(TankTestBase):
-    """Tests for Tank.paths_from_template method which check the string sent to glob.glob."""
+    """Tests for Tank.paths_from_template method which check the pattern searched for."""
     def setUp(self):
         super(TestPathsFromTemplateGlob, self).setUp()
         keys = {"Shot": StringKey("Shot"),
@@ -313,16 +447,16 @@ class TestPathsFromTemplateGlob(TankTestBase):
 
         self.template = TemplatePath("{Shot}/{version}/filename.{seq_num}", keys, root_path=self.project_root)
 
-    @patch("tank.api.glob.iglob")
-    def assert_glob(self, fields, expected_glob, skip_keys, mock_glob):
-        # want to ensure that value returned from glob is returned
+    @patch("tank.template_walker.TemplatePathWalker.walk", autospec=True)
+    def assert_glob(self, fields, expected_glob, skip_keys, mock_walk):
+        # want to ensure that value returned from the walker is returned
         expected = [os.path.join(self.project_root, "shot_1","001","filename.00001")]
-        mock_glob.return_value = expected
+        mock_walk.return_value = iter(expected)
         retval = self.tk.paths_from_template(self.template, fields, skip_keys=skip_keys)
         self.assertEquals(expected, retval)
         # Check glob string
         expected_glob = os.path.join(self.project_root, expected_glob)
-        glob_actual = [x[0][0] for x in mock_glob.call_args_list][0]
+        glob_actual = [x[0][0].pattern for x in mock_walk.call_args_list][0]
         self.assertEquals(expected_glob, glob_actual)
 
     def test_fully_qualified(self):
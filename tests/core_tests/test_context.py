@@ -12,6 +12,8 @@ from __future__ import with_statement
 
 import os
 import copy
+import json
+import time
 
 from tank_test.tank_test_base import TankTestBase, setUpModule # noqa
 
@@ -1073,6 +1075,514 @@ class TestAsTemplateFields(TestContext):
         ctx.as_template_fields(template, validate=False)
 
 
+class TestContextCache(TankTestBase):
+    """
+    Tests the cache of the contexts built by the factory methods.
+    """
+
+    def setUp(self):
+        super(TestContextCache, self).setUp()
+
+        self.shot = {"type": "Shot", "code": "shot_name", "id": 2, "project": self.project}
+        self.step = {"type": "Step", "name": "step_name", "id": 4}
+        self.task = {"type": "Task", "content": "task_content", "id": 1}
+        self.shot_path = os.path.join(self.project_root, "shot_code")
+        self.add_production_path(self.shot_path, self.shot)
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared(self):
+        """
+        Ensures cached contexts are shared rather than copied.
+        """
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        with patch("tank.context._get_valid_context_entity_dict") as valid_entity_dict_mock:
+            self.assertIs(ctx, context.from_entity(self.tk, "Shot", self.shot["id"]))
+            self.assertIs(ctx, self.tk.context_from_path(self.shot_path))
+        self.assertEqual(valid_entity_dict_mock.call_count, 0)
+
+        # other instances get their own contexts
+        tk = tank.Sgtk(self.tk.pipeline_configuration)
+        self.addCleanup(tk.close)
+        other_ctx = context.from_entity(tk, "Shot", self.shot["id"])
+        self.assertIsNot(ctx, other_ctx)
+        self.assertIs(other_ctx.sgtk, tk)
+
+    def test_previous_context(self):
+        """
+        Ensures a previous context doesn't change the cached context.
+        """
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        task_ctx = context.Context(
+            self.tk,
+            project=ctx.project,
+            entity=ctx.entity,
+            step={"type": "Step", "id": self.step["id"], "name": self.step["name"]},
+            task={"type": "Task", "id": self.task["id"], "name": self.task["content"]},
+        )
+        ctx_with_task = context.from_entity(self.tk, "Shot", self.shot["id"], previous_context=task_ctx)
+        self.assertEqual(ctx_with_task.task["id"], self.task["id"])
+        self.assertEqual(ctx.task, None)
+        self.assertIs(ctx, context.from_entity(self.tk, "Shot", self.shot["id"]))
+
+        user_ctx = ctx.create_copy_for_user({"type": "HumanUser", "id": 7, "name": "John Snow"})
+        self.assertEqual(user_ctx.user["id"], 7)
+        self.assertEqual(user_ctx.entity, ctx.entity)
+        self.assertEqual(ctx.user, None)
+
+    def test_sync_task_and_step(self):
+        """
+        Ensures syncing a cached context returns a copy.
+        """
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        task_ctx = context.Context(
+            self.tk,
+            project=ctx.project,
+            entity=ctx.entity,
+            step={"type": "Step", "id": self.step["id"], "name": self.step["name"]},
+            task={"type": "Task", "id": self.task["id"], "name": self.task["content"]},
+        )
+        synced_ctx = ctx.sync_task_and_step(task_ctx)
+        self.assertEqual(synced_ctx.step["id"], self.step["id"])
+        self.assertEqual(synced_ctx.task["id"], self.task["id"])
+        self.assertEqual(ctx.step, None)
+        self.assertEqual(ctx.task, None)
+        self.assertIs(ctx, context.from_entity(self.tk, "Shot", self.shot["id"]))
+
+        # nothing to sync from a context of another entity
+        other_ctx = context.Context(self.tk, project=ctx.project, task=task_ctx.task)
+        self.assertIs(ctx.sync_task_and_step(other_ctx), ctx)
+
+    def test_entities_copied(self):
+        """
+        Ensures modifying the entity dictionaries of a context doesn't change
+        the cached context.
+        """
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        task_ctx = context.Context(
+            self.tk,
+            project=ctx.project,
+            entity=ctx.entity,
+            step={"type": "Step", "id": self.step["id"], "name": self.step["name"]},
+            task={"type": "Task", "id": self.task["id"], "name": self.task["content"]},
+        )
+        ctx_with_task = context.from_entity(self.tk, "Shot", self.shot["id"], previous_context=task_ctx)
+        ctx_with_task.project["name"] = "modified"
+        ctx_with_task.entity["name"] = "modified"
+        ctx_with_task.task["name"] = "modified"
+        ctx_with_task.additional_entities.append({"type": "Sequence", "id": 1})
+        self.assertEqual(ctx_with_task.task["name"], self.task["content"])
+
+        self.assertIs(ctx, context.from_entity(self.tk, "Shot", self.shot["id"]))
+        self.assertEqual(ctx.project["name"], self.project["name"])
+        self.assertEqual(ctx.entity["name"], self.shot["code"])
+        self.assertEqual(ctx.additional_entities, [])
+
+    def test_invalidation(self):
+        """
+        Ensures cached contexts are discarded when the path cache changes, when
+        they expire and when the cache is invalidated.
+        """
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+
+        self.add_production_path(os.path.join(self.project_root, "other_shot"), {
+            "type": "Shot", "code": "other_shot", "id": 3, "project": self.project
+        })
+        new_ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        self.assertIsNot(ctx, new_ctx)
+        self.assertEqual(ctx, new_ctx)
+
+        with patch.object(context.g_context_cache, "ttl", -1):
+            context.g_context_cache.add(self.tk, {"type": "Shot", "id": self.shot["id"]}, new_ctx)
+            self.assertIsNone(context.g_context_cache.get(self.tk, {"type": "Shot", "id": self.shot["id"]}))
+
+        ctx = context.from_entity(self.tk, "Shot", self.shot["id"])
+        context.g_context_cache.invalidate()
+        self.assertIsNot(ctx, context.from_entity(self.tk, "Shot", self.shot["id"]))
+
+    def test_bounded(self):
+        """
+        Ensures the least recently used contexts are discarded first.
+        """
+        cache = context.ContextCache(max_size=2)
+        contexts = {}
+        for entity_type in ["Shot", "Step", "Task"]:
+            contexts[entity_type] = context.Context(self.tk)
+            cache.add(self.tk, {"type": entity_type, "id": 1}, contexts[entity_type])
+        self.assertIsNone(cache.get(self.tk, {"type": "Shot", "id": 1}))
+        self.assertIs(cache.get(self.tk, {"type": "Task", "id": 1}), contexts["Task"])
+        self.assertEqual(cache.info["size"], 2)
+
+
+class TestContextsFromPaths(TankTestBase):
+    """
+    Tests the creation of contexts for many paths at once.
+    """
+
+    def setUp(self):
+        super(TestContextsFromPaths, self).setUp()
+
+        self.seq = {"type": "Sequence", "code": "seq_name", "id": 3, "project": self.project}
+        self.shot = {"type": "Shot", "code": "shot_name", "id": 2, "sg_sequence": self.seq, "project": self.project}
+        self.shot_alt = {
+            "type": "Shot", "code": "shot_name_alt", "id": 123, "sg_sequence": self.seq, "project": self.project
+        }
+        self.step = {"type": "Step", "name": "step_name", "id": 4}
+
+        self.seq_path = os.path.join(self.project_root, "sequence", "Seq")
+        self.add_production_path(self.seq_path, self.seq)
+        self.shot_path = os.path.join(self.seq_path, "shot_code")
+        self.add_production_path(self.shot_path, self.shot)
+        self.shot_path_alt = os.path.join(self.seq_path, "shot_code_alt")
+        self.add_production_path(self.shot_path_alt, self.shot_alt)
+        self.step_path = os.path.join(self.shot_path, "step_short_name")
+        self.add_production_path(self.step_path, self.step)
+        self.step_path_alt = os.path.join(self.shot_path_alt, "step_short_name")
+        self.add_production_path(self.step_path_alt, self.step)
+
+        self.paths = [
+            os.path.join(self.step_path, "work", "file_1.ma"),
+            self.step_path_alt,
+            self.shot_path,
+            os.path.join(self.step_path, "work", "file_2.ma"),
+            self.seq_path,
+            self.project_root,
+        ]
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        context.g_context_cache.invalidate()
+        tank.util.shotgun_batch.get_find_cache().clear()
+
+    def test_contexts(self):
+        """
+        Ensures the contexts match the ones built for each path.
+        """
+        contexts = self.tk.contexts_from_paths(self.paths)
+        self.assertEqual(len(self.paths), len(contexts))
+
+        # paths resolving to the same entities share their context
+        self.assertIs(contexts[0], contexts[3])
+        self.assertEqual(contexts[0].step["id"], self.step["id"])
+        self.assertEqual(contexts[1].entity["id"], self.shot_alt["id"])
+
+        context.g_context_cache.invalidate()
+        tank.util.shotgun_batch.get_find_cache().clear()
+        for path, ctx in zip(self.paths, contexts):
+            self.assertEqual(self.tk.context_from_path(path), ctx)
+
+    def test_shared_lookups(self):
+        """
+        Ensures the hook, path cache and Shotgun lookups are shared by the contexts.
+        """
+        sg = self.tk.shotgun
+        with patch.object(self.tk, "execute_core_hook", wraps=self.tk.execute_core_hook) as hook_mock:
+            with patch.object(sg, "find", wraps=sg.find) as find_mock:
+                with patch.object(sg, "find_one", wraps=sg.find_one) as find_one_mock:
+                    self.tk.contexts_from_paths(self.paths)
+
+        self.assertEqual(hook_mock.call_count, 1)
+        self.assertEqual(find_one_mock.call_count, 0)
+        # a query per entity type
+        queried_types = [call_args[0][0] for call_args in find_mock.call_args_list]
+        self.assertEqual(sorted(queried_types), sorted(set(queried_types)))
+
+    def test_cached(self):
+        """
+        Ensures cached contexts are reused, the cache being looked up once per
+        entity dictionary.
+        """
+        contexts = self.tk.contexts_from_paths(self.paths)
+        info = context.g_context_cache.info
+        self.assertEqual((info["hits"], info["misses"]), (0, 5))
+
+        ctx = self.tk.context_from_path(self.shot_path)
+        self.assertIs(ctx, contexts[2])
+        context.g_context_cache.invalidate()
+        ctx = self.tk.context_from_path(self.shot_path)
+        with patch("tank.context._prefetch_context_fields", return_value={}) as prefetch_mock:
+            self.assertIs(self.tk.contexts_from_paths([self.shot_path])[0], ctx)
+        self.assertEqual(prefetch_mock.call_args[0][1], [])
+        info = context.g_context_cache.info
+        self.assertEqual((info["hits"], info["misses"]), (1, 1))
+
+    def test_invalid_path(self):
+        """
+        Ensures paths without entities are reported.
+        """
+        self.assertRaises(
+            TankError, self.tk.contexts_from_paths, [self.shot_path, os.path.join(self.tank_temp, "not_a_project")]
+        )
+        self.assertEqual(self.tk.contexts_from_paths([]), [])
+
+
+class TestTemplateFieldsMemo(TankTestBase):
+    """
+    Tests the memoization of the template fields of a context.
+    """
+
+    def setUp(self):
+        super(TestTemplateFieldsMemo, self).setUp()
+
+        self.shot = {"type": "Shot", "code": "shot_name", "id": 2, "project": self.project}
+        self.shot_path = os.path.join(self.project_root, "shot_name")
+        self.add_production_path(self.shot_path, self.shot)
+
+        keys = {"Shot": StringKey("Shot", self.tk.pipeline_configuration, shotgun_entity_type="Shot")}
+        self.template = TemplatePath("{Shot}", keys, self.tk.pipeline_configuration, self.project_root)
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ctx = context.Context(self.tk, project=self.project, entity=self.shot)
+
+    def test_memoized(self):
+        """
+        Ensures the fields are only resolved once per template and validate flag.
+        """
+        with patch.object(context.Context, "_as_template_fields", wraps=self.ctx._as_template_fields) as mock:
+            fields = self.ctx.as_template_fields(self.template)
+            self.assertEqual(fields, {"Shot": "shot_name"})
+            self.assertEqual(self.ctx.as_template_fields(self.template), fields)
+            self.assertEqual(mock.call_count, 1)
+
+            self.ctx.as_template_fields(self.template, validate=True)
+            self.assertEqual(mock.call_count, 2)
+
+            # the result is a copy the caller can modify
+            fields["Shot"] = "other_shot"
+            self.assertEqual(self.ctx.as_template_fields(self.template), {"Shot": "shot_name"})
+            self.assertEqual(mock.call_count, 2)
+
+            # copies of the context resolve their own fields
+            copy.deepcopy(self.ctx).as_template_fields(self.template)
+            self.assertEqual(mock.call_count, 3)
+
+    def test_invalidation(self):
+        """
+        Ensures the fields are resolved again when the path cache changes.
+        """
+        self.assertEqual(self.ctx.as_template_fields(self.template), {"Shot": "shot_name"})
+
+        self.add_production_path(os.path.join(self.project_root, "other_shot"), {
+            "type": "Shot", "code": "other_shot", "id": 3, "project": self.project
+        })
+        with patch.object(context.Context, "_as_template_fields", wraps=self.ctx._as_template_fields) as mock:
+            self.ctx.as_template_fields(self.template)
+            self.assertEqual(mock.call_count, 1)
+
+            # fields which aren't Shotgun values are kept as long as contexts
+            expired = time.time() + tank.util.shotgun_batch.get_find_cache().ttl + 1
+            with patch("time.time", return_value=expired):
+                self.ctx.as_template_fields(self.template)
+            self.assertEqual(mock.call_count, 1)
+
+            # folders may have been created by other instances in the meantime
+            expired = time.time() + tank.constants.CONTEXT_CACHE_TTL + 1
+            with patch("time.time", return_value=expired):
+                self.ctx.as_template_fields(self.template)
+            self.assertEqual(mock.call_count, 2)
+
+    def test_errors(self):
+        """
+        Ensures failures are not memoized.
+        """
+        other_ctx = context.Context(self.tk, project=self.project)
+        self.assertRaises(TankError, other_ctx.as_template_fields, self.template, validate=True)
+        self.assertRaises(TankError, other_ctx.as_template_fields, self.template, validate=True)
+        self.assertEqual(other_ctx.as_template_fields(self.template), {})
+
+
+class TestFieldsFromShotgun(TankTestBase):
+    """
+    Tests the retrieval of template fields stored in Shotgun.
+    """
+
+    def setUp(self):
+        super(TestFieldsFromShotgun, self).setUp()
+
+        self.shot = {
+            "type": "Shot", "code": "shot_name", "id": 2, "project": self.project,
+            "sg_shot_type": "hero", "description": "closeup",
+        }
+        self.add_production_path(os.path.join(self.project_root, "shot_name"), self.shot)
+
+        pc = self.tk.pipeline_configuration
+        keys = {
+            "Shot": StringKey("Shot", pc, shotgun_entity_type="Shot", shotgun_field_name="code"),
+            "shot_type": StringKey("shot_type", pc, shotgun_entity_type="Shot", shotgun_field_name="sg_shot_type"),
+            "shot_desc": StringKey("shot_desc", pc, shotgun_entity_type="Shot", shotgun_field_name="description"),
+        }
+        self.template = TemplatePath("{Shot}/{shot_type}_{shot_desc}", keys, pc, self.project_root)
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_fields(self):
+        """
+        Returns the template fields of a new context and the Shotgun queries run to get them.
+        """
+        entity = {"type": "Shot", "id": self.shot["id"], "name": self.shot["code"]}
+        ctx = context.Context(self.tk, project=self.project, entity=entity)
+        sg = self.tk.shotgun
+        with patch.object(sg, "find", wraps=sg.find) as find_mock:
+            with patch.object(sg, "find_one", wraps=sg.find_one) as find_one_mock:
+                fields = ctx.as_template_fields(self.template)
+        return fields, find_mock.call_args_list + find_one_mock.call_args_list
+
+    def test_single_query(self):
+        """
+        Ensures all the fields of an entity are retrieved with a single query.
+        """
+        fields, queries = self._get_fields()
+        self.assertEqual(fields, {"Shot": "shot_name", "shot_type": "hero", "shot_desc": "closeup"})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(queries[0][0][2]), ["description", "sg_shot_type"])
+
+    def test_shared_cache(self):
+        """
+        Ensures the values retrieved are shared by contexts until they expire.
+        """
+        self._get_fields()
+        fields, queries = self._get_fields()
+        self.assertEqual(fields["shot_type"], "hero")
+        self.assertEqual(queries, [])
+
+        expired = time.time() + tank.util.shotgun_batch.get_find_cache().ttl + 1
+        with patch("tank.util.shotgun_batch.time.time", return_value=expired):
+            fields, queries = self._get_fields()
+        self.assertEqual(fields["shot_desc"], "closeup")
+        self.assertEqual(len(queries), 1)
+
+    def test_memo_expiry(self):
+        """
+        Ensures the memoized fields of a context holding Shotgun values expire
+        along with the Shotgun records.
+        """
+        entity = {"type": "Shot", "id": self.shot["id"], "name": self.shot["code"]}
+        ctx = context.Context(self.tk, project=self.project, entity=entity)
+        sg = self.tk.shotgun
+        expired = time.time() + tank.util.shotgun_batch.get_find_cache().ttl + 1
+        with patch.object(sg, "find", wraps=sg.find) as find_mock:
+            ctx.as_template_fields(self.template)
+            ctx.as_template_fields(self.template)
+            self.assertEqual(find_mock.call_count, 1)
+
+            with patch("time.time", return_value=expired):
+                fields = ctx.as_template_fields(self.template)
+            self.assertEqual(fields["shot_type"], "hero")
+            self.assertEqual(find_mock.call_count, 2)
+
+
+class TestJsonSerialize(TankTestBase):
+    """
+    Tests the serialization of contexts in the JSON format.
+    """
+
+    def setUp(self):
+        super(TestJsonSerialize, self).setUp()
+
+        seq = {"type": "Sequence", "code": "seq_name", "id": 3, "project": self.project}
+        seq_path = os.path.join(self.project_root, "sequences", "seq_name")
+        self.add_production_path(seq_path, seq)
+
+        shot = {"type": "Shot", "code": "shot_name", "id": 2, "sg_sequence": seq, "project": self.project}
+        self.shot_path = os.path.join(seq_path, "shot_name")
+        self.add_production_path(self.shot_path, shot)
+
+        step = {"type": "Step", "code": "step_name", "id": 4}
+        self.shot_step_path = os.path.join(self.shot_path, "step_name")
+        self.add_production_path(self.shot_step_path, step)
+
+        # each Sgtk instance reads its own templates
+        patcher = patch("tank.api.read_templates", side_effect=self._read_templates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tk.reload_templates()
+
+        patcher = patch("tank.util.login.get_current_user", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ctx = self.tk.context_from_path(self.shot_step_path)
+
+    def _read_templates(self, pipeline_configuration):
+        """
+        Returns the templates of the shot work area and of an asset work area.
+        """
+        keys = {
+            "Sequence": StringKey("Sequence", pipeline_configuration, shotgun_entity_type="Sequence"),
+            "Shot": StringKey("Shot", pipeline_configuration, shotgun_entity_type="Shot"),
+            "Step": StringKey("Step", pipeline_configuration, shotgun_entity_type="Step"),
+            "Asset": StringKey("Asset", pipeline_configuration, shotgun_entity_type="Asset"),
+        }
+        templates = {
+            "shot_work_area": TemplatePath(
+                "sequences/{Sequence}/{Shot}/{Step}/work", keys, pipeline_configuration, self.project_root
+            ),
+            "asset_work_area": TemplatePath(
+                "assets/{Asset}/{Step}/work", keys, pipeline_configuration, self.project_root
+            ),
+        }
+        return templates, keys
+
+    def test_round_trip(self):
+        """
+        Ensures deserialized contexts are equal to the original ones.
+        """
+        context_str = self.ctx.serialize(with_user_credentials=False, use_json=True)
+        data = json.loads(context_str)
+        self.assertEqual(data["version"], tank.constants.CONTEXT_SERIALIZATION_VERSION)
+        # only the templates of the context's entity hierarchy are resolved
+        self.assertEqual(list(data["templates"]), ["shot_work_area"])
+
+        ctx = tank.Context.deserialize(context_str)
+        self.assertEqual(ctx, self.ctx)
+        self.assertEqual(ctx.additional_entities, self.ctx.additional_entities)
+        self.assertIsInstance(ctx.entity["name"], str)
+
+        # the format is detected, both can be deserialized
+        self.assertEqual(tank.Context.deserialize(self.ctx.serialize(with_user_credentials=False)), self.ctx)
+
+    def test_resolved_data(self):
+        """
+        Ensures the entity locations and template fields are used without lookups.
+        """
+        fields = self.ctx.as_template_fields(self.tk.templates["shot_work_area"], validate=True)
+        self.assertEqual(fields, {"Sequence": "seq_name", "Shot": "shot_name", "Step": "step_name"})
+        ctx = tank.Context.deserialize(self.ctx.serialize(with_user_credentials=False, use_json=True))
+        template = ctx.sgtk.templates["shot_work_area"]
+
+        with patch("tank.context.PathCache") as path_cache_mock:
+            with patch.object(ctx.sgtk, "paths_from_entity") as paths_mock:
+                with patch("tank.util.shotgun.get_sg_connection") as sg_mock:
+                    self.assertEqual(ctx.entity_locations, [self.shot_path])
+                    self.assertEqual(ctx.as_template_fields(template, validate=True), fields)
+        self.assertEqual(path_cache_mock.call_count, 0)
+        self.assertEqual(paths_mock.call_count, 0)
+        self.assertEqual(sg_mock.call_count, 0)
+
+        # the resolved data is discarded once the path cache changes
+        ctx.sgtk._get_path_cache_database().mark_changed()
+        with patch.object(ctx.sgtk, "paths_from_entity", return_value=[]) as paths_mock:
+            self.assertEqual(ctx.entity_locations, [])
+        self.assertEqual(paths_mock.call_count, 1)
+
+    def test_unsupported_version(self):
+        """
+        Ensures contexts serialized with newer formats are reported.
+        """
+        data = json.loads(self.ctx.serialize(with_user_credentials=False, use_json=True))
+        data["version"] += 1
+        self.assertRaises(TankContextDeserializationError, tank.Context.deserialize, json.dumps(data))
+
+
 class TestSerialize(TestContext):
     def setUp(self):
         super(TestSerialize, self).setUp()
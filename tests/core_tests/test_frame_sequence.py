@@ -0,0 +1,54 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from tank import FrameSequence
+from tank_test.tank_test_base import ShotgunTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestFrameSequence(ShotgunTestBase):
+    """Tests the FrameSequence class."""
+
+    def test_ranges(self):
+        sequence = FrameSequence("render.%04d.exr", [7, 1, 2, 3, 5, 3, 8])
+        self.assertEquals([(1, 3), (5, 5), (7, 8)], sequence.ranges)
+        self.assertEquals([1, 2, 3, 5, 7, 8], sequence.frames)
+        self.assertEquals(6, len(sequence))
+        self.assertEquals(1, sequence.first_frame)
+        self.assertEquals(8, sequence.last_frame)
+
+    def test_missing_frames(self):
+        sequence = FrameSequence("render.%04d.exr", [1, 2, 5, 9])
+        self.assertEquals([3, 4, 6, 7, 8], sequence.missing_frames)
+        self.assertIn(5, sequence)
+        self.assertNotIn(4, sequence)
+
+    def test_string(self):
+        sequence = FrameSequence("render.%04d.exr", [1, 2, 3, 5])
+        self.assertEquals("render.%04d.exr [1-3, 5]", str(sequence))
+
+    def test_empty(self):
+        sequence = FrameSequence("render.%04d.exr", [])
+        self.assertEquals(0, len(sequence))
+        self.assertEquals([], sequence.ranges)
+        self.assertIsNone(sequence.first_frame)
+        self.assertIsNone(sequence.last_frame)
+
+    def test_equality(self):
+        self.assertEquals(FrameSequence("a.%04d.exr", [1, 2]), FrameSequence("a.%04d.exr", [2, 1]))
+        self.assertNotEquals(FrameSequence("a.%04d.exr", [1, 2]), FrameSequence("a.%04d.exr", [1, 3]))
+
+    def test_hash(self):
+        sequences = set([
+            FrameSequence("a.%04d.exr", [1, 2]),
+            FrameSequence("a.%04d.exr", [2, 1]),
+            FrameSequence("a.%04d.exr", [1, 3]),
+        ])
+        self.assertEquals(2, len(sequences))
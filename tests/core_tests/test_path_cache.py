@@ -13,9 +13,12 @@ from __future__ import with_statement, print_function
 import os
 import sys
 import time
+import sqlite3
+import threading
 import Queue
 import StringIO
 import shutil
+import tempfile
 import contextlib
 import logging
 
@@ -39,6 +42,23 @@ def add_item_to_cache(path_cache, entity, path, primary=True):
     path_cache.add_mappings(data, None, [])
 
 
+def get_cache_entries(path_cache, entity_type, entity_id):
+    """
+    Returns the path cache entries of an entity.
+
+    :returns: list of (db path, root name, entity name) tuples
+    """
+    cursor = path_cache._connection.cursor()
+    try:
+        return [
+            (db_path, root_name, entity_name)
+            for (_, curr_type, curr_id, entity_name, root_name, db_path, _) in path_cache._get_entries(cursor)
+            if (curr_type, curr_id) == (entity_type, entity_id)
+        ]
+    finally:
+        cursor.close()
+
+
 def sync_path_cache(tk, force_full_sync=False):
     """
     Synchronizes the path cache with Shotgun.
@@ -86,6 +106,7 @@ class TestInit(TestPathCache):
         
         if os.path.exists(self.path_cache_location):
             self.path_cache.close()
+            self.tk.close()
             os.remove(self.path_cache_location)
         self.assertFalse(os.path.exists(self.path_cache_location))
         pc = path_cache.PathCache(self.tk)
@@ -108,6 +129,283 @@ class TestInit(TestPathCache):
 
 
 
+class TestPathCacheDatabase(TestPathCache):
+    """Tests the path cache database shared by the path cache objects of a tk instance."""
+
+    def test_shared_connection(self):
+        pc = path_cache.PathCache(self.tk)
+        self.assertIs(self.path_cache._connection, pc._connection)
+        pc.close()
+        # the connection stays open
+        self.path_cache._connection.execute("SELECT * FROM path_cache_entry").fetchall()
+
+    def test_thread_connections(self):
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(path_cache.PathCache(self.tk)._connection))
+        thread.start()
+        thread.join()
+        self.assertEqual(1, len(connections))
+        self.assertIsNot(self.path_cache._connection, connections[0])
+
+        # the connection of the thread which exited is closed when another one is opened
+        thread = threading.Thread(target=lambda: connections.append(path_cache.PathCache(self.tk)._connection))
+        thread.start()
+        thread.join()
+        self.assertRaises(sqlite3.ProgrammingError, connections[0].cursor)
+        connections[1].cursor()
+        self.path_cache._connection.cursor()
+        self.assertEqual(2, len(self.tk._get_path_cache_database()._connections))
+
+    def test_opened_once(self):
+        """The location is resolved and the schema checked only once."""
+        with patch.object(path_cache.PathCache, "_check_schema") as check_schema:
+            with patch.object(self.tk, "execute_core_hook_method") as hook:
+                path_cache.PathCache(self.tk).close()
+                path_cache.PathCache(self.tk).close()
+        self.assertEqual(0, check_schema.call_count)
+        self.assertEqual(0, hook.call_count)
+
+    def test_close(self):
+        connection = self.path_cache._connection
+        self.tk.close()
+        self.assertRaises(sqlite3.ProgrammingError, connection.cursor)
+
+        # connections are opened again on demand, checking the schema
+        with patch.object(path_cache.PathCache, "_check_schema", autospec=True,
+                          side_effect=path_cache.PathCache._check_schema) as check_schema:
+            pc = path_cache.PathCache(self.tk)
+            self.assertIsNot(connection, pc._connection)
+            self.assertIs(self.path_cache._connection, pc._connection)
+            self.path_cache._connection.execute("SELECT * FROM path_cache_entry").fetchall()
+            pc.close()
+        self.assertEqual(1, check_schema.call_count)
+
+    def test_close_discards_contexts(self):
+        """Contexts cached for an instance are discarded when it is closed."""
+        shot = {"type": "Shot", "id": 1}
+        ctx = self.tk.context_empty()
+        tank.context.g_context_cache.add(self.tk, shot, ctx)
+        self.assertIs(ctx, tank.context.g_context_cache.get(self.tk, shot))
+        self.tk.close()
+        self.assertIsNone(tank.context.g_context_cache.get(self.tk, shot))
+
+
+class TestPathCacheReplica(TestPathCache):
+    """Tests reading the path cache from a local replica of the database."""
+
+    def setUp(self):
+        super(TestPathCacheReplica, self).setUp()
+        self.shot = {"type": "Shot", "id": 999, "name": "shot_name"}
+        self.shot_path = os.path.join(self.project_root, "seq", "shot_name")
+
+        # the replica location is resolved when the database is opened
+        self.tk.close()
+        patcher = patch.object(
+            self.tk.pipeline_configuration, "get_path_cache_replica_enabled", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path_cache = path_cache.PathCache(self.tk)
+        self.replica_location = self.tk._get_path_cache_database().get_replica_path()
+
+    def _get_replica_entries(self):
+        connection = sqlite3.connect(self.replica_location)
+        try:
+            return connection.execute(
+                "SELECT t.name, e.entity_id FROM path_cache_entry e "
+                "INNER JOIN path_cache_entity_type t ON t.id = e.entity_type_id"
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def test_replica(self):
+        self.assertIsNotNone(self.replica_location)
+        self.assertNotEqual(self.path_cache_location, self.replica_location)
+        self.assertTrue(os.path.exists(self.replica_location))
+        self.assertIsNot(self.path_cache._connection, self.path_cache._read_connection)
+
+    def test_writes(self):
+        """Writes go to the database and are copied to the replica."""
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        # along with the project entries registered by the test base class
+        self.assertEqual(
+            [("Shot", 999)],
+            [entry for entry in self._get_replica_entries() if entry[0] != "Project"]
+        )
+        self.assertEqual(self.shot, self.path_cache.get_entity(self.shot_path))
+
+    def test_writes_replayed(self):
+        """Writes are replayed on the replica rather than copied to it."""
+        with patch("tank.path_cache._copy_database") as copy_database:
+            add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        self.assertEqual(0, copy_database.call_count)
+        self.assertEqual(
+            [("Shot", 999)],
+            [entry for entry in self._get_replica_entries() if entry[0] != "Project"]
+        )
+
+    def test_writes_after_external_changes(self):
+        """The database is copied to the replica if another process modified it since the last copy."""
+        connection = sqlite3.connect(self.path_cache_location)
+        connection.execute("INSERT INTO path_cache_entity_type(name) VALUES('Asset')")
+        connection.commit()
+        connection.close()
+
+        with patch("tank.path_cache._copy_database", wraps=path_cache._copy_database) as copy_database:
+            add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        self.assertEqual(1, copy_database.call_count)
+
+        connection = sqlite3.connect(self.replica_location)
+        try:
+            self.assertEqual(
+                [(1,)], connection.execute("SELECT count(*) FROM path_cache_entity_type WHERE name = 'Asset'").fetchall()
+            )
+        finally:
+            connection.close()
+
+    def test_external_changes(self):
+        """The replica is refreshed when another process modifies the database."""
+        connection = sqlite3.connect(self.path_cache_location)
+        connection.executescript("""
+            INSERT OR IGNORE INTO path_cache_folder(parent_id, name) VALUES(0, 'primary');
+            INSERT INTO path_cache_folder(parent_id, name)
+                SELECT id, 'seq' FROM path_cache_folder WHERE parent_id = 0 AND name = 'primary';
+            INSERT INTO path_cache_folder(parent_id, name)
+                SELECT id, 'shot_name' FROM path_cache_folder WHERE name = 'seq';
+            INSERT OR IGNORE INTO path_cache_entity_type(name) VALUES('Shot');
+            INSERT INTO path_cache_entry(folder_id, entity_type_id, entity_id, entity_name, primary_entity)
+                SELECT f.id, t.id, 999, 'shot_name', 1 FROM path_cache_folder f, path_cache_entity_type t
+                WHERE f.name = 'shot_name' AND t.name = 'Shot';
+            """)
+        connection.close()
+
+        # reads are done from the replica
+        self.assertIsNone(self.path_cache._get_entity(self.shot_path))
+
+        pc = path_cache.PathCache(self.tk)
+        self.assertEqual(self.shot, pc._get_entity(self.shot_path))
+        pc.close()
+
+    def test_disabled(self):
+        self.tk.close()
+        with patch.object(self.tk.pipeline_configuration, "get_path_cache_replica_enabled", return_value=False):
+            pc = path_cache.PathCache(self.tk)
+            self.assertIsNone(self.tk._get_path_cache_database().get_replica_path())
+            self.assertIs(pc._connection, pc._read_connection)
+            pc.close()
+
+
+class TestSchemaMigration(TestPathCache):
+    """Tests the migration of the path cache entries to the v2 tables."""
+
+    def setUp(self):
+        super(TestSchemaMigration, self).setUp()
+        self.shot = {"type": "Shot", "id": 999, "name": "shot_name"}
+        self.shot_path = os.path.join(self.project_root, "seq", "shot_name")
+
+        # replace the database with one holding the v1 tables only
+        self.tk.close()
+        os.remove(self.path_cache_location)
+        connection = sqlite3.connect(self.path_cache_location)
+        connection.executescript("""
+            CREATE TABLE path_cache (entity_type text, entity_id integer, entity_name text, root text, path text, primary_entity integer);
+            CREATE INDEX path_cache_entity ON path_cache(entity_type, entity_id);
+            CREATE INDEX path_cache_path ON path_cache(root, path, primary_entity);
+            CREATE UNIQUE INDEX path_cache_all ON path_cache(entity_type, entity_id, root, path, primary_entity);
+            CREATE TABLE event_log_sync (last_id integer);
+            CREATE TABLE shotgun_status (path_cache_id integer, shotgun_id integer);
+            CREATE UNIQUE INDEX shotgun_status_id ON shotgun_status(path_cache_id);
+            CREATE INDEX shotgun_status_shotgun_id ON shotgun_status(shotgun_id);
+
+            INSERT INTO path_cache VALUES('Shot', 999, 'shot_name', 'primary', '/seq/shot_name', 1);
+            INSERT INTO path_cache VALUES('Sequence', 2, 'seq', 'primary', '/seq/shot_name', 0);
+            INSERT INTO shotgun_status VALUES(1, 1234);
+            INSERT INTO event_log_sync VALUES(42);
+            """)
+        connection.close()
+
+    def test_migration(self):
+        pc = path_cache.PathCache(self.tk)
+        self.assertEqual(self.shot, pc.get_entity(self.shot_path))
+        self.assertEqual([{"type": "Sequence", "id": 2, "name": "seq"}], pc.get_secondary_entities(self.shot_path))
+        self.assertEqual([self.shot_path], pc.get_paths("Shot", 999, primary_only=True))
+        self.assertEqual(1234, pc.get_shotgun_id_from_path(self.shot_path))
+
+        connection = pc._connection
+        self.assertEqual([(42,)], connection.execute("SELECT last_id FROM path_cache_sync").fetchall())
+        # older cores find an empty path cache and do a full sync
+        for table_name in ["path_cache", "event_log_sync"]:
+            self.assertEqual([], connection.execute("SELECT * FROM %s" % table_name).fetchall())
+        # apart from the sentinel telling their full syncs apart
+        self.assertEqual([(0, 0)], connection.execute("SELECT * FROM shotgun_status").fetchall())
+        pc.close()
+
+    def _write_v1_entries(self, sql):
+        """
+        Migrates the database, then runs statements against the v1 tables the way an older core would.
+        """
+        path_cache.PathCache(self.tk).close()
+        self.tk.close()
+
+        connection = sqlite3.connect(self.path_cache_location)
+        connection.executescript(sql)
+        connection.close()
+
+    def test_entries_from_older_cores(self):
+        """Entries written by older cores after the migration are merged into the v2 tables."""
+        self._write_v1_entries("""
+            INSERT INTO path_cache VALUES('Shot', 1000, 'other_shot', 'primary', '/seq/other_shot', 1);
+            INSERT INTO shotgun_status VALUES(1, 1235);
+            INSERT INTO path_cache VALUES('Shot', 1001, 'conflicting_shot', 'primary', '/seq/shot_name', 1);
+            INSERT INTO event_log_sync VALUES(50);
+            """)
+
+        pc = path_cache.PathCache(self.tk)
+        self.assertEqual(
+            {"type": "Shot", "id": 1000, "name": "other_shot"},
+            pc.get_entity(os.path.join(self.project_root, "seq", "other_shot"))
+        )
+        self.assertEqual(1235, pc.get_shotgun_id_from_path(os.path.join(self.project_root, "seq", "other_shot")))
+        # the existing entries are kept, along with the marker they were synced up to.
+        self.assertEqual(self.shot, pc.get_entity(self.shot_path))
+        self.assertEqual(1234, pc.get_shotgun_id_from_path(self.shot_path))
+        connection = pc._connection
+        self.assertEqual([(42,)], connection.execute("SELECT last_id FROM path_cache_sync").fetchall())
+        self.assertEqual([], connection.execute("SELECT * FROM path_cache").fetchall())
+        self.assertEqual([(0, 0)], connection.execute("SELECT * FROM shotgun_status").fetchall())
+        pc.close()
+
+    def test_full_sync_from_older_cores(self):
+        """A full sync done by an older core after the migration replaces the v2 tables."""
+        self._write_v1_entries("""
+            DELETE FROM event_log_sync;
+            DELETE FROM shotgun_status;
+            DELETE FROM path_cache;
+            INSERT INTO path_cache VALUES('Shot', 1000, 'other_shot', 'primary', '/seq/other_shot', 1);
+            INSERT INTO shotgun_status VALUES(1, 1235);
+            INSERT INTO event_log_sync VALUES(50);
+            """)
+
+        pc = path_cache.PathCache(self.tk)
+        self.assertEqual(
+            {"type": "Shot", "id": 1000, "name": "other_shot"},
+            pc.get_entity(os.path.join(self.project_root, "seq", "other_shot"))
+        )
+        self.assertIsNone(pc._get_entity(self.shot_path))
+        self.assertEqual([(50,)], pc._connection.execute("SELECT last_id FROM path_cache_sync").fetchall())
+        pc.close()
+
+    def test_no_compaction_after_first_migration(self):
+        """The database is only compacted when it is first migrated."""
+        self._write_v1_entries(
+            "INSERT INTO path_cache VALUES('Shot', 1000, 'other_shot', 'primary', '/seq/other_shot', 1);"
+        )
+        with patch("tank.path_cache._PathCacheCursor.execute", autospec=True,
+                   side_effect=path_cache._PathCacheCursor.execute) as execute:
+            path_cache.PathCache(self.tk).close()
+        self.assertNotIn("VACUUM", [args[0][1] for args in execute.call_args_list])
+
+
 class TestAddMapping(TestPathCache):
 
     def setUp(self):
@@ -129,11 +427,7 @@ class TestAddMapping(TestPathCache):
         full_path = os.path.join(self.project_root, relative_path)
         add_item_to_cache(self.path_cache, self.entity, full_path)
 
-        res = self.db_cursor.execute(
-            "SELECT path, root FROM path_cache "
-            "WHERE entity_type = ? AND entity_id = ?", (self.entity["type"], self.entity["id"])
-        )
-        entry = res.fetchall()[0]
+        entry = get_cache_entries(self.path_cache, self.entity["type"], self.entity["id"])[0]
         self.assertEquals("/shot", entry[0])
         self.assertEquals("primary", entry[1])
 
@@ -157,8 +451,8 @@ class TestAddMapping(TestPathCache):
         self.assertRaises(tank.TankError, add_item_to_cache, self.path_cache, ne2, full_path)         
 
         # finally, make sure that there is exactly a single record in the db representing the path
-        res = self.db_cursor.execute("SELECT path, root FROM path_cache WHERE entity_type = ? AND entity_id = ?", (self.entity["type"], self.entity["id"]))
-        self.assertEqual( len(res.fetchall()), 1)
+        entries = get_cache_entries(self.path_cache, self.entity["type"], self.entity["id"])
+        self.assertEqual( len(entries), 1)
 
     def test_is_path_in_db(self):
         """
@@ -246,8 +540,8 @@ class TestAddMapping(TestPathCache):
         self.assertEquals( paths[0], full_path)
 
         # finally, make sure that there no dupe records
-        res = self.db_cursor.execute("SELECT path, root FROM path_cache WHERE entity_type = ? AND entity_id = ?", (self.entity["type"], self.entity["id"]+3))
-        self.assertEqual( len(res.fetchall()), 1)
+        entries = get_cache_entries(self.path_cache, self.entity["type"], self.entity["id"]+3)
+        self.assertEqual( len(entries), 1)
 
     def test_non_primary_path(self):
         """
@@ -257,8 +551,7 @@ class TestAddMapping(TestPathCache):
         full_path = os.path.join(self.alt_root_1, relative_path)
         add_item_to_cache(self.path_cache, self.entity, full_path)
 
-        res = self.db_cursor.execute("SELECT path, root FROM path_cache WHERE entity_type = ? AND entity_id = ?", (self.entity["type"], self.entity["id"]))
-        entry = res.fetchall()[0]
+        entry = get_cache_entries(self.path_cache, self.entity["type"], self.entity["id"])[0]
         self.assertEquals("/shot", entry[0])
         self.assertEquals("alternate_1", entry[1])
 
@@ -273,9 +566,8 @@ class TestAddMapping(TestPathCache):
         entity_name = "someunicode\xe8"
         add_item_to_cache(self.path_cache, {"name":entity_name, "id":entity_id, "type":entity_type}, full_path)
 
-        res = self.db_cursor.execute("SELECT entity_name FROM path_cache WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id))
-        entry = res.fetchall()[0]
-        self.assertEquals(entity_name, entry[0])
+        entry = get_cache_entries(self.path_cache, entity_type, entity_id)[0]
+        self.assertEquals(entity_name, entry[2])
 
 
 class TestGetEntity(TestPathCache):
@@ -339,6 +631,237 @@ class TestGetEntity(TestPathCache):
         self.assertIsNone(result)
 
 
+class TestGetAncestorEntities(TestPathCache):
+    """Tests the lookup of the entities of a path and its parent folders."""
+
+    def setUp(self):
+        super(TestGetAncestorEntities, self).setUp()
+        self.proj = {"type": "Project", "id": self.project["id"], "name": self.project["name"]}
+        self.shot = {"type": "Shot", "id": 999, "name": "shot_name"}
+        self.step = {"type": "Step", "id": 888, "name": "step_name"}
+        self.seq_path = os.path.join(self.alt_root_1, "seq")
+        self.shot_path = os.path.join(self.seq_path, "shot_name")
+        self.step_path = os.path.join(self.shot_path, "step_name")
+
+        add_item_to_cache(self.path_cache, self.proj, self.project_root)
+        add_item_to_cache(self.path_cache, self.proj, self.alt_root_1)
+        add_item_to_cache(self.path_cache, self.shot, self.shot_path)
+        add_item_to_cache(self.path_cache, self.step, self.step_path)
+        add_item_to_cache(self.path_cache, self.shot, self.step_path, primary=False)
+
+    def test_ancestors(self):
+        with patch.object(self.path_cache, "_get_entity_from_schema", return_value=None) as from_schema:
+            with patch.object(self.path_cache, "_get_entity") as get_entity:
+                result = self.path_cache.get_ancestor_entities(os.path.join(self.step_path, "work"))
+
+        self.assertEqual(0, get_entity.call_count)
+        # the folders missing from the path cache are looked up in the schema
+        self.assertEqual(
+            [call(os.path.join(self.step_path, "work")), call(self.seq_path)],
+            from_schema.call_args_list
+        )
+        self.assertEqual(
+            [
+                (os.path.join(self.step_path, "work"), None, []),
+                (self.step_path, self.step, [self.shot]),
+                (self.shot_path, self.shot, []),
+                (self.seq_path, None, []),
+                (self.alt_root_1, self.proj, []),
+            ],
+            result
+        )
+
+    def test_single_folder_query(self):
+        """The folders of a path and of its parents are looked up with a single query."""
+        stats = self.tk._get_path_cache_database().stats
+        stats.reset()
+        with patch.object(self.path_cache, "_get_entity_from_schema", return_value=None):
+            with patch.object(self.path_cache, "_get_folder_ids") as get_folder_ids:
+                self.path_cache.get_ancestor_entities(os.path.join(self.step_path, "work"))
+        self.assertEqual(0, get_folder_ids.call_count)
+        # a query for the folders and another one for their entities
+        self.assertEqual(2, stats.get_stats()["queries"])
+
+    def test_non_project_path(self):
+        non_project_path = os.path.join(os.path.sep, "path", "not", "in", "project")
+        with patch.object(self.path_cache, "_get_entity_from_schema", return_value=None):
+            result = self.path_cache.get_ancestor_entities(non_project_path)
+        self.assertEqual(5, len(result))
+        self.assertEqual([(non_project_path, None, [])], result[:1])
+        self.assertEqual(os.path.sep, result[-1][0])
+
+    def test_ancestors_for_paths(self):
+        work_path = os.path.join(self.step_path, "work")
+        other_shot_path = os.path.join(self.seq_path, "other_shot")
+        with patch.object(self.path_cache, "_get_entity_from_schema", return_value=None) as from_schema:
+            with patch.object(
+                self.path_cache, "_get_entities_for_paths", wraps=self.path_cache._get_entities_for_paths
+            ) as get_entities:
+                result = self.path_cache.get_ancestor_entities_for_paths([work_path, other_shot_path, work_path])
+
+            # all the folders are looked up at once, the shared ones only once
+            self.assertEqual(1, get_entities.call_count)
+            self.assertEqual(3, from_schema.call_count)
+            self.assertEqual(set([work_path, other_shot_path]), set(result))
+            self.assertEqual(self.path_cache.get_ancestor_entities(work_path), result[work_path])
+
+        self.assertEqual(
+            [
+                (other_shot_path, None, []),
+                (self.seq_path, None, []),
+                (self.alt_root_1, self.proj, []),
+            ],
+            result[other_shot_path]
+        )
+
+
+class TestBulkLookups(TestPathCache):
+    """Tests the lookups of entities and paths in bulk."""
+
+    def setUp(self):
+        super(TestBulkLookups, self).setUp()
+        self.proj = {"type": "Project", "id": self.project["id"], "name": self.project["name"]}
+        self.shots = [{"type": "Shot", "id": index, "name": "shot_%03d" % index} for index in range(250)]
+        self.step = {"type": "Step", "id": 888, "name": "step_name"}
+
+        self.shot_paths = []
+        data = [{"entity": self.proj, "path": self.project_root, "primary": True, "metadata": {}}]
+        for index, shot in enumerate(self.shots):
+            root = self.project_root if index % 2 else self.alt_root_1
+            path = os.path.join(root, "seq", shot["name"])
+            self.shot_paths.append(path)
+            data.append({"entity": shot, "path": path, "primary": True, "metadata": {}})
+        self.step_path = os.path.join(self.shot_paths[1], "step_name")
+        data.append({"entity": self.step, "path": self.step_path, "primary": True, "metadata": {}})
+        data.append({"entity": self.shots[1], "path": self.step_path, "primary": False, "metadata": {}})
+        self.path_cache.add_mappings(data, None, [])
+
+    def test_get_entities_for_paths(self):
+        missing_path = os.path.join(self.project_root, "missing")
+        paths = self.shot_paths + [self.step_path, self.project_root, missing_path, "/not/in/project"]
+
+        with patch.object(self.path_cache, "_get_entity_from_schema", return_value=None) as from_schema:
+            result = self.path_cache.get_entities_for_paths(paths)
+
+        self.assertEqual(
+            dict(zip(self.shot_paths, self.shots)),
+            dict((path, result[path]) for path in self.shot_paths)
+        )
+        self.assertEqual(self.step, result[self.step_path])
+        self.assertEqual(self.proj, result[self.project_root])
+        self.assertIsNone(result[missing_path])
+        self.assertIsNone(result["/not/in/project"])
+        self.assertEqual([call(missing_path), call("/not/in/project")], from_schema.call_args_list)
+
+        # same as the one by one lookups
+        for path in self.shot_paths[:10] + [self.step_path]:
+            self.assertEqual(self.path_cache.get_entity(path), result[path])
+
+    def test_get_secondary_entities_for_paths(self):
+        result = self.path_cache.get_secondary_entities_for_paths([self.step_path, self.shot_paths[1]])
+        self.assertEqual({self.step_path: [self.shots[1]], self.shot_paths[1]: []}, result)
+
+    def test_get_paths_for_entities(self):
+        entities = [(shot["type"], shot["id"]) for shot in self.shots] + [("Shot", 1000), ("Step", 888)]
+        result = self.path_cache.get_paths_for_entities(entities, primary_only=True)
+
+        self.assertEqual(len(entities), len(result))
+        for shot, path in zip(self.shots, self.shot_paths):
+            self.assertEqual([path], result[("Shot", shot["id"])])
+        self.assertEqual([], result[("Shot", 1000)])
+        self.assertEqual([self.step_path], result[("Step", 888)])
+
+        result = self.path_cache.get_paths_for_entities([("Shot", 1)], primary_only=False)
+        self.assertEqual(sorted([self.shot_paths[1], self.step_path]), sorted(result[("Shot", 1)]))
+
+    def test_sgtk(self):
+        self.assertEqual(
+            {self.shot_paths[0]: self.shots[0], self.step_path: self.step},
+            self.tk.entities_from_paths([self.shot_paths[0], self.step_path])
+        )
+        self.assertEqual(
+            {("Shot", 0): [self.shot_paths[0]], ("Step", 888): [self.step_path]},
+            self.tk.paths_from_entities([("Shot", 0), ("Step", 888)])
+        )
+
+
+class TestGetEntitiesUnderPath(TestPathCache):
+    """Tests the lookups of the entities registered in a subtree."""
+
+    def setUp(self):
+        super(TestGetEntitiesUnderPath, self).setUp()
+        self.seq = {"type": "Sequence", "id": 1, "name": "seq_a"}
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_a"}
+        self.step = {"type": "Step", "id": 3, "name": "step_a"}
+        # names sorting around the "/" separator, and with LIKE wildcards
+        self.other_seqs = [
+            {"type": "Sequence", "id": 4, "name": "seq_a-b"},
+            {"type": "Sequence", "id": 5, "name": "seq_a0"},
+            {"type": "Sequence", "id": 6, "name": "seqXa"},
+            {"type": "Sequence", "id": 7, "name": "SEQ_A"},
+        ]
+
+        self.seq_path = os.path.join(self.project_root, "sequences", "seq_a")
+        self.shot_path = os.path.join(self.seq_path, "shot_a")
+        self.step_path = os.path.join(self.shot_path, "step_a")
+
+        data = [
+            {"entity": self.seq, "path": self.seq_path, "primary": True, "metadata": {}},
+            {"entity": self.shot, "path": self.shot_path, "primary": True, "metadata": {}},
+            {"entity": self.step, "path": self.step_path, "primary": True, "metadata": {}},
+            {"entity": self.shot, "path": self.step_path, "primary": False, "metadata": {}},
+        ]
+        for seq in self.other_seqs:
+            path = os.path.join(self.project_root, "sequences", seq["name"])
+            data.append({"entity": seq, "path": path, "primary": True, "metadata": {}})
+            data.append({"entity": seq, "path": os.path.join(path, "shot_a"), "primary": True, "metadata": {}})
+        self.path_cache.add_mappings(data, None, [])
+
+    def test_subtree(self):
+        result = self.path_cache.get_entities_under_path(self.seq_path)
+        self.assertEqual(
+            [
+                (self.seq_path, self.seq, True),
+                (self.shot_path, self.shot, True),
+                (self.step_path, self.shot, False),
+                (self.step_path, self.step, True),
+            ],
+            sorted((entry["path"], entry["entity"], entry["primary"]) for entry in result)
+        )
+        # the FilesystemLocation ids of the primary and secondary entries of a folder are recorded.
+        sg_ids = [entry["sg_id"] for entry in result]
+        self.assertNotIn(None, sg_ids)
+        self.assertEqual(len(sg_ids), len(set(sg_ids)))
+
+        result = self.path_cache.get_entities_under_path(self.shot_path, primary_only=True)
+        self.assertEqual(
+            [(self.shot_path, self.shot), (self.step_path, self.step)],
+            [(entry["path"], entry["entity"]) for entry in result]
+        )
+
+    def test_leaf_and_missing(self):
+        result = self.path_cache.get_entities_under_path(self.step_path, primary_only=True)
+        self.assertEqual([self.step], [entry["entity"] for entry in result])
+
+        self.assertEqual([], self.path_cache.get_entities_under_path(os.path.join(self.seq_path, "missing")))
+        self.assertEqual([], self.path_cache.get_entities_under_path("/not/in/project"))
+
+    def test_folder_tree(self):
+        sg_id = self.path_cache.get_shotgun_id_from_path(self.seq_path)
+        tree = self.path_cache.get_folder_tree_from_sg_id(sg_id)
+        # one item per FilesystemLocation, the step folder also having a secondary entry.
+        self.assertEqual(
+            sorted([self.seq_path, self.shot_path, self.step_path, self.step_path]),
+            sorted(item["path"] for item in tree)
+        )
+
+    def test_sgtk(self):
+        self.assertEqual(
+            {self.seq_path: self.seq, self.shot_path: self.shot, self.step_path: self.step},
+            self.tk.entities_under_path(self.seq_path)
+        )
+
+
 class TestGetPaths(TestPathCache):
     def test_add_and_find_shot(self):
         # add two paths to cache for a shot
@@ -422,7 +945,7 @@ class TestShotgunSync(TankTestBase):
     def _get_path_cache(self):
         path_cache = tank.path_cache.PathCache(self.tk)
         c = path_cache._connection.cursor()
-        cache = list(c.execute("select * from path_cache" ))
+        cache = path_cache._get_entries(c)
         c.close()
         path_cache.close()
         return cache
@@ -487,6 +1010,7 @@ class TestShotgunSync(TankTestBase):
         self.assertEqual(path_cache_contents_2, path_cache_contents_1)
         
         # now clear the path cache completely. This should trigger a full flush
+        self.tk.close()
         os.remove(pcl)
         log = sync_path_cache(self.tk)
         self.assertTrue("Performing a complete Shotgun folder sync" in log)
@@ -504,6 +1028,87 @@ class TestShotgunSync(TankTestBase):
         
         
         
+    def test_paged_full_sync(self):
+        """
+        Test that a full sync downloads and imports the folders one page at a time.
+        """
+        folder.process_filesystem_structure(self.tk,
+                                            self.task["type"],
+                                            self.task["id"],
+                                            preview=False,
+                                            engine=None)
+        path_cache_contents = self._get_path_cache()
+        self.assertEqual(len(path_cache_contents), 4)
+
+        # mockgun doesn't support limits, so apply it ourselves.
+        find = self.mockgun.find
+        page_sizes = []
+
+        def find_page(entity_type, filters, fields=None, order=None, limit=0, **kwargs):
+            result = find(entity_type, filters, fields, order, **kwargs)
+            if limit:
+                result = result[:limit]
+                page_sizes.append(len(result))
+            return result
+
+        path_cache = tank.path_cache.PathCache(self.tk)
+        pcl = path_cache._get_path_cache_location()
+        path_cache.close()
+        self.tk.close()
+        os.remove(pcl)
+
+        with patch.object(tank.path_cache.PathCache, "SHOTGUN_ENTITY_QUERY_BATCH_SIZE", 3):
+            with patch.object(self.mockgun, "find", side_effect=find_page):
+                log = sync_path_cache(self.tk)
+
+        self.assertTrue("Performing a complete Shotgun folder sync" in log)
+        # a full page, then the last one, fetched by the background thread.
+        self.assertEqual(page_sizes, [3, 1])
+        self.assertEqual(sorted(self._get_path_cache()), sorted(path_cache_contents))
+
+    def test_failed_full_sync(self):
+        """
+        Test that a full sync failing after a page was imported leaves the path cache untouched.
+        """
+        seq_path = os.path.join(self.project_root, "sequences", self.seq["code"])
+        shot_path = os.path.join(seq_path, self.shot["code"])
+        pc = tank.path_cache.PathCache(self.tk)
+        add_item_to_cache(pc, {"type": "Sequence", "id": self.seq["id"], "name": self.seq["code"]}, seq_path)
+        add_item_to_cache(pc, {"type": "Shot", "id": self.shot["id"], "name": self.shot["code"]}, shot_path)
+        pc.close()
+        path_cache_contents = self._get_path_cache()
+
+        # mockgun doesn't support limits, so apply it ourselves.
+        find = self.mockgun.find
+
+        def find_page(entity_type, filters, fields=None, order=None, limit=0, **kwargs):
+            result = find(entity_type, filters, fields, order, **kwargs)
+            return result[:limit] if limit else result
+
+        import_page = tank.path_cache.PathCache._import_filesystem_location_page
+        imported_pages = []
+
+        def import_first_page(path_cache, cursor, sg_data):
+            if imported_pages:
+                raise tank.TankError("Sync interrupted.")
+            imported_pages.append(sg_data)
+            return import_page(path_cache, cursor, sg_data)
+
+        pc = tank.path_cache.PathCache(self.tk)
+        try:
+            with patch.object(tank.path_cache.PathCache, "SHOTGUN_ENTITY_QUERY_BATCH_SIZE", 1):
+                with patch.object(self.mockgun, "find", side_effect=find_page):
+                    with patch.object(
+                        tank.path_cache.PathCache, "_import_filesystem_location_page",
+                        autospec=True, side_effect=import_first_page
+                    ):
+                        self.assertRaises(tank.TankError, pc.synchronize, True)
+        finally:
+            pc.close()
+
+        self.assertEqual(1, len(imported_pages))
+        self.assertEqual(sorted(path_cache_contents), sorted(self._get_path_cache()))
+
     def test_no_new_folders_created(self):
         """
         Test the case when folder creation is running for an already existing path 
@@ -682,6 +1287,7 @@ class TestShotgunSync(TankTestBase):
         path_cache = tank.path_cache.PathCache(self.tk)
         path_cache_location = path_cache._get_path_cache_location()
         path_cache.close()
+        self.tk.close()
         os.remove(path_cache_location)
 
         # now because we deleted our path cache, we will do a full sync
@@ -997,14 +1603,17 @@ class TestPathCacheDelete(TankTestBase):
         """
         Mocks a remote path cache that can be updated.
         """
-        # Override the SHOTGUN_HOME so that path cache is read from another location.
+        # Override the SHOTGUN_HOME so that path cache is read from another location. The
+        # location is resolved once per tk instance, so use another one.
         with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "other_path_cache_root")):
-            pc = path_cache.PathCache(self.tk)
+            tk = tank.Sgtk(self.tk.pipeline_configuration)
+            pc = path_cache.PathCache(tk)
             pc.synchronize()
             try:
                 yield pc
             finally:
                 pc.close()
+                tk.close()
 
     def test_simple_delete_by_paths(self):
         """
@@ -1154,6 +1763,375 @@ class TestPathCacheDelete(TankTestBase):
         pc.remove_filesystem_location_entries(self.tk, path_ids)
 
 
+class TestPathCacheSynchronizer(TankTestBase):
+    """
+    Tests the background path cache synchronizer.
+    """
+
+    def setUp(self):
+        super(TestPathCacheSynchronizer, self).setUp()
+
+        self._shot_entity = self.mockgun.create("Shot", {"code": "MyShot", "project": self.project})
+        self._shot_entity["name"] = "MyShot"
+        self._shot_full_path = os.path.join(self.project_root, "shot")
+
+        # creates and syncs the local path cache.
+        self._pc = path_cache.PathCache(self.tk)
+
+    def tearDown(self):
+        self._pc.close()
+        self.tk.close()
+        super(TestPathCacheSynchronizer, self).tearDown()
+
+    def _register_remotely(self, entity, path):
+        """
+        Registers a folder from another path cache, as if it was created on another machine.
+        """
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "other_path_cache_root")):
+            tk = tank.Sgtk(self.tk.pipeline_configuration)
+            pc = path_cache.PathCache(tk)
+            try:
+                pc.synchronize()
+                add_item_to_cache(pc, entity, path)
+            finally:
+                pc.close()
+                tk.close()
+
+    def test_background_sync(self):
+        """
+        Ensures folders registered elsewhere are synced in the background.
+        """
+        self._register_remotely(self._shot_entity, self._shot_full_path)
+        self.assertEqual(self._pc.get_paths("Shot", self._shot_entity["id"], primary_only=True), [])
+
+        synchronizer = self.tk.start_path_cache_synchronizer(0.01)
+        self.assertEqual(self.tk.get_path_cache_synchronizer(), synchronizer)
+
+        timeout = time.time() + 10
+        while synchronizer.get_metrics()["syncs"] == 0 and time.time() < timeout:
+            time.sleep(0.01)
+
+        self.tk.stop_path_cache_synchronizer()
+        self.assertFalse(synchronizer.is_alive())
+        self.assertEqual(self.tk.get_path_cache_synchronizer(), None)
+
+        self.assertEqual(
+            self._pc.get_paths("Shot", self._shot_entity["id"], primary_only=True),
+            [self._shot_full_path]
+        )
+
+        metrics = synchronizer.get_metrics()
+        self.assertTrue(metrics["syncs"] >= 1)
+        self.assertEqual(metrics["failures"], 0)
+        self.assertEqual(metrics["folders_synced"], 1)
+        self.assertFalse(metrics["full_sync_required"])
+        self.assertTrue(metrics["lag"] >= 0)
+
+        # the foreground sync has nothing left to do.
+        self.assertEqual(self._pc.synchronize(), [])
+
+    def test_no_background_full_sync(self):
+        """
+        Ensures full syncs are left to the foreground.
+        """
+        cursor = self._pc._connection.cursor()
+        cursor.execute("DELETE FROM path_cache_sync")
+        self._pc._connection.commit()
+        cursor.close()
+
+        synchronizer = path_cache.PathCacheSynchronizer(self.tk, 0.01)
+        synchronizer._synchronize()
+        self.assertTrue(synchronizer.get_metrics()["full_sync_required"])
+        self.assertEqual(synchronizer.get_metrics()["syncs"], 0)
+        self.assertEqual(synchronizer.get_metrics()["lag"], None)
+
+    def test_close(self):
+        """
+        Ensures closing the Toolkit instance stops the synchronizer.
+        """
+        synchronizer = self.tk.start_path_cache_synchronizer(0.01)
+        self.tk.close()
+        self.assertFalse(synchronizer.is_alive())
+
+
+class TestPathCacheSnapshot(TankTestBase):
+    """
+    Tests seeding new path caches from a snapshot.
+    """
+
+    def setUp(self):
+        super(TestPathCacheSnapshot, self).setUp()
+
+        self._shot_entity = self.mockgun.create("Shot", {"code": "MyShot", "project": self.project})
+        self._shot_entity["name"] = "MyShot"
+        self._shot_full_path = os.path.join(self.project_root, "shot")
+        # the test data location is shared by all the tests
+        self._test_folder = tempfile.mkdtemp(dir=self.tank_temp)
+        self._snapshot_path = os.path.join(self._test_folder, "snapshots", "path_cache.db.gz")
+
+        pc = path_cache.PathCache(self.tk)
+        try:
+            add_item_to_cache(pc, self._shot_entity, self._shot_full_path)
+        finally:
+            pc.close()
+
+    def _get_new_path_cache(self, machine_name="farm_node"):
+        """
+        Creates the path cache of another machine, seeded from the snapshot.
+        """
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self._test_folder, machine_name)):
+            tk = tank.Sgtk(self.tk.pipeline_configuration)
+            self.addCleanup(tk.close)
+            with patch.object(
+                tk.pipeline_configuration, "get_path_cache_snapshot_path", return_value=self._snapshot_path
+            ):
+                pc = path_cache.PathCache(tk)
+        self.addCleanup(pc.close)
+        return pc
+
+    def test_seed(self):
+        """
+        Ensures new path caches are seeded from the snapshot and synced incrementally.
+        """
+        self.assertTrue(self.tk.export_path_cache_snapshot(self._snapshot_path) > 0)
+
+        # registered after the snapshot was taken
+        sequence_entity = self.mockgun.create("Sequence", {"code": "MySeq", "project": self.project})
+        sequence_entity["name"] = "MySeq"
+        sequence_full_path = os.path.join(self.project_root, "seq")
+        pc = path_cache.PathCache(self.tk)
+        try:
+            add_item_to_cache(pc, sequence_entity, sequence_full_path)
+        finally:
+            pc.close()
+
+        with patch.object(path_cache.PathCache, "_do_full_sync") as full_sync_mock:
+            pc = self._get_new_path_cache()
+        self.assertEqual(full_sync_mock.call_count, 0)
+
+        self.assertEqual(
+            pc.get_paths("Shot", self._shot_entity["id"], primary_only=True), [self._shot_full_path]
+        )
+        self.assertEqual(
+            pc.get_paths("Sequence", sequence_entity["id"], primary_only=True), [sequence_full_path]
+        )
+        cursor = pc._connection.cursor()
+        tables = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        cursor.close()
+        self.assertFalse("path_cache_snapshot" in tables)
+
+    def test_other_project(self):
+        """
+        Ensures snapshots of other projects are ignored.
+        """
+        self.tk.export_path_cache_snapshot(self._snapshot_path)
+        with patch.object(self.tk.pipeline_configuration, "get_project_id", return_value=self.project["id"] + 1):
+            with patch.object(path_cache.PathCache, "_do_full_sync", return_value=[]) as full_sync_mock:
+                self._get_new_path_cache()
+        self.assertEqual(full_sync_mock.call_count, 1)
+
+    def test_invalid_snapshot(self):
+        """
+        Ensures path caches are fully synced when the snapshot is missing or can't be read.
+        """
+        with patch.object(path_cache.PathCache, "_do_full_sync", return_value=[]) as full_sync_mock:
+            self._get_new_path_cache()
+        self.assertEqual(full_sync_mock.call_count, 1)
+
+        os.mkdir(os.path.dirname(self._snapshot_path))
+        with open(self._snapshot_path, "wb") as fh:
+            fh.write("not a snapshot")
+        with patch.object(path_cache.PathCache, "_do_full_sync", return_value=[]) as full_sync_mock:
+            self._get_new_path_cache("other_farm_node")
+        self.assertEqual(full_sync_mock.call_count, 1)
+
+    def test_command(self):
+        """
+        Ensures the export_path_cache_snapshot command writes the snapshot.
+        """
+        command = tank.get_command("export_path_cache_snapshot", self.tk)
+        self.assertTrue(command.execute({"path": self._snapshot_path}) > 0)
+        self.assertTrue(os.path.exists(self._snapshot_path))
+
+
+class TestPathCacheStats(TankTestBase):
+    """
+    Tests the statistics recorded about the path cache lookups and syncs.
+    """
+
+    def setUp(self):
+        super(TestPathCacheStats, self).setUp()
+
+        self._shot_entity = self.mockgun.create("Shot", {"code": "MyShot", "project": self.project})
+        self._shot_entity["name"] = "MyShot"
+        self._shot_full_path = os.path.join(self.project_root, "shot")
+
+        self._pc = path_cache.PathCache(self.tk)
+        self._pc.synchronize()
+        self.tk.get_path_cache_stats(reset=True)
+
+    def tearDown(self):
+        self._pc.close()
+        super(TestPathCacheStats, self).tearDown()
+
+    def _register_remotely(self, entity, path):
+        """
+        Registers a folder from another path cache, as if it was created on another machine.
+        """
+        with temp_env_var(SHOTGUN_HOME=os.path.join(self.tank_temp, "stats_path_cache_root")):
+            tk = tank.Sgtk(self.tk.pipeline_configuration)
+            pc = path_cache.PathCache(tk)
+            try:
+                pc.synchronize()
+                add_item_to_cache(pc, entity, path)
+            finally:
+                pc.close()
+                tk.close()
+
+    def test_lookups(self):
+        """
+        Ensures the calls, queries and results of the lookups are counted.
+        """
+        add_item_to_cache(self._pc, self._shot_entity, self._shot_full_path)
+        self._pc.get_paths("Shot", self._shot_entity["id"], primary_only=True)
+        self._pc.get_paths("Shot", self._shot_entity["id"] + 1, primary_only=True)
+        self._pc.get_entities_for_paths([self._shot_full_path, self.project_root])
+
+        stats = self.tk.get_path_cache_stats()
+        self.assertEqual(stats["methods"]["add_mappings"]["calls"], 1)
+        get_paths = stats["methods"]["get_paths"]
+        self.assertEqual(get_paths["calls"], 2)
+        self.assertEqual(get_paths["rows"], 1)
+        self.assertTrue(get_paths["queries"] >= 2)
+        self.assertTrue(get_paths["max_time"] >= get_paths["average_time"])
+        self.assertEqual(stats["methods"]["get_entities_for_paths"]["rows"], 2)
+        self.assertEqual(
+            stats["queries"], sum(method["queries"] for method in stats["methods"].values())
+        )
+
+        # cleared once returned
+        self.tk.get_path_cache_stats(reset=True)
+        self.assertEqual(self.tk.get_path_cache_stats()["methods"], {})
+
+    def test_syncs(self):
+        """
+        Ensures the kind, duration and event log lag of the syncs are recorded.
+        """
+        self._pc.synchronize()
+        stats = self.tk.get_path_cache_stats()
+        self.assertEqual(stats["up_to_date_syncs"], 1)
+        self.assertEqual(stats["event_log_lag"], 0)
+        self.assertTrue(stats["lag"] >= 0)
+
+        self._register_remotely(self._shot_entity, self._shot_full_path)
+        self._pc.synchronize()
+        stats = self.tk.get_path_cache_stats()
+        self.assertEqual(stats["incremental_syncs"], 1)
+        self.assertEqual(stats["event_log_lag"], 1)
+        self.assertEqual(stats["folders_synced"], 1)
+
+        self._pc.synchronize(full_sync=True)
+        stats = self.tk.get_path_cache_stats()
+        self.assertEqual(stats["full_syncs"], 1)
+        self.assertEqual(stats["event_log_lag"], None)
+        self.assertEqual(stats["methods"]["synchronize"]["calls"], 3)
+        self.assertTrue(stats["sync_time"] >= stats["last_sync_duration"])
+
+    def test_log_metrics(self):
+        """
+        Ensures the statistics are emitted as a metric.
+        """
+        self._pc.get_paths("Shot", self._shot_entity["id"], primary_only=True)
+        with patch("tank.util.EventMetric.log") as log_mock:
+            self.tk.log_path_cache_metrics()
+        self.assertEqual(log_mock.call_count, 1)
+        self.assertEqual(log_mock.call_args[0][1], "Path Cache Statistics")
+        self.assertEqual(log_mock.call_args[1]["properties"]["methods"]["get_paths"]["calls"], 1)
+        self.assertEqual(self.tk.get_path_cache_stats()["methods"], {})
+
+    def test_command(self):
+        """
+        Ensures the path_cache_stats command reports the path cache content and statistics.
+        """
+        add_item_to_cache(self._pc, self._shot_entity, self._shot_full_path)
+        command = tank.get_command("path_cache_stats", self.tk)
+        result = command.execute({})
+        self.assertTrue(result["database"]["entries"] >= 1)
+        self.assertEqual(result["stats"]["up_to_date_syncs"], 1)
+        self.assertEqual(result["stats"]["methods"]["add_mappings"]["calls"], 1)
+
+    def test_command_no_full_sync(self):
+        """
+        Ensures the path_cache_stats command leaves full syncs to the synchronize_folders command.
+        """
+        self._pc._connection.execute("DELETE FROM path_cache_sync")
+        self._pc._connection.commit()
+        command = tank.get_command("path_cache_stats", self.tk)
+        result = command.execute({})
+        self.assertEqual(result["stats"]["full_syncs"], 0)
+        self.assertEqual(result["database"]["last_event_log_id"], None)
+
+
+class TestPathCacheQueryPlans(TestPathCache):
+    """
+    Checks with EXPLAIN QUERY PLAN that the path cache lookups use the indexes
+    rather than scanning whole tables.
+    """
+
+    # the sync marker table only ever holds a single row
+    UNINDEXED_TABLES = ["path_cache_sync"]
+
+    def setUp(self):
+        super(TestPathCacheQueryPlans, self).setUp()
+        self.stats = self.tk._get_path_cache_database().stats
+        self.stats.check_query_plans = True
+        self.stats.reset()
+
+        self.seq = {"type": "Sequence", "id": 1, "name": "seq_a"}
+        self.shot = {"type": "Shot", "id": 2, "name": "shot_a"}
+        self.step = {"type": "Step", "id": 3, "name": "step_a"}
+        self.seq_path = os.path.join(self.project_root, "seq_a")
+        self.shot_path = os.path.join(self.seq_path, "shot_a")
+        self.step_path = os.path.join(self.shot_path, "step_a")
+        self.path_cache.add_mappings(
+            [
+                {"entity": self.seq, "path": self.seq_path, "primary": True, "metadata": {}},
+                {"entity": self.shot, "path": self.shot_path, "primary": True, "metadata": {}},
+                {"entity": self.step, "path": self.step_path, "primary": True, "metadata": {}},
+                {"entity": self.shot, "path": self.step_path, "primary": False, "metadata": {}},
+            ],
+            None,
+            []
+        )
+
+    def tearDown(self):
+        self.stats.check_query_plans = False
+        super(TestPathCacheQueryPlans, self).tearDown()
+
+    def test_lookups(self):
+        pc = self.path_cache
+        with patch.object(pc, "_get_entity_from_schema", return_value=None):
+            pc.get_entity(self.step_path)
+            pc.get_secondary_entities(self.step_path)
+            pc.get_ancestor_entities(self.step_path)
+            pc.get_entities_for_paths([self.shot_path, self.step_path])
+            pc.get_secondary_entities_for_paths([self.shot_path, self.step_path])
+        pc.get_paths("Shot", self.shot["id"], primary_only=False)
+        pc.get_paths_for_entities([("Shot", self.shot["id"]), ("Step", self.step["id"])], primary_only=True)
+        pc.get_entities_under_path(self.seq_path)
+        pc.get_folder_tree_from_sg_id(pc.get_shotgun_id_from_path(self.seq_path))
+        pc.validate_mappings(
+            [{"entity": self.shot, "path": self.shot_path, "primary": True, "metadata": {}}]
+        )
+
+        full_scans = [
+            (sql, table_name) for (sql, table_name) in self.stats.get_stats()["full_scans"]
+            if table_name not in self.UNINDEXED_TABLES
+        ]
+        self.assertEqual(full_scans, [])
+        self.assertTrue(self.stats.get_stats()["queries"] > 0)
+
+
 class TestPathCacheBatchOperation(TankTestBase):
     """
     Tests the deletion of 2000+ filesystem locations (#44931)
@@ -1179,41 +2157,37 @@ class TestPathCacheBatchOperation(TankTestBase):
         """
         cursor = self._pc._connection.cursor()
 
+        record_count = list(cursor.execute("select count(*) from path_cache_entry"))[0][0]
+
         # insert dummy data so we can delete it
         folder_ids = []
-        entity_type = "Shot"
+        entity_type_id = self._pc._get_entity_type_ids(cursor, ["Shot"], create=True)["Shot"]
         for idx in xrange(3147):
             entity_id = idx
             entity_name = "name_%s" % idx
+            shotgun_id = 100000 + idx
 
             cursor.execute(
                 """
-                    INSERT INTO path_cache(entity_type,
+                    INSERT INTO path_cache_entry(folder_id,
+                    entity_type_id,
                     entity_id,
                     entity_name,
-                    root,
-                    path,
-                    primary_entity)
+                    primary_entity,
+                    shotgun_id)
                     VALUES(?, ?, ?, ?, ?, ?)
                 """,
                 (
-                    entity_type,
+                    idx + 1000000,  # folder
+                    entity_type_id,
                     entity_id,
                     entity_name,
-                    None,  # root
-                    None,  # path
-                    1      # primary
+                    1,  # primary
+                    shotgun_id
                 )
             )
 
-            path_cache_id = cursor.lastrowid
-
-            cursor.execute(
-                "INSERT INTO shotgun_status(path_cache_id, shotgun_id) VALUES(?, ?)",
-                (path_cache_id, idx)
-            )
-
-            folder_ids.append(cursor.lastrowid)
+            folder_ids.append(shotgun_id)
 
         self._pc._connection.commit()
 
@@ -1237,13 +2211,18 @@ class TestPathCacheBatchOperation(TankTestBase):
         # # now make sure it doesn't fail
         # path_cache.SQLITE_MAX_ITEMS_FOR_IN_STATEMENT = paging_limit
 
-        record_count = list(cursor.execute("select count(*) from shotgun_status"))[0][0]
-        self.assertEqual(record_count, 3148)
+        self.assertEqual(
+            list(cursor.execute("select count(*) from path_cache_entry"))[0][0],
+            record_count + 3147
+        )
 
-        self._pc._remove_filesystem_location_entities(cursor, folder_ids)
+        # keep a few entries
+        self._pc._remove_filesystem_location_entities(cursor, folder_ids[3:])
 
-        record_count = list(cursor.execute("select count(*) from shotgun_status"))[0][0]
-        self.assertEqual(record_count, 3)
+        self.assertEqual(
+            list(cursor.execute("select count(*) from path_cache_entry"))[0][0],
+            record_count + 3
+        )
 
     @patch("tank_vendor.shotgun_api3.lib.mockgun.Shotgun.find")
     def test_full_shotgun_retrieval(self, find_mock):
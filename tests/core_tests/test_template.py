@@ -9,11 +9,13 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import copy
+import itertools
 import os
 import sys
 import time
 
 import unittest2
+from mock import patch
 import tank
 from tank import TankError
 from tank_test.tank_test_base import TankTestBase, ShotgunTestBase, setUpModule # noqa
@@ -420,3 +422,164 @@ class TestReadTemplates(TankTestBase):
         self.assertIsInstance(houdini_asset_publish, TemplatePath)
         for key_name in ["sg_asset_type", "Asset", "Step", "name", "version"]:
             self.assertIn(key_name, houdini_asset_publish.keys)
+
+
+class TestEntitiesMany(TankTestBase):
+    """
+    Tests the batched resolution of entities and entity fields.
+    """
+
+    def setUp(self):
+        super(TestEntitiesMany, self).setUp()
+        self.setup_fixtures()
+
+        self.seq = {"type": "Sequence", "id": 1, "code": "seq_1", "project": self.project}
+        self.shots = [
+            {"type": "Shot", "id": shot_id, "code": "shot_%d" % shot_id,
+             "sg_sequence": self.seq, "project": self.project, "description": "desc_%d" % shot_id}
+            for shot_id in range(1, 4)
+        ]
+        self.add_to_sg_mock_db([self.seq] + self.shots)
+
+        keys = {"Sequence": StringKey("Sequence", None, shotgun_entity_type="Sequence", shotgun_field_name="code"),
+                "Shot": StringKey("Shot", None, shotgun_entity_type="Shot", shotgun_field_name="code"),
+                "shot_desc": StringKey("shot_desc", None, shotgun_entity_type="Shot",
+                                       shotgun_field_name="description")}
+        self.template = TemplatePath("sequences/{Sequence}/{Shot}", keys, self.tk.pipeline_configuration,
+                                     root_path=self.project_root)
+        self.paths = [os.path.join(self.project_root, "sequences", "seq_1", shot["code"]) for shot in self.shots]
+
+    def test_get_entities_many(self):
+        """Entities of many paths are resolved with one query per entity type."""
+        with patch.object(self.mockgun, "find", wraps=self.mockgun.find) as mock_find:
+            entities_list = self.template.get_entities_many(self.paths)
+        self.assertEqual(2, mock_find.call_count)
+
+        for shot, entities in zip(self.shots, entities_list):
+            self.assertEqual(entities, self.template.get_entities(self.paths[self.shots.index(shot)]))
+            entity_ids = dict((entity["type"], entity["id"]) for entity in entities)
+            self.assertEqual({"Project": self.project["id"], "Sequence": 1, "Shot": shot["id"]}, entity_ids)
+
+    def test_get_entities_errors(self):
+        """Entities which can't be found are reported per path."""
+        paths = self.paths + [os.path.join(self.project_root, "sequences", "seq_1", "shot_9")]
+        errors = []
+        entities_list = self.template.get_entities_many(paths, errors=errors)
+        self.assertIsNone(entities_list[-1])
+        self.assertEqual([3], [index for index, _ in errors])
+        self.assertIsInstance(errors[0][1], TankError)
+        self.assertRaises(TankError, self.template.get_entities_many, paths)
+
+    def test_get_entity_fields_many(self):
+        """Values missing from entities are retrieved with one query per entity type."""
+        entities_list = [[{"type": "Shot", "id": shot["id"], "code": shot["code"]}] for shot in self.shots]
+        with patch.object(self.mockgun, "find", wraps=self.mockgun.find) as mock_find:
+            fields_list = self.template.get_entity_fields_many(entities_list)
+        self.assertEqual(1, mock_find.call_count)
+        self.assertEqual(["desc_1", "desc_2", "desc_3"], [fields["shot_desc"] for fields in fields_list])
+        self.assertEqual(fields_list[0], self.template.get_entity_fields(entities_list[0]))
+
+
+class TestMemoization(TankTestBase):
+    """
+    Tests the memoization of apply_fields and get_fields.
+    """
+
+    def setUp(self):
+        super(TestMemoization, self).setUp()
+        self.keys = {"Shot": StringKey("Shot", None),
+                     "version": IntegerKey("version", None, format_spec="03"),
+                     "time": TimestampKey("time", None, default="now", format_spec="%H_%M_%S_%f")}
+        self.template = TemplatePath("shots/{Shot}/v{version}.ma", self.keys, self.tk.pipeline_configuration,
+                                     root_path=self.project_root)
+        self.template.set_cache_size(2)
+
+    def test_disabled_by_default(self):
+        template = TemplatePath("shots/{Shot}", self.keys, self.tk.pipeline_configuration,
+                                root_path=self.project_root)
+        template.apply_fields({"Shot": "shot_1"})
+        self.assertIsNone(template.get_cache_info())
+
+    def test_apply_fields(self):
+        fields = {"Shot": "shot_1", "version": 3}
+        path = self.template.apply_fields(fields)
+        # keys which aren't part of the template don't matter
+        fields["other"] = ["unhashable"]
+        self.assertEqual(path, self.template.apply_fields(fields))
+        self.assertEqual(path, self.template.apply_fields(fields, platform=sys.platform))
+        self.assertEqual(
+            {"hits": 1, "misses": 2, "size": 2, "max_size": 2},
+            self.template.get_cache_info()
+        )
+
+    def test_get_fields(self):
+        path = os.path.join(self.project_root, "shots", "shot_1", "v003.ma")
+        fields = self.template.get_fields(path)
+        fields["version"] = 4
+        # paths are normalized and callers get their own copy of the fields
+        self.assertEqual({"Shot": "shot_1", "version": 3}, self.template.get_fields(path + os.path.sep))
+        self.assertEqual(1, self.template.get_cache_info()["hits"])
+
+        # errors are not cached
+        bad_path = os.path.join(self.project_root, "shots", "shot_1", "v003.mb")
+        self.assertRaises(TankError, self.template.get_fields, bad_path)
+        self.assertRaises(TankError, self.template.get_fields, bad_path)
+        self.assertEqual(1, self.template.get_cache_info()["size"])
+
+    def test_bounded(self):
+        for version in range(10):
+            self.template.apply_fields({"Shot": "shot_1", "version": version})
+        self.assertEqual(2, self.template.get_cache_info()["size"])
+        # the least recently used results are discarded
+        self.template.apply_fields({"Shot": "shot_1", "version": 0})
+        self.assertEqual(0, self.template.get_cache_info()["hits"])
+
+    def test_timestamp_default(self):
+        template = TemplatePath("shots/{Shot}/{time}.ma", self.keys, self.tk.pipeline_configuration,
+                                root_path=self.project_root)
+        template.set_cache_size(10)
+        path = template.apply_fields({"Shot": "shot_1"})
+        time.sleep(0.01)
+        self.assertNotEqual(path, template.apply_fields({"Shot": "shot_1"}))
+        self.assertEqual(0, template.get_cache_info()["size"])
+
+    def test_callable_default(self):
+        counter = itertools.count()
+        keys = {"Shot": StringKey("Shot", None),
+                "name": StringKey("name", None, default=lambda: "name_%d" % next(counter))}
+        template = TemplatePath("shots/{Shot}/{name}.ma", keys, self.tk.pipeline_configuration,
+                                root_path=self.project_root)
+        template.set_cache_size(10)
+        path = template.apply_fields({"Shot": "shot_1"})
+        self.assertNotEqual(path, template.apply_fields({"Shot": "shot_1"}))
+        self.assertEqual(0, template.get_cache_info()["size"])
+
+        # a value given for the key is memoized.
+        template.apply_fields({"Shot": "shot_1", "name": "c"})
+        self.assertEqual(1, template.get_cache_info()["size"])
+
+    def test_clear(self):
+        self.template.apply_fields({"Shot": "shot_1", "version": 3})
+        self.template.clear_cache()
+        self.assertEqual(
+            {"hits": 0, "misses": 0, "size": 0, "max_size": 2},
+            self.template.get_cache_info()
+        )
+        self.template.set_cache_size(0)
+        self.assertIsNone(self.template.get_cache_info())
+
+    def test_configuration(self):
+        """Memoization is enabled on all templates through the environment."""
+        self.setup_fixtures()
+        with patch.dict(os.environ, {tank.constants.TEMPLATE_CACHE_SIZE_ENV_VAR: "16"}):
+            self.tk.reload_templates()
+        template = self.tk.templates["maya_shot_work"]
+        self.assertEqual(16, template.get_cache_info()["max_size"])
+
+        template.apply_fields({"Sequence": "seq_1", "Shot": "shot_1", "Step": "comp", "name": "main", "version": 1})
+        self.assertEqual(1, template.get_cache_info()["size"])
+
+        # previous templates are cleared on reload
+        self.tk.reload_templates()
+        self.assertEqual(0, template.get_cache_info()["size"])
+        self.assertIsNone(self.tk.templates["maya_shot_work"].get_cache_info())
@@ -0,0 +1,144 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import itertools
+
+from mock import patch
+
+import tank
+from tank.template import TemplatePath, TemplateString
+from tank.templatekey import StringKey, IntegerKey
+from tank.template_overlap import TemplateOverlaps
+
+from tank_test.tank_test_base import TankTestBase, setUpModule # noqa
+
+
+class TestTemplateOverlaps(TankTestBase):
+    """Tests the analysis of overlapping templates."""
+
+    def setUp(self):
+        super(TestTemplateOverlaps, self).setUp()
+        self.keys = {
+            "Shot": StringKey("Shot", None),
+            "Asset": StringKey("Asset", None),
+            "Step": StringKey("Step", None, choices=["comp", "light"]),
+            "ext": StringKey("ext", None, choices=["ma", "mb"]),
+            "name": StringKey("name", None, filter_by="alphanumeric"),
+            "version": IntegerKey("version", None, format_spec="03"),
+        }
+        definitions = {
+            "shot_work": "shots/{Shot}/{Step}/work/{name}.v{version}.{ext}",
+            "shot_work_nuke": "shots/{Shot}/{Step}/work/{name}.v{version}.nk",
+            "shot_work_optional": "shots/{Shot}/{Step}/work/{name}[_{Asset}].v{version}.{ext}",
+            "shot_publish": "shots/{Shot}/{Step}/publish/{name}.v{version}.{ext}",
+            "asset_work": "assets/{Asset}/{Step}/work/{name}.v{version}.{ext}",
+            "shot_root": "shots/{Shot}",
+            "shot_step": "shots/{Shot}/{Step}",
+            "shot_asset": "shots/{Shot}/{Asset}",
+            "shot_notes": "shots/{Shot}/notes_dir",
+        }
+        self.templates = dict(
+            (name, TemplatePath(definition, self.keys, self.tk.pipeline_configuration,
+                                self.project_root, name=name))
+            for name, definition in definitions.iteritems()
+        )
+        self.overlaps = TemplateOverlaps(self.templates.values())
+
+    def _can_overlap(self, name, other_name):
+        return self.overlaps.can_overlap(self.templates[name], self.templates[other_name])
+
+    def test_static_tokens(self):
+        self.assertFalse(self._can_overlap("shot_work", "asset_work"))
+        self.assertFalse(self._can_overlap("shot_work", "shot_publish"))
+        self.assertFalse(self._can_overlap("shot_root", "shot_step"))
+
+    def test_choices(self):
+        self.assertFalse(self._can_overlap("shot_work", "shot_work_nuke"))
+        self.assertFalse(self._can_overlap("shot_step", "shot_notes"))
+
+    def test_filters(self):
+        # name is alphanumeric and can't hold an underscore
+        template = TemplatePath("shots/{Shot}/{name}", self.keys, None, self.project_root)
+        overlaps = TemplateOverlaps([template, self.templates["shot_notes"]])
+        self.assertFalse(overlaps.can_overlap(template, self.templates["shot_notes"]))
+
+    def test_overlapping(self):
+        self.assertTrue(self._can_overlap("shot_step", "shot_asset"))
+        self.assertTrue(self._can_overlap("shot_asset", "shot_notes"))
+        self.assertEqual(
+            ["shot_asset"],
+            [template.name for template in self.overlaps.get_overlapping(self.templates["shot_step"])]
+        )
+        pairs = set(
+            tuple(sorted([template.name, other_template.name]))
+            for template, other_template in self.overlaps.get_overlapping_pairs()
+        )
+        self.assertEqual(
+            set([("shot_asset", "shot_step"), ("shot_asset", "shot_notes"),
+                 ("shot_work", "shot_work_optional")]),
+            pairs
+        )
+
+    def test_template_string(self):
+        """Template strings can't be analysed and may overlap with anything."""
+        template = TemplateString("{name}", self.keys, None)
+        overlaps = TemplateOverlaps([template] + self.templates.values())
+        self.assertTrue(overlaps.can_overlap(template, self.templates["shot_root"]))
+        self.assertEqual(len(self.templates), len(overlaps.get_overlapping(template)))
+
+    def test_conservative(self):
+        """Templates validating the same path are always reported as overlapping."""
+        values = ["comp", "light", "work", "notes_dir", "a", "a_b", "v001.ma", "a.v001.ma", "a.v002.nk"]
+        for num_segments in range(1, 5):
+            for segments in itertools.product(values, repeat=num_segments):
+                path = os.path.join(self.project_root, "shots", *segments)
+                matched = [template for template in self.templates.values() if template.validate(path)]
+                for template, other_template in itertools.combinations(matched, 2):
+                    self.assertTrue(self.overlaps.can_overlap(template, other_template))
+
+    def test_template_from_path(self):
+        """Templates which can't overlap with a matching template are not validated."""
+        self.tk.templates = self.templates
+        shot_step = self.templates["shot_step"]
+        shot_root = self.templates["shot_root"]
+        shot_notes = self.templates["shot_notes"]
+        # can overlap with shot_step for paths ending with "light"
+        shot_light = TemplatePath("shots/{Shot}/{name}t", self.keys, None, self.project_root)
+        candidates = [shot_step, shot_notes, shot_light, shot_root]
+        self.tk.templates["shot_light"] = shot_light
+        path = os.path.join(self.project_root, "shots", "shot_1", "comp")
+
+        with patch("tank.template_index.TemplateIndex.get_candidates", return_value=candidates):
+            with patch.object(shot_notes, "validate", wraps=shot_notes.validate) as notes_validate:
+                with patch.object(shot_light, "validate", wraps=shot_light.validate) as light_validate:
+                    self.assertEqual(shot_step, self.tk.template_from_path(path))
+
+        self.assertEqual(0, notes_validate.call_count)
+        self.assertEqual(1, light_validate.call_count)
+
+    def test_reload(self):
+        """The analysis is rebuilt when the templates change."""
+        self.tk.templates = self.templates
+        overlaps = self.tk.template_overlaps
+        self.assertIs(overlaps, self.tk.template_overlaps)
+        self.tk.templates = dict(self.templates)
+        self.tk.templates.pop("shot_asset")
+        self.assertIsNot(overlaps, self.tk.template_overlaps)
+        self.assertEqual([], self.tk.template_overlaps.get_overlapping(self.templates["shot_step"]))
+
+    def test_command(self):
+        self.tk.templates = self.templates
+        command = tank.get_command("template_overlaps", self.tk)
+        self.assertEqual(
+            set([("shot_asset", "shot_step"), ("shot_asset", "shot_notes"),
+                 ("shot_work", "shot_work_optional")]),
+            set(tuple(sorted(pair)) for pair in command.execute({}))
+        )
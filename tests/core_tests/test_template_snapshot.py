@@ -0,0 +1,204 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import sys
+
+from mock import patch
+
+import tank
+from tank import constants
+from tank import template
+from tank import template_snapshot
+from tank.util import yaml_cache
+
+from tank_test.tank_test_base import TankTestBase, setUpModule # noqa
+
+
+class TestTemplateSnapshot(TankTestBase):
+    """Tests the on disk snapshot of processed templates."""
+
+    def setUp(self):
+        super(TestTemplateSnapshot, self).setUp()
+        self.setup_fixtures()
+        self.pipeline_configuration = self.tk.pipeline_configuration
+        self.roots = self.pipeline_configuration.get_all_platform_data_roots()
+        self.snapshot_path = template_snapshot.get_snapshot_path(self.pipeline_configuration)
+        self.templates_file = os.path.join(self.project_config, "core", "templates.yml")
+
+    def test_written(self):
+        """Loading templates writes a snapshot."""
+        self.assertTrue(os.path.exists(self.snapshot_path))
+
+    def test_load(self):
+        """Templates loaded from the snapshot are identical to the ones read from the config."""
+        snapshot = template_snapshot.load_snapshot(self.pipeline_configuration, self.roots)
+        self.assertIsNotNone(snapshot)
+        templates, keys = snapshot
+
+        self.assertEqual(sorted(templates.keys()), sorted(self.tk.templates.keys()))
+        self.assertEqual(sorted(keys.keys()), sorted(self.tk.template_keys.keys()))
+        for name, snapshot_template in templates.iteritems():
+            self.assertEqual(snapshot_template.definition, self.tk.templates[name].definition)
+            self.assertEqual(type(snapshot_template), type(self.tk.templates[name]))
+
+        # the pipeline configuration isn't part of the snapshot.
+        for snapshot_template in templates.values():
+            self.assertIs(snapshot_template.pipeline_configuration, self.pipeline_configuration)
+
+    def test_fields(self):
+        """Templates loaded from the snapshot resolve paths."""
+        templates, _ = template_snapshot.load_snapshot(self.pipeline_configuration, self.roots)
+        file_path = os.path.join(
+            self.project_root, "sequences/Sequence_1/shot_010/Anm/publish/shot_010.jfk.v001.ma"
+        )
+        expected = self.tk.template_from_path(file_path)
+        self.assertIsNotNone(expected)
+        self.assertEqual(templates[expected.name].get_fields(file_path), expected.get_fields(file_path))
+
+    def test_roots_changed(self):
+        """The snapshot isn't used once the storage roots change."""
+        roots = dict(self.roots)
+        roots["unknown_root"] = dict(roots[self.primary_root_name])
+        self.assertIsNone(template_snapshot.load_snapshot(self.pipeline_configuration, roots))
+
+    def test_config_changed(self):
+        """The snapshot isn't used once the templates file changes."""
+        with open(self.templates_file, "a") as fh:
+            fh.write("\n# edited\n")
+        self.assertIsNone(template_snapshot.load_snapshot(self.pipeline_configuration, self.roots))
+
+        # reloading templates brings the snapshot up to date.
+        self.tk.reload_templates()
+        self.assertIsNotNone(template_snapshot.load_snapshot(self.pipeline_configuration, self.roots))
+
+    def test_corrupted(self):
+        """A corrupted snapshot is ignored and replaced."""
+        with open(self.snapshot_path, "wb") as fh:
+            fh.write("not a snapshot")
+        self.assertIsNone(template_snapshot.load_snapshot(self.pipeline_configuration, self.roots))
+
+        templates, _ = template.read_templates(self.pipeline_configuration)
+        self.assertEqual(sorted(templates.keys()), sorted(self.tk.templates.keys()))
+        self.assertIsNotNone(template_snapshot.load_snapshot(self.pipeline_configuration, self.roots))
+
+    def test_disabled(self):
+        """Snapshots are neither read nor written when disabled."""
+        os.remove(self.snapshot_path)
+        with patch.dict(os.environ, {constants.DISABLE_TEMPLATES_SNAPSHOT_ENV_VAR: "1"}):
+            self.assertFalse(template_snapshot.is_snapshot_enabled())
+            self.tk.reload_templates()
+        self.assertFalse(os.path.exists(self.snapshot_path))
+
+    def test_command(self):
+        """The cache_templates command writes the snapshot."""
+        os.remove(self.snapshot_path)
+        command = tank.get_command("cache_templates", self.tk)
+        self.assertEqual(command.execute({}), self.snapshot_path)
+        self.assertTrue(os.path.exists(self.snapshot_path))
+
+    def test_core_files(self):
+        """The core files are tracked as imported, compiled or not."""
+        self.assertEqual(
+            template_snapshot._get_core_files(),
+            [tank.template.__file__, tank.templatekey.__file__]
+        )
+
+
+class TestTemplateSnapshotIncludes(TankTestBase):
+    """Tests that the snapshot tracks how the templates includes resolve."""
+
+    def setUp(self):
+        super(TestTemplateSnapshotIncludes, self).setUp()
+        self.pipeline_configuration = self.tk.pipeline_configuration
+        self.roots = self.pipeline_configuration.get_all_platform_data_roots()
+
+        core_folder = os.path.join(self.project_config, "core")
+        self.include_files = []
+        for name in ["include_a", "include_b"]:
+            include_file = os.path.join(core_folder, "%s.yml" % name)
+            with open(include_file, "w") as fh:
+                fh.write("strings:\n  %s: '{name}.nk'\n" % name)
+            self.include_files.append(include_file)
+
+        with open(os.path.join(core_folder, "templates.yml"), "w") as fh:
+            fh.write("include: $TK_TEST_TEMPLATES_INCLUDE\n")
+            fh.write("keys:\n  name:\n    type: str\n")
+
+    def _read_templates(self, include):
+        """
+        Reads the templates with the include environment variable set to a given
+        value, writing a new snapshot.
+        """
+        with patch.dict(os.environ, {"TK_TEST_TEMPLATES_INCLUDE": include}):
+            templates, _ = template.read_templates(self.pipeline_configuration, use_snapshot=False)
+        return templates
+
+    def _load_snapshot(self, include):
+        """
+        Loads the snapshot with the include environment variable set to a given value.
+        """
+        with patch.dict(os.environ, {"TK_TEST_TEMPLATES_INCLUDE": include}):
+            return template_snapshot.load_snapshot(self.pipeline_configuration, self.roots)
+
+    def test_include_changed(self):
+        """The snapshot isn't used once an include resolves to another file."""
+        self.assertEqual(list(self._read_templates(self.include_files[0])), ["include_a"])
+        self.assertIsNotNone(self._load_snapshot(self.include_files[0]))
+        self.assertIsNone(self._load_snapshot(self.include_files[1]))
+
+        self.assertEqual(list(self._read_templates(self.include_files[1])), ["include_b"])
+        self.assertIsNotNone(self._load_snapshot(self.include_files[1]))
+
+    def test_include_added(self):
+        """The snapshot isn't used once a skipped include resolves to a file."""
+        # an absolute path for another platform is skipped.
+        other_platform_include = "/tmp/templates.yml" if sys.platform == "win32" else "C:\\templates.yml"
+        self.assertEqual(self._read_templates(other_platform_include), {})
+        self.assertIsNotNone(self._load_snapshot(other_platform_include))
+        self.assertIsNone(self._load_snapshot(self.include_files[0]))
+
+    def test_include_removed(self):
+        """The snapshot isn't used once an include can't be found."""
+        self._read_templates(self.include_files[0])
+        os.remove(self.include_files[0])
+        self.assertIsNone(self._load_snapshot(self.include_files[0]))
+
+    def test_preferences_include(self):
+        """Includes provided by the preferences system are tracked by their data."""
+        include = "{preferences}/templates.yml"
+        with open(os.path.join(self.project_config, "core", "templates.yml"), "w") as fh:
+            fh.write("include: '%s'\n" % include)
+            fh.write("keys:\n  name:\n    type: str\n")
+        preferences_data = {"strings": {"include_a": "{name}.nk"}}
+
+        def get_preferences(path, role, package):
+            return dict(preferences_data)
+
+        with patch("tank.util.yaml_cache.preferences.Preferences", side_effect=get_preferences, create=True):
+            self.assertEqual(list(self._read_templates(include)), ["include_a"])
+            self.assertIsNotNone(self._load_snapshot(include))
+
+            # the data is read again by a new process
+            preferences_data = {"strings": {"include_b": "{name}.nk"}}
+            yaml_cache.g_yaml_cache.invalidate(include)
+            self.assertIsNone(self._load_snapshot(include))
+
+    def test_command_not_snapshotted(self):
+        """The cache_templates command reports configurations which can't be snapshotted."""
+        snapshot_path = template_snapshot.get_snapshot_path(self.pipeline_configuration)
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        command = tank.get_command("cache_templates", self.tk)
+        with patch.dict(os.environ, {"TK_TEST_TEMPLATES_INCLUDE": self.include_files[0]}):
+            with patch("tank.template_snapshot._get_core_files", return_value=["/not/a/core/file.py"]):
+                self.assertIsNone(command.execute({}))
+            self.assertFalse(os.path.exists(snapshot_path))
+            self.assertEqual(command.execute({}), snapshot_path)
@@ -17,6 +17,7 @@ import tank
 from tank import TankError
 
 from tank.template import TemplatePath
+from tank.template_path_parser import TemplatePathParser
 from tank_test.tank_test_base import ShotgunTestBase, setUpModule # noqa
 from tank.templatekey import (StringKey, IntegerKey, SequenceKey)
 
@@ -1096,6 +1097,162 @@ class TestGetKeysSepInValue(TestTemplatePath):
         self.assert_path_matches(definition, input_path, expected)        
 
 
+class TestManyItems(TestTemplatePath):
+    """
+    Tests for the bulk variants of get_fields, validate and apply_fields.
+    """
+    def setUp(self):
+        super(TestManyItems, self).setUp()
+        self.fields_list = []
+        for shot in ["s1", "s2", "shot_1"]:
+            self.fields_list.append({"Sequence": "seq_1",
+                                     "Shot": shot,
+                                     "Step": "Anm",
+                                     "branch": "mmm",
+                                     "version": 3,
+                                     "snapshot": 2})
+        self.paths = [self.template_path.apply_fields(fields) for fields in self.fields_list]
+
+    def test_apply_fields_many(self):
+        result = list(self.template_path.apply_fields_many(self.fields_list))
+        self.assertEquals(self.paths, result)
+
+    def test_apply_fields_many_platform(self):
+        expected = [self.template_path.apply_fields(fields, platform="win32") for fields in self.fields_list]
+        result = list(self.template_path.apply_fields_many(self.fields_list, platform="win32"))
+        self.assertEquals(expected, result)
+
+    def test_apply_fields_many_errors(self):
+        fields_list = self.fields_list + [{"Shot": "s1"}]
+        self.assertRaises(TankError, list, self.template_path.apply_fields_many(fields_list))
+
+        errors = []
+        result = list(self.template_path.apply_fields_many(fields_list, errors=errors))
+        self.assertEquals(self.paths + [None], result)
+        self.assertEquals(1, len(errors))
+        self.assertEquals(3, errors[0][0])
+        self.assertIsInstance(errors[0][1], TankError)
+
+    def test_get_fields_many(self):
+        result = list(self.template_path.get_fields_many(self.paths))
+        self.assertEquals(self.fields_list, result)
+
+    def test_get_fields_many_errors(self):
+        bad_path = os.path.join(self.project_root, "shots", "seq_1")
+        paths = [bad_path] + self.paths
+        self.assertRaises(TankError, list, self.template_path.get_fields_many(paths))
+
+        errors = []
+        result = list(self.template_path.get_fields_many(paths, errors=errors))
+        self.assertEquals([None] + self.fields_list, result)
+        self.assertEquals(1, len(errors))
+        self.assertEquals(0, errors[0][0])
+        with self.assertRaises(TankError) as cm:
+            self.template_path.get_fields(bad_path)
+        self.assertEquals(str(cm.exception), str(errors[0][1]))
+
+    def test_validate_many(self):
+        bad_path = os.path.join(self.project_root, "shots", "seq_1")
+        result = list(self.template_path.validate_many(self.paths + [bad_path]))
+        self.assertEquals([True, True, True, False], result)
+
+        result = list(self.template_path.validate_many(self.paths, fields={"Shot": "s2"}))
+        self.assertEquals([False, True, False], result)
+
+
+class TestGetFieldsMatcher(TestTemplatePath):
+    """
+    Tests that the compiled path matchers give the same results as the path parser.
+    """
+    def setUp(self):
+        super(TestGetFieldsMatcher, self).setUp()
+        self.matcher_keys = {"Shot": StringKey("Shot", None),
+                             "Step": StringKey("Step", None),
+                             "name": StringKey("name", None, filter_by="alphanumeric"),
+                             "version": IntegerKey("version", None, format_spec="03"),
+                             "frame": SequenceKey("frame", None, format_spec="04")}
+
+    def _parse_path(self, template, input_path):
+        """
+        Parses a path with the TemplatePathParser for all template variations.
+        """
+        for ordered_keys, static_tokens in zip(template._ordered_keys, template._static_tokens):
+            path_parser = TemplatePathParser(ordered_keys, static_tokens)
+            fields = path_parser.parse_path(input_path, None)
+            if fields is not None:
+                return fields
+        return None
+
+    def _assert_same_fields(self, definition, relative_paths):
+        template = TemplatePath(definition, self.matcher_keys, None, root_path=self.project_root)
+        for relative_path in relative_paths:
+            input_path = os.path.join(self.project_root, relative_path)
+            expected = self._parse_path(template, input_path)
+            self.assertEquals(expected, template.validate_and_get_fields(input_path))
+
+    def test_compiled(self):
+        definition = "shots/{Shot}/{Step}/work/{name}.v{version}.ma"
+        template = TemplatePath(definition, self.matcher_keys, None, root_path=self.project_root)
+        input_path = os.path.join(self.project_root, "shots", "s1", "anim", "work", "scene.v003.ma")
+        template.get_fields(input_path)
+        self.assertTrue(template._matchers[0].is_compiled)
+        expected = {"Shot": "s1", "Step": "anim", "name": "scene", "version": 3}
+        self.assertEquals(expected, template.get_fields(input_path))
+
+    def test_same_fields(self):
+        definition = "shots/{Shot}/{Step}/work/{name}.v{version}.ma"
+        self._assert_same_fields(definition, [
+            os.path.join("shots", "s1", "anim", "work", "scene.v003.ma"),
+            os.path.join("SHOTS", "s1", "anim", "WORK", "scene.V003.MA"),
+            os.path.join("shots", "s1", "anim", "work", "scene_a.v003.ma"),
+            os.path.join("shots", "s1", "anim", "work", "scene.v3.ma"),
+            os.path.join("shots", "s1", "anim", "work", "scene.v003.mb"),
+            os.path.join("shots", "s1", "work", "scene.v003.ma"),
+            os.path.join("shots", "s1"),
+        ])
+
+    def test_same_fields_optional(self):
+        definition = "shots/{Shot}/{name}[.v{version}].ma"
+        self._assert_same_fields(definition, [
+            os.path.join("shots", "s1", "scene.v003.ma"),
+            os.path.join("shots", "s1", "scene.ma"),
+            os.path.join("shots", "s1", "scene.v.ma"),
+        ])
+
+    def test_same_fields_fallback(self):
+        # keys which aren't followed by a character they can't contain
+        # are left to the parser.
+        definition = "shots/{Shot}_{Step}/{name}.{frame}.exr"
+        template = TemplatePath(definition, self.matcher_keys, None, root_path=self.project_root)
+        template.get_fields(os.path.join(self.project_root, "shots", "s1_anim", "scene.0001.exr"))
+        self.assertFalse(template._matchers[0].is_compiled)
+        self._assert_same_fields(definition, [
+            os.path.join("shots", "s1_anim", "scene.0001.exr"),
+            os.path.join("shots", "s1_a_anim", "scene.0001.exr"),
+            os.path.join("shots", "s1", "scene.0001.exr"),
+        ])
+
+    def test_same_error(self):
+        definition = "shots/{Shot}/{Step}/work/{name}.v{version}.ma"
+        template = TemplatePath(definition, self.matcher_keys, None, root_path=self.project_root)
+        input_path = os.path.join(self.project_root, "shots", "s1", "anim", "work", "scene.v003.mb")
+
+        path_parser = TemplatePathParser(template._ordered_keys[0], template._static_tokens[0])
+        path_parser.parse_path(input_path, None)
+        expected = "Template %s: %s" % (template, path_parser.last_error)
+
+        with self.assertRaises(TankError) as cm:
+            template.get_fields(input_path)
+        self.assertEquals(expected, str(cm.exception))
+
+    def test_skip_keys(self):
+        definition = "shots/{Shot}/{Step}/work/{name}.v{version}.ma"
+        template = TemplatePath(definition, self.matcher_keys, None, root_path=self.project_root)
+        input_path = os.path.join(self.project_root, "shots", "s1", "anim", "work", "scene.v003.ma")
+        expected = {"Shot": "s1", "name": "scene", "version": 3}
+        self.assertEquals(expected, template.get_fields(input_path, skip_keys=["Step"]))
+
+
 class TestParent(TestTemplatePath):
     def test_parent_exists(self):
         expected_definition = os.path.join("shots",
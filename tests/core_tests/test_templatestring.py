@@ -208,3 +208,22 @@ class TestGetFields(TestTemplateString):
     
 
 
+
+
+class TestGetFieldsMany(TestTemplateString):
+
+    def test_simple(self):
+        input_strings = ["something-shot_1.Seq_12", "something-shot_2.Seq_12"]
+        expected = [{"Shot": "shot_1", "Sequence": "Seq_12"},
+                    {"Shot": "shot_2", "Sequence": "Seq_12"}]
+        result = list(self.template_string.get_fields_many(input_strings))
+        self.assertEquals(expected, result)
+
+    def test_errors(self):
+        input_strings = ["something-shot_1.Seq_12", "shot_1."]
+        errors = []
+        result = list(self.template_string.get_fields_many(input_strings, errors=errors))
+        self.assertEquals([{"Shot": "shot_1", "Sequence": "Seq_12"}, None], result)
+        self.assertEquals(1, len(errors))
+        self.assertEquals(1, errors[0][0])
+        self.assertIsInstance(errors[0][1], TankError)
@@ -527,6 +527,8 @@ class TankTestBase(unittest.TestCase):
                 pc = path_cache.PathCache(self.tk)
                 path_cache_file = pc._get_path_cache_location()
                 pc.close()
+                # path cache connections are shared by the tk instance
+                self.tk.close()
                 if os.path.exists(path_cache_file):
                     os.remove(path_cache_file)
 
@@ -541,6 +543,8 @@ class TankTestBase(unittest.TestCase):
 
             # clear global shotgun accessor
             tank.util.shotgun.connection._g_sg_cached_connections = threading.local()
+            # and the records cached by batched shotgun queries
+            tank.util.shotgun_batch.get_find_cache().clear()
         finally:
             if self._old_shotgun_home is not None:
                 os.environ[self.SHOTGUN_HOME] = self._old_shotgun_home
@@ -744,7 +748,7 @@ class TankTestBase(unittest.TestCase):
 
         path_cache = tank.path_cache.PathCache(self.tk)
         c = path_cache._connection.cursor()
-        for x in list(c.execute("select * from path_cache")):
+        for x in path_cache._get_entries(c):
             print(x)
         c.close()
         path_cache.close()
@@ -952,6 +956,7 @@ def _move_data(path):
             tk = sgtk.sgtk_from_path(path)
             pc = path_cache.PathCache(tk)
             db_path = pc._get_path_cache_location()
+            tk.close()
             if os.path.exists(db_path):
                 print('Removing db %s' % db_path)
                 # Importing pdb allows the deletion of the sqlite db sometimes...
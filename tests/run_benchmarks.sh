@@ -0,0 +1,17 @@
+#!/bin/bash
+# Copyright (c) 2017 Shotgun Software Inc.
+# 
+# CONFIDENTIAL AND PROPRIETARY
+# 
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit 
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your 
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights 
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+#
+# Runs the template engine benchmarks against the python executable and compares
+# the results to the stored baseline. Add "-h" to see options.
+#
+
+python `dirname $0`/benchmarks/benchmark_templates.py $*
@@ -0,0 +1,80 @@
+# Copyright (c) 2017 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from __future__ import with_statement
+
+from mock import patch
+
+from tank.util import shotgun_batch
+from tank_test.tank_test_base import TankTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestBatchedFind(TankTestBase):
+    """
+    Tests the batching of Shotgun searches.
+    """
+
+    def setUp(self):
+        super(TestBatchedFind, self).setUp()
+        self.shots = []
+        for shot_id in range(1, 6):
+            shot = {"type": "Shot", "id": shot_id, "code": "shot_%d" % shot_id, "project": self.project}
+            self.shots.append(shot)
+        self.add_to_sg_mock_db(self.shots)
+        self.cache = shotgun_batch.ShotgunFindCache(60)
+
+    def _add_shot_searches(self, batch, codes):
+        return [
+            batch.add("Shot", [["code", "is", code], ["project", "is", self.project]], ["type", "id", "code"])
+            for code in codes
+        ]
+
+    def test_single_query(self):
+        """Searches only differing by their values are sent as a single query."""
+        batch = shotgun_batch.BatchedFind(self.mockgun, self.cache)
+        search_ids = self._add_shot_searches(batch, ["shot_1", "shot_3", "shot_9"])
+        with patch.object(self.mockgun, "find", wraps=self.mockgun.find) as mock_find:
+            batch.execute()
+        self.assertEqual(1, mock_find.call_count)
+
+        self.assertEqual(1, batch.get(search_ids[0])["id"])
+        self.assertEqual(3, batch.get(search_ids[1])["id"])
+        self.assertIsNone(batch.get(search_ids[2]))
+        self.assertEqual(set(["type", "id", "code"]), set(batch.get(search_ids[0])))
+
+    def test_cache(self):
+        """Records found are reused by later searches."""
+        batch = shotgun_batch.BatchedFind(self.mockgun, self.cache)
+        self._add_shot_searches(batch, ["shot_1", "shot_2"])
+        batch.execute()
+
+        batch = shotgun_batch.BatchedFind(self.mockgun, self.cache)
+        search_ids = self._add_shot_searches(batch, ["shot_1", "shot_2"])
+        with patch.object(self.mockgun, "find", wraps=self.mockgun.find) as mock_find:
+            batch.execute()
+        self.assertEqual(0, mock_find.call_count)
+        self.assertEqual(2, batch.get(search_ids[1])["id"])
+
+    def test_cache_expiry(self):
+        """Cached records expire."""
+        self.cache.set("key", "value")
+        self.assertEqual((True, "value"), self.cache.get("key"))
+
+        self.cache.ttl = -1
+        self.cache.set("key", "value")
+        self.assertEqual((False, None), self.cache.get("key"))
+
+    def test_find_entity_fields(self):
+        """Fields of many records are retrieved with a single query."""
+        with patch.object(self.mockgun, "find", wraps=self.mockgun.find) as mock_find:
+            records = shotgun_batch.find_entity_fields(self.mockgun, "Shot", [1, 2, 42], ["code"], self.cache)
+        self.assertEqual(1, mock_find.call_count)
+        self.assertEqual({1: {"code": "shot_1"}, 2: {"code": "shot_2"}}, records)